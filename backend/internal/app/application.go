@@ -64,6 +64,8 @@ type Application struct {
 	logger           *slog.Logger
 	database         *relational.Database
 	server           *http.Server
+	guardSocket      *http.Server
+	guardSocketPath  string
 	audits           *auditapp.Service
 	responses        repository.ResponseRepository
 	cleanupLock      repository.DistributedLock
@@ -157,6 +159,7 @@ func New(ctx context.Context, cfg config.Config, logger *slog.Logger) (*Applicat
 	var deviceSessions repository.DeviceSessionRepository
 	var refreshLock repository.DistributedLock
 	var epochStore repository.EgressEpochStore
+	var guardLeases repository.QualityGuardLeaseStore
 	var settingsBus repository.SettingsChangeBus
 	var quotaQueue repository.QuotaRecoveryQueue
 	var quotaRefreshState repository.QuotaRefreshCoordinator
@@ -188,6 +191,7 @@ func New(ctx context.Context, cfg config.Config, logger *slog.Logger) (*Applicat
 		deviceSessions = redisruntime.NewDeviceSessionStore(redisStore)
 		refreshLock = redisruntime.NewLockStore(redisStore)
 		epochStore = redisStore
+		guardLeases = redisStore
 		settingsBus = redisStore
 		quotaQueue = redisStore
 		quotaRefreshState = redisStore
@@ -200,6 +204,7 @@ func New(ctx context.Context, cfg config.Config, logger *slog.Logger) (*Applicat
 		deviceSessions = memory.NewDeviceSessionStore()
 		refreshLock = memory.NewLockStore()
 		epochStore = memory.NewEgressEpochStore()
+		guardLeases = memory.NewQualityGuardLeaseStore()
 		quotaQueue = memory.NewQuotaRecoveryQueue()
 		quotaRefreshState = memory.NewQuotaRefreshCoordinator()
 	default:
@@ -476,6 +481,10 @@ func New(ctx context.Context, cfg config.Config, logger *slog.Logger) (*Applicat
 			Prompt: infraqualityguard.ProbePrompt, Expected: infraqualityguard.ProbeExpected,
 			MaxOutputTokens: cfg.QualityGuard.MaxOutputTokens,
 		}
+		if cfg.QualityGuard.EarlyExitProbe {
+			qualityGuardProbe.EarlyExitPrompt = infraqualityguard.EarlyExitProbePrompt
+			qualityGuardProbe.MinGenerationMS = cfg.QualityGuard.MinimumGenerationWindow.Value().Milliseconds()
+		}
 	}
 	// Mihomo 切换成功后的模型质量验证，镜像 transport handler 的
 	// qualityGuardProbe 调用：守护启用时携带真实 probe 身份；未启用时字段为
@@ -484,10 +493,17 @@ func New(ctx context.Context, cfg config.Config, logger *slog.Logger) (*Applicat
 		_, err := egressService.ProbeQuality(ctx, nodeID, qualityGuardProbe)
 		return err
 	})
-	router := httpserver.New(httpserver.Dependencies{Logger: logger, RequestTimeout: cfg.Server.RequestTimeout.Value(), MaxBodyBytes: cfg.Server.MaxBodyBytes, ConcurrencyGate: inferenceConcurrency, SecureCookies: cfg.Auth.SecureCookies, SwaggerEnabled: cfg.Server.SwaggerEnabled, PublicAPIBaseURL: cfg.Frontend.EffectivePublicAPIBaseURL(), FrontendStaticPath: cfg.Frontend.StaticPath, Readiness: readiness, TrafficReady: startup.acceptsTraffic, AdminAuth: adminService, Accounts: accountService, AccountSync: accountSyncService, Models: modelService, ClientKeys: clientKeyService, Audits: auditService, Dashboard: dashboardService, Gateway: gatewayService, Media: mediaService, Settings: settingsService, Egress: egressService, QualityGuardStatePath: qualityGuardPath("state.json"), QualityGuardConfigPath: qualityGuardPath("runtime-config.json"), QualityGuardBootstrapPath: qualityGuardPath("bootstrap.json"), QualityGuardToken: qualityGuardToken, QualityGuardProbe: qualityGuardProbe, Updates: updateService})
+	router := httpserver.New(httpserver.Dependencies{Logger: logger, RequestTimeout: cfg.Server.RequestTimeout.Value(), MaxBodyBytes: cfg.Server.MaxBodyBytes, ConcurrencyGate: inferenceConcurrency, SecureCookies: cfg.Auth.SecureCookies, SwaggerEnabled: cfg.Server.SwaggerEnabled, PublicAPIBaseURL: cfg.Frontend.EffectivePublicAPIBaseURL(), FrontendStaticPath: cfg.Frontend.StaticPath, Readiness: readiness, TrafficReady: startup.acceptsTraffic, AdminAuth: adminService, Accounts: accountService, AccountSync: accountSyncService, Models: modelService, ClientKeys: clientKeyService, Audits: auditService, Dashboard: dashboardService, Gateway: gatewayService, Media: mediaService, Settings: settingsService, Egress: egressService, QualityGuardStatePath: qualityGuardPath("state.json"), QualityGuardConfigPath: qualityGuardPath("runtime-config.json"), QualityGuardBootstrapPath: qualityGuardPath("bootstrap.json"), QualityGuardToken: qualityGuardToken, QualityGuardProbe: qualityGuardProbe, QualityGuardLeases: guardLeases, Updates: updateService})
 	server := &http.Server{Addr: cfg.Server.Listen, Handler: router, ReadHeaderTimeout: 10 * time.Second, ReadTimeout: cfg.Server.ReadTimeout.Value(), IdleTimeout: 2 * time.Minute, MaxHeaderBytes: 64 << 10}
+	// 可选的守护专用 Unix socket：同一路由只放行内部接口，守护流量不与公开请求共用 TCP 监听器。
+	var guardSocket *http.Server
+	guardSocketPath := ""
+	if cfg.QualityGuard.Enabled && cfg.QualityGuard.UnixSocket && qualityGuardDirectory != "" {
+		guardSocketPath = qualityGuardPath(infraqualityguard.SocketName)
+		guardSocket = &http.Server{Handler: httpserver.QualityGuardSocketHandler(router), ReadHeaderTimeout: 10 * time.Second, ReadTimeout: cfg.Server.ReadTimeout.Value(), IdleTimeout: 2 * time.Minute, MaxHeaderBytes: 64 << 10}
+	}
 	return &Application{
-		logger: logger, database: database, server: server,
+		logger: logger, database: database, server: server, guardSocket: guardSocket, guardSocketPath: guardSocketPath,
 		audits: auditService, responses: responseRepo, cleanupLock: refreshLock, runtime: runtimeStore,
 		settingsBus: settingsBus, invalidationBus: invalidationBus, settings: settingsService, gateway: gatewayService, media: mediaService, quotaRecovery: quotaRecoveryService, accounts: accountService, models: modelService, clientKeys: clientKeyService, updates: updateService, invalidations: invalidationService,
 		egressBus: wiredEgressBus, egressInstanceID: egressInstanceID,
@@ -622,6 +638,23 @@ func (value egressMihomoManager) MihomoRefreshDelays(ctx context.Context) egress
 	return mapMihomoStatus(value.manager.RefreshMihomoDelays(ctx))
 }
 
+func (value egressMihomoManager) MihomoEpochs() egressapp.MihomoEpochs {
+	return mapMihomoEpochs(value.manager.MihomoEpochs())
+}
+
+func (value egressMihomoManager) WaitMihomoEpochs(ctx context.Context, known egressapp.MihomoEpochs) egressapp.MihomoEpochs {
+	return mapMihomoEpochs(value.manager.WaitMihomoEpochs(ctx, infraegress.MihomoEpochs{
+		Enabled: known.Enabled, Epoch: known.Epoch, TestEnabled: known.TestEnabled, TestEpoch: known.TestEpoch,
+	}))
+}
+
+// mapMihomoEpochs 转换 infra 层代际号快照为应用层镜像类型。
+func mapMihomoEpochs(epochs infraegress.MihomoEpochs) egressapp.MihomoEpochs {
+	return egressapp.MihomoEpochs{
+		Enabled: epochs.Enabled, Epoch: epochs.Epoch, TestEnabled: epochs.TestEnabled, TestEpoch: epochs.TestEpoch,
+	}
+}
+
 // mapMihomoStatus 转换 infra 层状态快照为应用层镜像类型。
 func mapMihomoStatus(status infraegress.MihomoStatus) egressapp.MihomoStatus {
 	return egressapp.MihomoStatus{
@@ -722,7 +755,17 @@ func (a *Application) Run(ctx context.Context) error {
 		cancelBackground()
 		background.Wait()
 	}()
-	errCh := make(chan error, 1)
+	errCh := make(chan error, 2)
+	if a.guardSocket != nil {
+		listener, err := listenQualityGuardSocket(a.guardSocketPath)
+		if err != nil {
+			return fmt.Errorf("监听质量守护 Unix socket: %w", err)
+		}
+		go func() {
+			a.logger.Info("quality_guard_socket_started", "path", a.guardSocketPath)
+			errCh <- a.guardSocket.Serve(listener)
+		}()
+	}
 	go func() {
 		a.logger.Info("server_started", "listen", a.server.Addr)
 		errCh <- a.server.ListenAndServe()
@@ -876,6 +919,11 @@ func (a *Application) Run(ctx context.Context) error {
 	case <-ctx.Done():
 		shutdownCtx, cancel := context.WithTimeout(context.Background(), 10*time.Second)
 		defer cancel()
+		if a.guardSocket != nil {
+			if err := a.guardSocket.Shutdown(shutdownCtx); err != nil {
+				a.logger.Warn("quality_guard_socket_shutdown_failed", "error", err)
+			}
+		}
 		if err := a.server.Shutdown(shutdownCtx); err != nil {
 			return fmt.Errorf("关闭 HTTP 服务: %w", err)
 		}
@@ -0,0 +1,25 @@
+package app
+
+import (
+	"errors"
+	"io/fs"
+	"net"
+	"os"
+)
+
+// listenQualityGuardSocket 在守护目录中监听内部接口 Unix socket。上次进程遗留的
+// socket 文件会先被删除；权限收紧到 0600，只有与 grok2api 同一用户运行的守护能连接。
+func listenQualityGuardSocket(path string) (net.Listener, error) {
+	if err := os.Remove(path); err != nil && !errors.Is(err, fs.ErrNotExist) {
+		return nil, err
+	}
+	listener, err := net.Listen("unix", path)
+	if err != nil {
+		return nil, err
+	}
+	if err := os.Chmod(path, 0o600); err != nil {
+		_ = listener.Close()
+		return nil, err
+	}
+	return listener, nil
+}
@@ -71,3 +71,23 @@ func TestProbeQualityRejectsUnsupportedNodeAndMissingProber(t *testing.T) {
 		t.Fatalf("missing prober error = %v", err)
 	}
 }
+
+func TestProbeQualityEarlyExitUsesEarlyMarkerPrompt(t *testing.T) {
+	repository := &qualityProbeRepository{node: domain.Node{ID: 7, Scope: domain.ScopeBuild, EncryptedProxyURL: "encrypted"}}
+	prober := &qualityProberStub{}
+	service := NewService(repository, nil, "")
+	service.SetQualityProber(prober)
+	_, err := service.ProbeQuality(context.Background(), 7, QualityProbeInput{ClientKeyID: 3, Model: "grok-test", Prompt: "full", EarlyExit: true})
+	if !errors.Is(err, ErrInvalidInput) {
+		t.Fatalf("missing early prompt error = %v", err)
+	}
+	_, err = service.ProbeQuality(context.Background(), 7, QualityProbeInput{
+		ClientKeyID: 3, Model: "grok-test", Prompt: "full", EarlyExitPrompt: " early ", EarlyExit: true, MinGenerationMS: 1000,
+	})
+	if err != nil {
+		t.Fatal(err)
+	}
+	if prober.input.Prompt != "early" || !prober.input.EarlyExit || prober.input.MinGenerationMS != 1000 {
+		t.Fatalf("probe input=%#v", prober.input)
+	}
+}
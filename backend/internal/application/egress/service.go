@@ -5,6 +5,7 @@ import (
 	"errors"
 	"fmt"
 	"net/url"
+	"slices"
 	"strings"
 	"sync"
 	"time"
@@ -46,6 +47,11 @@ type QualityProbeInput struct {
 	Prompt          string
 	Expected        string
 	MaxOutputTokens int
+	// EarlyExitPrompt 把指令标记放在回复开头；EarlyExit 请求使用它，并在标记
+	// 已出现、输出至少 32 Token 且生成窗口达到 MinGenerationMS 后立即关闭流。
+	EarlyExitPrompt string
+	EarlyExit       bool
+	MinGenerationMS int64
 }
 
 type QualityProbeResult struct {
@@ -64,6 +70,9 @@ type QualityProbeResult struct {
 	OutputTokensPerSecond float64
 	ExpectedMatched       bool
 	ResponseSHA256        string
+	// EarlyExit 表示流在测速判定所需样本齐备后被提前关闭，Token 数为按已收
+	// 字符估算的值。
+	EarlyExit bool
 }
 
 type QualityProber interface {
@@ -144,6 +153,12 @@ func (s *Service) ProbeQuality(ctx context.Context, nodeID uint64, input Quality
 	if input.Expected == "" {
 		input.Expected = DefaultQualityProbeExpected
 	}
+	if input.EarlyExit {
+		input.Prompt = strings.TrimSpace(input.EarlyExitPrompt)
+		if input.Prompt == "" || input.MinGenerationMS < 0 {
+			return QualityProbeResult{}, fmt.Errorf("%w: 提前结束探测未配置", ErrInvalidInput)
+		}
+	}
 	if len(input.Prompt) > MaxQualityProbePromptBytes || len(input.Expected) > MaxQualityProbeExpectedBytes {
 		return QualityProbeResult{}, fmt.Errorf("%w: 探测文本过长", ErrInvalidInput)
 	}
@@ -199,7 +214,7 @@ type BatchNodeDeleter interface {
 }
 
 type BatchNodeEnabledUpdater interface {
-	UpdateEgressNodesEnabled(context.Context, []uint64, bool) (int, error)
+	ChangeEgressNodesEnabled(context.Context, []uint64, bool) ([]uint64, error)
 }
 
 type ClearanceManager interface {
@@ -243,6 +258,15 @@ type MihomoStatus struct {
 	TestMembers []MihomoMemberStatus
 }
 
+// MihomoEpochs 镜像 infraegress.MihomoEpochs：生产组与测试组的出口代际号，
+// 对应客户端未启用时 Enabled/TestEnabled 为 false。
+type MihomoEpochs struct {
+	Enabled     bool
+	Epoch       uint64
+	TestEnabled bool
+	TestEpoch   uint64
+}
+
 // MihomoRotation 是质量守护 rotate_node 契约的结果：Changed 为 true 表示
 // 组出口已确认轮换（含单飞合并，镜像 403 分支的静默语义），false 表示失败。
 type MihomoRotation struct {
@@ -259,6 +283,8 @@ type MihomoManager interface {
 	MihomoTestBan(string) (int, error)
 	MihomoTestUnban(string) (int, error)
 	MihomoRefreshDelays(context.Context) MihomoStatus
+	MihomoEpochs() MihomoEpochs
+	WaitMihomoEpochs(context.Context, MihomoEpochs) MihomoEpochs
 }
 
 type BatchClearanceManager interface {
@@ -312,6 +338,29 @@ func (s *Service) MihomoStatus(ctx context.Context) (MihomoStatus, error) {
 	return manager.MihomoStatus(ctx), nil
 }
 
+// MihomoEpochs 返回当前出口代际号（只读内存，不访问 Mihomo API）。
+func (s *Service) MihomoEpochs() (MihomoEpochs, error) {
+	s.mu.RLock()
+	manager := s.mihomo
+	s.mu.RUnlock()
+	if manager == nil {
+		return MihomoEpochs{}, ErrMihomoUnavailable
+	}
+	return manager.MihomoEpochs(), nil
+}
+
+// WaitMihomoEpochs 阻塞到出口代际号与 known 不同或 ctx 结束，返回此时的
+// 代际号，供质量守护长轮询。
+func (s *Service) WaitMihomoEpochs(ctx context.Context, known MihomoEpochs) (MihomoEpochs, error) {
+	s.mu.RLock()
+	manager := s.mihomo
+	s.mu.RUnlock()
+	if manager == nil {
+		return MihomoEpochs{}, ErrMihomoUnavailable
+	}
+	return manager.WaitMihomoEpochs(ctx, known), nil
+}
+
 // MihomoRefreshDelays 手动触发延迟探测并返回刷新后的状态：清空缓存后
 // 重新拉取，成员组装时必然触发实时探测（生产组与测试组同步刷新）。
 func (s *Service) MihomoRefreshDelays(ctx context.Context) (MihomoStatus, error) {
@@ -552,9 +601,17 @@ func (s *Service) validateFallbackNodeUpdateWithConfig(node domain.Node, config
 // UpdateManyEnabled changes only the scheduling state, leaving proxy secrets,
 // health, probes, and account bindings untouched.
 func (s *Service) UpdateManyEnabled(ctx context.Context, nodeIDs []uint64, enabled bool) (int, error) {
+	changed, err := s.ChangeManyEnabled(ctx, nodeIDs, enabled)
+	return len(changed), err
+}
+
+// ChangeManyEnabled is UpdateManyEnabled reporting which nodes changed, in
+// ascending ID order. Missing nodes and nodes already in the requested state
+// are left out, so a caller can settle each ID of a batch on its own.
+func (s *Service) ChangeManyEnabled(ctx context.Context, nodeIDs []uint64, enabled bool) ([]uint64, error) {
 	ids := uniqueIDs(nodeIDs)
 	if len(ids) == 0 {
-		return 0, fmt.Errorf("%w: 代理节点参数无效", ErrInvalidInput)
+		return nil, fmt.Errorf("%w: 代理节点参数无效", ErrInvalidInput)
 	}
 	for _, id := range ids {
 		value, err := s.repository.GetEgressNode(ctx, id)
@@ -562,10 +619,10 @@ func (s *Service) UpdateManyEnabled(ctx context.Context, nodeIDs []uint64, enabl
 			continue
 		}
 		if err != nil {
-			return 0, err
+			return nil, err
 		}
 		if value.IsMihomoSynced() {
-			return 0, ErrManagedMihomoNode
+			return nil, ErrManagedMihomoNode
 		}
 	}
 
@@ -575,7 +632,7 @@ func (s *Service) UpdateManyEnabled(ctx context.Context, nodeIDs []uint64, enabl
 	if !enabled && s.operations != nil {
 		config, err := s.operations.GetEgressOperationsConfig(ctx)
 		if err != nil {
-			return 0, err
+			return nil, err
 		}
 		selected := make(map[uint64]struct{}, len(ids))
 		for _, id := range ids {
@@ -596,49 +653,50 @@ func (s *Service) UpdateManyEnabled(ctx context.Context, nodeIDs []uint64, enabl
 				continue
 			}
 			if err != nil {
-				return 0, err
+				return nil, err
 			}
 			node.Enabled = false
 			if err := s.validateFallbackNodeUpdateWithConfig(node, config); err != nil {
-				return 0, err
+				return nil, err
 			}
 		}
 	}
 
 	if batch, ok := s.repository.(BatchNodeEnabledUpdater); ok {
-		updated, err := batch.UpdateEgressNodesEnabled(ctx, ids, enabled)
+		changed, err := batch.ChangeEgressNodesEnabled(ctx, ids, enabled)
 		if errors.Is(err, repository.ErrEgressFallbackInUse) {
-			return 0, fmt.Errorf("%w: 固定回退节点不能被批量禁用", ErrInvalidInput)
+			return nil, fmt.Errorf("%w: 固定回退节点不能被批量禁用", ErrInvalidInput)
 		}
 		if err != nil {
-			return 0, err
+			return nil, err
 		}
-		if updated > 0 {
-			s.forgetClearances(ids)
+		if len(changed) > 0 {
+			s.forgetClearances(changed)
 		}
-		return updated, nil
+		return changed, nil
 	}
 
-	updated := 0
+	changed := make([]uint64, 0, len(ids))
 	for _, id := range ids {
 		node, err := s.repository.GetEgressNode(ctx, id)
 		if errors.Is(err, repository.ErrNotFound) {
 			continue
 		}
 		if err != nil {
-			return updated, err
+			return changed, err
 		}
 		if node.Enabled == enabled {
 			continue
 		}
 		node.Enabled = enabled
 		if _, err := s.repository.UpdateEgressNode(ctx, node); err != nil {
-			return updated, err
+			return changed, err
 		}
 		s.forgetClearance(id)
-		updated++
+		changed = append(changed, id)
 	}
-	return updated, nil
+	slices.Sort(changed)
+	return changed, nil
 }
 
 func (s *Service) Delete(ctx context.Context, id uint64) error {
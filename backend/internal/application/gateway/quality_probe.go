@@ -22,7 +22,11 @@ import (
 	"github.com/chenyme/grok2api/backend/internal/infra/security"
 )
 
-const qualityProbeMaxStreamBytes = 4 << 20
+const (
+	qualityProbeMaxStreamBytes = 4 << 20
+	// qualityProbeEarlyExitTokens 与守卫测速判定要求的最少输出 Token 一致。
+	qualityProbeEarlyExitTokens = 32
+)
 
 type qualityProbeChatEvent struct {
 	ID      string `json:"id"`
@@ -98,6 +102,9 @@ func (s *Service) ProbeEgressQuality(ctx context.Context, nodeID uint64, input e
 	chunkCount := 0
 	totalBytes := 0
 	terminal := false
+	stoppedEarly := false
+	expectedSeen := false
+	reasoningCharacters := 0
 	scanner := bufio.NewScanner(result.Body)
 	scanner.Buffer(make([]byte, 64<<10), 1<<20)
 	for scanner.Scan() {
@@ -143,13 +150,31 @@ func (s *Service) ProbeEgressQuality(ctx context.Context, nodeID uint64, input e
 				visible.WriteString(delta.Content)
 				chunkCount++
 			}
+			reasoningCharacters += utf8.RuneCountInString(delta.Reasoning) + utf8.RuneCountInString(delta.ReasoningContent)
+		}
+		if !input.EarlyExit || firstGeneratedAt.IsZero() {
+			continue
+		}
+		if !expectedSeen {
+			expectedSeen = strings.Contains(visible.String(), input.Expected)
+		}
+		estimated := qualityProbeEstimatedTokens(utf8.RuneCountInString(visible.String()) + reasoningCharacters)
+		if qualityProbeEarlyExitSettled(expectedSeen, estimated, time.Since(firstGeneratedAt).Milliseconds(), input.MinGenerationMS) {
+			// 测速所需样本已齐备，关闭流（defer 中的 Body.Close）即中止上游生成。
+			stoppedEarly = true
+			break
 		}
 	}
-	if err := scanner.Err(); err != nil {
+	if stoppedEarly {
+		// 提前关闭时上游尚未发送 usage 事件，按已收字符估算并写入审计。
+		usage.ReasoningTokens = qualityProbeEstimatedTokens(reasoningCharacters)
+		usage.OutputTokens = qualityProbeEstimatedTokens(utf8.RuneCountInString(visible.String()) + reasoningCharacters)
+		usage.TotalTokens = usage.InputTokens + usage.OutputTokens
+	} else if err := scanner.Err(); err != nil {
 		errorCode = "quality_probe_stream_interrupted"
 		return egressapp.QualityProbeResult{}, fmt.Errorf("读取质量探测流: %w", err)
 	}
-	if !terminal {
+	if !terminal && !stoppedEarly {
 		errorCode = "quality_probe_stream_incomplete"
 		return egressapp.QualityProbeResult{}, errors.New("质量探测流未正常结束")
 	}
@@ -185,6 +210,7 @@ func (s *Service) ProbeEgressQuality(ctx context.Context, nodeID uint64, input e
 		ChunkCount: chunkCount, OutputTokens: usage.OutputTokens, ReasoningTokens: usage.ReasoningTokens,
 		VisibleTokens: visibleTokens, VisibleCharacters: visibleCharacters, OutputTokensPerSecond: outputTokensPerSecond,
 		ExpectedMatched: strings.Contains(text, input.Expected), ResponseSHA256: hex.EncodeToString(digest[:]),
+		EarlyExit: stoppedEarly,
 	}, nil
 }
 
@@ -199,6 +225,20 @@ func normalizeQualityProbeRequestError(err error) error {
 	return err
 }
 
+// qualityProbeEstimatedTokens 沿用可见 Token 的兜底估算：约 4 个字符一个 Token。
+func qualityProbeEstimatedTokens(characters int) int64 {
+	if characters <= 0 {
+		return 0
+	}
+	return int64((characters + 3) / 4)
+}
+
+// qualityProbeEarlyExitSettled 判断提前结束探测是否已拿到守卫分类所需的全部
+// 样本：开头的指令标记、足够的输出 Token 和最短生成窗口。
+func qualityProbeEarlyExitSettled(expectedSeen bool, outputTokens, generationMS, minGenerationMS int64) bool {
+	return expectedSeen && outputTokens >= qualityProbeEarlyExitTokens && generationMS >= minGenerationMS
+}
+
 func qualityProbeOutputTokensPerSecond(outputTokens, durationMS, firstTokenMS int64) float64 {
 	generationMS := durationMS - firstTokenMS
 	if outputTokens <= 0 || generationMS <= 0 {
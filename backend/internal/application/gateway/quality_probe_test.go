@@ -39,3 +39,26 @@ func TestQualityProbeOutputTokensPerSecondIncludesReasoningTokens(t *testing.T)
 		t.Fatalf("output TPS = %v, want 10500", got)
 	}
 }
+
+func TestQualityProbeEarlyExitWaitsForMarkerTokensAndWindow(t *testing.T) {
+	if got := qualityProbeEstimatedTokens(129); got != 33 {
+		t.Fatalf("estimated tokens = %d, want 33", got)
+	}
+	cases := []struct {
+		name         string
+		expectedSeen bool
+		tokens       int64
+		generationMS int64
+		want         bool
+	}{
+		{name: "settled", expectedSeen: true, tokens: 32, generationMS: 1000, want: true},
+		{name: "marker missing", expectedSeen: false, tokens: 64, generationMS: 2000},
+		{name: "too few tokens", expectedSeen: true, tokens: 31, generationMS: 2000},
+		{name: "window too short", expectedSeen: true, tokens: 64, generationMS: 999},
+	}
+	for _, tc := range cases {
+		if got := qualityProbeEarlyExitSettled(tc.expectedSeen, tc.tokens, tc.generationMS, 1000); got != tc.want {
+			t.Fatalf("%s: settled = %v, want %v", tc.name, got, tc.want)
+		}
+	}
+}
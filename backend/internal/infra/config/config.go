@@ -275,7 +275,12 @@ type QualityGuardConfig struct {
 	NodeIDs                 []uint64 `yaml:"nodeIDs"`
 	Mode                    string   `yaml:"mode"`
 	ActiveInterval          Duration `yaml:"activeInterval"`
+	AdaptiveInterval        bool     `yaml:"adaptiveInterval"`
+	ActiveIntervalMin       Duration `yaml:"activeIntervalMin"`
+	ActiveIntervalMax       Duration `yaml:"activeIntervalMax"`
 	PassivePollInterval     Duration `yaml:"passivePollInterval"`
+	PassiveCoverageAudits   int      `yaml:"passiveCoverageAudits"`
+	PassiveCoverageWindow   Duration `yaml:"passiveCoverageWindow"`
 	SoftTPS                 float64  `yaml:"softTPS"`
 	HardTPS                 float64  `yaml:"hardTPS"`
 	ConsecutiveSoft         int      `yaml:"consecutiveSoft"`
@@ -283,7 +288,16 @@ type QualityGuardConfig struct {
 	QuarantineDuration      Duration `yaml:"quarantineDuration"`
 	NoAccountBackoff        Duration `yaml:"noAccountBackoff"`
 	MinimumHealthyNodes     int      `yaml:"minimumHealthyNodes"`
+	ActiveConcurrency       int      `yaml:"activeConcurrency"`
+	ActiveCycleBudget       Duration `yaml:"activeCycleBudget"`
+	LeaseTTL                Duration `yaml:"leaseTTL"`
+	DrainGrace              Duration `yaml:"drainGrace"`
+	UnixSocket              bool     `yaml:"unixSocket"`
+	DailyProbeRequests      int      `yaml:"dailyProbeRequests"`
+	DailyProbeOutputTokens  int      `yaml:"dailyProbeOutputTokens"`
+	ProbeReuseWindow        Duration `yaml:"probeReuseWindow"`
 	MaxOutputTokens         int      `yaml:"maxOutputTokens"`
+	EarlyExitProbe          bool     `yaml:"earlyExitProbe"`
 	FailClosed              bool     `yaml:"failClosed"`
 	MinimumGenerationWindow Duration `yaml:"minimumGenerationWindow"`
 	RotationURL             string   `yaml:"rotationURL"`
@@ -713,9 +727,15 @@ func validateQualityGuardConfig(value QualityGuardConfig) error {
 	if value.ActiveInterval.Value() < time.Minute || value.ActiveInterval.Value() > 24*time.Hour {
 		return errors.New("qualityGuard.activeInterval 必须在 1 分钟到 24 小时之间")
 	}
+	if value.ActiveIntervalMin.Value() < time.Minute || value.ActiveIntervalMax.Value() < value.ActiveIntervalMin.Value() || value.ActiveIntervalMax.Value() > 24*time.Hour {
+		return errors.New("qualityGuard.activeIntervalMin 和 activeIntervalMax 必须在 1 分钟到 24 小时之间，且下限不大于上限")
+	}
 	if value.PassivePollInterval.Value() < time.Second || value.PassivePollInterval.Value() > 5*time.Minute {
 		return errors.New("qualityGuard.passivePollInterval 必须在 1 秒到 5 分钟之间")
 	}
+	if value.PassiveCoverageAudits < 0 || value.PassiveCoverageAudits > 1000 || value.PassiveCoverageWindow.Value() < time.Minute || value.PassiveCoverageWindow.Value() > 24*time.Hour {
+		return errors.New("qualityGuard.passiveCoverageAudits 必须在 0 到 1000 之间，passiveCoverageWindow 必须在 1 分钟到 24 小时之间")
+	}
 	if value.SoftTPS < 1 || value.HardTPS <= value.SoftTPS || value.HardTPS > 10000 {
 		return errors.New("qualityGuard TPS 阈值无效")
 	}
@@ -728,6 +748,25 @@ func validateQualityGuardConfig(value QualityGuardConfig) error {
 	if value.MinimumHealthyNodes < 1 || (len(value.NodeIDs) > 0 && value.MinimumHealthyNodes > len(value.NodeIDs)) {
 		return errors.New("qualityGuard.minimumHealthyNodes 与受管节点数量不匹配")
 	}
+	if value.ActiveConcurrency < 1 || value.ActiveConcurrency > 64 {
+		return errors.New("qualityGuard.activeConcurrency 必须在 1 到 64 之间")
+	}
+	if value.ActiveCycleBudget.Value() < 0 || value.ActiveCycleBudget.Value() > time.Hour {
+		return errors.New("qualityGuard.activeCycleBudget 必须在 0 到 1 小时之间")
+	}
+	if lease := value.LeaseTTL.Value(); lease != 0 && (lease < 5*time.Second || lease > 5*time.Minute) {
+		return errors.New("qualityGuard.leaseTTL 必须为 0 或在 5 秒到 5 分钟之间")
+	}
+	// 容器的 S6_SERVICES_GRACETIME 为 25 秒，需留出写回状态并退出的时间。
+	if value.DrainGrace.Value() < 0 || value.DrainGrace.Value() > 20*time.Second {
+		return errors.New("qualityGuard.drainGrace 必须在 0 到 20 秒之间")
+	}
+	if value.DailyProbeRequests < 0 || value.DailyProbeRequests > 1000000 || value.DailyProbeOutputTokens < 0 || value.DailyProbeOutputTokens > 1000000000 {
+		return errors.New("qualityGuard.dailyProbeRequests 和 dailyProbeOutputTokens 不能为负数或过大")
+	}
+	if value.ProbeReuseWindow.Value() < 0 || value.ProbeReuseWindow.Value() > 10*time.Minute {
+		return errors.New("qualityGuard.probeReuseWindow 必须在 0 到 10 分钟之间")
+	}
 	if value.MaxOutputTokens < 32 || value.MaxOutputTokens > 4096 {
 		return errors.New("qualityGuard.maxOutputTokens 必须在 32 到 4096 之间")
 	}
@@ -873,9 +912,11 @@ func defaultConfig() Config {
 		QualityGuard: QualityGuardConfig{
 			Model: "grok-4.5", Mode: "hybrid",
 			ActiveInterval: Duration(30 * time.Minute), PassivePollInterval: Duration(5 * time.Second),
+			ActiveIntervalMin: Duration(10 * time.Minute), ActiveIntervalMax: Duration(4 * time.Hour),
+			PassiveCoverageWindow: Duration(30 * time.Minute), ProbeReuseWindow: Duration(time.Minute),
 			SoftTPS: 500, HardTPS: 1000, ConsecutiveSoft: 2, ConsecutiveErrors: 2,
 			QuarantineDuration: Duration(5 * time.Minute), NoAccountBackoff: Duration(5 * time.Minute),
-			MinimumHealthyNodes: 3, MaxOutputTokens: 384,
+			MinimumHealthyNodes: 3, ActiveConcurrency: 1, ActiveCycleBudget: Duration(5 * time.Minute), DrainGrace: Duration(15 * time.Second), MaxOutputTokens: 384,
 			MinimumGenerationWindow: Duration(time.Second), RotationTimeout: Duration(45 * time.Second),
 		},
 		ClientKeyDefaults: ClientKeyDefaultsConfig{RPMLimit: clientkeydomain.DefaultRPMLimit, MaxConcurrent: clientkeydomain.DefaultMaxConcurrent},
@@ -185,6 +185,7 @@ type Manager struct {
 	mihomoFallbackNext      time.Time
 	mihomoConfig            MihomoConfig
 	mihomoTestConfig        MihomoConfig
+	mihomoReconfigured      chan struct{}
 	clearanceConfig         ClearanceConfig
 	clearanceVersion        uint64
 	clearances              map[string]clearanceState
@@ -564,6 +565,11 @@ func (m *Manager) UpdateMihomoConfig(value MihomoConfig) {
 	value.GroupName = strings.TrimSpace(value.GroupName)
 	m.mihomoMu.Lock()
 	defer m.mihomoMu.Unlock()
+	// 客户端可能被置空或重建，唤醒等待旧客户端 epoch 的长轮询重新取值。
+	if m.mihomoReconfigured != nil {
+		close(m.mihomoReconfigured)
+	}
+	m.mihomoReconfigured = make(chan struct{})
 	if !value.Enabled || value.APIURL == "" || value.GroupName == "" {
 		m.mihomo = nil
 		m.mihomoTest = nil
@@ -610,6 +616,72 @@ func (m *Manager) updateMihomoTestLocked(value MihomoConfig) {
 	}
 }
 
+// MihomoEpochs 是生产组与测试组出口代际号的快照；对应客户端未启用时
+// Enabled/TestEnabled 为 false、代际号为 0。
+type MihomoEpochs struct {
+	Enabled     bool
+	Epoch       uint64
+	TestEnabled bool
+	TestEpoch   uint64
+}
+
+// MihomoEpochs 返回当前出口代际号，只读内存不访问 Mihomo API。
+func (m *Manager) MihomoEpochs() MihomoEpochs {
+	m.mihomoMu.RLock()
+	mihomo := m.mihomo
+	testMihomo := m.mihomoTest
+	m.mihomoMu.RUnlock()
+	return mihomoEpochsOf(mihomo, testMihomo)
+}
+
+// WaitMihomoEpochs 阻塞到出口代际号与 known 不同、Mihomo 配置变化或 ctx
+// 结束，返回此时的代际号。质量守护据此长轮询，出口一切换即可作废进行中的
+// 探测，而不必在每次探测前后各查询一次状态。
+func (m *Manager) WaitMihomoEpochs(ctx context.Context, known MihomoEpochs) MihomoEpochs {
+	for {
+		m.mihomoMu.Lock()
+		if m.mihomoReconfigured == nil {
+			m.mihomoReconfigured = make(chan struct{})
+		}
+		reconfigured := m.mihomoReconfigured
+		mihomo := m.mihomo
+		testMihomo := m.mihomoTest
+		m.mihomoMu.Unlock()
+		// 先取唤醒通道再读代际号，两者之间的变化也会关闭已取到的通道。
+		var changed, testChanged <-chan struct{}
+		if mihomo != nil {
+			changed = mihomo.EpochChanged()
+		}
+		if testMihomo != nil {
+			testChanged = testMihomo.EpochChanged()
+		}
+		current := mihomoEpochsOf(mihomo, testMihomo)
+		if current != known {
+			return current
+		}
+		select {
+		case <-ctx.Done():
+			return current
+		case <-changed:
+		case <-testChanged:
+		case <-reconfigured:
+		}
+	}
+}
+
+func mihomoEpochsOf(mihomo, testMihomo *MihomoClient) MihomoEpochs {
+	var epochs MihomoEpochs
+	if mihomo != nil {
+		epochs.Enabled = true
+		epochs.Epoch = mihomo.Epoch()
+	}
+	if testMihomo != nil {
+		epochs.TestEnabled = true
+		epochs.TestEpoch = testMihomo.Epoch()
+	}
+	return epochs
+}
+
 // MihomoMemberStatus 是 Mihomo 代理组成员的状态快照，供状态 API 展示。
 // DelayMS 取节点 history 最后一条；-1 表示无延迟数据（history 为空或
 // 最后一条 <= 0）。Provider 是成员所属机场/订阅名，无 provider 的节点
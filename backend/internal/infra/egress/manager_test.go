@@ -2949,6 +2949,43 @@ func TestMihomoEpochStoreAndSwitchLockInjection(t *testing.T) {
 	}
 }
 
+func TestWaitMihomoEpochsWakesOnBumpAndReconfigure(t *testing.T) {
+	manager := NewManager(&synchronizedEgressRepository{}, nil)
+	manager.UpdateMihomoConfig(MihomoConfig{Enabled: true, APIURL: "http://mihomo.invalid", GroupName: "XAI-GROUP"})
+	known := manager.MihomoEpochs()
+	if !known.Enabled || known.TestEnabled {
+		t.Fatalf("epochs = %+v", known)
+	}
+
+	ctx, cancel := context.WithTimeout(context.Background(), 20*time.Millisecond)
+	defer cancel()
+	if got := manager.WaitMihomoEpochs(ctx, known); got != known {
+		t.Fatalf("unchanged epochs should wait out the context: %+v", got)
+	}
+
+	manager.mihomoMu.RLock()
+	mihomo := manager.mihomo
+	manager.mihomoMu.RUnlock()
+	go func() {
+		time.Sleep(10 * time.Millisecond)
+		mihomo.mu.Lock()
+		mihomo.bumpEpochLocked()
+		mihomo.mu.Unlock()
+	}()
+	bumped := manager.WaitMihomoEpochs(context.Background(), known)
+	if bumped.Epoch != known.Epoch+1 {
+		t.Fatalf("bump not observed: known=%+v got=%+v", known, bumped)
+	}
+
+	go func() {
+		time.Sleep(10 * time.Millisecond)
+		manager.UpdateMihomoConfig(MihomoConfig{})
+	}()
+	if got := manager.WaitMihomoEpochs(context.Background(), bumped); got != (MihomoEpochs{}) {
+		t.Fatalf("disabling mihomo should wake the wait: %+v", got)
+	}
+}
+
 // TestClearanceBindingFingerprintTracksSharedEpoch 验证 FIX-1 读方接线：多实例
 // 部署下出口切换可能由其他实例完成（共享 epoch 已 bump 而本地镜像未跟上），
 // Manager 求解 clearance 前先追平共享 epoch，使绑定指纹反映最新出口代际，
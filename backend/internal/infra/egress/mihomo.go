@@ -203,6 +203,10 @@ type MihomoClient struct {
 	// 节点集变化、默认连接节点 now 变化、清空黑名单、配置变化）都 +1。
 	// Manager 用它与出口绑定 clearance 指纹：出口一变旧缓存自动作废。
 	epoch atomic.Uint64
+	// epochWake 在 epoch 每次变化时关闭并换新，供 Manager.WaitMihomoEpochs
+	// 的长轮询即时唤醒（见 EpochChanged）。
+	epochWakeMu sync.Mutex
+	epochWake   chan struct{}
 	// delayCache 是主动延迟探测结果缓存（组名 -> 条目），由 mu 保护。失效
 	// 时机与 epoch 语义一致：bumpEpochLocked（切换/节点集变化/黑名单变动/
 	// 配置变化）即清空；TTL 兜底防止长时间无事件时展示过期延迟。
@@ -331,6 +335,26 @@ func (c *MihomoClient) Epoch() uint64 {
 	return c.epoch.Load()
 }
 
+// EpochChanged 返回一个在 epoch 下一次变化时关闭的通道。调用方应先取通道
+// 再读 Epoch，避免错过两者之间发生的变化。
+func (c *MihomoClient) EpochChanged() <-chan struct{} {
+	c.epochWakeMu.Lock()
+	defer c.epochWakeMu.Unlock()
+	if c.epochWake == nil {
+		c.epochWake = make(chan struct{})
+	}
+	return c.epochWake
+}
+
+func (c *MihomoClient) announceEpochChange() {
+	c.epochWakeMu.Lock()
+	if c.epochWake != nil {
+		close(c.epochWake)
+	}
+	c.epochWake = make(chan struct{})
+	c.epochWakeMu.Unlock()
+}
+
 // bumpEpochLocked 递增出口代际版本号并清空延迟探测缓存（两者同生命周期：
 // 任何出口选择状态变化都使旧探测结果失效）。注入了 epochStore 时以共享
 // 存储为权威：BumpEpoch 成功用返回值追平本地 atomic（max 语义，只前向）——
@@ -341,6 +365,7 @@ func (c *MihomoClient) Epoch() uint64 {
 // 调用方须持有 c.mu（保证各事件的本地代际号与共享存储同序）。
 func (c *MihomoClient) bumpEpochLocked() {
 	clear(c.delayCache)
+	defer c.announceEpochChange()
 	if c.epochStore == nil {
 		c.epoch.Add(1)
 		return
@@ -404,6 +429,7 @@ func (c *MihomoClient) RefreshEpochFromStore(ctx context.Context) {
 			return
 		}
 		if c.epoch.CompareAndSwap(local, shared) {
+			c.announceEpochChange()
 			return
 		}
 	}
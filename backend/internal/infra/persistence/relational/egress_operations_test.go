@@ -3,6 +3,7 @@ package relational
 import (
 	"context"
 	"errors"
+	"slices"
 	"strings"
 	"testing"
 	"time"
@@ -480,6 +481,30 @@ func TestEgressOperationsBatchUpdatesEnabledState(t *testing.T) {
 	}
 }
 
+func TestEgressOperationsBatchReportsChangedNodeIDs(t *testing.T) {
+	ctx := context.Background()
+	database := openTestDatabase(t)
+	nodes := NewEgressRepository(database)
+	cipher := egressOperationsCipher(t)
+	first := createHealthyEgressNode(t, ctx, nodes, cipher, "batch-ids-first", 0)
+	second := createHealthyEgressNode(t, ctx, nodes, cipher, "batch-ids-second", 0)
+	second.Enabled = false
+	if _, err := nodes.UpdateEgressNode(ctx, second); err != nil {
+		t.Fatal(err)
+	}
+
+	service := egressapp.NewService(nodes, cipher, "test-browser")
+	missing := second.ID + 1000
+	changed, err := service.ChangeManyEnabled(ctx, []uint64{missing, second.ID, first.ID}, false)
+	if err != nil || !slices.Equal(changed, []uint64{first.ID}) {
+		t.Fatalf("disable changed = %v, err = %v", changed, err)
+	}
+	changed, err = service.ChangeManyEnabled(ctx, []uint64{second.ID, first.ID}, true)
+	if err != nil || !slices.Equal(changed, []uint64{first.ID, second.ID}) {
+		t.Fatalf("enable changed = %v, err = %v", changed, err)
+	}
+}
+
 func TestEgressOperationsBatchDisableRejectsFixedFallback(t *testing.T) {
 	ctx := context.Background()
 	database := openTestDatabase(t)
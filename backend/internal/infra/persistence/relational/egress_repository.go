@@ -147,36 +147,48 @@ func (r *EgressRepository) UpdateEgressNode(ctx context.Context, value egress.No
 }
 
 func (r *EgressRepository) UpdateEgressNodesEnabled(ctx context.Context, ids []uint64, enabled bool) (int, error) {
+	changed, err := r.ChangeEgressNodesEnabled(ctx, ids, enabled)
+	return len(changed), err
+}
+
+// ChangeEgressNodesEnabled 批量切换启用状态并按 ID 升序返回实际发生变化的
+// 节点；不存在或已处于目标状态的 ID 不在结果中。禁用时若任一节点是固定
+// 回退节点，整批不生效并返回 ErrEgressFallbackInUse。
+func (r *EgressRepository) ChangeEgressNodesEnabled(ctx context.Context, ids []uint64, enabled bool) ([]uint64, error) {
 	if len(ids) == 0 {
-		return 0, nil
-	}
-	if enabled {
-		result := r.db.db.WithContext(ctx).Model(&egressNodeModel{}).
-			Where("id IN ? AND enabled <> ?", ids, true).
-			Updates(map[string]any{"enabled": true, "updated_at": time.Now().UTC()})
-		return int(result.RowsAffected), mapError(result.Error)
+		return nil, nil
 	}
-	var updated int64
+	var changed []uint64
 	err := r.db.db.WithContext(ctx).Transaction(func(tx *gorm.DB) error {
-		config, err := lockEgressOperationsConfig(tx)
-		if err != nil {
-			return err
+		var config egressOperationsConfigModel
+		if !enabled {
+			var err error
+			if config, err = lockEgressOperationsConfig(tx); err != nil {
+				return err
+			}
 		}
 		var lockedIDs []uint64
 		if err := tx.Model(&egressNodeModel{}).Clauses(clause.Locking{Strength: "UPDATE"}).
 			Where("id IN ?", ids).Order("id ASC").Pluck("id", &lockedIDs).Error; err != nil {
 			return err
 		}
-		if configReferencesAnyFallbackNode(config, lockedIDs) {
+		if !enabled && configReferencesAnyFallbackNode(config, lockedIDs) {
 			return repository.ErrEgressFallbackInUse
 		}
-		result := tx.Model(&egressNodeModel{}).
-			Where("id IN ? AND enabled <> ?", lockedIDs, false).
-			Updates(map[string]any{"enabled": false, "updated_at": time.Now().UTC()})
-		updated = result.RowsAffected
-		return result.Error
+		if err := tx.Model(&egressNodeModel{}).Where("id IN ? AND enabled <> ?", lockedIDs, enabled).
+			Order("id ASC").Pluck("id", &changed).Error; err != nil {
+			return err
+		}
+		if len(changed) == 0 {
+			return nil
+		}
+		return tx.Model(&egressNodeModel{}).Where("id IN ?", changed).
+			Updates(map[string]any{"enabled": enabled, "updated_at": time.Now().UTC()}).Error
 	})
-	return int(updated), mapError(err)
+	if err != nil {
+		return nil, mapError(err)
+	}
+	return changed, nil
 }
 
 func (r *EgressRepository) UpdateEgressNodeClearance(ctx context.Context, id uint64, encryptedCookie, userAgent, fingerprint, bindingFingerprint string, refreshedAt time.Time) error {
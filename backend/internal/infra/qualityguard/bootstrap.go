@@ -16,9 +16,15 @@ import (
 
 const bootstrapVersion = 1
 
+// SocketName 是启用 unixSocket 时内部接口 Unix socket 在守护目录中的文件名。
+const SocketName = "api.sock"
+
 const (
 	ProbePrompt   = "Write exactly 16 numbered lines about reliable distributed systems. Each line must be one complete English sentence, with no markdown heading. The final line must end with the exact marker QUALITY_OK."
 	ProbeExpected = "QUALITY_OK"
+	// EarlyExitProbePrompt 把标记放在第一行，流可在测速样本齐备后立即关闭，
+	// 同时仍能校验指令遵循。
+	EarlyExitProbePrompt = "Begin your reply with the exact marker QUALITY_OK on its own line. Then write exactly 16 numbered lines about reliable distributed systems. Each line must be one complete English sentence, with no markdown heading."
 )
 
 type bootstrapFile struct {
@@ -29,27 +35,41 @@ type bootstrapFile struct {
 }
 
 type bootstrapConfig struct {
-	Model                   string   `json:"model"`
-	Prompt                  string   `json:"prompt"`
-	Expected                string   `json:"expected"`
-	NodeIDs                 []string `json:"node_ids"`
-	Mode                    string   `json:"mode"`
-	ActiveIntervalSeconds   int      `json:"active_interval_seconds"`
-	PassivePollSeconds      int      `json:"passive_poll_seconds"`
-	SoftTPS                 float64  `json:"soft_tps"`
-	HardTPS                 float64  `json:"hard_tps"`
-	ConsecutiveSoft         int      `json:"consecutive_soft"`
-	ConsecutiveErrors       int      `json:"consecutive_errors"`
-	QuarantineSeconds       int      `json:"quarantine_seconds"`
-	NoAccountBackoffSeconds int      `json:"no_account_backoff_seconds"`
-	MinHealthyNodes         int      `json:"min_healthy_nodes"`
-	MaxOutputTokens         int      `json:"max_output_tokens"`
-	FailClosed              bool     `json:"fail_closed"`
-	MinGenerationMS         int      `json:"min_generation_ms"`
-	RotationURL             string   `json:"rotation_url"`
-	RotationToken           string   `json:"rotation_token"`
-	RotationTimeoutSeconds  int      `json:"rotation_timeout_seconds"`
-	RotatableNodeIDs        []string `json:"rotatable_node_ids"`
+	Model                        string   `json:"model"`
+	Prompt                       string   `json:"prompt"`
+	Expected                     string   `json:"expected"`
+	NodeIDs                      []string `json:"node_ids"`
+	Mode                         string   `json:"mode"`
+	ActiveIntervalSeconds        int      `json:"active_interval_seconds"`
+	AdaptiveInterval             bool     `json:"adaptive_interval"`
+	ActiveIntervalMinSeconds     int      `json:"active_interval_min_seconds"`
+	ActiveIntervalMaxSeconds     int      `json:"active_interval_max_seconds"`
+	PassivePollSeconds           int      `json:"passive_poll_seconds"`
+	PassiveCoverageAudits        int      `json:"passive_coverage_audits"`
+	PassiveCoverageWindowSeconds int      `json:"passive_coverage_window_seconds"`
+	SoftTPS                      float64  `json:"soft_tps"`
+	HardTPS                      float64  `json:"hard_tps"`
+	ConsecutiveSoft              int      `json:"consecutive_soft"`
+	ConsecutiveErrors            int      `json:"consecutive_errors"`
+	QuarantineSeconds            int      `json:"quarantine_seconds"`
+	NoAccountBackoffSeconds      int      `json:"no_account_backoff_seconds"`
+	MinHealthyNodes              int      `json:"min_healthy_nodes"`
+	ActiveConcurrency            int      `json:"active_concurrency"`
+	ActiveCycleBudgetSeconds     int      `json:"active_cycle_budget_seconds"`
+	LeaseTTLSeconds              int      `json:"lease_ttl_seconds"`
+	DrainGraceSeconds            int      `json:"drain_grace_seconds"`
+	DailyProbeRequests           int      `json:"daily_probe_requests"`
+	DailyProbeOutputTokens       int      `json:"daily_probe_output_tokens"`
+	ProbeReuseSeconds            int      `json:"probe_reuse_seconds"`
+	MaxOutputTokens              int      `json:"max_output_tokens"`
+	EarlyExitProbe               bool     `json:"early_exit_probe"`
+	FailClosed                   bool     `json:"fail_closed"`
+	MinGenerationMS              int      `json:"min_generation_ms"`
+	RotationURL                  string   `json:"rotation_url"`
+	RotationToken                string   `json:"rotation_token"`
+	RotationTimeoutSeconds       int      `json:"rotation_timeout_seconds"`
+	RotatableNodeIDs             []string `json:"rotatable_node_ids"`
+	APISocket                    string   `json:"api_socket"`
 }
 
 // Prepare writes the sidecar bootstrap file and returns the scoped internal
@@ -67,6 +87,10 @@ func Prepare(path string, value config.QualityGuardConfig, jwtSecret string) (st
 	if value.Enabled {
 		token = deriveToken(jwtSecret)
 	}
+	apiSocket := ""
+	if value.UnixSocket {
+		apiSocket = filepath.Join(filepath.Dir(path), SocketName)
+	}
 	payload := bootstrapFile{
 		Version: bootstrapVersion, Enabled: value.Enabled, InternalToken: token,
 		Config: bootstrapConfig{
@@ -74,12 +98,16 @@ func Prepare(path string, value config.QualityGuardConfig, jwtSecret string) (st
 			Prompt: ProbePrompt, Expected: ProbeExpected,
 			NodeIDs: uint64Strings(value.NodeIDs), Mode: value.Mode,
 			ActiveIntervalSeconds: int(value.ActiveInterval.Value().Seconds()), PassivePollSeconds: int(value.PassivePollInterval.Value().Seconds()),
-			SoftTPS: value.SoftTPS, HardTPS: value.HardTPS, ConsecutiveSoft: value.ConsecutiveSoft, ConsecutiveErrors: value.ConsecutiveErrors,
+			AdaptiveInterval: value.AdaptiveInterval, ActiveIntervalMinSeconds: int(value.ActiveIntervalMin.Value().Seconds()),
+			ActiveIntervalMaxSeconds: int(value.ActiveIntervalMax.Value().Seconds()), PassiveCoverageAudits: value.PassiveCoverageAudits,
+			PassiveCoverageWindowSeconds: int(value.PassiveCoverageWindow.Value().Seconds()), SoftTPS: value.SoftTPS,
+			HardTPS: value.HardTPS, ConsecutiveSoft: value.ConsecutiveSoft, ConsecutiveErrors: value.ConsecutiveErrors,
 			QuarantineSeconds: int(value.QuarantineDuration.Value().Seconds()), NoAccountBackoffSeconds: int(value.NoAccountBackoff.Value().Seconds()),
-			MinHealthyNodes: value.MinimumHealthyNodes, MaxOutputTokens: value.MaxOutputTokens, FailClosed: value.FailClosed,
+			MinHealthyNodes: value.MinimumHealthyNodes, ActiveConcurrency: value.ActiveConcurrency, MaxOutputTokens: value.MaxOutputTokens, FailClosed: value.FailClosed,
+			EarlyExitProbe: value.EarlyExitProbe, ActiveCycleBudgetSeconds: int(value.ActiveCycleBudget.Value().Seconds()), LeaseTTLSeconds: int(value.LeaseTTL.Value().Seconds()), DrainGraceSeconds: int(value.DrainGrace.Value().Seconds()), DailyProbeRequests: value.DailyProbeRequests, DailyProbeOutputTokens: value.DailyProbeOutputTokens, ProbeReuseSeconds: int(value.ProbeReuseWindow.Value().Seconds()),
 			MinGenerationMS: int(value.MinimumGenerationWindow.Value().Milliseconds()), RotationURL: strings.TrimSpace(value.RotationURL),
 			RotationToken: value.RotationToken, RotationTimeoutSeconds: int(value.RotationTimeout.Value().Seconds()),
-			RotatableNodeIDs: uint64Strings(value.RotatableNodeIDs),
+			RotatableNodeIDs: uint64Strings(value.RotatableNodeIDs), APISocket: apiSocket,
 		},
 	}
 	if err := writeAtomic(path, payload); err != nil {
@@ -16,9 +16,12 @@ func TestPrepareWritesPrivateScopedBootstrap(t *testing.T) {
 	value := config.QualityGuardConfig{
 		Enabled: true, Model: "grok-4.5", NodeIDs: []uint64{2, 9}, Mode: "hybrid",
 		ActiveInterval: config.Duration(30 * time.Minute), PassivePollInterval: config.Duration(5 * time.Second),
-		SoftTPS: 500, HardTPS: 1000, ConsecutiveSoft: 2, ConsecutiveErrors: 2,
+		AdaptiveInterval: true, ActiveIntervalMin: config.Duration(10 * time.Minute), ActiveIntervalMax: config.Duration(4 * time.Hour),
+		PassiveCoverageAudits: 3, PassiveCoverageWindow: config.Duration(20 * time.Minute),
+		DailyProbeRequests: 200, DailyProbeOutputTokens: 80000, ProbeReuseWindow: config.Duration(time.Minute), EarlyExitProbe: true,
+		ActiveCycleBudget: config.Duration(5 * time.Minute), LeaseTTL: config.Duration(15 * time.Second), DrainGrace: config.Duration(20 * time.Second), UnixSocket: true, SoftTPS: 500, HardTPS: 1000, ConsecutiveSoft: 2, ConsecutiveErrors: 2,
 		QuarantineDuration: config.Duration(5 * time.Minute), NoAccountBackoff: config.Duration(5 * time.Minute),
-		MinimumHealthyNodes: 1, MaxOutputTokens: 384, MinimumGenerationWindow: config.Duration(time.Second),
+		MinimumHealthyNodes: 1, ActiveConcurrency: 4, MaxOutputTokens: 384, MinimumGenerationWindow: config.Duration(time.Second),
 		RotationTimeout: config.Duration(45 * time.Second),
 	}
 	token, err := Prepare(path, value, "12345678901234567890123456789012")
@@ -42,7 +45,13 @@ func TestPrepareWritesPrivateScopedBootstrap(t *testing.T) {
 	if err := json.Unmarshal(data, &payload); err != nil {
 		t.Fatal(err)
 	}
-	if !payload.Enabled || payload.InternalToken != token || len(payload.Config.NodeIDs) != 2 || payload.Config.Prompt != ProbePrompt || payload.Config.Expected != ProbeExpected {
+	if !payload.Enabled || payload.InternalToken != token || len(payload.Config.NodeIDs) != 2 || payload.Config.Prompt != ProbePrompt || payload.Config.Expected != ProbeExpected || payload.Config.ActiveConcurrency != 4 ||
+		!payload.Config.AdaptiveInterval || payload.Config.ActiveIntervalMinSeconds != 600 || payload.Config.ActiveIntervalMaxSeconds != 14400 ||
+		payload.Config.PassiveCoverageAudits != 3 || payload.Config.PassiveCoverageWindowSeconds != 1200 ||
+		payload.Config.DailyProbeRequests != 200 || payload.Config.DailyProbeOutputTokens != 80000 ||
+		payload.Config.ProbeReuseSeconds != 60 || !payload.Config.EarlyExitProbe ||
+		payload.Config.ActiveCycleBudgetSeconds != 300 || payload.Config.LeaseTTLSeconds != 15 ||
+		payload.Config.DrainGraceSeconds != 20 || payload.Config.APISocket != filepath.Join(filepath.Dir(path), SocketName) {
 		t.Fatalf("payload = %#v", payload)
 	}
 }
@@ -0,0 +1,66 @@
+package memory
+
+import (
+	"context"
+	"fmt"
+	"sync"
+	"time"
+
+	"github.com/chenyme/grok2api/backend/internal/repository"
+)
+
+// QualityGuardLeaseStore 是单实例的质量守护主节点租约，行为与 Redis 实现一致：
+// fencing token 在进程生命周期内单调递增，租约过期后由下一位申请者接管。
+type QualityGuardLeaseStore struct {
+	mu    sync.Mutex
+	lease repository.QualityGuardLease
+	token uint64
+}
+
+func NewQualityGuardLeaseStore() *QualityGuardLeaseStore {
+	return &QualityGuardLeaseStore{}
+}
+
+func (s *QualityGuardLeaseStore) AcquireQualityGuardLease(ctx context.Context, holder string, ttl time.Duration, now time.Time) (repository.QualityGuardLease, bool, error) {
+	if holder == "" || ttl <= 0 {
+		return repository.QualityGuardLease{}, false, fmt.Errorf("quality guard lease holder or ttl is invalid")
+	}
+	if err := ctx.Err(); err != nil {
+		return repository.QualityGuardLease{}, false, err
+	}
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	if s.lease.Holder != "" && s.lease.Holder != holder && now.Before(s.lease.ExpiresAt) {
+		return s.lease, false, nil
+	}
+	if s.lease.Holder != holder || !now.Before(s.lease.ExpiresAt) {
+		s.token++
+		s.lease = repository.QualityGuardLease{Holder: holder, Token: s.token}
+	}
+	s.lease.ExpiresAt = now.Add(ttl)
+	return s.lease, true, nil
+}
+
+func (s *QualityGuardLeaseStore) ReleaseQualityGuardLease(ctx context.Context, holder string, token uint64) error {
+	if err := ctx.Err(); err != nil {
+		return err
+	}
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	if s.lease.Holder == holder && s.lease.Token == token {
+		s.lease = repository.QualityGuardLease{}
+	}
+	return nil
+}
+
+func (s *QualityGuardLeaseStore) CurrentQualityGuardLease(ctx context.Context, now time.Time) (repository.QualityGuardLease, bool, error) {
+	if err := ctx.Err(); err != nil {
+		return repository.QualityGuardLease{}, false, err
+	}
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	if s.lease.Holder == "" || !now.Before(s.lease.ExpiresAt) {
+		return repository.QualityGuardLease{}, false, nil
+	}
+	return s.lease, true, nil
+}
@@ -0,0 +1,44 @@
+package memory
+
+import (
+	"context"
+	"testing"
+	"time"
+)
+
+func TestQualityGuardLeaseFailsOverWithHigherFencingToken(t *testing.T) {
+	ctx := context.Background()
+	store := NewQualityGuardLeaseStore()
+	now := time.Unix(1000, 0)
+	first, held, err := store.AcquireQualityGuardLease(ctx, "host-a", 15*time.Second, now)
+	if err != nil || !held || first.Token != 1 {
+		t.Fatalf("首次获取 = %+v, held = %v, err = %v", first, held, err)
+	}
+	current, held, err := store.AcquireQualityGuardLease(ctx, "host-b", 15*time.Second, now.Add(5*time.Second))
+	if err != nil || held || current.Holder != "host-a" {
+		t.Fatalf("租约有效期内备用节点不应接管: %+v, held = %v, err = %v", current, held, err)
+	}
+	renewed, held, err := store.AcquireQualityGuardLease(ctx, "host-a", 15*time.Second, now.Add(10*time.Second))
+	if err != nil || !held || renewed.Token != first.Token || !renewed.ExpiresAt.Equal(now.Add(25*time.Second)) {
+		t.Fatalf("续约应保持 token 并延长有效期: %+v, held = %v, err = %v", renewed, held, err)
+	}
+	takeover, held, err := store.AcquireQualityGuardLease(ctx, "host-b", 15*time.Second, now.Add(25*time.Second))
+	if err != nil || !held || takeover.Holder != "host-b" || takeover.Token != 2 {
+		t.Fatalf("过期后备用节点应以更大的 token 接管: %+v, held = %v, err = %v", takeover, held, err)
+	}
+	if err := store.ReleaseQualityGuardLease(ctx, "host-a", first.Token); err != nil {
+		t.Fatal(err)
+	}
+	if current, ok, err := store.CurrentQualityGuardLease(ctx, now.Add(26*time.Second)); err != nil || !ok || current.Token != 2 {
+		t.Fatalf("旧主节点不能释放新租约: %+v, ok = %v, err = %v", current, ok, err)
+	}
+	if err := store.ReleaseQualityGuardLease(ctx, "host-b", takeover.Token); err != nil {
+		t.Fatal(err)
+	}
+	if _, ok, _ := store.CurrentQualityGuardLease(ctx, now.Add(26*time.Second)); ok {
+		t.Fatal("释放后不应再有主节点")
+	}
+	if next, held, _ := store.AcquireQualityGuardLease(ctx, "host-a", 15*time.Second, now.Add(27*time.Second)); !held || next.Token != 3 {
+		t.Fatalf("释放后重新获取应继续递增 token: %+v", next)
+	}
+}
@@ -56,6 +56,30 @@ if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1])
 return 0
 `)
 
+// 租约键随 PEXPIRE 自然过期；fencing 计数键不设 TTL，易主时 token 始终递增。
+var acquireQualityGuardLeaseScript = redisclient.NewScript(`
+local holder = redis.call('HGET', KEYS[1], 'holder')
+if holder and holder ~= ARGV[1] then
+  local current = redis.call('HMGET', KEYS[1], 'token', 'expires_at')
+  return {'0', holder, current[1], current[2]}
+end
+local token = redis.call('HGET', KEYS[1], 'token')
+if not holder then
+  token = redis.call('INCR', KEYS[2])
+  redis.call('HSET', KEYS[1], 'holder', ARGV[1], 'token', token)
+end
+local expiresAt = tonumber(ARGV[3]) + tonumber(ARGV[2])
+redis.call('HSET', KEYS[1], 'expires_at', expiresAt)
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return {'1', ARGV[1], tostring(token), tostring(expiresAt)}
+`)
+
+var releaseQualityGuardLeaseScript = redisclient.NewScript(`
+local current = redis.call('HMGET', KEYS[1], 'holder', 'token')
+if current[1] == ARGV[1] and current[2] == ARGV[2] then return redis.call('DEL', KEYS[1]) end
+return 0
+`)
+
 var setStickyScript = redisclient.NewScript(`
 local old = redis.call('GET', KEYS[1])
 if old and old ~= ARGV[1] then redis.call('ZREM', ARGV[3] .. old, KEYS[1]) end
@@ -1057,3 +1081,53 @@ func (s *Store) GetEpoch(ctx context.Context, groupKey string) (uint64, error) {
 	}
 	return strconv.ParseUint(value, 10, 64)
 }
+
+// AcquireQualityGuardLease 在 Lua 脚本内原子完成判断、易主递增 token 与续约。
+func (s *Store) AcquireQualityGuardLease(ctx context.Context, holder string, ttl time.Duration, now time.Time) (repository.QualityGuardLease, bool, error) {
+	if holder == "" || ttl <= 0 {
+		return repository.QualityGuardLease{}, false, fmt.Errorf("quality guard lease holder or ttl is invalid")
+	}
+	values, err := acquireQualityGuardLeaseScript.Run(ctx, s.client, []string{s.key("quality-guard", "lease"), s.key("quality-guard", "fence")}, holder, ttl.Milliseconds(), now.UnixMilli()).StringSlice()
+	if err != nil {
+		return repository.QualityGuardLease{}, false, err
+	}
+	if len(values) != 4 {
+		return repository.QualityGuardLease{}, false, fmt.Errorf("quality guard lease reply is invalid")
+	}
+	lease, err := parseQualityGuardLease(values[1], values[2], values[3])
+	return lease, values[0] == "1", err
+}
+
+func (s *Store) ReleaseQualityGuardLease(ctx context.Context, holder string, token uint64) error {
+	return releaseQualityGuardLeaseScript.Run(ctx, s.client, []string{s.key("quality-guard", "lease")}, holder, strconv.FormatUint(token, 10)).Err()
+}
+
+func (s *Store) CurrentQualityGuardLease(ctx context.Context, now time.Time) (repository.QualityGuardLease, bool, error) {
+	values, err := s.client.HMGet(ctx, s.key("quality-guard", "lease"), "holder", "token", "expires_at").Result()
+	if err != nil {
+		return repository.QualityGuardLease{}, false, err
+	}
+	holder, _ := values[0].(string)
+	token, _ := values[1].(string)
+	expiresAt, _ := values[2].(string)
+	if holder == "" {
+		return repository.QualityGuardLease{}, false, nil
+	}
+	lease, err := parseQualityGuardLease(holder, token, expiresAt)
+	if err != nil || !now.Before(lease.ExpiresAt) {
+		return repository.QualityGuardLease{}, false, err
+	}
+	return lease, true, nil
+}
+
+func parseQualityGuardLease(holder, token, expiresAt string) (repository.QualityGuardLease, error) {
+	parsedToken, err := strconv.ParseUint(token, 10, 64)
+	if err != nil {
+		return repository.QualityGuardLease{}, fmt.Errorf("quality guard lease token is invalid: %w", err)
+	}
+	expiresAtMS, err := strconv.ParseInt(expiresAt, 10, 64)
+	if err != nil {
+		return repository.QualityGuardLease{}, fmt.Errorf("quality guard lease expiry is invalid: %w", err)
+	}
+	return repository.QualityGuardLease{Holder: holder, Token: parsedToken, ExpiresAt: time.UnixMilli(expiresAtMS).UTC()}, nil
+}
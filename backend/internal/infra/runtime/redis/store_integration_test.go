@@ -276,6 +276,21 @@ func TestRedisRuntimeStoreIntegration(t *testing.T) {
 		t.Fatalf("concurrent egress epoch bumps = %d, want %d", maxEpoch, epochWorkers*epochBumpsPerWorker)
 	}
 
+	leaseNow := time.Now().UTC()
+	leader, held, err := store.AcquireQualityGuardLease(ctx, "guard-a", time.Minute, leaseNow)
+	if err != nil || !held || leader.Token == 0 {
+		t.Fatalf("quality guard lease = %#v, held = %v, err = %v", leader, held, err)
+	}
+	if current, held, err := store.AcquireQualityGuardLease(ctx, "guard-b", time.Minute, leaseNow); err != nil || held || current.Token != leader.Token {
+		t.Fatalf("standby acquired a held quality guard lease: %#v, held = %v, err = %v", current, held, err)
+	}
+	if err := store.ReleaseQualityGuardLease(ctx, "guard-a", leader.Token); err != nil {
+		t.Fatal(err)
+	}
+	if next, held, err := store.AcquireQualityGuardLease(ctx, "guard-b", time.Minute, leaseNow); err != nil || !held || next.Token <= leader.Token {
+		t.Fatalf("quality guard takeover = %#v, held = %v, err = %v", next, held, err)
+	}
+
 	dueAt := time.Now().UTC().Add(-time.Second)
 	event := account.QuotaRecoveryEvent{AccountID: 42, Mode: "fast", DueAt: dueAt, Attempts: 3}
 	if err := store.ScheduleQuotaRecovery(ctx, event); err != nil {
@@ -237,3 +237,21 @@ type EgressEpochStore interface {
 	BumpEpoch(ctx context.Context, groupKey string) (uint64, error)
 	GetEpoch(ctx context.Context, groupKey string) (uint64, error)
 }
+
+// QualityGuardLease 是质量守护主节点租约。Token 是 fencing token：每次易主
+// 单调递增，同一持有者续约时保持不变。
+type QualityGuardLease struct {
+	Holder    string
+	Token     uint64
+	ExpiresAt time.Time
+}
+
+// QualityGuardLeaseStore 在多个副本的守护进程之间选出唯一主节点。
+type QualityGuardLeaseStore interface {
+	// AcquireQualityGuardLease 在租约空闲、已过期或已由 holder 持有时获取或续约，
+	// 返回当前租约以及是否由 holder 持有。
+	AcquireQualityGuardLease(ctx context.Context, holder string, ttl time.Duration, now time.Time) (QualityGuardLease, bool, error)
+	// ReleaseQualityGuardLease 仅在 holder 与 token 均匹配时释放租约。
+	ReleaseQualityGuardLease(ctx context.Context, holder string, token uint64) error
+	CurrentQualityGuardLease(ctx context.Context, now time.Time) (QualityGuardLease, bool, error)
+}
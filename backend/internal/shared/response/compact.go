@@ -0,0 +1,150 @@
+package response
+
+import (
+	"fmt"
+	"net/http"
+	"reflect"
+	"strings"
+	"sync"
+
+	"github.com/gin-gonic/gin"
+)
+
+type listColumn struct {
+	name   string
+	index  int
+	quoted bool
+}
+
+var listColumnCache sync.Map
+
+// ListItems 按请求协商的编码把列表项写入 payload：fields 按 JSON 字段名投影列，
+// format=rows 时以 columns 表头加 rows 行数组返回，省去每条记录重复的键名。
+// 两者都未指定时原样写入 items。参数无效时写入 400 错误并返回 false。
+func ListItems(c *gin.Context, payload gin.H, items any) bool {
+	rows := false
+	switch c.Query("format") {
+	case "", "objects":
+	case "rows":
+		rows = true
+	default:
+		Error(c, http.StatusBadRequest, "invalidFormat", "format 仅支持 objects、rows")
+		return false
+	}
+	fields := splitFields(c.Query("fields"))
+	if !rows && len(fields) == 0 {
+		payload["items"] = items
+		return true
+	}
+	value := reflect.ValueOf(items)
+	columns, err := selectListColumns(value.Type().Elem(), fields)
+	if err != nil {
+		Error(c, http.StatusBadRequest, "invalidFields", err.Error())
+		return false
+	}
+	if rows {
+		names := make([]string, len(columns))
+		for index, column := range columns {
+			names[index] = column.name
+		}
+		values := make([][]any, value.Len())
+		for row := range values {
+			values[row] = listRow(value.Index(row), columns)
+		}
+		payload["columns"] = names
+		payload["rows"] = values
+		return true
+	}
+	projected := make([]map[string]any, value.Len())
+	for row := range projected {
+		cells := listRow(value.Index(row), columns)
+		item := make(map[string]any, len(columns))
+		for index, column := range columns {
+			item[column.name] = cells[index]
+		}
+		projected[row] = item
+	}
+	payload["items"] = projected
+	return true
+}
+
+func splitFields(raw string) []string {
+	fields := make([]string, 0)
+	for _, field := range strings.Split(raw, ",") {
+		if field = strings.TrimSpace(field); field != "" {
+			fields = append(fields, field)
+		}
+	}
+	return fields
+}
+
+func selectListColumns(itemType reflect.Type, fields []string) ([]listColumn, error) {
+	all := listColumnsOf(itemType)
+	if len(fields) == 0 {
+		return all, nil
+	}
+	byName := make(map[string]listColumn, len(all))
+	for _, column := range all {
+		byName[column.name] = column
+	}
+	selected := make([]listColumn, 0, len(fields))
+	seen := make(map[string]struct{}, len(fields))
+	for _, field := range fields {
+		column, ok := byName[field]
+		if !ok {
+			return nil, fmt.Errorf("fields 包含未知字段 %q", field)
+		}
+		if _, exists := seen[field]; exists {
+			continue
+		}
+		seen[field] = struct{}{}
+		selected = append(selected, column)
+	}
+	return selected, nil
+}
+
+// listColumnsOf 按 JSON 标签列出结构体的顶层字段，结果按类型缓存。
+func listColumnsOf(itemType reflect.Type) []listColumn {
+	if cached, ok := listColumnCache.Load(itemType); ok {
+		return cached.([]listColumn)
+	}
+	columns := make([]listColumn, 0, itemType.NumField())
+	for index := 0; index < itemType.NumField(); index++ {
+		field := itemType.Field(index)
+		tag := field.Tag.Get("json")
+		if !field.IsExported() || tag == "-" {
+			continue
+		}
+		name, options, _ := strings.Cut(tag, ",")
+		if name == "" {
+			name = field.Name
+		}
+		quoted := false
+		for _, option := range strings.Split(options, ",") {
+			quoted = quoted || option == "string"
+		}
+		columns = append(columns, listColumn{name: name, index: index, quoted: quoted})
+	}
+	listColumnCache.Store(itemType, columns)
+	return columns
+}
+
+func listRow(item reflect.Value, columns []listColumn) []any {
+	cells := make([]any, len(columns))
+	for index, column := range columns {
+		field := item.Field(column.index)
+		if field.Kind() == reflect.Pointer {
+			if field.IsNil() {
+				continue
+			}
+			field = field.Elem()
+		}
+		if column.quoted {
+			// 与 `json:",string"` 一致，64 位 ID 以字符串输出，避免客户端精度丢失。
+			cells[index] = fmt.Sprint(field.Interface())
+			continue
+		}
+		cells[index] = field.Interface()
+	}
+	return cells
+}
@@ -1,6 +1,14 @@
 package response
 
-import "github.com/gin-gonic/gin"
+import (
+	"crypto/sha256"
+	"encoding/hex"
+	"encoding/json"
+	"net/http"
+	"strings"
+
+	"github.com/gin-gonic/gin"
+)
 
 type successEnvelope struct {
 	Data any `json:"data"`
@@ -21,6 +29,37 @@ func Success(c *gin.Context, status int, data any) {
 	c.JSON(status, successEnvelope{Data: data})
 }
 
+// SuccessConditional 返回 200 成功包裹，并以响应体摘要作为 ETag；请求的
+// If-None-Match 命中时只返回 304，轮询方无需重复下载未变化的数据。摘要取自
+// 未压缩的 JSON，gzip 中间件可能改变传输字节，因此 ETag 为弱校验器。
+func SuccessConditional(c *gin.Context, data any) {
+	body, err := json.Marshal(successEnvelope{Data: data})
+	if err != nil {
+		Error(c, http.StatusInternalServerError, "responseEncodeFailed", "编码响应失败")
+		return
+	}
+	digest := sha256.Sum256(body)
+	etag := `W/"` + hex.EncodeToString(digest[:16]) + `"`
+	c.Header("ETag", etag)
+	if etagMatches(c.GetHeader("If-None-Match"), etag) {
+		c.Status(http.StatusNotModified)
+		return
+	}
+	c.Data(http.StatusOK, "application/json; charset=utf-8", body)
+}
+
+// etagMatches 按 If-None-Match 的弱比较规则忽略 W/ 前缀。
+func etagMatches(header, etag string) bool {
+	etag = strings.TrimPrefix(etag, "W/")
+	for _, candidate := range strings.Split(header, ",") {
+		candidate = strings.TrimPrefix(strings.TrimSpace(candidate), "W/")
+		if candidate == etag || candidate == "*" {
+			return true
+		}
+	}
+	return false
+}
+
 // Error 返回 Admin API 稳定错误码和请求 ID。
 func Error(c *gin.Context, status int, code, message string) {
 	requestID, _ := c.Get("requestId")
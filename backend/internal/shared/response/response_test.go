@@ -0,0 +1,42 @@
+package response
+
+import (
+	"net/http"
+	"net/http/httptest"
+	"strings"
+	"testing"
+
+	"github.com/gin-gonic/gin"
+)
+
+func TestSuccessConditionalAnswersMatchingETagWithNotModified(t *testing.T) {
+	gin.SetMode(gin.TestMode)
+	version := "v1"
+	router := gin.New()
+	router.GET("/inventory", func(c *gin.Context) { SuccessConditional(c, gin.H{"version": version}) })
+
+	first := httptest.NewRecorder()
+	router.ServeHTTP(first, httptest.NewRequest(http.MethodGet, "/inventory", nil))
+	etag := first.Header().Get("ETag")
+	if first.Code != http.StatusOK || !strings.HasPrefix(etag, `W/"`) || first.Body.String() != `{"data":{"version":"v1"}}` {
+		t.Fatalf("status = %d, etag = %q, body = %s", first.Code, etag, first.Body.String())
+	}
+
+	request := httptest.NewRequest(http.MethodGet, "/inventory", nil)
+	// 弱比较：去掉 W/ 前缀的同一校验器也视为命中。
+	request.Header.Set("If-None-Match", `"other", `+strings.TrimPrefix(etag, "W/"))
+	unchanged := httptest.NewRecorder()
+	router.ServeHTTP(unchanged, request)
+	if unchanged.Code != http.StatusNotModified || unchanged.Body.Len() != 0 || unchanged.Header().Get("ETag") != etag {
+		t.Fatalf("status = %d, headers = %v, body = %q", unchanged.Code, unchanged.Header(), unchanged.Body.String())
+	}
+
+	version = "v2"
+	request = httptest.NewRequest(http.MethodGet, "/inventory", nil)
+	request.Header.Set("If-None-Match", etag)
+	changed := httptest.NewRecorder()
+	router.ServeHTTP(changed, request)
+	if changed.Code != http.StatusOK || changed.Header().Get("ETag") == etag {
+		t.Fatalf("status = %d, etag = %q", changed.Code, changed.Header().Get("ETag"))
+	}
+}
@@ -38,19 +38,20 @@ func (h *Handler) RegisterQualityGuard(router *gin.RouterGroup) {
 }
 
 type qualityGuardAuditResponse struct {
-	ID              uint64  `json:"id,string"`
-	RequestID       string  `json:"requestId"`
-	QualityProbe    bool    `json:"qualityProbe"`
-	Provider        string  `json:"provider"`
-	EgressNodeID    *uint64 `json:"egressNodeId,string,omitempty"`
-	EgressNodeName  string  `json:"egressNodeName,omitempty"`
-	StatusCode      int     `json:"statusCode"`
-	Streaming       bool    `json:"streaming"`
-	OutputTokens    int64   `json:"outputTokens"`
-	ReasoningTokens int64   `json:"reasoningTokens"`
-	FirstTokenMS    *int64  `json:"firstTokenMs,omitempty"`
-	DurationMS      int64   `json:"durationMs"`
-	ErrorCode       string  `json:"errorCode,omitempty"`
+	ID              uint64    `json:"id,string"`
+	RequestID       string    `json:"requestId"`
+	QualityProbe    bool      `json:"qualityProbe"`
+	Provider        string    `json:"provider"`
+	EgressNodeID    *uint64   `json:"egressNodeId,string,omitempty"`
+	EgressNodeName  string    `json:"egressNodeName,omitempty"`
+	StatusCode      int       `json:"statusCode"`
+	Streaming       bool      `json:"streaming"`
+	OutputTokens    int64     `json:"outputTokens"`
+	ReasoningTokens int64     `json:"reasoningTokens"`
+	FirstTokenMS    *int64    `json:"firstTokenMs,omitempty"`
+	DurationMS      int64     `json:"durationMs"`
+	ErrorCode       string    `json:"errorCode,omitempty"`
+	CreatedAt       time.Time `json:"createdAt"`
 }
 
 func (h *Handler) listQualityGuard(c *gin.Context) {
@@ -76,10 +77,14 @@ func (h *Handler) listQualityGuard(c *gin.Context) {
 			Provider: value.Provider, EgressNodeID: value.EgressNodeID, EgressNodeName: value.EgressNodeName,
 			StatusCode: value.StatusCode, Streaming: value.Streaming, OutputTokens: value.OutputTokens,
 			ReasoningTokens: value.ReasoningTokens, FirstTokenMS: value.FirstTokenMS,
-			DurationMS: value.DurationMS, ErrorCode: value.ErrorCode,
+			DurationMS: value.DurationMS, ErrorCode: value.ErrorCode, CreatedAt: value.CreatedAt,
 		})
 	}
-	response.Success(c, http.StatusOK, gin.H{"items": items, "pageSize": pageSize, "nextCursor": result.NextCursor, "hasMore": result.HasMore})
+	payload := gin.H{"pageSize": pageSize, "nextCursor": result.NextCursor, "hasMore": result.HasMore}
+	if !response.ListItems(c, payload, items) {
+		return
+	}
+	response.Success(c, http.StatusOK, payload)
 }
 
 type auditResponse struct {
@@ -131,6 +131,58 @@ func TestQualityGuardAuditListMarksOwnProbeWithoutExposingKeyIdentity(t *testing
 	}
 }
 
+func TestQualityGuardAuditListProjectsColumnsAsRows(t *testing.T) {
+	gin.SetMode(gin.TestMode)
+	ctx := context.Background()
+	database, err := relational.OpenSQLite(ctx, filepath.Join(t.TempDir(), "quality-guard-rows.db"))
+	if err != nil {
+		t.Fatal(err)
+	}
+	defer database.Close()
+	if err := database.InitializeSchema(ctx); err != nil {
+		t.Fatal(err)
+	}
+	repository := relational.NewAuditRepository(database)
+	nodeID := uint64(42)
+	createdAt := time.Date(2026, 1, 2, 3, 4, 5, 0, time.UTC)
+	if err := repository.CreateBatch(ctx, []auditdomain.Record{
+		{RequestID: "routed", ClientKeyID: 8, ModelRouteID: 1, Provider: "grok_build", EgressNodeID: &nodeID, StatusCode: 200, CreatedAt: createdAt},
+	}); err != nil {
+		t.Fatal(err)
+	}
+	service := auditapp.NewService(repository, slog.Default(), 8, 4, time.Second)
+	router := gin.New()
+	NewQualityGuardHandler(service, 7).RegisterQualityGuard(router.Group(""))
+
+	recorder := httptest.NewRecorder()
+	router.ServeHTTP(recorder, httptest.NewRequest(http.MethodGet, "/request-audits?format=rows&fields=requestId,egressNodeId,firstTokenMs,createdAt", nil))
+	if recorder.Code != http.StatusOK {
+		t.Fatalf("status = %d, body = %s", recorder.Code, recorder.Body.String())
+	}
+	var payload struct {
+		Data struct {
+			Items   []any    `json:"items"`
+			Columns []string `json:"columns"`
+			Rows    [][]any  `json:"rows"`
+		} `json:"data"`
+	}
+	if err := json.Unmarshal(recorder.Body.Bytes(), &payload); err != nil {
+		t.Fatal(err)
+	}
+	if payload.Data.Items != nil || strings.Join(payload.Data.Columns, ",") != "requestId,egressNodeId,firstTokenMs,createdAt" {
+		t.Fatalf("unexpected layout: %s", recorder.Body.String())
+	}
+	if len(payload.Data.Rows) != 1 || payload.Data.Rows[0][0] != "routed" || payload.Data.Rows[0][1] != "42" || payload.Data.Rows[0][2] != nil || payload.Data.Rows[0][3] != "2026-01-02T03:04:05Z" {
+		t.Fatalf("unexpected rows: %#v", payload.Data.Rows)
+	}
+
+	recorder = httptest.NewRecorder()
+	router.ServeHTTP(recorder, httptest.NewRequest(http.MethodGet, "/request-audits?fields=clientKeyName", nil))
+	if recorder.Code != http.StatusBadRequest || !strings.Contains(recorder.Body.String(), "invalidFields") {
+		t.Fatalf("unknown field status = %d, body = %s", recorder.Code, recorder.Body.String())
+	}
+}
+
 func TestAuditResponseExplainsBillingWithoutChangingStoredTotal(t *testing.T) {
 	estimated := newAuditResponse(auditdomain.Record{
 		InputTokens: 100, CachedInputTokens: 20, OutputTokens: 50, ContextInputTokens: 100,
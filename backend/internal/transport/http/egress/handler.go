@@ -1,6 +1,7 @@
 package egress
 
 import (
+	"context"
 	"encoding/json"
 	"errors"
 	"fmt"
@@ -29,6 +30,7 @@ type Handler struct {
 	guardConfigPath    string
 	guardBootstrapPath string
 	guardProbe         egressapp.QualityProbeInput
+	guardLeases        repository.QualityGuardLeaseStore
 	// mihomoOps 是 Mihomo 写操作（rotate/switch/blacklist-clear）的 HTTP 层
 	// 限流闸，admin JWT 与 internal token 两条路径共用（同一 Handler 实例）。
 	mihomoOps *mihomoOpLimiter
@@ -97,6 +99,13 @@ func (h *Handler) WithQualityGuardProbe(input egressapp.QualityProbeInput) *Hand
 	return h
 }
 
+// WithQualityGuardLease enables leader election between guards on several
+// replicas and fencing of their write operations.
+func (h *Handler) WithQualityGuardLease(store repository.QualityGuardLeaseStore) *Handler {
+	h.guardLeases = store
+	return h
+}
+
 func (h *Handler) Register(router *gin.RouterGroup) {
 	router.GET("/egress-nodes", h.list)
 	router.POST("/egress-nodes", h.create)
@@ -139,15 +148,202 @@ func (h *Handler) Register(router *gin.RouterGroup) {
 // available only through administrator authentication.
 func (h *Handler) RegisterQualityGuard(router *gin.RouterGroup) {
 	router.GET("/egress-nodes", h.list)
-	router.PATCH("/egress-nodes/batch", h.updateMany)
+	router.PATCH("/egress-nodes/batch", h.qualityGuardFence, h.updateMany)
 	router.POST("/egress-nodes/:id/test", h.testNode)
 	router.POST("/egress-nodes/:id/quality-test", h.testQualityGuardNode)
+	router.POST("/egress-nodes/batch/quality-test", h.testQualityGuardNodes)
 	router.GET("/egress-operations", h.operationsConfig)
+	router.GET("/egress-quality-guard/snapshot", h.qualityGuardSnapshot)
+	router.POST("/egress-quality-guard/lease", h.acquireQualityGuardLease)
+	router.DELETE("/egress-quality-guard/lease", h.releaseQualityGuardLease)
 	router.GET("/egress-mihomo/status", h.mihomoStatus)
-	router.POST("/egress-mihomo/rotate", h.mihomoRotate)
-	router.POST("/egress-mihomo/select", h.mihomoTestSelect)
-	router.POST("/egress-mihomo/ban", h.mihomoTestBan)
-	router.POST("/egress-mihomo/unban", h.mihomoTestUnban)
+	router.GET("/egress-mihomo/epochs", h.mihomoEpochs)
+	router.POST("/egress-mihomo/rotate", h.qualityGuardFence, h.mihomoRotate)
+	router.POST("/egress-mihomo/select", h.qualityGuardFence, h.mihomoTestSelect)
+	router.POST("/egress-mihomo/ban", h.qualityGuardFence, h.mihomoTestBan)
+	router.POST("/egress-mihomo/unban", h.qualityGuardFence, h.mihomoTestUnban)
+}
+
+// qualityGuardSnapshot 在一次请求中返回守护每轮所需的 Grok Build 节点清单、
+// 固定回退节点 ID 和 Mihomo 出口代际号，节点列表支持 fields/format 投影。
+// 各部分在同一请求内先后读取，守护无需为准备一轮发起多次请求。
+func (h *Handler) qualityGuardSnapshot(c *gin.Context) {
+	ctx := c.Request.Context()
+	operations, err := h.service.OperationsConfig(ctx)
+	if err != nil {
+		h.writeError(c, err)
+		return
+	}
+	values, err := h.service.ListAll(ctx, egressdomain.ScopeBuild, repository.SortQuery{})
+	if h.writeListError(c, err) {
+		return
+	}
+	items := make([]nodeResponse, 0, len(values))
+	for _, value := range values {
+		items = append(items, newNodeResponse(value))
+	}
+	fixed := make([]string, 0, len(operationsFallbackScopes))
+	for _, scope := range operationsFallbackScopes {
+		fallback := operations.FallbackFor(scope)
+		if fallback.Mode == egressdomain.FallbackModeFixed && fallback.NodeID != 0 {
+			fixed = append(fixed, strconv.FormatUint(fallback.NodeID, 10))
+		}
+	}
+	slices.Sort(fixed)
+	fixed = slices.Compact(fixed)
+	var mihomo gin.H
+	if epochs, err := h.service.MihomoEpochs(); err == nil && epochs.Enabled {
+		// 只返回代际号，避免成员延迟等易变字段让快照 ETag 频繁失效。
+		mihomo = newMihomoEpochsResponse(epochs)
+	}
+	payload := gin.H{"total": len(items), "fixedFallbackNodeIds": fixed, "mihomo": mihomo}
+	if !response.ListItems(c, payload, items) {
+		return
+	}
+	response.SuccessConditional(c, payload)
+}
+
+// maxMihomoEpochsWait 是 epochs 长轮询单次最长等待时间。
+const maxMihomoEpochsWait = 60 * time.Second
+
+// mihomoEpochs 返回 Mihomo 出口代际号。waitSeconds 大于 0 时长轮询：当前
+// 代际号与查询参数 enabled/epoch/testEnabled/testEpoch 相同时阻塞，直到出口
+// 切换或等待超时，质量守护据此即时作废进行中的探测。
+func (h *Handler) mihomoEpochs(c *gin.Context) {
+	wait, err := strconv.Atoi(c.DefaultQuery("waitSeconds", "0"))
+	if err != nil || wait < 0 || time.Duration(wait)*time.Second > maxMihomoEpochsWait {
+		response.Error(c, http.StatusBadRequest, "invalidRequest", "请求参数无效")
+		return
+	}
+	var known egressapp.MihomoEpochs
+	known.Enabled, err = strconv.ParseBool(c.DefaultQuery("enabled", "false"))
+	if err == nil {
+		known.Epoch, err = strconv.ParseUint(c.DefaultQuery("epoch", "0"), 10, 64)
+	}
+	if err == nil {
+		known.TestEnabled, err = strconv.ParseBool(c.DefaultQuery("testEnabled", "false"))
+	}
+	if err == nil {
+		known.TestEpoch, err = strconv.ParseUint(c.DefaultQuery("testEpoch", "0"), 10, 64)
+	}
+	if err != nil {
+		response.Error(c, http.StatusBadRequest, "invalidRequest", "请求参数无效")
+		return
+	}
+	ctx, cancel := context.WithTimeout(c.Request.Context(), time.Duration(wait)*time.Second)
+	defer cancel()
+	epochs, err := h.service.WaitMihomoEpochs(ctx, known)
+	if err != nil {
+		h.writeError(c, err)
+		return
+	}
+	response.Success(c, http.StatusOK, newMihomoEpochsResponse(epochs))
+}
+
+func newMihomoEpochsResponse(epochs egressapp.MihomoEpochs) gin.H {
+	return gin.H{"enabled": epochs.Enabled, "epoch": epochs.Epoch, "testEnabled": epochs.TestEnabled, "testEpoch": epochs.TestEpoch}
+}
+
+// qualityGuardFenceHeader 携带守护主节点租约的 fencing token。
+const qualityGuardFenceHeader = "X-Quality-Guard-Fence"
+
+const (
+	minQualityGuardLeaseTTL = 5 * time.Second
+	maxQualityGuardLeaseTTL = 5 * time.Minute
+)
+
+type qualityGuardLeaseRequest struct {
+	Holder     string `json:"holder"`
+	TTLSeconds int    `json:"ttlSeconds"`
+	Token      uint64 `json:"token,string"`
+}
+
+// acquireQualityGuardLease 获取或续约守护主节点租约。未持有租约时返回当前
+// 主节点，调用方保持待命并按租约有效期的一部分重试。
+func (h *Handler) acquireQualityGuardLease(c *gin.Context) {
+	if h.guardLeases == nil {
+		response.Error(c, http.StatusServiceUnavailable, "qualityGuardLeaseUnavailable", "质量守护租约暂不可用")
+		return
+	}
+	request, ok := decodeQualityGuardLeaseRequest(c)
+	if !ok {
+		return
+	}
+	ttl := time.Duration(request.TTLSeconds) * time.Second
+	if ttl < minQualityGuardLeaseTTL || ttl > maxQualityGuardLeaseTTL {
+		response.Error(c, http.StatusBadRequest, "invalidRequest", "租约时长必须在 5 秒到 5 分钟之间")
+		return
+	}
+	lease, held, err := h.guardLeases.AcquireQualityGuardLease(c.Request.Context(), request.Holder, ttl, time.Now().UTC())
+	if err != nil {
+		response.Error(c, http.StatusServiceUnavailable, "qualityGuardLeaseUnavailable", "质量守护租约暂不可用")
+		return
+	}
+	response.Success(c, http.StatusOK, gin.H{
+		"leader": held, "holder": lease.Holder, "token": strconv.FormatUint(lease.Token, 10), "expiresAt": lease.ExpiresAt,
+	})
+}
+
+func (h *Handler) releaseQualityGuardLease(c *gin.Context) {
+	if h.guardLeases == nil {
+		response.Error(c, http.StatusServiceUnavailable, "qualityGuardLeaseUnavailable", "质量守护租约暂不可用")
+		return
+	}
+	request, ok := decodeQualityGuardLeaseRequest(c)
+	if !ok {
+		return
+	}
+	if err := h.guardLeases.ReleaseQualityGuardLease(c.Request.Context(), request.Holder, request.Token); err != nil {
+		response.Error(c, http.StatusServiceUnavailable, "qualityGuardLeaseUnavailable", "质量守护租约暂不可用")
+		return
+	}
+	response.Success(c, http.StatusOK, gin.H{"released": true})
+}
+
+func decodeQualityGuardLeaseRequest(c *gin.Context) (qualityGuardLeaseRequest, bool) {
+	var request qualityGuardLeaseRequest
+	decoder := json.NewDecoder(io.LimitReader(c.Request.Body, 4<<10))
+	decoder.DisallowUnknownFields()
+	if err := decoder.Decode(&request); err != nil {
+		response.Error(c, http.StatusBadRequest, "invalidRequest", "请求参数无效")
+		return qualityGuardLeaseRequest{}, false
+	}
+	request.Holder = strings.TrimSpace(request.Holder)
+	if request.Holder == "" || len(request.Holder) > 128 {
+		response.Error(c, http.StatusBadRequest, "invalidRequest", "请求参数无效")
+		return qualityGuardLeaseRequest{}, false
+	}
+	return request, true
+}
+
+// qualityGuardFence 拒绝携带过期 fencing token 的守护写操作。未携带令牌的
+// 单机守护不受影响；携带令牌时必须与当前租约一致，已失去租约但仍在运行的
+// 旧主节点无法再隔离节点或轮换出口。
+func (h *Handler) qualityGuardFence(c *gin.Context) {
+	value := strings.TrimSpace(c.GetHeader(qualityGuardFenceHeader))
+	if value == "" {
+		c.Next()
+		return
+	}
+	token, err := strconv.ParseUint(value, 10, 64)
+	if err != nil || token == 0 {
+		response.Error(c, http.StatusBadRequest, "invalidRequest", "请求参数无效")
+		return
+	}
+	if h.guardLeases == nil {
+		response.Error(c, http.StatusServiceUnavailable, "qualityGuardLeaseUnavailable", "质量守护租约暂不可用")
+		return
+	}
+	lease, ok, err := h.guardLeases.CurrentQualityGuardLease(c.Request.Context(), time.Now().UTC())
+	if err != nil {
+		response.Error(c, http.StatusServiceUnavailable, "qualityGuardLeaseUnavailable", "质量守护租约暂不可用")
+		return
+	}
+	if !ok || lease.Token != token {
+		response.Error(c, http.StatusConflict, "qualityGuardFenced", "质量守护主节点租约已失效")
+		return
+	}
+	c.Next()
 }
 
 // A fully populated 2,000-node guard state is slightly larger than 1 MiB.
@@ -287,7 +483,9 @@ type mihomoTestNodeRequest struct {
 
 // mihomoTestSelect 实现测试组 select_node 契约：显式切换测试组到指定节点
 // （节点名由 Mihomo 组节点提供，body 的 nodeId 即节点名）。测试组与生产出口
-// 隔离，切换零扰动生产。changed 恒为 true（成功或单飞合并）。
+// 隔离，切换零扰动生产。changed 恒为 true（成功或单飞合并）。切换会递增
+// testEpoch，响应附带切换后的 epochs，守卫以此作为探测基线，不会把自己的
+// select 误判为探测期间的 epoch 变化。
 func (h *Handler) mihomoTestSelect(c *gin.Context) {
 	var request mihomoTestNodeRequest
 	if c.ShouldBindJSON(&request) != nil || strings.TrimSpace(request.NodeID) == "" {
@@ -299,7 +497,11 @@ func (h *Handler) mihomoTestSelect(c *gin.Context) {
 		h.writeError(c, err)
 		return
 	}
-	response.Success(c, http.StatusOK, gin.H{"changed": true, "currentNode": current})
+	payload := gin.H{"changed": true, "currentNode": current}
+	if epochs, err := h.service.MihomoEpochs(); err == nil {
+		payload["epochs"] = newMihomoEpochsResponse(epochs)
+	}
+	response.Success(c, http.StatusOK, payload)
 }
 
 // mihomoTestBan 封禁测试组内一个节点，返回当前测试组黑名单节点数。
@@ -343,6 +545,31 @@ type qualityGuardState struct {
 	Nodes             map[string]qualityGuardNodeState `json:"nodes"`
 	RecentEvents      []qualityGuardEvent              `json:"recent_events"`
 	Statistics        qualityGuardStatistics           `json:"statistics"`
+	Budget            *qualityGuardBudget              `json:"budget"`
+	Shards            []qualityGuardShard              `json:"shards"`
+}
+
+// qualityGuardShard 是分片模式下协调进程合并时记录的单个工作进程状态。
+type qualityGuardShard struct {
+	Index     int     `json:"index"`
+	Available bool    `json:"available"`
+	UpdatedAt float64 `json:"updated_at"`
+	Nodes     int     `json:"nodes"`
+}
+
+type qualityGuardBudget struct {
+	Day              string                             `json:"day"`
+	RequestLimit     int                                `json:"request_limit"`
+	OutputTokenLimit int                                `json:"output_token_limit"`
+	Requests         uint64                             `json:"requests"`
+	OutputTokens     uint64                             `json:"output_tokens"`
+	Denied           uint64                             `json:"denied"`
+	Nodes            map[string]qualityGuardBudgetUsage `json:"nodes"`
+}
+
+type qualityGuardBudgetUsage struct {
+	Requests     uint64 `json:"requests"`
+	OutputTokens uint64 `json:"output_tokens"`
 }
 
 type qualityGuardStatistics struct {
@@ -362,26 +589,30 @@ type qualityGuardDetectionStats struct {
 }
 
 type qualityGuardActionStats struct {
-	Quarantined uint64 `json:"quarantined"`
-	Restored    uint64 `json:"restored"`
-	Suppressed  uint64 `json:"suppressed"`
+	Quarantined    uint64 `json:"quarantined"`
+	Restored       uint64 `json:"restored"`
+	Suppressed     uint64 `json:"suppressed"`
+	PassiveCovered uint64 `json:"passive_covered"`
 }
 
 type qualityGuardConfig struct {
-	Mode                  string   `json:"mode"`
-	Model                 string   `json:"model"`
-	NodeIDs               []string `json:"node_ids"`
-	ActiveIntervalSeconds int      `json:"active_interval_seconds"`
-	PassivePollSeconds    int      `json:"passive_poll_seconds"`
-	SoftTPS               float64  `json:"soft_tps"`
-	HardTPS               float64  `json:"hard_tps"`
-	ConsecutiveSoft       int      `json:"consecutive_soft"`
-	ConsecutiveErrors     int      `json:"consecutive_errors"`
-	QuarantineSeconds     int      `json:"quarantine_seconds"`
-	MinHealthyNodes       int      `json:"min_healthy_nodes"`
-	MaxOutputTokens       int      `json:"max_output_tokens"`
-	Prompt                string   `json:"prompt"`
-	Expected              string   `json:"expected"`
+	Mode                     string   `json:"mode"`
+	Model                    string   `json:"model"`
+	NodeIDs                  []string `json:"node_ids"`
+	ActiveIntervalSeconds    int      `json:"active_interval_seconds"`
+	AdaptiveInterval         bool     `json:"adaptive_interval"`
+	ActiveIntervalMinSeconds int      `json:"active_interval_min_seconds"`
+	ActiveIntervalMaxSeconds int      `json:"active_interval_max_seconds"`
+	PassivePollSeconds       int      `json:"passive_poll_seconds"`
+	SoftTPS                  float64  `json:"soft_tps"`
+	HardTPS                  float64  `json:"hard_tps"`
+	ConsecutiveSoft          int      `json:"consecutive_soft"`
+	ConsecutiveErrors        int      `json:"consecutive_errors"`
+	QuarantineSeconds        int      `json:"quarantine_seconds"`
+	MinHealthyNodes          int      `json:"min_healthy_nodes"`
+	MaxOutputTokens          int      `json:"max_output_tokens"`
+	Prompt                   string   `json:"prompt"`
+	Expected                 string   `json:"expected"`
 }
 
 type qualityGuardNodeState struct {
@@ -392,6 +623,8 @@ type qualityGuardNodeState struct {
 	DisabledByGuard    bool    `json:"disabled_by_guard"`
 	LastReason         string  `json:"last_reason"`
 	LastProbeAt        float64 `json:"last_probe_at"`
+	NextProbeAt        float64 `json:"next_probe_at"`
+	HealthyStreak      int     `json:"healthy_streak"`
 	LastObservedAt     float64 `json:"last_observed_at"`
 	LastSource         string  `json:"last_source"`
 	LastClassification string  `json:"last_classification"`
@@ -431,7 +664,9 @@ func (h *Handler) qualityGuardStatus(c *gin.Context) {
 		"config": gin.H{
 			"mode": state.Guard.Mode, "model": state.Guard.Model,
 			"node_ids": state.Guard.NodeIDs, "active_interval_seconds": state.Guard.ActiveIntervalSeconds,
-			"passive_poll_seconds": state.Guard.PassivePollSeconds, "soft_tps": state.Guard.SoftTPS,
+			"adaptive_interval": state.Guard.AdaptiveInterval, "active_interval_min_seconds": state.Guard.ActiveIntervalMinSeconds,
+			"active_interval_max_seconds": state.Guard.ActiveIntervalMaxSeconds,
+			"passive_poll_seconds":        state.Guard.PassivePollSeconds, "soft_tps": state.Guard.SoftTPS,
 			"hard_tps": state.Guard.HardTPS, "consecutive_soft": state.Guard.ConsecutiveSoft,
 			"consecutive_errors": state.Guard.ConsecutiveErrors, "quarantine_seconds": state.Guard.QuarantineSeconds,
 			"min_healthy_nodes": state.Guard.MinHealthyNodes, "max_output_tokens": state.Guard.MaxOutputTokens,
@@ -442,6 +677,12 @@ func (h *Handler) qualityGuardStatus(c *gin.Context) {
 	if state.Statistics.StartedAt > 0 {
 		payload["statistics"] = state.Statistics
 	}
+	if state.Budget != nil && state.Budget.Day != "" {
+		payload["budget"] = state.Budget
+	}
+	if len(state.Shards) > 0 {
+		payload["shards"] = state.Shards
+	}
 	response.Success(c, http.StatusOK, payload)
 }
 
@@ -587,27 +828,41 @@ type qualityGuardBootstrapFile struct {
 }
 
 type qualityGuardBootstrapConfig struct {
-	Model                   string   `json:"model"`
-	Prompt                  string   `json:"prompt"`
-	Expected                string   `json:"expected"`
-	NodeIDs                 []string `json:"node_ids"`
-	Mode                    string   `json:"mode"`
-	ActiveIntervalSeconds   int      `json:"active_interval_seconds"`
-	PassivePollSeconds      int      `json:"passive_poll_seconds"`
-	SoftTPS                 float64  `json:"soft_tps"`
-	HardTPS                 float64  `json:"hard_tps"`
-	ConsecutiveSoft         int      `json:"consecutive_soft"`
-	ConsecutiveErrors       int      `json:"consecutive_errors"`
-	QuarantineSeconds       int      `json:"quarantine_seconds"`
-	NoAccountBackoffSeconds int      `json:"no_account_backoff_seconds"`
-	MinHealthyNodes         int      `json:"min_healthy_nodes"`
-	MaxOutputTokens         int      `json:"max_output_tokens"`
-	FailClosed              bool     `json:"fail_closed"`
-	MinGenerationMS         int      `json:"min_generation_ms"`
-	RotationURL             string   `json:"rotation_url"`
-	RotationToken           string   `json:"rotation_token"`
-	RotationTimeoutSeconds  int      `json:"rotation_timeout_seconds"`
-	RotatableNodeIDs        []string `json:"rotatable_node_ids"`
+	Model                        string   `json:"model"`
+	Prompt                       string   `json:"prompt"`
+	Expected                     string   `json:"expected"`
+	NodeIDs                      []string `json:"node_ids"`
+	Mode                         string   `json:"mode"`
+	ActiveIntervalSeconds        int      `json:"active_interval_seconds"`
+	AdaptiveInterval             bool     `json:"adaptive_interval"`
+	ActiveIntervalMinSeconds     int      `json:"active_interval_min_seconds"`
+	ActiveIntervalMaxSeconds     int      `json:"active_interval_max_seconds"`
+	PassivePollSeconds           int      `json:"passive_poll_seconds"`
+	PassiveCoverageAudits        int      `json:"passive_coverage_audits"`
+	PassiveCoverageWindowSeconds int      `json:"passive_coverage_window_seconds"`
+	SoftTPS                      float64  `json:"soft_tps"`
+	HardTPS                      float64  `json:"hard_tps"`
+	ConsecutiveSoft              int      `json:"consecutive_soft"`
+	ConsecutiveErrors            int      `json:"consecutive_errors"`
+	QuarantineSeconds            int      `json:"quarantine_seconds"`
+	NoAccountBackoffSeconds      int      `json:"no_account_backoff_seconds"`
+	MinHealthyNodes              int      `json:"min_healthy_nodes"`
+	ActiveConcurrency            int      `json:"active_concurrency"`
+	ActiveCycleBudgetSeconds     int      `json:"active_cycle_budget_seconds"`
+	LeaseTTLSeconds              int      `json:"lease_ttl_seconds"`
+	DrainGraceSeconds            int      `json:"drain_grace_seconds"`
+	DailyProbeRequests           int      `json:"daily_probe_requests"`
+	DailyProbeOutputTokens       int      `json:"daily_probe_output_tokens"`
+	ProbeReuseSeconds            int      `json:"probe_reuse_seconds"`
+	MaxOutputTokens              int      `json:"max_output_tokens"`
+	EarlyExitProbe               bool     `json:"early_exit_probe"`
+	FailClosed                   bool     `json:"fail_closed"`
+	MinGenerationMS              int      `json:"min_generation_ms"`
+	RotationURL                  string   `json:"rotation_url"`
+	RotationToken                string   `json:"rotation_token"`
+	RotationTimeoutSeconds       int      `json:"rotation_timeout_seconds"`
+	RotatableNodeIDs             []string `json:"rotatable_node_ids"`
+	APISocket                    string   `json:"api_socket"`
 }
 
 func (h *Handler) readQualityGuardBootstrap() (qualityGuardBootstrapFile, error) {
@@ -763,21 +1018,58 @@ func (h *Handler) testQualityGuardNodeManual(c *gin.Context) {
 	h.testQualityGuardNode(c)
 }
 
+// qualityGuardProbeRequest 是内部探测的可选请求体。调用方只能选择是否提前
+// 结束，提示词、标记和生成窗口仍由服务端固定。
+type qualityGuardProbeRequest struct {
+	EarlyExit bool `json:"earlyExit"`
+}
+
 func (h *Handler) testQualityGuardNode(c *gin.Context) {
 	nodeID, ok := pathID(c)
 	if !ok {
 		return
 	}
-	if h.guardProbe.ClientKeyID == 0 || strings.TrimSpace(h.guardProbe.Model) == "" || h.guardProbe.Prompt == "" || h.guardProbe.Expected == "" {
+	if !h.guardProbeConfigured() {
+		response.Error(c, http.StatusServiceUnavailable, "qualityGuardUnavailable", "质量守护配置暂不可用")
+		return
+	}
+	var request qualityGuardProbeRequest
+	decoder := json.NewDecoder(io.LimitReader(c.Request.Body, 4<<10))
+	decoder.DisallowUnknownFields()
+	if err := decoder.Decode(&request); err != nil && !errors.Is(err, io.EOF) {
+		response.Error(c, http.StatusBadRequest, "invalidRequest", "请求参数无效")
+		return
+	}
+	input, ok := h.guardProbeInput(request.EarlyExit)
+	if !ok {
 		response.Error(c, http.StatusServiceUnavailable, "qualityGuardUnavailable", "质量守护配置暂不可用")
 		return
 	}
-	value, err := h.service.ProbeQuality(c.Request.Context(), nodeID, h.guardProbe)
+	value, err := h.service.ProbeQuality(c.Request.Context(), nodeID, input)
 	if err != nil {
 		h.writeQualityProbeError(c, err)
 		return
 	}
-	response.Success(c, http.StatusOK, gin.H{
+	response.Success(c, http.StatusOK, qualityGuardProbeResponse(value))
+}
+
+func (h *Handler) guardProbeConfigured() bool {
+	return h.guardProbe.ClientKeyID != 0 && strings.TrimSpace(h.guardProbe.Model) != "" && h.guardProbe.Prompt != "" && h.guardProbe.Expected != ""
+}
+
+func (h *Handler) guardProbeInput(earlyExit bool) (egressapp.QualityProbeInput, bool) {
+	input := h.guardProbe
+	if earlyExit {
+		if input.EarlyExitPrompt == "" {
+			return input, false
+		}
+		input.EarlyExit = true
+	}
+	return input, true
+}
+
+func qualityGuardProbeResponse(value egressapp.QualityProbeResult) gin.H {
+	return gin.H{
 		"requestId": value.RequestID, "nodeId": strconv.FormatUint(value.NodeID, 10), "model": value.Model,
 		"statusCode": value.StatusCode, "firstTokenMs": value.FirstTokenMS, "durationMs": value.DurationMS,
 		"generationMs": value.GenerationMS, "chunkCount": value.ChunkCount,
@@ -785,8 +1077,116 @@ func (h *Handler) testQualityGuardNode(c *gin.Context) {
 		"visibleTokens": value.VisibleTokens, "visibleCharacters": value.VisibleCharacters,
 		"outputTokensPerSecond":  value.OutputTokensPerSecond,
 		"visibleTokensPerSecond": value.OutputTokensPerSecond, "expectedMatched": value.ExpectedMatched,
-		"responseSha256": value.ResponseSHA256,
-	})
+		"responseSha256": value.ResponseSHA256, "earlyExit": value.EarlyExit,
+	}
+}
+
+const (
+	// maxQualityGuardBatchProbes 限制单次批量探测的节点数，保证整批能在一次请求内完成。
+	maxQualityGuardBatchProbes = 64
+	// maxQualityGuardBatchConcurrency 限制批量探测在服务端同时进行的探测数。
+	maxQualityGuardBatchConcurrency = 16
+)
+
+type qualityGuardBatchProbeRequest struct {
+	IDs         []string `json:"ids"`
+	Concurrency int      `json:"concurrency"`
+	EarlyExit   bool     `json:"earlyExit"`
+}
+
+// testQualityGuardNodes 在服务端以有限并发探测一批节点，复用已池化的账号和连接，
+// 并以 NDJSON 每完成一个节点写出一行：成功行携带 data，失败行携带与单节点接口
+// 相同的 error 与 status。Mihomo 同步节点共用测试组、须先切换成员，不参与批量探测。
+func (h *Handler) testQualityGuardNodes(c *gin.Context) {
+	if !h.guardProbeConfigured() {
+		response.Error(c, http.StatusServiceUnavailable, "qualityGuardUnavailable", "质量守护配置暂不可用")
+		return
+	}
+	var request qualityGuardBatchProbeRequest
+	decoder := json.NewDecoder(io.LimitReader(c.Request.Body, 64<<10))
+	decoder.DisallowUnknownFields()
+	if err := decoder.Decode(&request); err != nil {
+		response.Error(c, http.StatusBadRequest, "invalidRequest", "请求参数无效")
+		return
+	}
+	ids, err := parseBoundedEgressNodeIDs(request.IDs, maxQualityGuardBatchProbes)
+	if err != nil {
+		response.Error(c, http.StatusBadRequest, "invalidId", "代理节点 ID 无效")
+		return
+	}
+	if request.Concurrency < 1 || request.Concurrency > maxQualityGuardBatchConcurrency {
+		response.Error(c, http.StatusBadRequest, "invalidConcurrency", fmt.Sprintf("concurrency 必须在 1 到 %d 之间", maxQualityGuardBatchConcurrency))
+		return
+	}
+	input, ok := h.guardProbeInput(request.EarlyExit)
+	if !ok {
+		response.Error(c, http.StatusServiceUnavailable, "qualityGuardUnavailable", "质量守护配置暂不可用")
+		return
+	}
+
+	ctx := c.Request.Context()
+	jobs := make(chan uint64)
+	lines := make(chan gin.H)
+	var workers sync.WaitGroup
+	for range min(request.Concurrency, len(ids)) {
+		workers.Add(1)
+		go func() {
+			defer workers.Done()
+			for id := range jobs {
+				lines <- h.qualityGuardProbeLine(ctx, id, input)
+			}
+		}()
+	}
+	go func() {
+		defer close(jobs)
+		for _, id := range ids {
+			select {
+			case jobs <- id:
+			case <-ctx.Done():
+				return
+			}
+		}
+	}()
+	go func() {
+		workers.Wait()
+		close(lines)
+	}()
+
+	c.Header("Content-Type", "application/x-ndjson")
+	c.Header("Cache-Control", "no-cache")
+	c.Status(http.StatusOK)
+	encoder := json.NewEncoder(c.Writer)
+	failed := false
+	for line := range lines {
+		// 客户端断开后继续接收剩余结果，让探测协程随请求上下文取消后退出。
+		if failed {
+			continue
+		}
+		if err := encoder.Encode(line); err != nil {
+			failed = true
+			continue
+		}
+		c.Writer.Flush()
+	}
+}
+
+func (h *Handler) qualityGuardProbeLine(ctx context.Context, nodeID uint64, input egressapp.QualityProbeInput) gin.H {
+	id := strconv.FormatUint(nodeID, 10)
+	node, err := h.service.GetNode(ctx, nodeID)
+	if err == nil && node.IsMihomoSynced() {
+		return gin.H{"nodeId": id, "status": http.StatusConflict, "error": gin.H{
+			"code": "egressQualityProbeMihomoSynced", "message": "Mihomo 同步节点需逐个探测",
+		}}
+	}
+	var value egressapp.QualityProbeResult
+	if err == nil {
+		value, err = h.service.ProbeQuality(ctx, nodeID, input)
+	}
+	if err != nil {
+		status, code, message := qualityProbeErrorOf(err)
+		return gin.H{"nodeId": id, "status": status, "error": gin.H{"code": code, "message": message}}
+	}
+	return gin.H{"nodeId": id, "status": http.StatusOK, "data": qualityGuardProbeResponse(value)}
 }
 
 func (h *Handler) cleanupPreview(c *gin.Context) {
@@ -941,12 +1341,17 @@ func (h *Handler) updateMany(c *gin.Context) {
 		response.Error(c, http.StatusBadRequest, "invalidId", "代理节点 ID 无效")
 		return
 	}
-	updated, err := h.service.UpdateManyEnabled(c.Request.Context(), ids, *request.Enabled)
+	changed, err := h.service.ChangeManyEnabled(c.Request.Context(), ids, *request.Enabled)
 	if err != nil {
 		h.writeError(c, err)
 		return
 	}
-	response.Success(c, http.StatusOK, gin.H{"updated": updated})
+	// updatedIds 让质量守护按 ID 结算一次批量隔离/恢复中每个节点的结果。
+	updatedIDs := make([]string, len(changed))
+	for index, id := range changed {
+		updatedIDs[index] = strconv.FormatUint(id, 10)
+	}
+	response.Success(c, http.StatusOK, gin.H{"updated": len(changed), "updatedIds": updatedIDs})
 }
 
 func (h *Handler) deleteMany(c *gin.Context) {
@@ -1039,7 +1444,11 @@ func (h *Handler) list(c *gin.Context) {
 		if pageSize == 0 {
 			pageSize = repository.DefaultPageSize
 		}
-		response.Success(c, http.StatusOK, gin.H{"items": items, "page": 1, "pageSize": pageSize, "total": len(items), "defaultUserAgents": h.service.DefaultUserAgents()})
+		payload := gin.H{"page": 1, "pageSize": pageSize, "total": len(items), "defaultUserAgents": h.service.DefaultUserAgents()}
+		if !response.ListItems(c, payload, items) {
+			return
+		}
+		response.SuccessConditional(c, payload)
 		return
 	}
 	page, pageSize := nodePagination(c)
@@ -1054,7 +1463,11 @@ func (h *Handler) list(c *gin.Context) {
 	for _, value := range values {
 		items = append(items, newNodeResponse(value))
 	}
-	response.Success(c, http.StatusOK, gin.H{"items": items, "page": page, "pageSize": pageSize, "total": total, "defaultUserAgents": h.service.DefaultUserAgents()})
+	payload := gin.H{"page": page, "pageSize": pageSize, "total": total, "defaultUserAgents": h.service.DefaultUserAgents()}
+	if !response.ListItems(c, payload, items) {
+		return
+	}
+	response.SuccessConditional(c, payload)
 }
 
 func legacyEgressListRequest(c *gin.Context) bool {
@@ -1322,9 +1735,11 @@ func newSourceResponse(value egressdomain.PublicSubscriptionSource) sourceRespon
 	}
 }
 
+var operationsFallbackScopes = []egressdomain.Scope{egressdomain.ScopeBuild, egressdomain.ScopeWeb, egressdomain.ScopeConsole, egressdomain.ScopeWebAsset, egressdomain.ScopeConsoleAsset}
+
 func newOperationsConfigResponse(value egressdomain.OperationsConfig) operationsConfigResponse {
-	fallbacks := make(map[string]operationsFallbackResponse, 5)
-	for _, scope := range []egressdomain.Scope{egressdomain.ScopeBuild, egressdomain.ScopeWeb, egressdomain.ScopeConsole, egressdomain.ScopeWebAsset, egressdomain.ScopeConsoleAsset} {
+	fallbacks := make(map[string]operationsFallbackResponse, len(operationsFallbackScopes))
+	for _, scope := range operationsFallbackScopes {
 		fallback := value.FallbackFor(scope)
 		item := operationsFallbackResponse{Mode: string(fallback.Mode)}
 		if fallback.NodeID != 0 {
@@ -1505,7 +1920,7 @@ func (h *Handler) operationsConfig(c *gin.Context) {
 		h.writeError(c, err)
 		return
 	}
-	response.Success(c, http.StatusOK, newOperationsConfigResponse(value))
+	response.SuccessConditional(c, newOperationsConfigResponse(value))
 }
 
 func (h *Handler) updateOperationsConfig(c *gin.Context) {
@@ -1584,15 +1999,23 @@ func (h *Handler) writeError(c *gin.Context, err error) {
 }
 
 func (h *Handler) writeQualityProbeError(c *gin.Context, err error) {
+	status, code, message := qualityProbeErrorOf(err)
+	response.Error(c, status, code, message)
+}
+
+// qualityProbeErrorOf 把探测错误映射为状态码、错误码和提示，单节点与批量探测共用。
+func qualityProbeErrorOf(err error) (int, string, string) {
 	switch {
 	case errors.Is(err, egressapp.ErrQualityProbeNoAccount):
-		response.Error(c, http.StatusServiceUnavailable, "egressQualityProbeNoAccount", "质量检测暂无可调度账号，请稍后重试")
-	case errors.Is(err, egressapp.ErrInvalidInput),
-		errors.Is(err, egressapp.ErrNotFound),
-		errors.Is(err, egressapp.ErrQualityProbeUnavailable):
-		h.writeError(c, err)
+		return http.StatusServiceUnavailable, "egressQualityProbeNoAccount", "质量检测暂无可调度账号，请稍后重试"
+	case errors.Is(err, egressapp.ErrInvalidInput):
+		return http.StatusBadRequest, "invalidEgressNode", err.Error()
+	case errors.Is(err, egressapp.ErrNotFound):
+		return http.StatusNotFound, "egressNodeNotFound", err.Error()
+	case errors.Is(err, egressapp.ErrQualityProbeUnavailable):
+		return http.StatusServiceUnavailable, "egressQualityProbeUnavailable", err.Error()
 	default:
-		response.Error(c, http.StatusBadGateway, "egressQualityProbeFailed", "质量检测暂不可用，请稍后重试")
+		return http.StatusBadGateway, "egressQualityProbeFailed", "质量检测暂不可用，请稍后重试"
 	}
 }
 
@@ -14,6 +14,7 @@ import (
 
 	egressapp "github.com/chenyme/grok2api/backend/internal/application/egress"
 	egressdomain "github.com/chenyme/grok2api/backend/internal/domain/egress"
+	"github.com/chenyme/grok2api/backend/internal/infra/runtime/memory"
 	"github.com/chenyme/grok2api/backend/internal/repository"
 	"github.com/chenyme/grok2api/backend/internal/transport/http/middleware"
 	"github.com/gin-gonic/gin"
@@ -21,7 +22,7 @@ import (
 
 func TestQualityGuardStatusReadsOnlyPublicState(t *testing.T) {
 	path := t.TempDir() + "/state.json"
-	state := `{"version":1,"started_at":10,"updated_at":20,"last_active_cycle_at":15,"last_passive_poll_at":19,"password":"must-not-leak","guard":{"mode":"hybrid","model":"grok-4.5","client_key_id":"6","node_ids":["8"],"active_interval_seconds":1800,"passive_poll_seconds":5,"soft_tps":500,"hard_tps":1000,"consecutive_soft":2,"consecutive_errors":2,"quarantine_seconds":300,"min_healthy_nodes":3,"max_output_tokens":384,"prompt":"private-probe-prompt","expected":"private-marker"},"protected_node_ids":["9"],"nodes":{"8":{"active_soft_strikes":0,"passive_soft_strikes":0,"error_strikes":0,"quarantined_until":0,"disabled_by_guard":false,"last_reason":"","last_probe_at":15,"last_observed_at":19,"last_source":"passive","last_classification":"healthy","last_output_tps":42.5,"last_output_tokens":100,"last_first_token_ms":900,"last_duration_ms":4000}},"statistics":{"started_at":11,"active":{"total":7,"healthy":6,"soft":1,"hard":0,"errors":0,"output_tokens":1400},"passive":{"total":9,"healthy":8,"soft":0,"hard":1,"errors":0,"output_tokens":1800},"actions":{"quarantined":1,"restored":0,"suppressed":0}}}`
+	state := `{"version":1,"started_at":10,"updated_at":20,"last_active_cycle_at":15,"last_passive_poll_at":19,"password":"must-not-leak","guard":{"mode":"hybrid","model":"grok-4.5","client_key_id":"6","node_ids":["8"],"active_interval_seconds":1800,"passive_poll_seconds":5,"soft_tps":500,"hard_tps":1000,"consecutive_soft":2,"consecutive_errors":2,"quarantine_seconds":300,"min_healthy_nodes":3,"max_output_tokens":384,"prompt":"private-probe-prompt","expected":"private-marker"},"protected_node_ids":["9"],"nodes":{"8":{"active_soft_strikes":0,"passive_soft_strikes":0,"error_strikes":0,"quarantined_until":0,"disabled_by_guard":false,"last_reason":"","last_probe_at":15,"last_observed_at":19,"last_source":"passive","last_classification":"healthy","last_output_tps":42.5,"last_output_tokens":100,"last_first_token_ms":900,"last_duration_ms":4000}},"statistics":{"started_at":11,"active":{"total":7,"healthy":6,"soft":1,"hard":0,"errors":0,"output_tokens":1400},"passive":{"total":9,"healthy":8,"soft":0,"hard":1,"errors":0,"output_tokens":1800},"actions":{"quarantined":1,"restored":0,"suppressed":0}},"budget":{"day":"2026-01-02","request_limit":240,"output_token_limit":0,"requests":7,"output_tokens":1400,"denied":2,"nodes":{"8":{"requests":7,"output_tokens":1400}}},"shards":[{"index":0,"available":true,"updated_at":20,"nodes":1}]}`
 	if err := os.WriteFile(path, []byte(state), 0o600); err != nil {
 		t.Fatal(err)
 	}
@@ -29,7 +30,7 @@ func TestQualityGuardStatusReadsOnlyPublicState(t *testing.T) {
 	context, _ := gin.CreateTestContext(recorder)
 	context.Request = httptest.NewRequest("GET", "/egress-quality-guard", nil)
 	NewHandler(nil, path).qualityGuardStatus(context)
-	if recorder.Code != 200 || !strings.Contains(recorder.Body.String(), `"available":true`) || !strings.Contains(recorder.Body.String(), `"last_output_tps":42.5`) || !strings.Contains(recorder.Body.String(), `"output_tokens":1400`) || !strings.Contains(recorder.Body.String(), `"protectedNodeIds":["9"]`) {
+	if recorder.Code != 200 || !strings.Contains(recorder.Body.String(), `"available":true`) || !strings.Contains(recorder.Body.String(), `"last_output_tps":42.5`) || !strings.Contains(recorder.Body.String(), `"output_tokens":1400`) || !strings.Contains(recorder.Body.String(), `"protectedNodeIds":["9"]`) || !strings.Contains(recorder.Body.String(), `"request_limit":240`) || !strings.Contains(recorder.Body.String(), `"shards":[{"index":0`) {
 		t.Fatalf("status=%d body=%s", recorder.Code, recorder.Body.String())
 	}
 	if strings.Contains(recorder.Body.String(), "must-not-leak") || strings.Contains(recorder.Body.String(), "private-probe-prompt") || strings.Contains(recorder.Body.String(), "private-marker") || strings.Contains(recorder.Body.String(), "client_key_id") || !strings.Contains(recorder.Body.String(), `"recentEvents":[]`) {
@@ -385,6 +386,7 @@ type stubMihomoManager struct {
 	bannedCount int
 	banErr      error
 	status      egressapp.MihomoStatus
+	epochChange chan egressapp.MihomoEpochs
 }
 
 func (value stubMihomoManager) MihomoStatus(context.Context) egressapp.MihomoStatus {
@@ -407,6 +409,20 @@ func (value stubMihomoManager) MihomoTestUnban(string) (int, error) {
 func (value stubMihomoManager) MihomoRefreshDelays(context.Context) egressapp.MihomoStatus {
 	return value.status
 }
+func (value stubMihomoManager) MihomoEpochs() egressapp.MihomoEpochs {
+	return egressapp.MihomoEpochs{Enabled: value.status.Enabled, Epoch: value.status.Epoch, TestEnabled: value.status.TestEnabled, TestEpoch: value.status.TestEpoch}
+}
+func (value stubMihomoManager) WaitMihomoEpochs(ctx context.Context, known egressapp.MihomoEpochs) egressapp.MihomoEpochs {
+	if current := value.MihomoEpochs(); current != known || value.epochChange == nil {
+		return current
+	}
+	select {
+	case next := <-value.epochChange:
+		return next
+	case <-ctx.Done():
+		return known
+	}
+}
 
 func newQualityGuardRotateRouter(service *egressapp.Service) *gin.Engine {
 	return newQualityGuardRotateRouterWithPaths(service)
@@ -556,14 +572,15 @@ func TestQualityGuardRotateRejectsEmptyNodeID(t *testing.T) {
 
 func TestQualityGuardSelectReportsChangedAndCurrentNode(t *testing.T) {
 	service := egressapp.NewService(nil, nil, "")
-	service.SetMihomoManager(stubMihomoManager{selectNode: "fast"})
+	service.SetMihomoManager(stubMihomoManager{selectNode: "fast", status: egressapp.MihomoStatus{Enabled: true, Epoch: 3, TestEnabled: true, TestEpoch: 8}})
 	router := newQualityGuardRotateRouter(service)
 	recorder := httptest.NewRecorder()
 	request := httptest.NewRequest("POST", "/api/internal/v1/quality-guard/egress-mihomo/select", bytes.NewBufferString(`{"nodeId":"fast"}`))
 	request.Header.Set("Content-Type", "application/json")
 	request.Header.Set("Authorization", "Bearer guard-secret")
 	router.ServeHTTP(recorder, request)
-	if recorder.Code != 200 || !strings.Contains(recorder.Body.String(), `"changed":true`) || !strings.Contains(recorder.Body.String(), `"currentNode":"fast"`) {
+	if recorder.Code != 200 || !strings.Contains(recorder.Body.String(), `"changed":true`) || !strings.Contains(recorder.Body.String(), `"currentNode":"fast"`) ||
+		!strings.Contains(recorder.Body.String(), `"epochs":{"enabled":true,"epoch":3,"testEnabled":true,"testEpoch":8}`) {
 		t.Fatalf("status=%d body=%s", recorder.Code, recorder.Body.String())
 	}
 }
@@ -672,6 +689,71 @@ func (r *stubManualDetectRepo) ListEgressNodePage(context.Context, repository.Eg
 	return []egressdomain.Node{r.node}, 1, nil
 }
 
+type stubSnapshotRepo struct {
+	*stubManualDetectRepo
+	egressapp.OperationsRepository
+	operations egressdomain.OperationsConfig
+}
+
+func (r *stubSnapshotRepo) GetEgressOperationsConfig(context.Context) (egressdomain.OperationsConfig, error) {
+	return r.operations, nil
+}
+
+func TestQualityGuardSnapshotCombinesNodesFallbacksAndEpochs(t *testing.T) {
+	operations := egressdomain.DefaultOperationsConfig()
+	operations.Fallbacks[egressdomain.ScopeBuild] = egressdomain.FallbackConfig{Mode: egressdomain.FallbackModeFixed, NodeID: 3}
+	operations.Fallbacks[egressdomain.ScopeWeb] = egressdomain.FallbackConfig{Mode: egressdomain.FallbackModeFixed, NodeID: 3}
+	repo := &stubSnapshotRepo{
+		stubManualDetectRepo: &stubManualDetectRepo{node: egressdomain.Node{ID: 3, Name: "std-3", Scope: egressdomain.ScopeBuild, Enabled: true}},
+		operations:           operations,
+	}
+	service := egressapp.NewService(repo, nil, "")
+	service.SetMihomoManager(stubMihomoManager{status: egressapp.MihomoStatus{Enabled: true, Epoch: 4, TestEnabled: true, TestEpoch: 9, CurrentNode: "volatile"}})
+	router := newQualityGuardRotateRouter(service)
+
+	recorder := httptest.NewRecorder()
+	request := httptest.NewRequest("GET", "/api/internal/v1/quality-guard/egress-quality-guard/snapshot?format=rows&fields=id,enabled", nil)
+	request.Header.Set("Authorization", "Bearer guard-secret")
+	router.ServeHTTP(recorder, request)
+	if recorder.Code != 200 {
+		t.Fatalf("status=%d body=%s", recorder.Code, recorder.Body.String())
+	}
+	want := `{"data":{"columns":["id","enabled"],"fixedFallbackNodeIds":["3"],"mihomo":{"enabled":true,"epoch":4,"testEnabled":true,"testEpoch":9},"rows":[["3",true]],"total":1}}`
+	if recorder.Body.String() != want {
+		t.Fatalf("body=%s", recorder.Body.String())
+	}
+	if recorder.Header().Get("ETag") == "" {
+		t.Fatal("snapshot should carry an ETag")
+	}
+}
+
+func TestMihomoEpochsLongPollReturnsOnChange(t *testing.T) {
+	changes := make(chan egressapp.MihomoEpochs, 1)
+	service := egressapp.NewService(&stubManualDetectRepo{}, nil, "")
+	service.SetMihomoManager(stubMihomoManager{status: egressapp.MihomoStatus{Enabled: true, Epoch: 4, TestEnabled: true, TestEpoch: 9}, epochChange: changes})
+	router := newQualityGuardRotateRouter(service)
+	poll := func(query string) *httptest.ResponseRecorder {
+		recorder := httptest.NewRecorder()
+		request := httptest.NewRequest("GET", "/api/internal/v1/quality-guard/egress-mihomo/epochs?"+query, nil)
+		request.Header.Set("Authorization", "Bearer guard-secret")
+		router.ServeHTTP(recorder, request)
+		return recorder
+	}
+
+	stale := poll("enabled=true&epoch=3&testEnabled=true&testEpoch=9&waitSeconds=30")
+	if stale.Body.String() != `{"data":{"enabled":true,"epoch":4,"testEnabled":true,"testEpoch":9}}` {
+		t.Fatalf("stale epochs should return at once: status=%d body=%s", stale.Code, stale.Body.String())
+	}
+	changes <- egressapp.MihomoEpochs{Enabled: true, Epoch: 4, TestEnabled: true, TestEpoch: 10}
+	current := poll("enabled=true&epoch=4&testEnabled=true&testEpoch=9&waitSeconds=30")
+	if current.Body.String() != `{"data":{"enabled":true,"epoch":4,"testEnabled":true,"testEpoch":10}}` {
+		t.Fatalf("long poll should return the change: status=%d body=%s", current.Code, current.Body.String())
+	}
+	if invalid := poll("waitSeconds=61"); invalid.Code != 400 {
+		t.Fatalf("wait above the limit: status=%d", invalid.Code)
+	}
+}
+
 type recordingMihomoManager struct {
 	stubMihomoManager
 	selectCalls []string
@@ -744,6 +826,119 @@ func TestQualityGuardManualDetectSkipsSelectForStandardNode(t *testing.T) {
 	}
 }
 
+type recordingQualityProber struct{ input egressapp.QualityProbeInput }
+
+func (p *recordingQualityProber) ProbeEgressQuality(_ context.Context, nodeID uint64, input egressapp.QualityProbeInput) (egressapp.QualityProbeResult, error) {
+	p.input = input
+	return egressapp.QualityProbeResult{NodeID: nodeID, ExpectedMatched: true, EarlyExit: input.EarlyExit}, nil
+}
+
+func TestQualityGuardProbeEarlyExitKeepsServerOwnedPrompt(t *testing.T) {
+	gin.SetMode(gin.TestMode)
+	repo := &stubManualDetectRepo{node: egressdomain.Node{ID: 2, Name: "std-1", Scope: egressdomain.ScopeBuild, EncryptedProxyURL: "encrypted"}}
+	prober := &recordingQualityProber{}
+	service := egressapp.NewService(repo, nil, "")
+	service.SetQualityProber(prober)
+	handler := NewHandler(service).WithQualityGuardProbe(egressapp.QualityProbeInput{
+		ClientKeyID: 7, Model: "grok-4.5", Prompt: "full", Expected: "e", EarlyExitPrompt: "early", MinGenerationMS: 1000,
+	})
+	router := gin.New()
+	handler.RegisterQualityGuard(router.Group(""))
+
+	recorder := httptest.NewRecorder()
+	router.ServeHTTP(recorder, httptest.NewRequest("POST", "/egress-nodes/2/quality-test", nil))
+	if recorder.Code != 200 || prober.input.EarlyExit || prober.input.Prompt != "full" {
+		t.Fatalf("default probe status=%d input=%#v", recorder.Code, prober.input)
+	}
+	recorder = httptest.NewRecorder()
+	router.ServeHTTP(recorder, httptest.NewRequest("POST", "/egress-nodes/2/quality-test", strings.NewReader(`{"earlyExit":true}`)))
+	if recorder.Code != 200 || !prober.input.EarlyExit || prober.input.Prompt != "early" || !strings.Contains(recorder.Body.String(), `"earlyExit":true`) {
+		t.Fatalf("early probe status=%d body=%s input=%#v", recorder.Code, recorder.Body.String(), prober.input)
+	}
+	recorder = httptest.NewRecorder()
+	router.ServeHTTP(recorder, httptest.NewRequest("POST", "/egress-nodes/2/quality-test", strings.NewReader(`{"prompt":"x"}`)))
+	if recorder.Code != 400 {
+		t.Fatalf("unknown field status=%d", recorder.Code)
+	}
+}
+
+func TestQualityGuardBatchProbeStreamsOneLinePerNode(t *testing.T) {
+	gin.SetMode(gin.TestMode)
+	repo := &stubManualDetectRepo{node: egressdomain.Node{ID: 2, Name: "std-1", Scope: egressdomain.ScopeBuild, EncryptedProxyURL: "encrypted"}}
+	prober := &recordingQualityProber{}
+	service := egressapp.NewService(repo, nil, "")
+	service.SetQualityProber(prober)
+	handler := NewHandler(service).WithQualityGuardProbe(egressapp.QualityProbeInput{
+		ClientKeyID: 7, Model: "grok-4.5", Prompt: "full", Expected: "e", EarlyExitPrompt: "early",
+	})
+	router := gin.New()
+	handler.RegisterQualityGuard(router.Group(""))
+
+	recorder := httptest.NewRecorder()
+	router.ServeHTTP(recorder, httptest.NewRequest("POST", "/egress-nodes/batch/quality-test", strings.NewReader(`{"ids":["2","9"],"concurrency":2,"earlyExit":true}`)))
+	if recorder.Code != 200 || recorder.Header().Get("Content-Type") != "application/x-ndjson" || !prober.input.EarlyExit {
+		t.Fatalf("status=%d headers=%v input=%#v", recorder.Code, recorder.Header(), prober.input)
+	}
+	lines := map[string]map[string]any{}
+	for _, line := range strings.Split(strings.TrimSpace(recorder.Body.String()), "\n") {
+		var value map[string]any
+		if err := json.Unmarshal([]byte(line), &value); err != nil {
+			t.Fatalf("line %q: %v", line, err)
+		}
+		lines[value["nodeId"].(string)] = value
+	}
+	if len(lines) != 2 || lines["2"]["status"] != float64(200) || lines["2"]["data"].(map[string]any)["expectedMatched"] != true {
+		t.Fatalf("lines = %v", lines)
+	}
+	if lines["9"]["status"] != float64(404) || lines["9"]["error"].(map[string]any)["code"] != "egressNodeNotFound" {
+		t.Fatalf("missing node line = %v", lines["9"])
+	}
+
+	for _, body := range []string{`{"ids":["2"],"concurrency":0}`, `{"ids":[],"concurrency":1}`, `{"ids":["2"],"concurrency":1,"prompt":"x"}`} {
+		recorder = httptest.NewRecorder()
+		router.ServeHTTP(recorder, httptest.NewRequest("POST", "/egress-nodes/batch/quality-test", strings.NewReader(body)))
+		if recorder.Code != 400 {
+			t.Fatalf("%s status=%d", body, recorder.Code)
+		}
+	}
+}
+
+func TestQualityGuardLeaseElectsOneLeaderAndFencesStaleWrites(t *testing.T) {
+	gin.SetMode(gin.TestMode)
+	service := egressapp.NewService(&stubManualDetectRepo{}, nil, "")
+	router := gin.New()
+	NewHandler(service).WithQualityGuardLease(memory.NewQualityGuardLeaseStore()).RegisterQualityGuard(router.Group(""))
+	acquire := func(holder string) *httptest.ResponseRecorder {
+		recorder := httptest.NewRecorder()
+		router.ServeHTTP(recorder, httptest.NewRequest("POST", "/egress-quality-guard/lease", strings.NewReader(`{"holder":"`+holder+`","ttlSeconds":15}`)))
+		return recorder
+	}
+	if recorder := acquire("host-a"); recorder.Code != 200 || !strings.Contains(recorder.Body.String(), `"leader":true`) || !strings.Contains(recorder.Body.String(), `"token":"1"`) {
+		t.Fatalf("leader acquire status=%d body=%s", recorder.Code, recorder.Body.String())
+	}
+	if recorder := acquire("host-b"); recorder.Code != 200 || !strings.Contains(recorder.Body.String(), `"leader":false`) || !strings.Contains(recorder.Body.String(), `"holder":"host-a"`) {
+		t.Fatalf("standby acquire status=%d body=%s", recorder.Code, recorder.Body.String())
+	}
+	write := func(token string) *httptest.ResponseRecorder {
+		recorder := httptest.NewRecorder()
+		request := httptest.NewRequest("PATCH", "/egress-nodes/batch", strings.NewReader(`{"ids":["2"],"enabled":false}`))
+		request.Header.Set("X-Quality-Guard-Fence", token)
+		router.ServeHTTP(recorder, request)
+		return recorder
+	}
+	if recorder := write("2"); recorder.Code != 409 || !strings.Contains(recorder.Body.String(), "qualityGuardFenced") {
+		t.Fatalf("stale fence status=%d body=%s", recorder.Code, recorder.Body.String())
+	}
+	if recorder := write("1"); recorder.Code == 409 {
+		t.Fatalf("current fence rejected: %s", recorder.Body.String())
+	}
+	recorder := httptest.NewRecorder()
+	router.ServeHTTP(recorder, httptest.NewRequest("POST", "/egress-quality-guard/lease", strings.NewReader(`{"holder":"host-a","ttlSeconds":1}`)))
+	if recorder.Code != 400 {
+		t.Fatalf("short ttl status=%d", recorder.Code)
+	}
+}
+
 func TestMihomoRefreshDelaysReturnsStatus(t *testing.T) {
 	gin.SetMode(gin.TestMode)
 	manager := &stubMihomoManager{status: egressapp.MihomoStatus{
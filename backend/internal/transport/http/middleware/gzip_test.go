@@ -0,0 +1,55 @@
+package middleware
+
+import (
+	"compress/gzip"
+	"io"
+	"net/http"
+	"net/http/httptest"
+	"testing"
+
+	"github.com/gin-gonic/gin"
+)
+
+func TestGzipCompressesOnlyNegotiatedBodies(t *testing.T) {
+	gin.SetMode(gin.TestMode)
+	router := gin.New()
+	router.Use(Gzip())
+	router.GET("/items", func(c *gin.Context) { c.JSON(http.StatusOK, gin.H{"items": []string{"a", "b"}}) })
+	router.DELETE("/items", func(c *gin.Context) { c.Status(http.StatusNoContent) })
+
+	request := httptest.NewRequest(http.MethodGet, "/items", nil)
+	request.Header.Set("Accept-Encoding", "br;q=1, gzip;q=0.5")
+	recorder := httptest.NewRecorder()
+	router.ServeHTTP(recorder, request)
+	if recorder.Header().Get("Content-Encoding") != "gzip" {
+		t.Fatalf("headers = %v", recorder.Header())
+	}
+	reader, err := gzip.NewReader(recorder.Body)
+	if err != nil {
+		t.Fatal(err)
+	}
+	body, err := io.ReadAll(reader)
+	if err != nil || string(body) != `{"items":["a","b"]}` {
+		t.Fatalf("body = %q, err = %v", body, err)
+	}
+
+	for _, test := range []struct {
+		method string
+		accept string
+	}{
+		{method: http.MethodGet, accept: "gzip;q=0"},
+		{method: http.MethodGet, accept: ""},
+		{method: http.MethodDelete, accept: "gzip"},
+	} {
+		request := httptest.NewRequest(test.method, "/items", nil)
+		request.Header.Set("Accept-Encoding", test.accept)
+		recorder := httptest.NewRecorder()
+		router.ServeHTTP(recorder, request)
+		if recorder.Header().Get("Content-Encoding") != "" {
+			t.Fatalf("%s %q compressed: %v", test.method, test.accept, recorder.Header())
+		}
+		if test.method == http.MethodGet && recorder.Body.String() != `{"items":["a","b"]}` {
+			t.Fatalf("%q body = %q", test.accept, recorder.Body.String())
+		}
+	}
+}
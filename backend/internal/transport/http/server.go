@@ -4,6 +4,7 @@ import (
 	"context"
 	"log/slog"
 	"net/http"
+	"strings"
 	"time"
 
 	_ "github.com/chenyme/grok2api/backend/docs"
@@ -19,6 +20,7 @@ import (
 	modelapp "github.com/chenyme/grok2api/backend/internal/application/model"
 	settingsapp "github.com/chenyme/grok2api/backend/internal/application/settings"
 	updatecheckapp "github.com/chenyme/grok2api/backend/internal/application/updatecheck"
+	"github.com/chenyme/grok2api/backend/internal/repository"
 	accounthttp "github.com/chenyme/grok2api/backend/internal/transport/http/account"
 	adminauthhttp "github.com/chenyme/grok2api/backend/internal/transport/http/adminauth"
 	audithttp "github.com/chenyme/grok2api/backend/internal/transport/http/audit"
@@ -65,6 +67,7 @@ type Dependencies struct {
 	QualityGuardBootstrapPath string
 	QualityGuardToken         string
 	QualityGuardProbe         egressapp.QualityProbeInput
+	QualityGuardLeases        repository.QualityGuardLeaseStore
 	Updates                   *updatecheckapp.Service
 }
 
@@ -106,6 +109,21 @@ type ReadinessSnapshot struct {
 	Startup    *ReadinessStartupReport       `json:"startup,omitempty"`
 }
 
+// QualityGuardInternalPrefix 是质量守护内部接口的路由前缀。
+const QualityGuardInternalPrefix = "/api/internal/v1/quality-guard"
+
+// QualityGuardSocketHandler 让 Unix socket 监听器复用同一路由，但只放行质量守护
+// 内部接口（仍需内部令牌）；守护流量因此不经过公开 TCP 监听器。
+func QualityGuardSocketHandler(router http.Handler) http.Handler {
+	return http.HandlerFunc(func(w http.ResponseWriter, r *http.Request) {
+		if !strings.HasPrefix(r.URL.Path, QualityGuardInternalPrefix+"/") {
+			http.NotFound(w, r)
+			return
+		}
+		router.ServeHTTP(w, r)
+	})
+}
+
 // New 创建完整 HTTP 路由并明确区分公共、管理员和客户端鉴权边界。
 func New(deps Dependencies) *gin.Engine {
 	if deps.ConcurrencyGate == nil {
@@ -154,7 +172,7 @@ func New(deps Dependencies) *gin.Engine {
 	dashboardhttp.NewHandler(deps.Dashboard).Register(adminProtected)
 	mediaHandler.RegisterAdmin(adminProtected)
 	settingshttp.NewHandler(deps.Settings).Register(adminProtected)
-	egressHandler := egresshttp.NewHandler(deps.Egress, deps.QualityGuardStatePath, deps.QualityGuardConfigPath, deps.QualityGuardBootstrapPath).WithQualityGuardProbe(deps.QualityGuardProbe)
+	egressHandler := egresshttp.NewHandler(deps.Egress, deps.QualityGuardStatePath, deps.QualityGuardConfigPath, deps.QualityGuardBootstrapPath).WithQualityGuardProbe(deps.QualityGuardProbe).WithQualityGuardLease(deps.QualityGuardLeases)
 	egressHandler.Register(adminProtected)
 	systemhttp.NewHandler(func() string {
 		if deps.Settings != nil {
@@ -164,8 +182,8 @@ func New(deps Dependencies) *gin.Engine {
 	}, deps.Updates).Register(adminProtected)
 
 	if deps.QualityGuardToken != "" {
-		qualityGuardInternal := router.Group("/api/internal/v1/quality-guard")
-		qualityGuardInternal.Use(middleware.QualityGuardAuth(deps.QualityGuardToken))
+		qualityGuardInternal := router.Group(QualityGuardInternalPrefix)
+		qualityGuardInternal.Use(middleware.QualityGuardAuth(deps.QualityGuardToken), middleware.Gzip())
 		audithttp.NewQualityGuardHandler(deps.Audits, deps.QualityGuardProbe.ClientKeyID).RegisterQualityGuard(qualityGuardInternal)
 		egressHandler.RegisterQualityGuard(qualityGuardInternal)
 	}
@@ -93,6 +93,27 @@ func TestSystemEndpointsRequireAdminAuthentication(t *testing.T) {
 	}
 }
 
+func TestQualityGuardSocketHandlerServesOnlyInternalRoutes(t *testing.T) {
+	deps := testDependencies()
+	deps.QualityGuardToken = "scoped-secret"
+	handler := QualityGuardSocketHandler(New(deps))
+	for _, route := range []struct {
+		path string
+		want int
+	}{
+		{path: "/healthz", want: http.StatusNotFound},
+		{path: "/api/admin/v1/system", want: http.StatusNotFound},
+		{path: QualityGuardInternalPrefix + "/egress-nodes", want: http.StatusUnauthorized},
+	} {
+		request := httptest.NewRequest(http.MethodGet, route.path, nil)
+		recorder := httptest.NewRecorder()
+		handler.ServeHTTP(recorder, request)
+		if recorder.Code != route.want {
+			t.Fatalf("%s status = %d, want %d", route.path, recorder.Code, route.want)
+		}
+	}
+}
+
 func TestFrontendStaticFilesAndSPAFallback(t *testing.T) {
 	root := t.TempDir()
 	if err := os.MkdirAll(filepath.Join(root, "assets"), 0o755); err != nil {
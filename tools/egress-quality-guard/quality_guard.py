@@ -10,22 +10,39 @@ bootstrap file. The implementation uses only Python's standard library.
 from __future__ import annotations
 
 import argparse
+import asyncio
+import codecs
+import concurrent.futures
+import contextlib
+import ctypes
 import dataclasses
+import datetime
 import fcntl
+import functools
+import gzip
+import hashlib
+import heapq
+import http.client
 import json
+import math
 import os
+import queue
 import random
+import secrets
+import selectors
 import signal
+import socket
 import ssl
+import struct
+import subprocess
 import sys
 import tempfile
+import threading
 import time
-import urllib.error
 import urllib.parse
-import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Any
-
+from typing import IO, Any, AsyncIterator, Awaitable, Callable, Iterator
 
 RUNTIME_CONFIG_FIELDS = {
     "mode",
@@ -43,6 +60,93 @@ RUNTIME_CONFIG_FIELDS = {
 BOOTSTRAP_VERSION = 1
 BOOTSTRAP_FILE = Path("/var/lib/grok2api-quality-guard/bootstrap.json")
 INTERNAL_API_PREFIX = "/api/internal/v1/quality-guard"
+# Columns the guard reads from the node and audit feeds. Both are requested as
+# gzip-compressed header-plus-rows tables restricted to these fields.
+NODE_FIELDS = (
+    "id",
+    "name",
+    "type",
+    "enabled",
+    "proxyConfigured",
+    "sourceKey",
+    "exitIp",
+)
+AUDIT_FIELDS = (
+    "id",
+    "requestId",
+    "qualityProbe",
+    "provider",
+    "egressNodeId",
+    "statusCode",
+    "streaming",
+    "outputTokens",
+    "firstTokenMs",
+    "durationMs",
+    "errorCode",
+    "createdAt",
+)
+# Consecutive healthy active probes that double an adaptive probe interval.
+ADAPTIVE_HEALTHY_STREAK = 3
+# Share of each daily probe budget that only recovery probes may spend.
+RECOVERY_BUDGET_RESERVE = 0.1
+# Output tokens a sample needs before its throughput is judged. Early-exit
+# probes are cut by the backend as soon as they reach this size.
+MIN_SPEED_OUTPUT_TOKENS = 32
+MAX_SHARDS = 64
+# Sharded mode: how often the coordinator merges shard state into the status
+# file, and the minimum delay before it restarts an exited worker.
+SHARD_MERGE_SECONDS = 5
+SHARD_RESTART_SECONDS = 10
+# Fallback interval for checking config files when inotify is unavailable;
+# SIGHUP reloads at once.
+RUNTIME_CONFIG_POLL_SECONDS = 5.0
+# Keep-alive pool for ApiClient: idle connections are dropped well before the
+# backend's two-minute idle timeout, and each host allows the probe workers
+# plus this many connections for loops, workers, the lease and the epoch watch.
+POOL_IDLE_SECONDS = 60.0
+POOL_SPARE_CONNECTIONS = 5
+# How long the mihomo epochs returned with a cycle snapshot stand in for a
+# fresh status read when checking probe reuse.
+SNAPSHOT_STATUS_SECONDS = 1.0
+# Long-poll window of the mihomo epoch watch, and its pause after a failed poll.
+EPOCH_WATCH_WAIT_SECONDS = 25
+EPOCH_WATCH_RETRY_SECONDS = 5.0
+# Most nodes one batch quality-test request may carry (backend limit).
+BATCH_PROBE_LIMIT = 64
+# Most probes one batch quality-test request runs at once (backend limit).
+BATCH_PROBE_CONCURRENCY = 16
+# Most items of one conditional page kept for replay on 304; larger pages are
+# downloaded in full every time rather than held in memory between polls.
+CONDITIONAL_CACHE_ITEMS = 2000
+# Time a draining shard worker gets beyond its grace to flush state and exit.
+DRAIN_FLUSH_SECONDS = 5.0
+# Longest drain grace: the container's S6_SERVICES_GRACETIME (25 s) minus the
+# time to flush state and exit.
+MAX_DRAIN_GRACE_SECONDS = 20
+# How often a loop waiting on in-flight probes looks at the drain deadline.
+DRAIN_CHECK_SECONDS = 0.5
+# Bootstrap fields a running guard cannot take over in place.
+RESTART_BOOTSTRAP_FIELDS = (
+    "state_file",
+    "lock_file",
+    "runtime_config_file",
+    "lease_ttl_seconds",
+    "shard_index",
+    "shard_count",
+)
+# inotify(7) event bits used by ConfigWatcher.
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+# Header carrying the leader lease's fencing token on guard write requests.
+FENCE_HEADER = "X-Quality-Guard-Fence"
+# Batch PATCH refusals caused by one node in the batch rather than by the
+# caller; besides these, only 400 validation errors are retried per ID.
+NODE_REFUSAL_CODES = frozenset({"mihomoNodeProtected", "managedSourceProtected"})
 
 
 class GuardDisabled(RuntimeError):
@@ -57,7 +161,12 @@ class Config:
     node_ids: tuple[str, ...]
     mode: str
     active_interval_seconds: int
+    adaptive_interval: bool
+    active_interval_min_seconds: int
+    active_interval_max_seconds: int
     passive_poll_seconds: int
+    passive_coverage_audits: int
+    passive_coverage_window_seconds: int
     passive_page_size: int
     passive_max_pages: int
     jitter_seconds: int
@@ -69,7 +178,15 @@ class Config:
     quarantine_seconds: int
     no_account_backoff_seconds: int
     min_healthy_nodes: int
+    active_concurrency: int
+    active_cycle_budget_seconds: int
+    lease_ttl_seconds: int
+    drain_grace_seconds: int
+    daily_probe_requests: int
+    daily_probe_output_tokens: int
+    probe_reuse_seconds: int
     max_output_tokens: int
+    early_exit_probe: bool
     fail_closed: bool
     min_generation_ms: int
     rotation_url: str
@@ -78,9 +195,12 @@ class Config:
     rotatable_node_ids: tuple[str, ...]
     prompt: str
     expected: str
+    api_socket: str
     state_file: Path
     lock_file: Path
     runtime_config_file: Path
+    shard_index: int = 0
+    shard_count: int = 1
 
     @classmethod
     def from_bootstrap(cls, path: Path = BOOTSTRAP_FILE) -> "Config":
@@ -124,7 +244,18 @@ class Config:
             node_ids=node_ids,
             mode=str(values.get("mode") or "").strip().lower(),
             active_interval_seconds=int(values.get("active_interval_seconds") or 0),
+            adaptive_interval=bool(values.get("adaptive_interval")),
+            active_interval_min_seconds=int(
+                values.get("active_interval_min_seconds") or 600
+            ),
+            active_interval_max_seconds=int(
+                values.get("active_interval_max_seconds") or 14400
+            ),
             passive_poll_seconds=int(values.get("passive_poll_seconds") or 0),
+            passive_coverage_audits=int(values.get("passive_coverage_audits") or 0),
+            passive_coverage_window_seconds=int(
+                values.get("passive_coverage_window_seconds") or 1800
+            ),
             passive_page_size=200,
             passive_max_pages=10,
             jitter_seconds=30,
@@ -138,7 +269,17 @@ class Config:
                 values.get("no_account_backoff_seconds") or 0
             ),
             min_healthy_nodes=int(values.get("min_healthy_nodes") or 0),
+            active_concurrency=int(values.get("active_concurrency") or 1),
+            active_cycle_budget_seconds=int(
+                values.get("active_cycle_budget_seconds") or 0
+            ),
+            lease_ttl_seconds=int(values.get("lease_ttl_seconds") or 0),
+            drain_grace_seconds=int(values.get("drain_grace_seconds") or 0),
+            daily_probe_requests=int(values.get("daily_probe_requests") or 0),
+            daily_probe_output_tokens=int(values.get("daily_probe_output_tokens") or 0),
+            probe_reuse_seconds=int(values.get("probe_reuse_seconds") or 0),
             max_output_tokens=int(values.get("max_output_tokens") or 0),
+            early_exit_probe=bool(values.get("early_exit_probe")),
             fail_closed=bool(values.get("fail_closed")),
             min_generation_ms=int(values.get("min_generation_ms") or 0),
             rotation_url=str(values.get("rotation_url") or "").strip(),
@@ -147,6 +288,7 @@ class Config:
             rotatable_node_ids=rotatable_node_ids,
             prompt=str(values.get("prompt") or "").strip(),
             expected=str(values.get("expected") or "").strip(),
+            api_socket=str(values.get("api_socket") or "").strip(),
             state_file=Path("/var/lib/grok2api-quality-guard/state.json"),
             lock_file=Path("/var/lib/grok2api-quality-guard/guard.lock"),
             runtime_config_file=Path(
@@ -162,6 +304,8 @@ class Config:
             raise ValueError("GROK2API_BASE_URL must be an absolute HTTP(S) URL")
         if not self.internal_token:
             raise ValueError("quality guard bootstrap internal token is missing")
+        if self.api_socket and not os.path.isabs(self.api_socket):
+            raise ValueError("quality guard bootstrap api_socket must be absolute")
         if not self.model or not self.prompt or not self.expected:
             raise ValueError("model, prompt, and expected marker must not be empty")
         if self.mode not in {"active", "passive", "hybrid"}:
@@ -172,10 +316,27 @@ class Config:
             )
         if self.active_interval_seconds > 86400:
             raise ValueError("qualityGuard.activeInterval must not exceed 24 hours")
+        if (
+            self.active_interval_min_seconds < 60
+            or self.active_interval_max_seconds < self.active_interval_min_seconds
+            or self.active_interval_max_seconds > 86400
+        ):
+            raise ValueError(
+                "qualityGuard.activeIntervalMin and activeIntervalMax must be ordered "
+                "and between 1 minute and 24 hours"
+            )
         if self.passive_poll_seconds > 300:
             raise ValueError(
                 "qualityGuard.passivePollInterval must not exceed 5 minutes"
             )
+        if not 0 <= self.passive_coverage_audits <= 1000:
+            raise ValueError(
+                "qualityGuard.passiveCoverageAudits must be between 0 and 1000"
+            )
+        if not 60 <= self.passive_coverage_window_seconds <= 86400:
+            raise ValueError(
+                "qualityGuard.passiveCoverageWindow must be between 1 minute and 24 hours"
+            )
         if self.soft_tps > 10000 or self.hard_tps > 10000:
             raise ValueError("quality guard Token/s thresholds must not exceed 10000")
         if self.consecutive_soft > 20 or self.consecutive_errors > 20:
@@ -192,6 +353,29 @@ class Config:
             raise ValueError(
                 "qualityGuard.minimumHealthyNodes must fit the configured node count"
             )
+        if self.active_concurrency < 1 or self.active_concurrency > 64:
+            raise ValueError("qualityGuard.activeConcurrency must be between 1 and 64")
+        if not 0 <= self.active_cycle_budget_seconds <= 3600:
+            raise ValueError(
+                "qualityGuard.activeCycleBudget must be between 0 and 1 hour"
+            )
+        if self.lease_ttl_seconds and not 5 <= self.lease_ttl_seconds <= 300:
+            raise ValueError(
+                "qualityGuard.leaseTTL must be 0 or between 5 seconds and 5 minutes"
+            )
+        if not 0 <= self.drain_grace_seconds <= MAX_DRAIN_GRACE_SECONDS:
+            raise ValueError("qualityGuard.drainGrace must be between 0 and 20 seconds")
+        if not 0 <= self.daily_probe_requests <= 1_000_000 or not (
+            0 <= self.daily_probe_output_tokens <= 1_000_000_000
+        ):
+            raise ValueError(
+                "qualityGuard.dailyProbeRequests and dailyProbeOutputTokens must not "
+                "be negative or excessive"
+            )
+        if not 0 <= self.probe_reuse_seconds <= 600:
+            raise ValueError(
+                "qualityGuard.probeReuseWindow must be between 0 and 10 minutes"
+            )
         if self.min_generation_ms > self.request_timeout_seconds * 1000:
             raise ValueError(
                 "qualityGuard.minimumGenerationWindow must fit the request timeout"
@@ -214,6 +398,72 @@ class Config:
             )
         if self.passive_page_size > 2000:
             raise ValueError("internal passive page size must not exceed 2000")
+        if not 1 <= self.shard_count <= MAX_SHARDS or not (
+            0 <= self.shard_index < self.shard_count
+        ):
+            raise ValueError(f"shard count must be between 1 and {MAX_SHARDS}")
+
+    def for_shard(self, index: int, count: int) -> "Config":
+        """Derive the config of one worker in a ``count``-way sharded guard.
+
+        Each worker gets its own state and lock file and an even share of the
+        daily probe budget. The node list, floor, and thresholds stay global.
+        """
+        config = dataclasses.replace(
+            self,
+            shard_index=index,
+            shard_count=count,
+            state_file=shard_path(self.state_file, f"shard-{index}-of-{count}"),
+            lock_file=shard_path(self.lock_file, f"shard-{index}-of-{count}"),
+            daily_probe_requests=math.ceil(self.daily_probe_requests / count),
+            daily_probe_output_tokens=math.ceil(self.daily_probe_output_tokens / count),
+        )
+        config.validate()
+        return config
+
+    def owns(self, node_id: str) -> bool:
+        return self.shard_count <= 1 or shard_of(node_id, self.shard_count) == (
+            self.shard_index
+        )
+
+    @property
+    def shard_state_files(self) -> list[Path]:
+        """State files of every worker in this worker's sharded guard."""
+        label = f".shard-{self.shard_index}-of-{self.shard_count}"
+        base = self.state_file.with_name(
+            self.state_file.stem.removesuffix(label) + self.state_file.suffix
+        )
+        return [
+            shard_path(base, f"shard-{index}-of-{self.shard_count}")
+            for index in range(self.shard_count)
+        ]
+
+    @property
+    def floor_lock_file(self) -> Path:
+        """Lock shared by all shards around the minimum healthy-node check."""
+        return self.lock_file.with_name("floor.lock")
+
+    @property
+    def test_group_lock_file(self) -> Path:
+        """Lock shared by all shards around select, probe and epoch check."""
+        return self.lock_file.with_name("test-group.lock")
+
+
+def shard_of(node_id: str, count: int) -> int:
+    """Stable shard for a node ID; unlike ``hash()`` it survives restarts."""
+    digest = hashlib.sha256(str(node_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def shard_path(path: Path, label: str) -> Path:
+    return path.with_name(f"{path.stem}.{label}{path.suffix}")
+
+
+def parse_shard_spec(value: str) -> tuple[int, int]:
+    index, separator, count = value.partition("/")
+    if not separator or not index.isdigit() or not count.isdigit():
+        raise ValueError("--shard must look like INDEX/COUNT")
+    return int(index), int(count)
 
 
 def load_runtime_config(base: Config, path: Path) -> Config:
@@ -256,24 +506,84 @@ def load_runtime_config(base: Config, path: Path) -> Config:
     return config
 
 
+def file_signature(path: Path) -> tuple[int, int] | None:
+    """``(st_mtime_ns, st_size)`` of ``path``, or ``None`` when it is missing."""
+    try:
+        stat_result = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
 class RuntimeConfigReloader:
-    def __init__(self, base: Config):
+    """Rebuilds the config when runtime-config.json or bootstrap.json changes.
+
+    Bootstrap changes are only followed when ``load_bootstrap`` is given; the
+    new base config replaces the old one in place and the runtime overlay is
+    applied on top of it again. Fields in ``RESTART_BOOTSTRAP_FIELDS`` still
+    need a restart, so a bootstrap that changes them is rejected.
+    """
+
+    def __init__(
+        self,
+        base: Config,
+        load_bootstrap: Callable[[], Config] | None = None,
+        bootstrap_file: Path = BOOTSTRAP_FILE,
+    ):
         self.base = base
         self.current = base
         self.signature: tuple[int, int] | None = None
         self.missing = False
+        self.load_bootstrap = load_bootstrap
+        self.bootstrap_file = bootstrap_file
+        self.bootstrap_signature: tuple[int, int] | None = None
+        if load_bootstrap is not None:
+            with contextlib.suppress(OSError):
+                self.bootstrap_signature = file_signature(bootstrap_file)
+
+    def watched_files(self) -> list[Path]:
+        files = [self.base.runtime_config_file]
+        if self.load_bootstrap is not None:
+            files.append(self.bootstrap_file)
+        return files
+
+    def _reload_bootstrap(self) -> bool:
+        signature = file_signature(self.bootstrap_file)
+        if signature == self.bootstrap_signature:
+            return False
+        self.bootstrap_signature = signature
+        assert self.load_bootstrap is not None
+        base = self.load_bootstrap()
+        fixed = [
+            name
+            for name in RESTART_BOOTSTRAP_FIELDS
+            if getattr(base, name) != getattr(self.base, name)
+        ]
+        if fixed:
+            raise ValueError(
+                f"bootstrap change needs a restart: {', '.join(sorted(fixed))}"
+            )
+        self.base = base
+        log_event("bootstrap_reloaded")
+        return True
 
     def reload(self, force: bool = False) -> tuple[Config, bool, Exception | None]:
+        bootstrap_changed = False
         try:
-            stat_result = self.base.runtime_config_file.stat()
-            signature = (stat_result.st_mtime_ns, stat_result.st_size)
-            missing = False
-        except FileNotFoundError:
-            signature = None
-            missing = True
+            if self.load_bootstrap is not None:
+                bootstrap_changed = self._reload_bootstrap()
+            signature = file_signature(self.base.runtime_config_file)
         except OSError as exc:
             return self.current, False, exc
-        if not force and signature == self.signature and missing == self.missing:
+        except (ValueError, GuardDisabled) as exc:
+            return self.current, True, exc
+        missing = signature is None
+        if (
+            not force
+            and not bootstrap_changed
+            and signature == self.signature
+            and missing == self.missing
+        ):
             return self.current, False, None
         self.signature = signature
         self.missing = missing
@@ -290,6 +600,75 @@ class RuntimeConfigReloader:
         return candidate, changed or force, None
 
 
+class ConfigWatcher:
+    """Linux inotify watch on the directories holding the guard's config files.
+
+    Directories are watched rather than the files themselves because grok2api
+    replaces both files by renaming a temporary file over them. :meth:`open`
+    returns ``None`` where inotify is unavailable, leaving callers on stat
+    polling. After a queue overflow or the loss of a watched directory,
+    :meth:`read_changes` reports a change so callers recheck, and
+    :attr:`lost` tells them to fall back to polling.
+    """
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, fd: int, names: dict[int, set[str]]):
+        self.fd = fd
+        self.names = names
+        self.lost = False
+
+    @classmethod
+    def open(cls, paths: list[Path]) -> "ConfigWatcher | None":
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            inotify_init1 = libc.inotify_init1
+            inotify_add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError):
+            return None
+        fd = inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        directories: dict[Path, set[str]] = {}
+        for path in paths:
+            directories.setdefault(path.parent, set()).add(path.name)
+        names: dict[int, set[str]] = {}
+        for directory, files in directories.items():
+            wd = inotify_add_watch(fd, os.fsencode(directory), cls.MASK)
+            if wd < 0:
+                os.close(fd)
+                return None
+            names.setdefault(wd, set()).update(files)
+        return cls(fd, names)
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def read_changes(self) -> bool:
+        """Drain pending events; True when a watched file may have changed."""
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset + 16 <= len(data):
+                wd, mask, _cookie, length = struct.unpack_from("iIII", data, offset)
+                name = data[offset + 16 : offset + 16 + length].split(b"\0", 1)[0]
+                offset += 16 + length
+                if mask & (IN_Q_OVERFLOW | IN_IGNORED):
+                    changed = True
+                    self.lost = self.lost or bool(mask & IN_IGNORED)
+                elif os.fsdecode(name) in self.names.get(wd, ()):
+                    changed = True
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
 class ApiError(RuntimeError):
     def __init__(self, status: int, code: str, message: str):
         super().__init__(f"HTTP {status} {code}: {message}")
@@ -297,10 +676,482 @@ class ApiError(RuntimeError):
         self.code = code
 
 
+def table_items(payload: dict[str, Any]) -> list[dict[str, Any]]:
+    """Return list items from a ``format=rows`` table or a plain ``items`` list.
+
+    Backends without compact encoding ignore the request and keep ``items``.
+    """
+    columns = payload.get("columns")
+    if columns is None:
+        return list(payload.get("items") or [])
+    return [dict(zip(columns, row)) for row in payload.get("rows") or []]
+
+
+class JsonStream:
+    """Pull-based JSON reader over a byte stream.
+
+    Values are decoded one at a time with :meth:`json.JSONDecoder.raw_decode`
+    while the buffer is refilled in ``chunk_size`` reads, so a large document
+    can be walked without holding its raw bytes or its whole tree at once.
+    """
+
+    WHITESPACE = " \t\r\n"
+
+    def __init__(self, read: Callable[[int], bytes], chunk_size: int = 65536):
+        self.read = read
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.read(self.chunk_size)
+        self.eof = not chunk
+        if self.pos > len(self.buffer) // 2:
+            self.buffer = self.buffer[self.pos :]
+            self.pos = 0
+        self.buffer += self.decoder.decode(chunk, final=self.eof)
+        return True
+
+    def peek(self) -> str:
+        """Return the next significant character without consuming it."""
+        while True:
+            while (
+                self.pos < len(self.buffer) and self.buffer[self.pos] in self.WHITESPACE
+            ):
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number ending the buffer may continue in the next chunk.
+            if end < len(self.buffer) or self.eof:
+                self.pos = end
+                return value
+            self._fill()
+
+    def members(self) -> Iterator[str]:
+        """Yield the keys of the next object; the caller reads each value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            closing = self.peek()
+            self.pos += 1
+            if closing == "}":
+                return
+            if closing != ",":
+                raise ValueError(f"malformed object at offset {self.pos}")
+
+    def elements(self) -> Iterator[None]:
+        """Step through the next array; the caller reads each element."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield None
+            closing = self.peek()
+            self.pos += 1
+            if closing == "]":
+                return
+            if closing != ",":
+                raise ValueError(f"malformed array at offset {self.pos}")
+
+
+def iter_page_items(
+    read: Callable[[int], bytes], page: dict[str, Any]
+) -> Iterator[dict[str, Any]]:
+    """Yield the items of a ``{"data": {...}}`` list page as they are decoded.
+
+    The page's other fields are stored in ``page``: fields ahead of the list
+    are set before the first item, the rest once iteration finishes. Rows of a
+    ``format=rows`` table are expanded against ``columns``, which the backend
+    sends first. Closing the iterator early skips the rest of the body.
+    """
+    stream = JsonStream(read)
+    for key in stream.members():
+        if key != "data":
+            stream.value()
+            continue
+        for field in stream.members():
+            if field not in ("items", "rows"):
+                page[field] = stream.value()
+                continue
+            columns = page.get("columns")
+            if field == "rows" and columns is None:
+                raise ValueError("rows arrived before columns")
+            for _ in stream.elements():
+                item = stream.value()
+                yield dict(zip(columns, item)) if field == "rows" else item
+    # Finish the body so its keep-alive connection can be reused.
+    while read(65536):
+        pass
+
+
+def api_error(status: int, raw: bytes) -> ApiError:
+    """Build an :class:`ApiError` from an error response body."""
+    try:
+        payload = json.loads(raw.decode("utf-8", "replace"))
+    except ValueError:
+        payload = {}
+    error = payload.get("error") if isinstance(payload, dict) else None
+    if not isinstance(error, dict):
+        error = {}
+    return ApiError(
+        status,
+        str(error.get("code", "request_failed")),
+        str(error.get("message", "request failed")),
+    )
+
+
+def mihomo_status_endpoint() -> str:
+    return os.environ.get(
+        "MIHOMO_STATUS_ENDPOINT",
+        f"{INTERNAL_API_PREFIX}/egress-mihomo/status",
+    )
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """``http.client`` connection over a Unix domain socket.
+
+    ``host`` only fills the Host header; the socket path picks the server.
+    """
+
+    def __init__(self, socket_path: str, host: str):
+        super().__init__(host)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class ProbeCancellation:
+    """Aborts the requests a probe thread is blocked on.
+
+    While a cancellation is active on a thread (see :func:`probe_cancellation`)
+    the transports register an abort callback for each request they send;
+    :meth:`cancel` runs them, and callbacks attached afterwards run at once.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._aborts: list[Callable[[], Any]] = []
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            aborts, self._aborts = self._aborts, []
+        for abort in aborts:
+            with contextlib.suppress(Exception):
+                abort()
+
+    @contextlib.contextmanager
+    def attach(self, abort: Callable[[], Any]) -> Iterator[None]:
+        with self._lock:
+            pending = not self.cancelled
+            if pending:
+                self._aborts.append(abort)
+        if not pending:
+            with contextlib.suppress(Exception):
+                abort()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if abort in self._aborts:
+                    self._aborts.remove(abort)
+
+
+_probe_cancellations = threading.local()
+
+
+@contextlib.contextmanager
+def probe_cancellation(cancellation: ProbeCancellation | None) -> Iterator[None]:
+    """Make ``cancellation`` abort this thread's API requests inside the block.
+
+    Blocks nest: cancelling the enclosing cancellation cancels ``cancellation``
+    too, and ``None`` keeps the enclosing one in force.
+    """
+    previous = current_probe_cancellation()
+    if cancellation is None or cancellation is previous:
+        yield
+        return
+    with contextlib.ExitStack() as stack:
+        if previous is not None:
+            stack.enter_context(previous.attach(cancellation.cancel))
+        _probe_cancellations.current = cancellation
+        try:
+            yield
+        finally:
+            _probe_cancellations.current = previous
+
+
+def current_probe_cancellation() -> ProbeCancellation | None:
+    return getattr(_probe_cancellations, "current", None)
+
+
+def shutdown_connection(connection: http.client.HTTPConnection) -> None:
+    """Unblock a reader of ``connection`` from another thread."""
+    sock = connection.sock
+    if sock is not None:
+        sock.shutdown(socket.SHUT_RDWR)
+
+
+class ConnectionPool:
+    """Thread-safe keep-alive ``http.client`` connections, pooled per host.
+
+    At most ``max_per_host`` connections to one ``(scheme, host, port)`` are
+    in use at a time; further callers wait for one to come back. A connection
+    returns to the pool only after its response was read in full and the
+    server did not ask to close it, and idle connections older than
+    ``idle_seconds`` are closed rather than reused. A reused connection that
+    the server already closed is retried once on a fresh one when the request
+    is idempotent or was not sent.
+    """
+
+    RETRY_METHODS = frozenset({"GET", "HEAD", "DELETE"})
+
+    def __init__(
+        self,
+        ssl_context: ssl.SSLContext,
+        max_per_host: int,
+        idle_seconds: float = POOL_IDLE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ssl_context = ssl_context
+        self.max_per_host = max_per_host
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._idle: dict[
+            tuple[str, str, int], list[tuple[float, http.client.HTTPConnection]]
+        ] = {}
+        self._in_use: dict[tuple[str, str, int], int] = {}
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: bytes | None,
+        headers: dict[str, str],
+        timeout: float,
+        unix_socket: str = "",
+    ) -> tuple[int, bytes]:
+        """Send one request and return its status and complete body."""
+        with self.open(method, url, body, headers, timeout, unix_socket) as (
+            response,
+            reader,
+        ):
+            return response.status, reader.read()
+
+    @contextlib.contextmanager
+    def open(
+        self,
+        method: str,
+        url: str,
+        body: bytes | None,
+        headers: dict[str, str],
+        timeout: float,
+        unix_socket: str = "",
+    ) -> Iterator[tuple[http.client.HTTPResponse, IO[bytes]]]:
+        """Send one request and yield its response and a reader over the body.
+
+        Gzip bodies are decoded as they are read. Leaving the block before the
+        body was read to the end closes the connection instead of pooling it.
+        With ``unix_socket`` the request goes to that socket; the URL still
+        supplies the path and the Host header.
+        """
+        parts = urllib.parse.urlsplit(url)
+        secure = parts.scheme == "https"
+        if unix_socket:
+            key = ("unix", unix_socket, 0)
+            headers = {"Host": parts.netloc, **headers}
+        else:
+            key = (
+                parts.scheme,
+                parts.hostname or "",
+                parts.port or (443 if secure else 80),
+            )
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        cancellation = current_probe_cancellation()
+        deadline = time.monotonic() + timeout
+        retry = True
+        while True:
+            connection, reused = self._acquire(key, deadline)
+            sent = False
+            aborts = contextlib.ExitStack()
+            try:
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                connection.request(method, target, body=body, headers=headers)
+                sent = True
+                if cancellation is not None:
+                    aborts.enter_context(
+                        cancellation.attach(
+                            functools.partial(shutdown_connection, connection)
+                        )
+                    )
+                response = connection.getresponse()
+                break
+            except ConnectionError:
+                aborts.close()
+                self._release(key, connection, False)
+                # RemoteDisconnected is a ConnectionResetError.
+                if (
+                    not (retry and reused)
+                    or (sent and method not in self.RETRY_METHODS)
+                    or (cancellation is not None and cancellation.cancelled)
+                ):
+                    raise
+                retry = False
+            except BaseException:
+                aborts.close()
+                self._release(key, connection, False)
+                raise
+        keep = False
+        try:
+            reader: IO[bytes] = response
+            if response.getheader("Content-Encoding", "").lower() == "gzip":
+                reader = gzip.GzipFile(fileobj=response)
+            yield response, reader
+            keep = response.isclosed() and not response.will_close
+        finally:
+            aborts.close()
+            self._release(key, connection, keep)
+
+    def resize(self, max_per_host: int) -> None:
+        """Change the per-host limit; waiters are woken if it grew."""
+        with self._condition:
+            self.max_per_host = max_per_host
+            self._condition.notify_all()
+
+    def _acquire(
+        self, key: tuple[str, str, int], deadline: float
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        with self._condition:
+            while self._in_use.get(key, 0) >= self.max_per_host:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("connection pool exhausted")
+                self._condition.wait(remaining)
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+            stale = self._evict_idle()
+            idle = self._idle.get(key)
+            connection = idle.pop()[1] if idle else None
+        for expired in stale:
+            expired.close()
+        if connection is not None:
+            return connection, True
+        scheme, host, port = key
+        if scheme == "unix":
+            return UnixHTTPConnection(host, "localhost"), False
+        if scheme == "https":
+            return (
+                http.client.HTTPSConnection(host, port, context=self.ssl_context),
+                False,
+            )
+        return http.client.HTTPConnection(host, port), False
+
+    def _release(
+        self,
+        key: tuple[str, str, int],
+        connection: http.client.HTTPConnection,
+        keep: bool,
+    ) -> None:
+        with self._condition:
+            self._in_use[key] -= 1
+            if keep:
+                self._idle.setdefault(key, []).append((self.clock(), connection))
+            stale = self._evict_idle()
+            self._condition.notify()
+        if not keep:
+            connection.close()
+        for expired in stale:
+            expired.close()
+
+    def _evict_idle(self) -> list[http.client.HTTPConnection]:
+        """Unlink idle connections past ``idle_seconds``; caller closes them."""
+        cutoff = self.clock() - self.idle_seconds
+        stale: list[http.client.HTTPConnection] = []
+        for key, idle in list(self._idle.items()):
+            fresh = [entry for entry in idle if entry[0] > cutoff]
+            stale.extend(entry[1] for entry in idle if entry[0] <= cutoff)
+            if fresh:
+                self._idle[key] = fresh
+            else:
+                del self._idle[key]
+        return stale
+
+    def idle_count(self) -> int:
+        with self._condition:
+            return sum(len(idle) for idle in self._idle.values())
+
+    def close(self) -> None:
+        with self._condition:
+            idle = [entry[1] for entries in self._idle.values() for entry in entries]
+            self._idle.clear()
+        for connection in idle:
+            connection.close()
+
+
 class ApiClient:
     def __init__(self, config: Config):
-        self.config = config
         self.ssl_context = ssl.create_default_context()
+        self.pool = ConnectionPool(
+            self.ssl_context, config.active_concurrency + POOL_SPARE_CONNECTIONS
+        )
+        self.config = config
+        # Set by LeaderLease while this guard holds the leader lease.
+        self.fence_token = ""
+        # ETag and last payload per conditional GET path.
+        self._validators: dict[str, tuple[str, Any]] = {}
+        self._snapshot_unsupported = False
+
+    @property
+    def config(self) -> Config:
+        return self._config
+
+    @config.setter
+    def config(self, config: Config) -> None:
+        # A reload may raise activeConcurrency; the pool must keep up with it.
+        self._config = config
+        self.pool.resize(config.active_concurrency + POOL_SPARE_CONNECTIONS)
 
     def _request(
         self,
@@ -308,41 +1159,116 @@ class ApiClient:
         path: str,
         body: dict[str, Any] | None = None,
         timeout: int | None = None,
+        compressed: bool = False,
     ) -> Any:
         data = (
             None if body is None else json.dumps(body, separators=(",", ":")).encode()
         )
-        headers = {"Accept": "application/json"}
-        if data is not None:
-            headers["Content-Type"] = "application/json"
-        headers["Authorization"] = f"Bearer {self.config.internal_token}"
-        request = urllib.request.Request(
-            self.config.base_url + path, data=data, headers=headers, method=method
-        )
         try:
-            with urllib.request.urlopen(
-                request,
-                timeout=(
-                    self.config.request_timeout_seconds if timeout is None else timeout
-                ),
-                context=self.ssl_context,
-            ) as response:
-                payload = json.load(response)
-        except urllib.error.HTTPError as exc:
-            try:
-                payload = json.loads(exc.read().decode("utf-8", "replace"))
-            except (ValueError, OSError):
-                payload = {}
-            error = payload.get("error") or {}
-            raise ApiError(
-                exc.code,
-                str(error.get("code", "request_failed")),
-                str(error.get("message", "request failed")),
-            ) from exc
-        except (urllib.error.URLError, TimeoutError, OSError) as exc:
+            status, raw = self.pool.request(
+                method,
+                self.config.base_url + path,
+                data,
+                self._headers(data is not None, compressed),
+                self.config.request_timeout_seconds if timeout is None else timeout,
+                unix_socket=self.config.api_socket,
+            )
+        except (http.client.HTTPException, OSError) as exc:
             raise RuntimeError(f"request failed: {type(exc).__name__}") from exc
+        if status >= 400:
+            raise api_error(status, raw)
+        payload = json.loads(raw)
         return payload.get("data", payload)
 
+    def _request_conditional(self, path: str) -> Any:
+        """GET ``path`` with ``If-None-Match``; a 304 reuses the cached payload.
+
+        Callers must treat the returned payload as read-only.
+        """
+        cached = self._validators.get(path)
+        try:
+            with self._open_conditional(path, cached) as (response, reader):
+                raw = reader.read()
+        except (http.client.HTTPException, OSError) as exc:
+            raise RuntimeError(f"request failed: {type(exc).__name__}") from exc
+        if response.status == 304 and cached is not None:
+            return cached[1]
+        if response.status >= 400:
+            raise api_error(response.status, raw)
+        payload = json.loads(raw)
+        payload = payload.get("data", payload)
+        etag = response.getheader("ETag")
+        if etag:
+            self._validators[path] = (etag, payload)
+        return payload
+
+    def _request_items(
+        self, path: str, page: dict[str, Any], conditional: bool = False
+    ) -> Iterator[dict[str, Any]]:
+        """GET a list page and yield its items while the body is decoded.
+
+        See :func:`iter_page_items` for how the other page fields fill
+        ``page``. Nothing is sent until the first item is requested. A
+        ``conditional`` page keeps its items under the response ETag and
+        replays copies of them when the backend answers 304. That trades the
+        streaming bound for one cached copy of the node inventory, so only
+        pages of at most ``CONDITIONAL_CACHE_ITEMS`` items are kept.
+        """
+        cached = self._validators.get(path) if conditional else None
+        try:
+            with self._open_conditional(path, cached) as (response, reader):
+                if response.status == 304 and cached is not None:
+                    reader.read()
+                    fields, items = cached[1]
+                    page.update(fields)
+                    yield from (dict(item) for item in items)
+                    return
+                if response.status >= 400:
+                    raise api_error(response.status, reader.read())
+                etag = response.getheader("ETag") if conditional else None
+                if not etag:
+                    yield from iter_page_items(reader.read, page)
+                    return
+                kept: list[dict[str, Any]] | None = []
+                for item in iter_page_items(reader.read, page):
+                    if kept is not None:
+                        kept.append(item)
+                        if len(kept) > CONDITIONAL_CACHE_ITEMS:
+                            kept = None
+                    yield dict(item)
+                if kept is None:
+                    self._validators.pop(path, None)
+                else:
+                    self._validators[path] = (etag, (dict(page), kept))
+        except (http.client.HTTPException, OSError) as exc:
+            raise RuntimeError(f"request failed: {type(exc).__name__}") from exc
+
+    def _open_conditional(
+        self, path: str, cached: tuple[str, Any] | None
+    ) -> contextlib.AbstractContextManager[tuple[http.client.HTTPResponse, IO[bytes]]]:
+        headers = self._headers(False, True)
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+        return self.pool.open(
+            "GET",
+            self.config.base_url + path,
+            None,
+            headers,
+            self.config.request_timeout_seconds,
+            unix_socket=self.config.api_socket,
+        )
+
+    def _headers(self, has_body: bool, compressed: bool) -> dict[str, str]:
+        headers = {"Accept": "application/json"}
+        if compressed:
+            headers["Accept-Encoding"] = "gzip"
+        if has_body:
+            headers["Content-Type"] = "application/json"
+        headers["Authorization"] = f"Bearer {self.config.internal_token}"
+        if self.fence_token:
+            headers[FENCE_HEADER] = self.fence_token
+        return headers
+
     def list_nodes(self) -> list[dict[str, Any]]:
         page_size = 2000
         items: list[dict[str, Any]] = []
@@ -350,31 +1276,38 @@ class ApiClient:
         page = 1
         while True:
             query = urllib.parse.urlencode(
-                {"page": page, "pageSize": page_size, "scope": "grok_build"}
-            )
-            payload = self._request(
-                "GET", f"{INTERNAL_API_PREFIX}/egress-nodes?{query}"
+                {
+                    "page": page,
+                    "pageSize": page_size,
+                    "scope": "grok_build",
+                    "fields": ",".join(NODE_FIELDS),
+                    "format": "rows",
+                }
             )
-            batch = list(payload.get("items") or [])
-            total = max(0, int(payload.get("total") or 0))
+            payload: dict[str, Any] = {}
+            received = 0
             added = 0
-            for node in batch:
+            for node in self._request_items(
+                f"{INTERNAL_API_PREFIX}/egress-nodes?{query}", payload, conditional=True
+            ):
+                received += 1
                 node_id = str(node.get("id") or "")
                 if not node_id or node_id in seen_ids:
                     continue
                 seen_ids.add(node_id)
                 items.append(node)
                 added += 1
-            if len(items) >= total or (total == 0 and len(batch) < page_size):
+            total = max(0, int(payload.get("total") or 0))
+            if len(items) >= total or (total == 0 and received < page_size):
                 return items
-            if not batch or added == 0:
+            if not received or added == 0:
                 raise RuntimeError(
                     f"egress node pagination stopped at {len(items)} of {total}"
                 )
             page += 1
 
     def fixed_fallback_node_ids(self) -> set[str]:
-        payload = self._request("GET", f"{INTERNAL_API_PREFIX}/egress-operations")
+        payload = self._request_conditional(f"{INTERNAL_API_PREFIX}/egress-operations")
         result: set[str] = set()
         for fallback in (payload.get("fallbacks") or {}).values():
             if not isinstance(fallback, dict) or fallback.get("mode") != "fixed":
@@ -384,42 +1317,139 @@ class ApiClient:
                 result.add(node_id)
         return result
 
+    def guard_snapshot(self) -> dict[str, Any] | None:
+        """Read nodes, fixed fallbacks and mihomo epochs in one request.
+
+        Returns None when the backend predates the snapshot route; the caller
+        then falls back to the separate endpoints.
+        """
+        if self._snapshot_unsupported:
+            return None
+        query = urllib.parse.urlencode(
+            {"fields": ",".join(NODE_FIELDS), "format": "rows"}
+        )
+        page: dict[str, Any] = {}
+        try:
+            nodes = list(
+                self._request_items(
+                    f"{INTERNAL_API_PREFIX}/egress-quality-guard/snapshot?{query}",
+                    page,
+                    conditional=True,
+                )
+            )
+        except ApiError as exc:
+            if exc.status != 404:
+                raise
+            self._snapshot_unsupported = True
+            return None
+        mihomo = page.get("mihomo")
+        return {
+            "nodes": nodes,
+            "fixed_fallback_ids": {
+                str(node_id) for node_id in page.get("fixedFallbackNodeIds") or []
+            },
+            "mihomo": mihomo if isinstance(mihomo, dict) else None,
+        }
+
     def get_mihomo_status(self) -> dict[str, Any] | None:
         """Return the mihomo egress status (epoch) or None when unavailable."""
-        endpoint = os.environ.get(
-            "MIHOMO_STATUS_ENDPOINT",
-            f"{INTERNAL_API_PREFIX}/egress-mihomo/status",
-        )
         try:
-            status = self._request("GET", endpoint, timeout=5)
+            status = self._request("GET", mihomo_status_endpoint(), timeout=5)
         except (ApiError, RuntimeError, ValueError):
             return None
         if not isinstance(status, dict) or not bool(status.get("enabled")):
             return None
         return status
 
-    def quality_test(self, node_id: str) -> dict[str, Any]:
+    def wait_mihomo_epochs(
+        self, known: dict[str, Any] | None, wait_seconds: int
+    ) -> dict[str, Any]:
+        """Return the mihomo epochs once they differ from ``known``.
+
+        The backend holds the request for up to ``wait_seconds`` while the
+        epochs still match and then answers with the unchanged values.
+        """
+        known = known or {}
+        query = urllib.parse.urlencode(
+            {
+                "enabled": "true" if known.get("enabled") else "false",
+                "epoch": int(known.get("epoch") or 0),
+                "testEnabled": "true" if known.get("testEnabled") else "false",
+                "testEpoch": int(known.get("testEpoch") or 0),
+                "waitSeconds": wait_seconds,
+            }
+        )
+        return self._request(
+            "GET",
+            f"{INTERNAL_API_PREFIX}/egress-mihomo/epochs?{query}",
+            timeout=wait_seconds + 5,
+        )
+
+    def quality_test(self, node_id: str, early_exit: bool = False) -> dict[str, Any]:
         return self._request(
-            "POST", f"{INTERNAL_API_PREFIX}/egress-nodes/{node_id}/quality-test"
+            "POST",
+            f"{INTERNAL_API_PREFIX}/egress-nodes/{node_id}/quality-test",
+            {"earlyExit": True} if early_exit else None,
         )
 
+    def quality_test_many(
+        self, node_ids: list[str], concurrency: int, early_exit: bool = False
+    ) -> Iterator[tuple[str, dict[str, Any] | ApiError]]:
+        """Probe nodes on the backend; yield ``(node ID, result)`` as each ends.
+
+        The backend streams one NDJSON line per node. A failed probe yields
+        the :class:`ApiError` the single-node route would have raised. Nothing
+        is sent until the first result is requested, and closing the iterator
+        early aborts the probes still running on the backend.
+        """
+        body: dict[str, Any] = {"ids": list(node_ids), "concurrency": concurrency}
+        if early_exit:
+            body["earlyExit"] = True
+        try:
+            # Uncompressed, so that each line can be decoded as it arrives.
+            with self.pool.open(
+                "POST",
+                f"{self.config.base_url}{INTERNAL_API_PREFIX}"
+                "/egress-nodes/batch/quality-test",
+                json.dumps(body, separators=(",", ":")).encode(),
+                self._headers(True, False),
+                self.config.request_timeout_seconds,
+                unix_socket=self.config.api_socket,
+            ) as (response, reader):
+                if response.status >= 400:
+                    raise api_error(response.status, reader.read())
+                for line in reader:
+                    if line.strip():
+                        yield batch_probe_result(json.loads(line))
+        except (http.client.HTTPException, OSError) as exc:
+            raise RuntimeError(f"request failed: {type(exc).__name__}") from exc
+
     def connectivity_test(self, node_id: str) -> dict[str, Any]:
         return self._request(
             "POST", f"{INTERNAL_API_PREFIX}/egress-nodes/{node_id}/test"
         )
 
     def list_audits(self, cursor: str = "") -> dict[str, Any]:
+        """Return one audit page whose ``items`` decode lazily.
+
+        ``hasMore`` and ``nextCursor`` may only be filled once ``items`` is
+        exhausted; close ``items`` to abandon the rest of the page.
+        """
         query = {
             "pagination": "cursor",
             "pageSize": self.config.passive_page_size,
             "period": "24h",
+            "fields": ",".join(AUDIT_FIELDS),
+            "format": "rows",
         }
         if cursor:
             query["cursor"] = cursor
-        return self._request(
-            "GET",
+        page: dict[str, Any] = {}
+        page["items"] = self._request_items(
             f"{INTERNAL_API_PREFIX}/request-audits?{urllib.parse.urlencode(query)}",
+            page,
         )
+        return page
 
     def set_enabled(self, node_id: str, enabled: bool) -> int:
         result = self._request(
@@ -429,14 +1459,55 @@ class ApiClient:
         )
         return int(result.get("updated") or 0)
 
-    def select_test_member(self, node_name: str) -> bool:
-        """将测试组当前成员切换到指定节点；成功返回 True，失败记录并返回 False。
+    def set_enabled_many(self, node_ids: list[str], enabled: bool) -> set[str]:
+        """Switch several nodes in one PATCH; return the IDs that changed.
+
+        Backends predating ``updatedIds`` only report a count. When it falls
+        short of the batch, a fresh listing tells which nodes now hold the
+        requested state.
+        """
+        result = self._request(
+            "PATCH",
+            f"{INTERNAL_API_PREFIX}/egress-nodes/batch",
+            {"ids": list(node_ids), "enabled": enabled},
+        )
+        if "updatedIds" in result:
+            return {str(value) for value in result.get("updatedIds") or []}
+        updated = int(result.get("updated") or 0)
+        if updated >= len(node_ids):
+            return set(node_ids)
+        if updated == 0:
+            return set()
+        wanted = set(node_ids)
+        return {
+            str(node.get("id"))
+            for node in self.list_nodes()
+            if str(node.get("id")) in wanted and bool(node.get("enabled")) == enabled
+        }
+
+    def acquire_lease(self, holder: str, ttl_seconds: int) -> dict[str, Any]:
+        return self._request(
+            "POST",
+            f"{INTERNAL_API_PREFIX}/egress-quality-guard/lease",
+            {"holder": holder, "ttlSeconds": ttl_seconds},
+        )
+
+    def release_lease(self, holder: str, token: str) -> None:
+        self._request(
+            "DELETE",
+            f"{INTERNAL_API_PREFIX}/egress-quality-guard/lease",
+            {"holder": holder, "token": token},
+        )
+
+    def select_test_member(self, node_name: str) -> dict[str, Any] | None:
+        """将测试组当前成员切换到指定节点；成功返回响应，失败记录并返回 None。
 
         nodeName 即 Mihomo 测试组成员名（同步器建行时 DB 节点 Name=成员名），
         body 的 nodeId 字段即节点名，与 Go 侧 mihomoTestSelect 契约一致。
+        新后端的响应带切换后的 ``epochs``。
         """
         try:
-            self._request(
+            payload = self._request(
                 "POST",
                 f"{INTERNAL_API_PREFIX}/egress-mihomo/select",
                 {"nodeId": node_name},
@@ -447,8 +1518,8 @@ class ApiClient:
                 node_name=node_name,
                 error_type=type(exc).__name__,
             )
-            return False
-        return True
+            return None
+        return payload if isinstance(payload, dict) else {}
 
     def ban_test_member(self, node_name: str) -> bool:
         """封禁测试组内一个成员；成功返回 True，失败记录并返回 False。
@@ -493,35 +1564,468 @@ class ApiClient:
         data = json.dumps(
             {"nodeId": node_id, "oldExitIp": old_exit_ip}, separators=(",", ":")
         ).encode()
-        headers = {"Accept": "application/json", "Content-Type": "application/json"}
-        if self.config.rotation_token:
-            headers["Authorization"] = f"Bearer {self.config.rotation_token}"
-        request = urllib.request.Request(
-            self.config.rotation_url, data=data, headers=headers, method="POST"
+        try:
+            status, raw = self.pool.request(
+                "POST",
+                self.config.rotation_url,
+                data,
+                rotation_headers(self.config, self.fence_token),
+                self.config.rotation_timeout_seconds,
+            )
+        except (http.client.HTTPException, OSError) as exc:
+            raise RuntimeError(f"rotation failed: {type(exc).__name__}") from exc
+        return rotation_payload(status, raw)
+
+
+def batch_probe_result(value: dict[str, Any]) -> tuple[str, dict[str, Any] | ApiError]:
+    """Decode one NDJSON line of the batch quality-test stream."""
+    node_id = str(value.get("nodeId") or "")
+    error = value.get("error")
+    if isinstance(error, dict):
+        return node_id, ApiError(
+            int(value.get("status") or 502),
+            str(error.get("code", "request_failed")),
+            str(error.get("message", "request failed")),
         )
+    return node_id, value.get("data") or {}
+
+
+def rotation_headers(config: Config, fence_token: str) -> dict[str, str]:
+    headers = {"Accept": "application/json", "Content-Type": "application/json"}
+    if config.rotation_token:
+        headers["Authorization"] = f"Bearer {config.rotation_token}"
+    if fence_token:
+        headers[FENCE_HEADER] = fence_token
+    return headers
+
+
+def rotation_payload(status: int, raw: bytes) -> dict[str, Any]:
+    """Check a rotation response; the exit IP must have changed."""
+    if status >= 400:
         try:
-            with urllib.request.urlopen(
-                request,
-                timeout=self.config.rotation_timeout_seconds,
-                context=self.ssl_context,
-            ) as response:
-                payload = json.load(response)
-        except urllib.error.HTTPError as exc:
-            try:
-                payload = json.loads(exc.read().decode("utf-8", "replace"))
-            except (ValueError, OSError):
-                payload = {}
-            raise RuntimeError(
-                f"rotation failed: HTTP {exc.code} {payload.get('error', 'request failed')}"
-            ) from exc
-        except (urllib.error.URLError, TimeoutError, OSError, ValueError) as exc:
+            payload = json.loads(raw.decode("utf-8", "replace"))
+        except ValueError:
+            payload = {}
+        if not isinstance(payload, dict):
+            payload = {}
+        raise RuntimeError(
+            f"rotation failed: HTTP {status} {payload.get('error', 'request failed')}"
+        )
+    try:
+        payload = json.loads(raw)
+    except ValueError as exc:
+        raise RuntimeError(f"rotation failed: {type(exc).__name__}") from exc
+    if not isinstance(payload, dict) or not bool(payload.get("changed")):
+        raise RuntimeError("rotation did not confirm an exit IP change")
+    return payload
+
+
+async def read_http_head(
+    reader: asyncio.StreamReader,
+) -> tuple[int, dict[str, str]]:
+    """Read an HTTP/1.1 status line and headers; header names are lowercased."""
+    status_line = (await reader.readline()).decode("latin-1")
+    parts = status_line.split(" ", 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+        raise ValueError("malformed HTTP status line")
+    headers: dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return int(parts[1]), headers
+
+
+async def iter_http_body(
+    reader: asyncio.StreamReader,
+    headers: dict[str, str],
+    timeout: float | None = None,
+) -> AsyncIterator[bytes]:
+    """Yield the raw body after :func:`read_http_head` as it arrives.
+
+    Each read waits at most ``timeout`` seconds, like a blocking socket
+    timeout; content encodings are left to the caller.
+    """
+
+    async def read(pending: Awaitable[bytes]) -> bytes:
+        return await asyncio.wait_for(pending, timeout)
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        while True:
+            size_line = (await read(reader.readline())).split(b";", 1)[0].strip()
+            size = int(size_line or b"0", 16)
+            if size == 0:
+                while (await read(reader.readline())) not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            yield await read(reader.readexactly(size))
+            await read(reader.readexactly(2))
+    elif "content-length" in headers:
+        remaining = int(headers["content-length"])
+        while remaining > 0:
+            chunk = await read(reader.read(min(remaining, 65536)))
+            if not chunk:
+                raise asyncio.IncompleteReadError(b"", remaining)
+            remaining -= len(chunk)
+            yield chunk
+    else:
+        while chunk := await read(reader.read(65536)):
+            yield chunk
+
+
+async def read_http_response(
+    reader: asyncio.StreamReader,
+) -> tuple[int, dict[str, str], bytes]:
+    """Read one HTTP/1.1 response (status, headers, decoded body) from a stream."""
+    status, headers = await read_http_head(reader)
+    if status in (204, 304):
+        return status, headers, b""
+    body = b"".join([chunk async for chunk in iter_http_body(reader, headers)])
+    if headers.get("content-encoding", "").lower() == "gzip":
+        body = gzip.decompress(body)
+    return status, headers, body
+
+
+class AsyncApiClient:
+    """Non-blocking client for the internal API over asyncio streams.
+
+    Each request uses its own HTTP/1.1 connection, so any number of probes
+    can be in flight on one event loop without a thread per request. Errors
+    map onto the same :class:`ApiError`/``RuntimeError`` split as
+    :class:`ApiClient`.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.ssl_context = ssl.create_default_context()
+        self.fence_token = ""
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        body: dict[str, Any] | None = None,
+        timeout: int | None = None,
+        compressed: bool = False,
+    ) -> Any:
+        status, _headers, raw = await self._send(
+            method, path, body, timeout, compressed
+        )
+        if status >= 400:
+            raise api_error(status, raw)
+        payload = json.loads(raw)
+        return payload.get("data", payload)
+
+    async def request_conditional(
+        self, path: str, etag: str = ""
+    ) -> tuple[int, str, Any]:
+        """GET ``path``, revalidating ``etag`` with ``If-None-Match`` if given.
+
+        Returns the status, the response ETag and the payload, which is None
+        when the backend answers 304.
+        """
+        status, headers, raw = await self._send(
+            "GET", path, compressed=True, extra={"If-None-Match": etag} if etag else {}
+        )
+        if status >= 400:
+            raise api_error(status, raw)
+        if status == 304 and etag:
+            return status, headers.get("etag", etag), None
+        payload = json.loads(raw)
+        return status, headers.get("etag", ""), payload.get("data", payload)
+
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        body: dict[str, Any] | None = None,
+        timeout: int | None = None,
+        compressed: bool = False,
+        extra: dict[str, str] | None = None,
+    ) -> tuple[int, dict[str, str], bytes]:
+        data = (
+            None if body is None else json.dumps(body, separators=(",", ":")).encode()
+        )
+        headers = self._headers(data is not None, compressed)
+        headers.update(extra or {})
+        message = self._message(method, self.config.base_url + path, data, headers)
+        try:
+            return await asyncio.wait_for(
+                self._exchange(message),
+                self.config.request_timeout_seconds if timeout is None else timeout,
+            )
+        except (asyncio.TimeoutError, OSError, EOFError) as exc:
+            raise RuntimeError(f"request failed: {type(exc).__name__}") from exc
+
+    def _headers(self, has_body: bool, compressed: bool) -> dict[str, str]:
+        headers = {
+            "Accept": "application/json",
+            "Authorization": f"Bearer {self.config.internal_token}",
+        }
+        if self.fence_token:
+            headers[FENCE_HEADER] = self.fence_token
+        if compressed:
+            headers["Accept-Encoding"] = "gzip"
+        if has_body:
+            headers["Content-Type"] = "application/json"
+        return headers
+
+    def _message(
+        self, method: str, url: str, data: bytes | None, headers: dict[str, str]
+    ) -> tuple[urllib.parse.SplitResult, bytes]:
+        parts = urllib.parse.urlsplit(url)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        lines.append("Connection: close")
+        if data is not None or method != "GET":
+            lines.append(f"Content-Length: {len(data or b'')}")
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        return parts, head + (data or b"")
+
+    @contextlib.asynccontextmanager
+    async def _connect(
+        self, url: urllib.parse.SplitResult, unix_socket: str
+    ) -> AsyncIterator[tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+        secure = url.scheme == "https"
+        if unix_socket:
+            reader, writer = await asyncio.open_unix_connection(unix_socket)
+        else:
+            reader, writer = await asyncio.open_connection(
+                url.hostname,
+                url.port or (443 if secure else 80),
+                ssl=self.ssl_context if secure else None,
+            )
+        try:
+            yield reader, writer
+        finally:
+            writer.close()
+            with contextlib.suppress(OSError):
+                await writer.wait_closed()
+
+    async def _exchange(
+        self,
+        message: tuple[urllib.parse.SplitResult, bytes],
+        unix_socket: str | None = None,
+    ) -> tuple[int, dict[str, str], bytes]:
+        """Send one request and read the whole response.
+
+        ``unix_socket`` defaults to the internal API socket; pass ``""`` for
+        a URL outside the internal API.
+        """
+        url, data = message
+        if unix_socket is None:
+            unix_socket = self.config.api_socket
+        async with self._connect(url, unix_socket) as (reader, writer):
+            writer.write(data)
+            await writer.drain()
+            return await read_http_response(reader)
+
+    async def get_mihomo_status(self) -> dict[str, Any] | None:
+        try:
+            status = await self.request("GET", mihomo_status_endpoint(), timeout=5)
+        except (ApiError, RuntimeError, ValueError):
+            return None
+        if not isinstance(status, dict) or not bool(status.get("enabled")):
+            return None
+        return status
+
+    async def quality_test(
+        self, node_id: str, early_exit: bool = False
+    ) -> dict[str, Any]:
+        return await self.request(
+            "POST",
+            f"{INTERNAL_API_PREFIX}/egress-nodes/{node_id}/quality-test",
+            {"earlyExit": True} if early_exit else None,
+        )
+
+    async def quality_test_many(
+        self, node_ids: list[str], concurrency: int, early_exit: bool = False
+    ) -> AsyncIterator[tuple[str, dict[str, Any] | ApiError]]:
+        """Stream batch probe results like :meth:`ApiClient.quality_test_many`.
+
+        Each read waits at most ``request_timeout_seconds``; closing the
+        iterator closes the connection, which aborts the backend's probes.
+        """
+        body: dict[str, Any] = {"ids": list(node_ids), "concurrency": concurrency}
+        if early_exit:
+            body["earlyExit"] = True
+        data = json.dumps(body, separators=(",", ":")).encode()
+        # Uncompressed, so that each line can be decoded as it arrives.
+        url, message = self._message(
+            "POST",
+            f"{self.config.base_url}{INTERNAL_API_PREFIX}"
+            "/egress-nodes/batch/quality-test",
+            data,
+            self._headers(True, False),
+        )
+        timeout = self.config.request_timeout_seconds
+        try:
+            async with self._connect(url, self.config.api_socket) as (reader, writer):
+                writer.write(message)
+                await asyncio.wait_for(writer.drain(), timeout)
+                status, headers = await asyncio.wait_for(
+                    read_http_head(reader), timeout
+                )
+                chunks = iter_http_body(reader, headers, timeout)
+                if status >= 400:
+                    raise api_error(status, b"".join([c async for c in chunks]))
+                buffered = b""
+                async for chunk in chunks:
+                    lines = (buffered + chunk).split(b"\n")
+                    buffered = lines.pop()
+                    for line in lines:
+                        if line.strip():
+                            yield batch_probe_result(json.loads(line))
+                if buffered.strip():
+                    yield batch_probe_result(json.loads(buffered))
+        except (asyncio.TimeoutError, OSError, EOFError) as exc:
+            raise RuntimeError(f"request failed: {type(exc).__name__}") from exc
+
+    async def rotate_node(self, node_id: str, old_exit_ip: str = "") -> dict[str, Any]:
+        """Ask ``rotation_url`` for a new exit IP like :meth:`ApiClient.rotate_node`."""
+        if not self.config.rotation_url:
+            raise RuntimeError("rotation endpoint is not configured")
+        data = json.dumps(
+            {"nodeId": node_id, "oldExitIp": old_exit_ip}, separators=(",", ":")
+        ).encode()
+        message = self._message(
+            "POST",
+            self.config.rotation_url,
+            data,
+            rotation_headers(self.config, self.fence_token),
+        )
+        try:
+            status, _headers, raw = await asyncio.wait_for(
+                self._exchange(message, unix_socket=""),
+                self.config.rotation_timeout_seconds,
+            )
+        except (asyncio.TimeoutError, OSError, EOFError) as exc:
             raise RuntimeError(f"rotation failed: {type(exc).__name__}") from exc
-        if not isinstance(payload, dict) or not bool(payload.get("changed")):
-            raise RuntimeError("rotation did not confirm an exit IP change")
+        return rotation_payload(status, raw)
+
+
+class LoopApiClient(ApiClient):
+    """Blocking :class:`ApiClient` whose requests run on an asyncio loop.
+
+    Guard code that still runs on threads (the state thread and the
+    recovery/confirmation workers) shares the loop's non-blocking transport,
+    batch probe streams and rotations included; the thread's probe
+    cancellation cancels the request on the loop. Must never be called from
+    the loop thread itself.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        transport: AsyncApiClient,
+        loop: asyncio.AbstractEventLoop,
+    ):
+        super().__init__(config)
+        self.transport = transport
+        self.loop = loop
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        body: dict[str, Any] | None = None,
+        timeout: int | None = None,
+        compressed: bool = False,
+    ) -> Any:
+        return self._run(
+            self.transport.request(method, path, body, timeout, compressed)
+        )
+
+    def _run(self, coroutine: Awaitable[Any]) -> Any:
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        cancellation = current_probe_cancellation()
+        if cancellation is None:
+            return future.result()
+        with cancellation.attach(future.cancel):
+            return future.result()
+
+    def quality_test_many(
+        self, node_ids: list[str], concurrency: int, early_exit: bool = False
+    ) -> Iterator[tuple[str, dict[str, Any] | ApiError]]:
+        # A task on the loop reads the stream and hands results over; closing
+        # this iterator or cancelling the probe cancels the task.
+        results: queue.Queue[tuple[str, dict[str, Any] | ApiError] | None] = (
+            queue.Queue()
+        )
+
+        async def pump() -> None:
+            async for result in self.transport.quality_test_many(
+                node_ids, concurrency, early_exit
+            ):
+                results.put(result)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        future.add_done_callback(lambda _future: results.put(None))
+        cancellation = current_probe_cancellation()
+        try:
+            with contextlib.ExitStack() as stack:
+                if cancellation is not None:
+                    stack.enter_context(cancellation.attach(future.cancel))
+                while (result := results.get()) is not None:
+                    yield result
+            future.result()
+        finally:
+            future.cancel()
+
+    def rotate_node(self, node_id: str, old_exit_ip: str = "") -> dict[str, Any]:
+        return self._run(self.transport.rotate_node(node_id, old_exit_ip))
+
+    def _request_conditional(self, path: str) -> Any:
+        cached = self._validators.get(path)
+        status, etag, payload = self._run(
+            self.transport.request_conditional(path, cached[0] if cached else "")
+        )
+        if status == 304 and cached is not None:
+            return cached[1]
+        if etag:
+            self._validators[path] = (etag, payload)
         return payload
 
+    def _request_items(
+        self, path: str, page: dict[str, Any], conditional: bool = False
+    ) -> Iterator[dict[str, Any]]:
+        # The asyncio transport reads whole bodies; decode the page at once.
+        # Validators are cached as in :meth:`ApiClient._request_items`.
+        cached = self._validators.get(path) if conditional else None
+        status, etag, payload = self._run(
+            self.transport.request_conditional(path, cached[0] if cached else "")
+        )
+        if status == 304 and cached is not None:
+            fields, items = cached[1]
+            page.update(fields)
+            yield from (dict(item) for item in items)
+            return
+        items = table_items(payload)
+        page.update(
+            (key, value)
+            for key, value in payload.items()
+            if key not in ("items", "rows")
+        )
+        if conditional and etag:
+            if len(items) > CONDITIONAL_CACHE_ITEMS:
+                self._validators.pop(path, None)
+            else:
+                self._validators[path] = (etag, (dict(page), items))
+                items = [dict(item) for item in items]
+        yield from items
+
 
 def classify_result(result: dict[str, Any], config: Config) -> tuple[str, str]:
+    """Classify one active probe result.
+
+    An early-exit result (``earlyExit``) was cut by the backend once the
+    leading marker, ``MIN_SPEED_OUTPUT_TOKENS`` and ``min_generation_ms`` were
+    all observed, so its estimated token count and speed settle the same
+    verdict as a full generation would.
+    """
     if not bool(result.get("expectedMatched")):
         return "soft", "expected_marker_missing"
     output_tokens = int(result.get("outputTokens") or result.get("visibleTokens") or 0)
@@ -535,7 +2039,7 @@ def classify_result(result: dict[str, Any], config: Config) -> tuple[str, str]:
         generation_ms = max(
             0, int(result.get("durationMs") or 0) - int(result.get("firstTokenMs") or 0)
         )
-    if output_tokens < 32:
+    if output_tokens < MIN_SPEED_OUTPUT_TOKENS:
         return "soft", "insufficient_output_tokens"
     if config.fail_closed and generation_ms < config.min_generation_ms:
         return "soft", "insufficient_generation_window"
@@ -559,7 +2063,7 @@ def classify_audit(
         return "ignored", "missing_first_token", 0.0, 0
     generation_ms = int(value.get("durationMs") or 0) - int(first_token_ms)
     output_tokens = max(0, int(value.get("outputTokens") or 0))
-    if generation_ms <= 0 or output_tokens < 32:
+    if generation_ms <= 0 or output_tokens < MIN_SPEED_OUTPUT_TOKENS:
         return "ignored", "insufficient_output_tokens", 0.0, output_tokens
     speed = float(output_tokens) * 1000 / float(generation_ms)
     if (
@@ -575,6 +2079,20 @@ def classify_audit(
     return "healthy", "within_threshold", speed, output_tokens
 
 
+def audit_time(value: dict[str, Any], default: float) -> float:
+    """Epoch seconds at which an audited request was recorded.
+
+    Falls back to ``default`` when the feed carries no parsable ``createdAt``.
+    """
+    try:
+        created = datetime.datetime.fromisoformat(str(value.get("createdAt") or ""))
+    except ValueError:
+        return default
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=datetime.timezone.utc)
+    return created.timestamp()
+
+
 def default_node_state() -> dict[str, Any]:
     return {
         "active_soft_strikes": 0,
@@ -584,6 +2102,11 @@ def default_node_state() -> dict[str, Any]:
         "disabled_by_guard": False,
         "last_reason": "",
         "last_probe_at": 0.0,
+        "next_probe_at": 0.0,
+        "healthy_streak": 0,
+        "last_suspect_at": 0.0,
+        "last_restored_at": 0.0,
+        "passive_healthy_at": [],
         "last_observed_at": 0.0,
         "last_source": "",
         "last_classification": "",
@@ -617,7 +2140,12 @@ def default_statistics() -> dict[str, Any]:
             "errors": 0,
             "output_tokens": 0,
         },
-        "actions": {"quarantined": 0, "restored": 0, "suppressed": 0},
+        "actions": {
+            "quarantined": 0,
+            "restored": 0,
+            "suppressed": 0,
+            "passive_covered": 0,
+        },
     }
 
 
@@ -645,6 +2173,36 @@ def ensure_statistics(state: dict[str, Any]) -> dict[str, Any]:
     return statistics
 
 
+def budget_day(now: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(now))
+
+
+def default_budget(day: str) -> dict[str, Any]:
+    return {
+        "day": day,
+        "request_limit": 0,
+        "output_token_limit": 0,
+        "requests": 0,
+        "output_tokens": 0,
+        "denied": 0,
+        "nodes": {},
+    }
+
+
+def ensure_budget(state: dict[str, Any], now: float) -> dict[str, Any]:
+    """Return today's probe budget accounting, starting a new UTC day if needed.
+
+    A timestamp from before the recorded day (a probe that started before
+    midnight) charges the current day rather than reopening the old one.
+    """
+    day = budget_day(now)
+    budget = state.get("budget")
+    if not isinstance(budget, dict) or str(budget.get("day", "")) < day:
+        budget = default_budget(day)
+        state["budget"] = budget
+    return budget
+
+
 def load_state(path: Path) -> dict[str, Any]:
     try:
         with path.open("r", encoding="utf-8") as handle:
@@ -694,6 +2252,152 @@ def save_state(path: Path, state: dict[str, Any]) -> None:
         raise
 
 
+@contextlib.contextmanager
+def process_lock(path: Path):
+    """Hold a blocking exclusive ``flock`` shared with other processes."""
+    path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+    with path.open("a+", encoding="utf-8") as handle:
+        os.chmod(path, 0o600)
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def guard_metadata(config: Config, node_ids: list[str]) -> dict[str, Any]:
+    """The ``guard`` section of the status file read by grok2api."""
+    return {
+        "mode": config.mode,
+        "model": config.model,
+        "node_ids": list(config.node_ids) if config.node_ids else node_ids,
+        "active_interval_seconds": config.active_interval_seconds,
+        "adaptive_interval": config.adaptive_interval,
+        "active_interval_min_seconds": config.active_interval_min_seconds,
+        "active_interval_max_seconds": config.active_interval_max_seconds,
+        "passive_poll_seconds": config.passive_poll_seconds,
+        "passive_coverage_audits": config.passive_coverage_audits,
+        "passive_coverage_window_seconds": config.passive_coverage_window_seconds,
+        "soft_tps": config.soft_tps,
+        "hard_tps": config.hard_tps,
+        "consecutive_soft": config.consecutive_soft,
+        "consecutive_errors": config.consecutive_errors,
+        "quarantine_seconds": config.quarantine_seconds,
+        "no_account_backoff_seconds": config.no_account_backoff_seconds,
+        "min_healthy_nodes": config.min_healthy_nodes,
+        "active_concurrency": config.active_concurrency,
+        "active_cycle_budget_seconds": config.active_cycle_budget_seconds,
+        "lease_ttl_seconds": config.lease_ttl_seconds,
+        "drain_grace_seconds": config.drain_grace_seconds,
+        "daily_probe_requests": config.daily_probe_requests,
+        "daily_probe_output_tokens": config.daily_probe_output_tokens,
+        "probe_reuse_seconds": config.probe_reuse_seconds,
+        "max_output_tokens": config.max_output_tokens,
+        "early_exit_probe": config.early_exit_probe,
+        "fail_closed": config.fail_closed,
+        "min_generation_ms": config.min_generation_ms,
+        "rotatable_node_ids": list(config.rotatable_node_ids),
+        "prompt": config.prompt,
+        "expected": config.expected,
+        "shard_count": config.shard_count,
+    }
+
+
+def shard_state_from(state: dict[str, Any], config: Config) -> dict[str, Any]:
+    """Seed one shard's state from an unsharded or merged state file.
+
+    The shard keeps its nodes, including guard quarantine ownership, and the
+    shared audit cursor. Cumulative statistics, events, and today's budget go
+    to shard 0 only so merging does not count them twice.
+    """
+    value = json.loads(json.dumps(state))
+    value["nodes"] = {
+        node_id: node
+        for node_id, node in (state.get("nodes") or {}).items()
+        if config.owns(node_id)
+    }
+    value.pop("guard", None)
+    value.pop("shards", None)
+    if config.shard_index != 0:
+        for key in ("statistics", "recent_events", "budget"):
+            value.pop(key, None)
+    return value
+
+
+def merge_shard_states(
+    config: Config, states: dict[int, dict[str, Any]], count: int, now: float
+) -> dict[str, Any]:
+    """Combine shard states into the single status file grok2api reads.
+
+    Counters are summed and node maps joined. ``updated_at`` and the passive
+    poll time take the oldest shard, so one stalled worker shows as stale.
+    """
+    merged: dict[str, Any] = {
+        "version": 1,
+        "nodes": {},
+        "passive_initialized": bool(states)
+        and all(bool(state.get("passive_initialized")) for state in states.values()),
+        "recent_events": [],
+        "protected_node_ids": sorted(
+            {
+                str(node_id)
+                for state in states.values()
+                for node_id in state.get("protected_node_ids", [])
+            }
+        ),
+    }
+    statistics = default_statistics()
+    budget = default_budget(budget_day(now))
+    budget["request_limit"] = config.daily_probe_requests
+    budget["output_token_limit"] = config.daily_probe_output_tokens
+    seen: dict[str, None] = {}
+    node_ids: list[str] = []
+    for _index, state in sorted(states.items()):
+        merged["nodes"].update(state.get("nodes") or {})
+        merged["recent_events"].extend(state.get("recent_events") or [])
+        node_ids.extend((state.get("guard") or {}).get("node_ids") or [])
+        for audit_id in state.get("seen_audit_ids") or []:
+            seen.setdefault(str(audit_id), None)
+        shard_statistics = ensure_statistics(state)
+        statistics["started_at"] = min(
+            float(statistics["started_at"]), float(shard_statistics["started_at"])
+        )
+        for group in ("active", "passive", "actions"):
+            for field in statistics[group]:
+                statistics[group][field] += int(shard_statistics[group][field])
+        shard_budget = state.get("budget")
+        if isinstance(shard_budget, dict) and shard_budget.get("day") == budget["day"]:
+            for field in ("requests", "output_tokens", "denied"):
+                budget[field] += int(shard_budget.get(field, 0))
+            budget["nodes"].update(shard_budget.get("nodes") or {})
+    merged["recent_events"].sort(key=lambda event: float(event.get("ts", 0.0)))
+    del merged["recent_events"][:-100]
+    merged["seen_audit_ids"] = list(seen)[:2000]
+    merged["statistics"] = statistics
+    merged["budget"] = budget
+    for field, pick in (
+        ("started_at", min),
+        ("updated_at", min),
+        ("last_passive_poll_at", min),
+        ("last_active_cycle_at", max),
+    ):
+        values = [float(state[field]) for state in states.values() if field in state]
+        if values:
+            merged[field] = pick(values)
+    merged["guard"] = guard_metadata(config, sorted(set(node_ids), key=int))
+    merged["guard"]["shard_count"] = count
+    merged["shards"] = [
+        {
+            "index": index,
+            "available": index in states,
+            "updated_at": float((states.get(index) or {}).get("updated_at", 0.0)),
+            "nodes": len((states.get(index) or {}).get("nodes") or {}),
+        }
+        for index in range(count)
+    ]
+    return merged
+
+
 def append_state_event(state: dict[str, Any], event: str, **fields: Any) -> None:
     events = state.setdefault("recent_events", [])
     events.append({"ts": time.time(), "event": event, **fields})
@@ -712,13 +2416,104 @@ def log_event(event: str, **fields: Any) -> None:
     )
 
 
+@dataclasses.dataclass
+class ProbePlan:
+    """Nodes due for a scheduled probe, taken from the deadline heap.
+
+    ``carried`` collects targets the cycle did not start before ``deadline``;
+    they keep their overdue deadline and lead the next slot.
+    """
+
+    now: float
+    all_nodes: list[dict[str, Any]]
+    targets: list[dict[str, Any]]
+    due: list[tuple[float, str]]
+    heap: list[tuple[float, str]]
+    deadline: float = math.inf
+    carried: list[str] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass
+class EpochWindow:
+    """One probe's subscription to the live :class:`EpochWatch`."""
+
+    watch: EpochWatch
+    before: dict[str, Any] | None
+    cancellation: ProbeCancellation
+
+
+@dataclasses.dataclass
+class ActuationBatch:
+    """Quarantine and restore decisions awaiting one :meth:`Guard._actuation`.
+
+    Both maps are keyed by node ID, so a node decided twice is acted on once.
+    """
+
+    quarantines: dict[str, tuple[list[dict[str, Any]], dict[str, Any], str, float]] = (
+        dataclasses.field(default_factory=dict)
+    )
+    restores: dict[str, tuple[dict[str, Any], float, str]] = dataclasses.field(
+        default_factory=dict
+    )
+
+
 class Guard:
-    def __init__(self, config: Config, api: ApiClient):
+    def __init__(
+        self, config: Config, api: ApiClient, lease: LeaderLease | None = None
+    ):
         self.config = config
         self.api = api
+        # Replicas may share the state directory: once the lease is lost, the
+        # new leader owns the state file and this guard stops writing it.
+        self.lease = lease
         self.state = load_state(config.state_file)
-        self._resolved_node_ids = list(config.node_ids)
+        self._resolved_node_ids = [
+            node_id for node_id in config.node_ids if config.owns(node_id)
+        ]
         self._mihomo_member_by_node: dict[str, str] = {}
+        # (monotonic time, mihomo status) from the latest cycle snapshot.
+        self._snapshot_mihomo: tuple[float, dict[str, Any] | None] | None = None
+        self._test_group_lock = threading.Lock()
+        # Held by every thread while it changes ``state`` and by saves while
+        # they serialize it; the recovery and confirmation workers run
+        # alongside the loops. Network round trips of probes stay outside.
+        self._state_lock = threading.RLock()
+        # Makes the healthy-floor check and the backend disable one step.
+        # Taken before the state lock and held across the PATCH, so a slow
+        # disable never stalls a thread that only needs ``state``.
+        self._floor_lock = threading.Lock()
+        self.recovery: NodeTaskWorker | None = None
+        self.confirmations: NodeTaskWorker | None = None
+        self.epoch_watch: EpochWatch | None = None
+        # Inline fallback when no confirmation worker runs: one probe per node,
+        # drained after the audit batch.
+        self._confirmation_backlog: dict[
+            str, tuple[list[dict[str, Any]], dict[str, Any]]
+        ] = {}
+        # Set once the backend answers 404 to the batch quality-test route.
+        self._batch_probes_unsupported = False
+        # Per-thread ActuationBatch while an :meth:`_actuation` block is open.
+        self._actuator = threading.local()
+        # node id -> (observed_at, epoch key, raw result) of the latest model
+        # probe, reused within ``probe_reuse_seconds`` on the same epoch.
+        self._probe_results: dict[str, tuple[float, Any, dict[str, Any]]] = {}
+        # node id -> (budget day, output tokens) reserved by each probe in
+        # flight, oldest first; settled by :meth:`_settle_budget`.
+        self._budget_reservations: dict[str, list[tuple[str, int]]] = {}
+        # Monotonic end of the shutdown grace period once a drain has begun.
+        # While draining no new probes start and saves are deferred to the
+        # single flush in :meth:`close`.
+        self.drain_deadline: float | None = None
+        # Set once a loop gave up on in-flight probes after the grace ran out.
+        self.abandoned = False
+        # Fired by the ``quality-drain`` watchdog when the grace runs out; it
+        # aborts every probe, batch stream and rotation still in flight.
+        self._drain_cancellation = ProbeCancellation()
+        self._drain_watchdog: threading.Thread | None = None
+        self._drain_watchdog_lock = threading.Lock()
+        self._drain_watchdog_stop = threading.Event()
+        self._closed = False
+        self._save_fenced = False
         self.state.setdefault("started_at", time.time())
         self.state.setdefault("recent_events", [])
         ensure_statistics(self.state)
@@ -726,64 +2521,343 @@ class Guard:
         self._save()
 
     def _bump_statistic(self, group: str, field: str, amount: int = 1) -> None:
-        statistics = ensure_statistics(self.state)
-        statistics[group][field] = int(statistics[group][field]) + amount
+        with self._state_lock:
+            statistics = ensure_statistics(self.state)
+            statistics[group][field] = int(statistics[group][field]) + amount
+
+    def _budget_allows(self, node_id: str, kind: str, now: float) -> bool:
+        """Check one model probe against the daily request and token limits.
+
+        Recovery probes may spend the whole budget. Scheduled and confirmation
+        probes stop at ``1 - RECOVERY_BUDGET_RESERVE`` of it and, per node, at
+        an even share of that pool across managed nodes. Token limits are
+        checked against the worst case, ``max_output_tokens``.
+        """
+        limits = (
+            ("requests", self.config.daily_probe_requests, 1),
+            (
+                "output_tokens",
+                self.config.daily_probe_output_tokens,
+                self.config.max_output_tokens,
+            ),
+        )
+        if not any(limit for _, limit, _ in limits):
+            return True
+        with self._state_lock:
+            budget = ensure_budget(self.state, now)
+            usage = budget["nodes"].get(node_id) or {}
+            share = 1.0 if kind == "recovery" else 1.0 - RECOVERY_BUDGET_RESERVE
+            node_count = max(1, len(self._resolved_node_ids))
+            for field, limit, cost in limits:
+                if not limit:
+                    continue
+                pool = limit * share
+                fair_share = math.ceil(pool / node_count)
+                if int(budget[field]) + cost > pool or (
+                    kind != "recovery" and int(usage.get(field, 0)) + cost > fair_share
+                ):
+                    budget["denied"] = int(budget["denied"]) + 1
+                    log_event(
+                        "probe_budget_exhausted",
+                        node_id=node_id,
+                        trigger=kind,
+                        limit=field,
+                    )
+                    return False
+        return True
+
+    def _reserve_budget(self, node_id: str, kind: str, now: float) -> bool:
+        """Admit one model probe and charge its worst case in the same step.
+
+        Charges one request and, under a token limit, ``max_output_tokens``,
+        so probes admitted together cannot overshoot the daily limits.
+        :meth:`_settle_budget` refunds what the probe did not use.
+        """
+        with self._state_lock:
+            if not self._budget_allows(node_id, kind, now):
+                return False
+            tokens = (
+                self.config.max_output_tokens
+                if self.config.daily_probe_output_tokens
+                else 0
+            )
+            self._spend_budget(node_id, now, requests=1, output_tokens=tokens)
+            day = str(ensure_budget(self.state, now)["day"])
+            self._budget_reservations.setdefault(node_id, []).append((day, tokens))
+            return True
+
+    def _settle_budget(
+        self, node_id: str, output_tokens: int, sent: bool = True
+    ) -> None:
+        """Replace a probe's oldest reservation with the tokens it produced.
+
+        A probe that was never sent also returns its request. A reservation
+        made before midnight went with that day's books, so the new day is
+        charged the full use.
+        """
+        with self._state_lock:
+            now = time.time()
+            reservations = self._budget_reservations.get(node_id) or []
+            day, tokens = reservations.pop(0) if reservations else ("", 0)
+            if not reservations:
+                self._budget_reservations.pop(node_id, None)
+            requests = 0
+            if day == ensure_budget(self.state, now)["day"]:
+                output_tokens -= tokens
+                requests = 0 if sent else -1
+            self._spend_budget(
+                node_id, now, requests=requests, output_tokens=output_tokens
+            )
+
+    def _spend_budget(
+        self, node_id: str, now: float, requests: int = 0, output_tokens: int = 0
+    ) -> None:
+        with self._state_lock:
+            budget = ensure_budget(self.state, now)
+            usage = budget["nodes"].setdefault(
+                node_id, {"requests": 0, "output_tokens": 0}
+            )
+            for field, amount in (
+                ("requests", requests),
+                ("output_tokens", output_tokens),
+            ):
+                budget[field] = int(budget[field]) + amount
+                usage[field] = int(usage.get(field, 0)) + amount
+
+    def _append_event(self, event: str, **fields: Any) -> None:
+        with self._state_lock:
+            append_state_event(self.state, event, **fields)
 
     def _update_guard_metadata(self) -> None:
         self.state["updated_at"] = time.time()
-        self.state["guard"] = {
-            "mode": self.config.mode,
-            "model": self.config.model,
-            "node_ids": list(self.config.node_ids)
-            if self.config.node_ids
-            else self._resolved_node_ids,
-            "active_interval_seconds": self.config.active_interval_seconds,
-            "passive_poll_seconds": self.config.passive_poll_seconds,
-            "soft_tps": self.config.soft_tps,
-            "hard_tps": self.config.hard_tps,
-            "consecutive_soft": self.config.consecutive_soft,
-            "consecutive_errors": self.config.consecutive_errors,
-            "quarantine_seconds": self.config.quarantine_seconds,
-            "no_account_backoff_seconds": self.config.no_account_backoff_seconds,
-            "min_healthy_nodes": self.config.min_healthy_nodes,
-            "max_output_tokens": self.config.max_output_tokens,
-            "fail_closed": self.config.fail_closed,
-            "min_generation_ms": self.config.min_generation_ms,
-            "rotatable_node_ids": list(self.config.rotatable_node_ids),
-            "prompt": self.config.prompt,
-            "expected": self.config.expected,
-        }
+        self.state["guard"] = guard_metadata(self.config, self._resolved_node_ids)
 
     def _save(self) -> None:
-        self._update_guard_metadata()
-        save_state(self.config.state_file, self.state)
+        if self.drain_deadline is not None or self._closed:
+            return
+        self._flush()
+
+    @property
+    def leading(self) -> bool:
+        """Whether this guard may still write the state file.
+
+        :meth:`LeaderLease.held` turns false a renewal interval before the
+        backend lease expires, which leaves time for a write in progress.
+        """
+        return self.lease is None or self.lease.held()
+
+    def _flush(self) -> None:
+        with self._state_lock:
+            if not self.leading:
+                if not self._save_fenced:
+                    self._save_fenced = True
+                    log_event("state_save_fenced", reason="lease_lost")
+                return
+            self._update_guard_metadata()
+            budget = ensure_budget(self.state, time.time())
+            budget["request_limit"] = self.config.daily_probe_requests
+            budget["output_token_limit"] = self.config.daily_probe_output_tokens
+            save_state(self.config.state_file, self.state)
 
     def _state_for(self, node_id: str) -> dict[str, Any]:
-        nodes = self.state.setdefault("nodes", {})
-        current = nodes.setdefault(node_id, default_node_state())
-        legacy_strikes = int(current.pop("soft_strikes", 0))
-        current.setdefault("active_soft_strikes", legacy_strikes)
-        current.setdefault("passive_soft_strikes", 0)
-        current.setdefault(
-            "last_output_tps", float(current.pop("last_visible_tps", 0.0))
-        )
-        current.setdefault(
-            "last_output_tokens", int(current.pop("last_visible_tokens", 0))
-        )
-        for key, value in default_node_state().items():
-            current.setdefault(key, value)
-        return current
+        with self._state_lock:
+            nodes = self.state.setdefault("nodes", {})
+            current = nodes.setdefault(node_id, default_node_state())
+            legacy_strikes = int(current.pop("soft_strikes", 0))
+            current.setdefault("active_soft_strikes", legacy_strikes)
+            current.setdefault("passive_soft_strikes", 0)
+            current.setdefault(
+                "last_output_tps", float(current.pop("last_visible_tps", 0.0))
+            )
+            current.setdefault(
+                "last_output_tokens", int(current.pop("last_visible_tokens", 0))
+            )
+            for key, value in default_node_state().items():
+                current.setdefault(key, value)
+            return current
 
-    def _defer_no_account(
+    @contextlib.contextmanager
+    def _test_group_guard(self, node: dict[str, Any]) -> Any:
+        """同步节点共享同一个测试组，select→探测→epoch 比对必须整体串行。
+
+        否则并发 select 会让探测结果归因到错误的成员；非同步节点不加锁。
+        分片模式下各工作进程共用同一个测试组，因此还要持有跨进程的文件锁。
+        """
+        if not self._is_mihomo_synced(node):
+            yield
+            return
+        with self._test_group_lock:
+            if self.config.shard_count > 1:
+                with process_lock(self.config.test_group_lock_file):
+                    yield
+            else:
+                yield
+
+    def start_workers(self) -> None:
+        """Move recoveries and passive confirmations off the detector loops."""
+        if self.recovery is None:
+            self.recovery = NodeTaskWorker(
+                "quality-recovery", "recovery_failed", self._run_recovery
+            )
+            self.recovery.start()
+        if self.confirmations is None:
+            self.confirmations = NodeTaskWorker(
+                "quality-confirmation", "confirmation_failed", self._run_confirmation
+            )
+            self.confirmations.start()
+        if self.epoch_watch is None:
+            self.epoch_watch = EpochWatch(self.api)
+            self.epoch_watch.start()
+
+    def stop_workers(self, timeout: float | None = None, cancel: bool = False) -> None:
+        watch, self.epoch_watch = self.epoch_watch, None
+        if watch is not None:
+            watch.stop()
+        for name in ("confirmations", "recovery"):
+            worker = getattr(self, name)
+            setattr(self, name, None)
+            if worker is not None:
+                worker.stop(timeout, cancel=cancel)
+
+    @property
+    def draining(self) -> bool:
+        return self.drain_deadline is not None
+
+    def drain(self) -> None:
+        """Stop starting work; in-flight probes may finish until the grace ends.
+
+        Only assigns an attribute, so it is safe to call from a signal handler.
+        """
+        if self.drain_deadline is None:
+            self.drain_deadline = time.monotonic() + self.config.drain_grace_seconds
+
+    def drain_remaining(self) -> float:
+        if self.drain_deadline is None:
+            return float(self.config.drain_grace_seconds)
+        return max(0.0, self.drain_deadline - time.monotonic())
+
+    @property
+    def drain_expired(self) -> bool:
+        """Whether a drain has begun and its grace period is over.
+
+        Loops check this at their boundaries and stop waiting for in-flight
+        probes, whose requests the drain watchdog aborts (see
+        :meth:`_drain_abortable`).
+        """
+        return self.drain_deadline is not None and self.drain_remaining() <= 0
+
+    def close(self) -> None:
+        """Write the final state exactly once; later saves are dropped.
+
+        Probe threads abandoned by an expired drain may still finish, but
+        their outcomes never reach the state file. A guard that lost the
+        lease skips the final write too.
+        """
+        self._drain_watchdog_stop.set()
+        with self._state_lock:
+            if self._closed:
+                return
+            self._flush()
+            self._closed = True
+
+    @contextlib.contextmanager
+    def _drain_abortable(self) -> Iterator[None]:
+        """Abort this thread's API requests inside the block at the drain grace.
+
+        The watchdog starts with the first such block, since :meth:`drain` runs
+        in a signal handler and must not take locks.
+        """
+        with self._drain_watchdog_lock:
+            if self._drain_watchdog is None:
+                self._drain_watchdog = threading.Thread(
+                    target=self._watch_drain, name="quality-drain", daemon=True
+                )
+                self._drain_watchdog.start()
+        with probe_cancellation(self._drain_cancellation):
+            yield
+
+    def _watch_drain(self) -> None:
+        while not self._drain_watchdog_stop.wait(DRAIN_CHECK_SECONDS):
+            if self.drain_expired:
+                self._drain_cancellation.cancel()
+                return
+
+    def _drain_aborted(self, abandoned_probes: int = 1) -> bool:
+        """Whether the drain grace aborted this thread's requests.
+
+        The interrupted outcomes are dropped like those of abandoned probes.
+        """
+        if not self._drain_cancellation.cancelled:
+            return False
+        log_event("drain_grace_expired", abandoned_probes=abandoned_probes)
+        self.abandoned = True
+        return True
+
+    def _recovering(self, node_id: str) -> bool:
+        return self.recovery is not None and self.recovery.owns(node_id)
+
+    def _start_recovery(
         self,
-        state: dict[str, Any],
         node: dict[str, Any],
         now: float,
-        event: str,
-        **fields: Any,
+        rotate: bool,
+        rotate_on_failure: bool = False,
     ) -> None:
-        state["last_probe_at"] = now
-        state["last_reason"] = "probe_no_account"
+        if self.recovery is None:
+            self._recover_quarantined(
+                node, now, rotate=rotate, rotate_on_failure=rotate_on_failure
+            )
+            return
+        if self.recovery.submit(node, rotate, rotate_on_failure):
+            log_event(
+                "recovery_queued",
+                node_id=str(node["id"]),
+                node_name=node.get("name"),
+                rotate=rotate,
+            )
+
+    def _run_recovery(
+        self, node: dict[str, Any], rotate: bool, rotate_on_failure: bool
+    ) -> None:
+        self._recover_quarantined(
+            node, time.time(), rotate=rotate, rotate_on_failure=rotate_on_failure
+        )
+        self._save()
+
+    def _request_confirmation(
+        self, all_nodes: list[dict[str, Any]], node: dict[str, Any]
+    ) -> None:
+        if self.confirmations is None:
+            self._confirmation_backlog.setdefault(str(node["id"]), (all_nodes, node))
+            return
+        if self.confirmations.submit(node, all_nodes):
+            log_event(
+                "passive_confirmation_queued",
+                node_id=str(node["id"]),
+                node_name=node.get("name"),
+            )
+
+    def _run_confirmation(
+        self, node: dict[str, Any], all_nodes: list[dict[str, Any]]
+    ) -> None:
+        if not node.get("enabled") or self._state_for(str(node["id"])).get(
+            "disabled_by_guard"
+        ):
+            # A hard signal quarantined the node while the probe was queued.
+            return
+        self._probe_active(all_nodes, node, time.time(), trigger="passive_confirmation")
+        self._save()
+
+    def _defer_no_account(
+        self,
+        state: dict[str, Any],
+        node: dict[str, Any],
+        now: float,
+        event: str,
+        **fields: Any,
+    ) -> None:
+        state["last_probe_at"] = now
+        state["last_reason"] = "probe_no_account"
         state["quarantined_until"] = max(
             float(state.get("quarantined_until", 0.0)),
             now + self.config.no_account_backoff_seconds,
@@ -812,7 +2886,7 @@ class Guard:
             node_id = str(node.get("id") or "")
             if not node_id or not node.get("proxyConfigured"):
                 continue
-            if self._is_mihomo_type(node):
+            if self._is_mihomo_type(node) or not self.config.owns(node_id):
                 continue
             tracked_quarantine = bool(
                 (state_nodes.get(node_id) or {}).get("disabled_by_guard")
@@ -828,11 +2902,31 @@ class Guard:
                 result.append(node)
         return result
 
-    def _can_quarantine(self, nodes: list[dict[str, Any]], node_id: str) -> bool:
+    def _can_quarantine(
+        self,
+        nodes: list[dict[str, Any]],
+        node_id: str,
+        peer_quarantines: frozenset[str] = frozenset(),
+    ) -> bool:
+        state_nodes = self.state.get("nodes") or {}
+        # Another thread may have quarantined a node after this list was
+        # fetched; guard ownership in state is the fresher signal. Synced
+        # nodes stay enabled while quarantined, so those held by other shards
+        # are known only from ``peer_quarantines``.
         enabled = sum(
             1
             for node in nodes
-            if bool(node.get("enabled")) and not self._is_mihomo_type(node)
+            if bool(node.get("enabled"))
+            and not self._is_mihomo_type(node)
+            and (
+                str(node.get("id")) == node_id
+                or not (
+                    str(node.get("id")) in peer_quarantines
+                    or (state_nodes.get(str(node.get("id"))) or {}).get(
+                        "disabled_by_guard"
+                    )
+                )
+            )
         )
         target_enabled = any(
             str(node.get("id")) == node_id and bool(node.get("enabled"))
@@ -842,6 +2936,21 @@ class Guard:
             return target_enabled
         return target_enabled and enabled - 1 >= self.config.min_healthy_nodes
 
+    def _peer_quarantines(self) -> frozenset[str]:
+        """Node IDs the other shards hold in guard quarantine.
+
+        Read under the floor lock: every shard persists ownership there
+        before it disables or bans a node.
+        """
+        owned: set[str] = set()
+        for path in self.config.shard_state_files:
+            if path == self.config.state_file:
+                continue
+            for node_id, state in (load_state(path).get("nodes") or {}).items():
+                if (state or {}).get("disabled_by_guard"):
+                    owned.add(str(node_id))
+        return frozenset(owned)
+
     def _is_mihomo_type(self, node: dict[str, Any]) -> bool:
         """判断节点是否为操作员显式声明的 Mihomo 组通道节点（type=mihomo）。
 
@@ -865,23 +2974,31 @@ class Guard:
             return True
         return str(node.get("name") or "").startswith("mihomo-")
 
-    def _select_test_member(self, node: dict[str, Any]) -> bool:
+    def _select_test_member(
+        self, node: dict[str, Any]
+    ) -> tuple[bool, dict[str, Any] | None]:
         """探测前先将测试组当前成员切换为目标节点，保证探测归因一致。
 
-        非同步节点直接放行（不调用 select）；同步节点 select 失败返回
-        False，由调用方记账并跳过本轮探测。
+        返回 ``(是否成功, 切换后的 epochs)``。非同步节点直接放行（不调用
+        select）；同步节点 select 失败返回 False，由调用方记账并跳过本轮探测。
+        select 本身会递增 testEpoch，切换后的 epochs 是探测的基线；旧后端不
+        回报时为 None。
         """
         if not self._is_mihomo_synced(node):
-            return True
+            return True, None
         node_name = str(node.get("name") or "")
-        if node_name and self.api.select_test_member(node_name):
-            return True
+        selected = self.api.select_test_member(node_name) if node_name else None
+        if selected is not None:
+            epochs = selected.get("epochs")
+            if isinstance(epochs, dict) and epochs.get("enabled"):
+                return True, epochs
+            return True, None
         log_event(
             "mihomo_select_failed",
             node_id=str(node.get("id") or ""),
             node_name=node.get("name"),
         )
-        return False
+        return False, None
 
     def _should_rotate(self, node_id: str, reason: str) -> bool:
         if node_id in self._mihomo_member_by_node:
@@ -925,7 +3042,18 @@ class Guard:
         """True when the shared exit switched during the probe (result invalid)."""
         if not before:
             return False
-        after = self.api.get_mihomo_status()
+        return self._epoch_moved(
+            before, self.api.get_mihomo_status(), node_id, node_name, **fields
+        )
+
+    def _epoch_moved(
+        self,
+        before: dict[str, Any],
+        after: dict[str, Any] | None,
+        node_id: str,
+        node_name: Any,
+        **fields: Any,
+    ) -> bool:
         if not after:
             return False
         if node_id in self._mihomo_member_by_node:
@@ -954,95 +3082,411 @@ class Guard:
         )
         return True
 
-    def _quarantine(
-        self, nodes: list[dict[str, Any]], node: dict[str, Any], reason: str, now: float
-    ) -> None:
+    @contextlib.contextmanager
+    def _epoch_window(
+        self, node_id: str | None, switched: dict[str, Any] | None = None
+    ) -> Iterator[EpochWindow | None]:
+        """Subscribe one probe to the live epoch watch.
+
+        ``node_id`` picks the epoch the probe depends on; None follows the
+        production ``epoch`` shared by every unsynced node.
+
+        Yields None when no watch is live; the caller then reads the status
+        endpoint around the probe. Otherwise the window's cancellation fires
+        as soon as an epoch the node's probe depends on moves past the
+        baseline: ``switched`` when given, else the watch's status on entry.
+        Updates older than the baseline are the watch catching up.
+        """
+        watch = self.epoch_watch
+        if watch is None:
+            yield None
+            return
+        cancellation = ProbeCancellation()
+        baseline = switched
+
+        def on_change(previous: Any, current: Any) -> None:
+            reference = baseline or previous
+            if (
+                reference
+                and current
+                and self._epoch_key(node_id, reference)
+                != self._epoch_key(node_id, current)
+                and not self._epoch_behind(node_id, current, reference)
+            ):
+                cancellation.cancel()
+
+        with watch.subscribe(on_change) as (live, current):
+            if baseline is None:
+                baseline = current
+            yield EpochWindow(watch, baseline, cancellation) if live else None
+
+    def _epoch_behind(
+        self, node_id: str | None, status: dict[str, Any], reference: dict[str, Any]
+    ) -> bool:
+        """Whether ``status`` predates ``reference``; epochs only grow."""
+        key = self._epoch_key(node_id, status)
+        floor = self._epoch_key(node_id, reference)
+        return (
+            bool(key and floor)
+            and key[0] == floor[0]
+            and int(key[1] or 0) < int(floor[1] or 0)
+        )
+
+    def _window_epoch_changed(
+        self,
+        window: EpochWindow | None,
+        before: dict[str, Any] | None,
+        node_id: str,
+        node_name: Any,
+        **fields: Any,
+    ) -> bool:
+        """:meth:`_epoch_changed`, reading the new epochs from a live watch.
+
+        A watch that has not yet seen the baseline cannot tell, so the status
+        endpoint is read instead.
+        """
+        if window is not None:
+            live, after = window.watch.status()
+            if live and not (
+                before and after and self._epoch_behind(node_id, after, before)
+            ):
+                return bool(before) and self._epoch_moved(
+                    before, after, node_id, node_name, **fields
+                )
+        return self._epoch_changed(before, node_id, node_name, **fields)
+
+    def _watched_quality_test(
+        self,
+        node: dict[str, Any],
+        trigger: str,
+        early_exit: bool = False,
+        switched: dict[str, Any] | None = None,
+    ) -> tuple[dict[str, Any] | None, dict[str, Any] | None]:
+        """Run one model probe and return ``(status before, result)``.
+
+        The result is None when a mihomo epoch the node depends on moved
+        during the probe. With a live watch the request is aborted as soon
+        as that happens instead of when it completes. ``switched`` is the
+        status reported by the select that preceded the probe; it is the
+        baseline, so the watch catching up with that select is not a move.
+        """
         node_id = str(node["id"])
-        state = self._state_for(node_id)
-        if not self._can_quarantine(nodes, node_id):
-            self._bump_statistic("actions", "suppressed")
-            log_event(
-                "quarantine_suppressed",
-                node_id=node_id,
-                node_name=node.get("name"),
-                reason=reason,
-                minimum_healthy=self.config.min_healthy_nodes,
-            )
+        with self._epoch_window(node_id, switched) as window:
+            if window is not None:
+                before = window.before
+            elif switched is not None:
+                before = switched
+            else:
+                before = self.api.get_mihomo_status()
+            try:
+                with probe_cancellation(window and window.cancellation):
+                    result = self.api.quality_test(node_id, early_exit)
+            except Exception:
+                if not (
+                    window is not None
+                    and window.cancellation.cancelled
+                    and self._window_epoch_changed(
+                        window, before, node_id, node.get("name"), trigger=trigger
+                    )
+                ):
+                    raise
+                return before, None
+            if self._window_epoch_changed(
+                window, before, node_id, node.get("name"), trigger=trigger
+            ):
+                return before, None
+        return before, result
+
+    def _epoch_key(self, node_id: str | None, status: dict[str, Any] | None) -> Any:
+        if not status:
+            return None
+        if (
+            node_id in self._mihomo_member_by_node
+            and status.get("testEpoch") is not None
+        ):
+            return ("testEpoch", status.get("testEpoch"))
+        return ("epoch", status.get("epoch"))
+
+    def _remember_probe_result(
+        self,
+        node_id: str,
+        status: dict[str, Any] | None,
+        result: dict[str, Any],
+    ) -> None:
+        if self.config.probe_reuse_seconds <= 0:
             return
-        previous_state = dict(state)
-        state.update(
-            {
-                "active_soft_strikes": 0,
-                "passive_soft_strikes": 0,
-                "error_strikes": 0,
-                "quarantined_until": now + self.config.quarantine_seconds,
-                "disabled_by_guard": True,
-                "last_reason": reason,
-            }
+        with self._state_lock:
+            self._probe_results[node_id] = (
+                time.time(),
+                self._epoch_key(node_id, status),
+                result,
+            )
+
+    def _forget_probe_result(self, node_id: str) -> None:
+        with self._state_lock:
+            self._probe_results.pop(node_id, None)
+
+    def _current_mihomo_status(self) -> dict[str, Any] | None:
+        """Mihomo status from this cycle's snapshot, or a fresh read once stale."""
+        snapshot = self._snapshot_mihomo
+        if (
+            snapshot is not None
+            and time.monotonic() - snapshot[0] <= SNAPSHOT_STATUS_SECONDS
+        ):
+            return snapshot[1]
+        return self.api.get_mihomo_status()
+
+    def _reusable_probe_result(self, node: dict[str, Any]) -> dict[str, Any] | None:
+        """Return a fresh model probe result for the node's current exit.
+
+        A result qualifies while it is younger than ``probe_reuse_seconds`` and
+        the mihomo epoch has not moved since it was observed. Quarantine and
+        rotation drop the entry, so recovery never reuses pre-quarantine data.
+        """
+        node_id = str(node["id"])
+        with self._state_lock:
+            entry = self._probe_results.get(node_id)
+        if entry is None or time.time() - entry[0] > self.config.probe_reuse_seconds:
+            return None
+        observed_at, epoch_key, result = entry
+        if self._epoch_key(node_id, self._current_mihomo_status()) != epoch_key:
+            return None
+        log_event(
+            "probe_result_reused",
+            node_id=node_id,
+            node_name=node.get("name"),
+            age_seconds=round(time.time() - observed_at, 3),
         )
-        # Persist ownership before changing backend scheduling state. A crash
-        # after the API call can then be reconciled safely on restart.
-        self._save()
+        return result
+
+    @contextlib.contextmanager
+    def _actuation(self) -> Iterator[None]:
+        """Collect this thread's quarantines and restores into one batch.
+
+        Decisions made inside the block are applied when it exits: restores
+        first, then quarantines admitted against a single healthy-floor count,
+        each kind in one PATCH. A nested block joins the outer batch.
+        """
+        if getattr(self._actuator, "batch", None) is not None:
+            yield
+            return
+        batch = ActuationBatch()
+        self._actuator.batch = batch
         try:
-            updated = self.api.set_enabled(node_id, False)
-        except Exception as exc:
-            state.clear()
-            state.update(previous_state)
+            yield
+        finally:
+            # Detached first: recoveries started by the flush act immediately.
+            self._actuator.batch = None
+            self._apply_restores(list(batch.restores.values()))
+            by_listing: dict[int, list[tuple[dict[str, Any], str, float]]] = {}
+            listings: dict[int, list[dict[str, Any]]] = {}
+            for nodes, node, reason, now in batch.quarantines.values():
+                listings[id(nodes)] = nodes
+                by_listing.setdefault(id(nodes), []).append((node, reason, now))
+            for key, decisions in by_listing.items():
+                self._apply_quarantines(listings[key], decisions)
+
+    def _actuation_pending(self, node_id: str) -> bool:
+        batch: ActuationBatch | None = getattr(self._actuator, "batch", None)
+        return batch is not None and (
+            node_id in batch.quarantines or node_id in batch.restores
+        )
+
+    def _quarantine(
+        self, nodes: list[dict[str, Any]], node: dict[str, Any], reason: str, now: float
+    ) -> None:
+        batch: ActuationBatch | None = getattr(self._actuator, "batch", None)
+        if batch is not None:
+            batch.quarantines.setdefault(str(node["id"]), (nodes, node, reason, now))
+            return
+        self._apply_quarantines(nodes, [(node, reason, now)])
+
+    def _floor_guard(self) -> Any:
+        if self.config.shard_count > 1:
+            return process_lock(self.config.floor_lock_file)
+        return contextlib.nullcontext()
+
+    def _apply_quarantines(
+        self,
+        nodes: list[dict[str, Any]],
+        decisions: list[tuple[dict[str, Any], str, float]],
+    ) -> None:
+        # Floor check and backend disable must be atomic across the detector
+        # loop and the workers, and across shard processes. The state lock is
+        # taken only to decide and to settle ownership, never across a request.
+        applied: list[tuple[dict[str, Any], str]] = []
+        with self._floor_lock, self._floor_guard():
+            # Other shards disable nodes this process never sees in its own
+            # state; under the floor lock a fresh listing and their state
+            # files are the authoritative count. Admission is sequential: each
+            # admitted node is marked guard-owned, so the next one is checked
+            # against the reduced floor.
+            floor_nodes = nodes
+            peer_quarantines: frozenset[str] = frozenset()
+            if self.config.shard_count > 1:
+                floor_nodes = self.api.list_nodes()
+                peer_quarantines = self._peer_quarantines()
+            admitted: list[tuple[dict[str, Any], str, dict[str, Any]]] = []
+            with self._state_lock:
+                for node, reason, now in decisions:
+                    node_id = str(node["id"])
+                    state = self._state_for(node_id)
+                    if state.get("disabled_by_guard"):
+                        continue
+                    if not self._can_quarantine(
+                        floor_nodes, node_id, peer_quarantines
+                    ):
+                        self._bump_statistic("actions", "suppressed")
+                        log_event(
+                            "quarantine_suppressed",
+                            node_id=node_id,
+                            node_name=node.get("name"),
+                            reason=reason,
+                            minimum_healthy=self.config.min_healthy_nodes,
+                        )
+                        continue
+                    admitted.append((node, reason, dict(state)))
+                    state.update(
+                        {
+                            "active_soft_strikes": 0,
+                            "passive_soft_strikes": 0,
+                            "error_strikes": 0,
+                            "quarantined_until": now + self.config.quarantine_seconds,
+                            "disabled_by_guard": True,
+                            "last_reason": reason,
+                        }
+                    )
+                    self._forget_probe_result(node_id)
+            if not admitted:
+                return
+            # Persist ownership before changing backend scheduling state. A
+            # crash after the API call can then be reconciled safely on restart.
+            self._save()
+            # Mihomo-synced nodes are managed by the backend, which rejects
+            # any PATCH that includes one; banning the test-group member is
+            # their quarantine.
+            patched = [
+                str(node["id"])
+                for node, _reason, _previous in admitted
+                if not self._is_mihomo_synced(node)
+            ]
+            failure: Exception | None = None
+            changed: set[str] = set()
+            if patched:
+                try:
+                    changed = self._set_enabled_batch(patched, False)
+                except Exception as exc:
+                    failure = exc
+            for node, _reason, _previous in admitted:
+                node_name = str(node.get("name") or "")
+                if (
+                    self._is_mihomo_synced(node)
+                    and node_name
+                    and self.api.ban_test_member(node_name)
+                ):
+                    changed.add(str(node["id"]))
+            with self._state_lock:
+                for node, reason, previous_state in admitted:
+                    node_id = str(node["id"])
+                    if node_id in changed:
+                        if not self._is_mihomo_synced(node):
+                            node["enabled"] = False
+                        applied.append((node, reason))
+                        continue
+                    # Ownership is settled per ID: a node the backend did not
+                    # change stays with whoever holds it.
+                    state = self._state_for(node_id)
+                    state.clear()
+                    state.update(previous_state)
+                    if self._is_mihomo_synced(node):
+                        log_event(
+                            "mihomo_ban_failed",
+                            node_id=node_id,
+                            node_name=node.get("name"),
+                        )
+                    elif failure is not None:
+                        log_event(
+                            "quarantine_failed",
+                            node_id=node_id,
+                            node_name=node.get("name"),
+                            reason=reason,
+                            error_type=type(failure).__name__,
+                        )
+                    else:
+                        log_event(
+                            "quarantine_not_applied",
+                            node_id=node_id,
+                            node_name=node.get("name"),
+                            reason=reason,
+                        )
+                for node, reason in applied:
+                    self._bump_statistic("actions", "quarantined")
+                    self._append_event(
+                        "node_quarantined",
+                        node_id=str(node["id"]),
+                        node_name=node.get("name"),
+                        reason=reason,
+                    )
             self._save()
+        for node, reason in applied:
+            node_id = str(node["id"])
             log_event(
-                "quarantine_failed",
+                "node_quarantined",
                 node_id=node_id,
                 node_name=node.get("name"),
                 reason=reason,
-                error_type=type(exc).__name__,
+                quarantine_seconds=self.config.quarantine_seconds,
             )
-            return
-        if updated != 1:
-            state.clear()
-            state.update(previous_state)
-            self._save()
+            if reason == "buffered_burst":
+                self._start_recovery(
+                    node, time.time(), rotate=False, rotate_on_failure=True
+                )
+            elif self._should_rotate(node_id, reason):
+                self._start_recovery(node, time.time(), rotate=True)
+
+    def _set_enabled_batch(self, node_ids: list[str], enabled: bool) -> set[str]:
+        """Apply one scheduling change; a single node keeps the plain PATCH.
+
+        The backend validates a batch as a whole, so one node it refuses (a
+        fixed fallback, a node that became Mihomo-synced since the listing)
+        fails every other node with it. Such a refused batch is retried one
+        ID at a time, and IDs refused on their own count as unchanged. Any
+        other error, such as a fenced lease or a rejected credential, would
+        fail every retry too and is raised at once.
+        """
+        if len(node_ids) == 1:
+            updated = self.api.set_enabled(node_ids[0], enabled)
+            return set(node_ids) if updated == 1 else set()
+        try:
+            return self.api.set_enabled_many(node_ids, enabled)
+        except ApiError as exc:
+            if not self._node_refusal(exc):
+                raise
             log_event(
-                "quarantine_not_applied",
-                node_id=node_id,
-                node_name=node.get("name"),
-                reason=reason,
-                updated=updated,
+                "batch_enable_rejected",
+                enabled=enabled,
+                node_count=len(node_ids),
+                error_code=exc.code,
             )
-            return
-        node["enabled"] = False
-        if self._is_mihomo_synced(node):
-            node_name = str(node.get("name") or "")
-            if node_name and not self.api.ban_test_member(node_name):
-                # 封禁失败仅记录、不阻断隔离：节点已被 set_enabled(False) 禁用，
-                # 且 Go 侧测试组黑名单自带 TTL（10 分钟）兜底，探测也始终先
-                # select 目标成员，隔离语义不依赖本次 ban 成功。
+        changed: set[str] = set()
+        for node_id in node_ids:
+            try:
+                if self.api.set_enabled(node_id, enabled) == 1:
+                    changed.add(node_id)
+            except ApiError as exc:
+                if not self._node_refusal(exc):
+                    raise
                 log_event(
-                    "mihomo_ban_failed",
+                    "node_enable_rejected",
                     node_id=node_id,
-                    node_name=node.get("name"),
+                    enabled=enabled,
+                    error_code=exc.code,
                 )
-        self._bump_statistic("actions", "quarantined")
-        append_state_event(
-            self.state,
-            "node_quarantined",
-            node_id=node_id,
-            node_name=node.get("name"),
-            reason=reason,
-        )
-        self._save()
-        log_event(
-            "node_quarantined",
-            node_id=node_id,
-            node_name=node.get("name"),
-            reason=reason,
-            quarantine_seconds=self.config.quarantine_seconds,
-        )
-        if reason == "buffered_burst":
-            self._recover_quarantined(
-                node, time.time(), rotate=False, rotate_on_failure=True
-            )
-        elif self._should_rotate(node_id, reason):
-            self._recover_quarantined(node, time.time(), rotate=True)
+        return changed
+
+    @staticmethod
+    def _node_refusal(exc: ApiError) -> bool:
+        return exc.status == 400 or exc.code in NODE_REFUSAL_CODES
 
     def _record_probe(
         self,
@@ -1076,12 +3520,18 @@ class Guard:
         state["error_strikes"] = 0
         self._bump_statistic("active", classification)
         self._bump_statistic("active", "output_tokens", output_tokens)
+        # The reservation taken at admission gives way to the actual spend.
+        self._settle_budget(node_id, output_tokens)
         if classification == "healthy":
             state["active_soft_strikes"] = 0
             state["passive_soft_strikes"] = 0
-        elif classification == "soft":
-            state["active_soft_strikes"] = int(state.get("active_soft_strikes", 0)) + 1
+            state["healthy_streak"] = int(state.get("healthy_streak", 0)) + 1
         else:
+            state["healthy_streak"] = 0
+            state["last_suspect_at"] = now
+        if classification == "soft":
+            state["active_soft_strikes"] = int(state.get("active_soft_strikes", 0)) + 1
+        elif classification == "hard":
             state["active_soft_strikes"] = self.config.consecutive_soft
         log_event(
             "quality_probe_completed",
@@ -1095,105 +3545,383 @@ class Guard:
             duration_ms=int(result.get("durationMs") or 0),
             chunk_count=int(result.get("chunkCount") or 0),
             expected_matched=bool(result.get("expectedMatched")),
+            early_exit=bool(result.get("earlyExit")),
         )
 
-    def _probe_active(
+    def _begin_probe(
+        self, node: dict[str, Any], now: float, trigger: str = "scheduled"
+    ) -> bool:
+        node_id = str(node["id"])
+        with self._state_lock:
+            state = self._state_for(node_id)
+            if state.get("last_reason") == "probe_no_account" and now < float(
+                state.get("quarantined_until", 0.0)
+            ):
+                return False
+        # The earlier result was already applied to strikes; skip this probe.
+        # Checked without the lock, since it may read the mihomo status.
+        if self._reusable_probe_result(node) is not None:
+            return False
+        with self._state_lock:
+            if not self._reserve_budget(node_id, trigger, now):
+                return False
+            self._bump_statistic("active", "total")
+            return True
+
+    def _run_probe(self, node: dict[str, Any], trigger: str) -> tuple[str, Any]:
+        """Perform the network half of an active probe without touching state.
+
+        Returns ``(kind, value)`` where kind is ``select_failed``, ``error``,
+        ``epoch_changed`` or ``result``. Concurrent workers call this method;
+        the outcome is applied to guard state by :meth:`_apply_probe`.
+        """
+        with self._drain_abortable(), self._test_group_guard(node):
+            return self._run_probe_io(node, trigger)
+
+    def _run_probe_io(self, node: dict[str, Any], trigger: str) -> tuple[str, Any]:
+        node_id = str(node["id"])
+        selected, switched = self._select_test_member(node)
+        if not selected:
+            return "select_failed", None
+        try:
+            before, result = self._watched_quality_test(
+                node, trigger, self.config.early_exit_probe, switched
+            )
+        except Exception as exc:
+            return "error", exc
+        if result is None:
+            return "epoch_changed", None
+        self._remember_probe_result(node_id, before, result)
+        return "result", result
+
+    def _apply_probe(
         self,
         nodes: list[dict[str, Any]],
         node: dict[str, Any],
         now: float,
-        trigger: str = "scheduled",
+        trigger: str,
+        outcome: tuple[str, Any],
     ) -> None:
-        node_id = str(node["id"])
-        state = self._state_for(node_id)
-        if state.get("last_reason") == "probe_no_account" and now < float(
-            state.get("quarantined_until", 0.0)
-        ):
-            return
-        self._bump_statistic("active", "total")
-        if not self._select_test_member(node):
-            # select 失败按探测错误记账但暂不隔离：等下一轮重试，避免测试组
-            # 切换抖动被误判为节点质量问题。
-            self._bump_statistic("active", "errors")
-            state["error_strikes"] = int(state.get("error_strikes", 0)) + 1
-            state["last_probe_at"] = now
-            log_event(
-                "quality_probe_skipped_select_failed",
-                node_id=node_id,
-                node_name=node.get("name"),
-                trigger=trigger,
-                strikes=state["error_strikes"],
-            )
-            return
-        before = self.api.get_mihomo_status()
-        try:
-            result = self.api.quality_test(node_id)
-        except Exception as exc:
-            if self._probe_account_unavailable(exc):
-                self._defer_no_account(
-                    state, node, now, "quality_probe_deferred", trigger=trigger
+        # A quarantine decided here is applied once the state lock is released.
+        with self._actuation(), self._state_lock:
+            node_id = str(node["id"])
+            state = self._state_for(node_id)
+            kind, value = outcome
+            if kind != "result":
+                self._settle_budget(node_id, 0)
+            if kind == "select_failed":
+                # select 失败按探测错误记账但暂不隔离：等下一轮重试，避免测试组
+                # 切换抖动被误判为节点质量问题。
+                self._bump_statistic("active", "errors")
+                state["error_strikes"] = int(state.get("error_strikes", 0)) + 1
+                state["last_probe_at"] = now
+                log_event(
+                    "quality_probe_skipped_select_failed",
+                    node_id=node_id,
+                    node_name=node.get("name"),
+                    trigger=trigger,
+                    strikes=state["error_strikes"],
                 )
                 return
-            self._bump_statistic("active", "errors")
-            state["error_strikes"] = int(state.get("error_strikes", 0)) + 1
-            state["last_probe_at"] = now
-            log_event(
-                "quality_probe_failed",
-                node_id=node_id,
-                node_name=node.get("name"),
-                trigger=trigger,
-                error_type=type(exc).__name__,
-                strikes=state["error_strikes"],
-            )
+            if kind == "error":
+                if self._probe_account_unavailable(value):
+                    self._defer_no_account(
+                        state, node, now, "quality_probe_deferred", trigger=trigger
+                    )
+                    return
+                self._bump_statistic("active", "errors")
+                state["error_strikes"] = int(state.get("error_strikes", 0)) + 1
+                state["healthy_streak"] = 0
+                state["last_probe_at"] = now
+                log_event(
+                    "quality_probe_failed",
+                    node_id=node_id,
+                    node_name=node.get("name"),
+                    trigger=trigger,
+                    error_type=type(value).__name__,
+                    strikes=state["error_strikes"],
+                )
+                if (
+                    trigger == "scheduled"
+                    and state["error_strikes"] >= self.config.consecutive_errors
+                ):
+                    self._quarantine(nodes, node, "probe_errors", now)
+                return
+            if kind == "epoch_changed":
+                return
+            classification, reason = classify_result(value, self.config)
+            self._record_probe(node, value, classification, reason, now)
             if (
-                trigger == "scheduled"
-                and state["error_strikes"] >= self.config.consecutive_errors
+                classification == "hard"
+                or (classification == "soft" and self.config.fail_closed)
+                or int(state.get("active_soft_strikes", 0))
+                >= self.config.consecutive_soft
             ):
-                self._quarantine(nodes, node, "probe_errors", now)
-            return
-        if self._epoch_changed(before, node_id, node.get("name"), trigger=trigger):
-            return
-        classification, reason = classify_result(result, self.config)
-        self._record_probe(node, result, classification, reason, now)
-        if (
-            classification == "hard"
-            or (classification == "soft" and self.config.fail_closed)
-            or int(state.get("active_soft_strikes", 0)) >= self.config.consecutive_soft
-        ):
-            self._quarantine(nodes, node, reason, now)
+                self._quarantine(nodes, node, reason, now)
 
-    def _recover_quarantined(
+    def _probe_active(
         self,
+        nodes: list[dict[str, Any]],
         node: dict[str, Any],
         now: float,
-        rotate: bool,
-        rotate_on_failure: bool = False,
+        trigger: str = "scheduled",
     ) -> None:
-        node_id = str(node["id"])
-        state = self._state_for(node_id)
-        if rotate:
-            try:
-                rotation = self.api.rotate_node(node_id, str(node.get("exitIp") or ""))
-            except Exception as exc:
-                state["rotation_failures"] = int(state.get("rotation_failures", 0)) + 1
-                state["quarantined_until"] = now + self.config.quarantine_seconds
-                state["last_reason"] = "rotation_error"
-                log_event(
-                    "node_rotation_failed",
-                    node_id=node_id,
+        if not self._begin_probe(node, now, trigger):
+            return
+        outcome = self._run_probe(node, trigger)
+        if outcome[0] != "result" and self._drain_aborted():
+            self._settle_budget(str(node["id"]), 0)
+            return
+        self._apply_probe(nodes, node, now, trigger, outcome)
+
+    def _probe_batched(
+        self,
+        nodes: list[dict[str, Any]],
+        targets: list[dict[str, Any]],
+        now: float,
+        deadline: float,
+    ) -> tuple[list[dict[str, Any]], set[str], list[str]]:
+        """Probe targets through the backend's batch quality-test route.
+
+        Targets go out in consecutive batches of ``BATCH_PROBE_LIMIT``; the
+        backend runs ``active_concurrency`` probes of a batch at a time (at
+        most ``BATCH_PROBE_CONCURRENCY``) on its pooled accounts and streams
+        each result back, and the next batch starts once a batch is done.
+        Outcomes are applied as they arrive, in completion order as in
+        :meth:`_probe_concurrently`. Mihomo-synced nodes share the test group
+        and stay on the per-node path, as does every target left when the
+        backend refuses a batch. Returns the targets still to probe, the IDs
+        among them whose probe was already begun, and the IDs carried over
+        by the deadline.
+        """
+        rest = [node for node in targets if self._is_mihomo_synced(node)]
+        waiting = [node for node in targets if not self._is_mihomo_synced(node)]
+        carried: list[str] = []
+        while waiting:
+            if self.draining or time.time() >= deadline:
+                carried.extend(str(node["id"]) for node in waiting)
+                break
+            chunk, waiting = waiting[:BATCH_PROBE_LIMIT], waiting[BATCH_PROBE_LIMIT:]
+            batch = [node for node in chunk if self._begin_probe(node, now)]
+            if not batch:
+                continue
+            unreported, refused = self._probe_batch(nodes, batch, now, deadline)
+            if refused:
+                begun = {str(node["id"]) for node in unreported}
+                return unreported + waiting + rest, begun, carried
+            for node in unreported:
+                self._settle_budget(str(node["id"]), 0)
+                carried.append(str(node["id"]))
+        return rest, set(), carried
+
+    def _probe_batch(
+        self,
+        nodes: list[dict[str, Any]],
+        batch: list[dict[str, Any]],
+        now: float,
+        deadline: float,
+    ) -> tuple[list[dict[str, Any]], bool]:
+        """Stream one batch and apply its results.
+
+        Returns the unreported nodes and whether the backend refused the
+        batch before reporting any result; the caller then probes those
+        nodes one by one. Reading stops once ``deadline`` passes or a drain
+        begins, which aborts the probes still running on the backend; a read
+        still blocked when the drain grace runs out is aborted too.
+        """
+        pending = {str(node["id"]): node for node in batch}
+        # Batches hold only unsynced nodes, which all depend on the
+        # production ``epoch``; the window follows that key.
+        with self._epoch_window(None) as window:
+            if window is not None:
+                before = window.before
+            else:
+                before = self.api.get_mihomo_status()
+            results = self.api.quality_test_many(
+                list(pending),
+                min(self.config.active_concurrency, BATCH_PROBE_CONCURRENCY),
+                self.config.early_exit_probe,
+            )
+            try:
+                while pending and not (self.draining or time.time() >= deadline):
+                    # Only the stream's own connection may be aborted; outcomes
+                    # applied below make requests of their own.
+                    with self._drain_abortable(), probe_cancellation(
+                        window and window.cancellation
+                    ):
+                        item = next(results, None)
+                    if item is None:
+                        break
+                    node_id, value = item
+                    node = pending.pop(node_id, None)
+                    if node is None:
+                        continue
+                    outcome = self._batch_outcome(window, before, node, value)
+                    self._apply_probe(nodes, node, now, "scheduled", outcome)
+                    self._save()
+            except Exception as exc:
+                if self._drain_aborted(len(pending)):
+                    # Carried over unapplied, like probes the drain never sent.
+                    return list(pending.values()), False
+                if isinstance(exc, ApiError) and len(pending) == len(batch):
+                    # Refused before any result, so no probe ran: a missing
+                    # route or a request this backend rejects.
+                    if exc.status == 404:
+                        self._batch_probes_unsupported = True
+                        log_event("batch_quality_test_unsupported")
+                    else:
+                        log_event(
+                            "batch_quality_test_refused",
+                            status=exc.status,
+                            error_code=exc.code,
+                        )
+                    return list(pending.values()), True
+                # The stream broke off; its unreported probes failed with it,
+                # or were aborted because an epoch moved.
+                for node in pending.values():
+                    outcome = self._batch_outcome(window, before, node, exc)
+                    self._apply_probe(nodes, node, now, "scheduled", outcome)
+                self._save()
+                return [], False
+            finally:
+                results.close()
+        return list(pending.values()), False
+
+    def _batch_outcome(
+        self,
+        window: EpochWindow | None,
+        before: dict[str, Any] | None,
+        node: dict[str, Any],
+        value: dict[str, Any] | Exception,
+    ) -> tuple[str, Any]:
+        """Turn one batch result into a :meth:`_run_probe` outcome."""
+        node_id = str(node["id"])
+        aborted = window is not None and window.cancellation.cancelled
+        if isinstance(value, Exception) and not aborted:
+            return "error", value
+        if self._window_epoch_changed(
+            window, before, node_id, node.get("name"), trigger="scheduled"
+        ):
+            return "epoch_changed", None
+        if isinstance(value, Exception):
+            return "error", value
+        self._remember_probe_result(node_id, before, value)
+        return "result", value
+
+    def _probe_concurrently(
+        self,
+        nodes: list[dict[str, Any]],
+        targets: list[dict[str, Any]],
+        now: float,
+        deadline: float = math.inf,
+        begun: set[str] | None = None,
+    ) -> list[str]:
+        """Probe targets on a bounded worker pool and apply outcomes serially.
+
+        Workers only perform network round trips. Outcomes are applied on the
+        calling thread in completion order, so strikes, the healthy floor in
+        :meth:`_can_quarantine`, and state saves never race each other.
+        Probes start only while a worker is free, ``deadline`` has not passed
+        and no drain has begun; in-flight probes finish unless the drain grace
+        runs out first, and the IDs of targets never started are returned.
+        Targets in ``begun`` were already counted by :meth:`_begin_probe`.
+        """
+        begun = begun or set()
+        waiting = list(targets)
+        carried: list[str] = []
+        workers = min(self.config.active_concurrency, len(waiting))
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="quality-probe"
+        )
+        abandoned = False
+        try:
+            running: dict[concurrent.futures.Future, dict[str, Any]] = {}
+            while waiting or running:
+                while waiting and len(running) < workers:
+                    if self.draining or time.time() >= deadline:
+                        carried.extend(str(node["id"]) for node in waiting)
+                        waiting.clear()
+                        break
+                    node = waiting.pop(0)
+                    if str(node["id"]) in begun or self._begin_probe(node, now):
+                        future = executor.submit(self._run_probe, node, "scheduled")
+                        running[future] = node
+                if not running:
+                    break
+                # Wake periodically so a drain that begins mid-wait is seen.
+                done, _ = concurrent.futures.wait(
+                    running,
+                    timeout=DRAIN_CHECK_SECONDS,
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                if self.drain_expired:
+                    # Leave in-flight probes behind; their outcomes are dropped.
+                    log_event("drain_grace_expired", abandoned_probes=len(running))
+                    self.abandoned = abandoned = True
+                    carried.extend(str(node["id"]) for node in waiting)
+                    break
+                for future in done:
+                    node = running.pop(future)
+                    self._apply_probe(nodes, node, now, "scheduled", future.result())
+                    self._save()
+        except BaseException:
+            abandoned = True
+            raise
+        finally:
+            executor.shutdown(wait=not abandoned, cancel_futures=True)
+        for node_id in carried:
+            if node_id in begun:
+                # Admitted for a refused batch, then never sent.
+                self._settle_budget(node_id, 0, sent=False)
+        return carried
+
+    def _run_recovery_probe(
+        self, node: dict[str, Any], now: float, rotate: bool
+    ) -> tuple[str, str, str] | None:
+        """Rotate if asked, then probe; None when the outcome was handled here.
+
+        State changes take the state lock; the network round trips do not.
+        """
+        node_id = str(node["id"])
+        state = self._state_for(node_id)
+        if not self._reserve_budget(node_id, "recovery", now):
+            # Keep quarantine and retry after another quarantine period.
+            with self._state_lock:
+                state["quarantined_until"] = now + self.config.quarantine_seconds
+            return None
+        if rotate:
+            try:
+                with self._drain_abortable():
+                    rotation = self.api.rotate_node(
+                        node_id, str(node.get("exitIp") or "")
+                    )
+            except Exception as exc:
+                self._settle_budget(node_id, 0, sent=False)
+                if self._drain_aborted():
+                    return None
+                with self._state_lock:
+                    state["rotation_failures"] = (
+                        int(state.get("rotation_failures", 0)) + 1
+                    )
+                    state["quarantined_until"] = now + self.config.quarantine_seconds
+                    state["last_reason"] = "rotation_error"
+                log_event(
+                    "node_rotation_failed",
+                    node_id=node_id,
                     node_name=node.get("name"),
                     error_type=type(exc).__name__,
                 )
-                return
-            state.update(
-                {
-                    "last_rotation_at": time.time(),
-                    "last_rotation_exit_ip": str(rotation.get("newExitIp") or ""),
-                    "rotation_failures": 0,
-                }
-            )
-            append_state_event(
-                self.state,
+                return None
+            self._forget_probe_result(node_id)
+            with self._state_lock:
+                state.update(
+                    {
+                        "last_rotation_at": time.time(),
+                        "last_rotation_exit_ip": str(rotation.get("newExitIp") or ""),
+                        "rotation_failures": 0,
+                    }
+                )
+            self._append_event(
                 "node_rotated",
                 node_id=node_id,
                 node_name=node.get("name"),
@@ -1206,53 +3934,87 @@ class Guard:
                 exit_ip=str(rotation.get("newExitIp") or ""),
             )
         try:
-            if not self._select_test_member(node):
-                # select 失败保持隔离，下一轮再试。
-                state["quarantined_until"] = now + self.config.quarantine_seconds
-                state["last_reason"] = "mihomo_select_failed"
-                log_event(
-                    "recovery_probe_skipped_select_failed",
-                    node_id=node_id,
-                    node_name=node.get("name"),
-                )
-                return
-            try:
-                connectivity = self.api.connectivity_test(node_id)
-                connectivity_status = str(connectivity.get("status") or "unknown")
-            except Exception as exc:
-                connectivity_status = "error"
-                log_event(
-                    "recovery_connectivity_probe_failed",
-                    node_id=node_id,
-                    node_name=node.get("name"),
-                    error_type=type(exc).__name__,
+            with self._drain_abortable(), self._test_group_guard(node):
+                selected, switched = self._select_test_member(node)
+                if not selected:
+                    # select 失败保持隔离，下一轮再试。
+                    self._settle_budget(node_id, 0, sent=False)
+                    with self._state_lock:
+                        state["quarantined_until"] = (
+                            now + self.config.quarantine_seconds
+                        )
+                        state["last_reason"] = "mihomo_select_failed"
+                    log_event(
+                        "recovery_probe_skipped_select_failed",
+                        node_id=node_id,
+                        node_name=node.get("name"),
+                    )
+                    return None
+                try:
+                    connectivity = self.api.connectivity_test(node_id)
+                    connectivity_status = str(connectivity.get("status") or "unknown")
+                except Exception as exc:
+                    connectivity_status = "error"
+                    log_event(
+                        "recovery_connectivity_probe_failed",
+                        node_id=node_id,
+                        node_name=node.get("name"),
+                        error_type=type(exc).__name__,
+                    )
+                self._bump_statistic("active", "total")
+                before, result = self._watched_quality_test(
+                    node, "recovery", switched=switched
                 )
-            self._bump_statistic("active", "total")
-            before = self.api.get_mihomo_status()
-            result = self.api.quality_test(node_id)
-            if self._epoch_changed(
-                before, node_id, node.get("name"), trigger="recovery"
-            ):
-                return
-            classification, reason = classify_result(result, self.config)
-            self._record_probe(node, result, classification, reason, now)
+                if result is None:
+                    self._settle_budget(node_id, 0)
+                    return None
+                self._remember_probe_result(node_id, before, result)
+                classification, reason = classify_result(result, self.config)
+            with self._state_lock:
+                self._record_probe(node, result, classification, reason, now)
         except Exception as exc:
-            if self._probe_account_unavailable(exc):
-                self._defer_no_account(state, node, now, "recovery_probe_deferred")
-                return
-            self._bump_statistic("active", "errors")
-            state["quarantined_until"] = now + self.config.quarantine_seconds
-            state["last_reason"] = "recovery_probe_error"
+            self._settle_budget(node_id, 0)
+            if self._drain_aborted():
+                return None
+            with self._state_lock:
+                if self._probe_account_unavailable(exc):
+                    self._defer_no_account(state, node, now, "recovery_probe_deferred")
+                    return None
+                self._bump_statistic("active", "errors")
+                state["quarantined_until"] = now + self.config.quarantine_seconds
+                state["last_reason"] = "recovery_probe_error"
             log_event(
                 "recovery_probe_failed",
                 node_id=node_id,
                 node_name=node.get("name"),
                 error_type=type(exc).__name__,
             )
-            return
+            return None
+        return classification, reason, connectivity_status
+
+    def _recover_quarantined(
+        self,
+        node: dict[str, Any],
+        now: float,
+        rotate: bool,
+        rotate_on_failure: bool = False,
+    ) -> None:
+        node_id = str(node["id"])
+        state = self._state_for(node_id)
+        # A rotation changes the exit, so only same-IP recoveries reuse results.
+        reused = None if rotate else self._reusable_probe_result(node)
+        if reused is not None:
+            classification, reason = classify_result(reused, self.config)
+            connectivity_status = "skipped"
+        else:
+            probed = self._run_recovery_probe(node, now, rotate)
+            if probed is None:
+                return
+            classification, reason, connectivity_status = probed
         if classification != "healthy":
-            state["quarantined_until"] = now + self.config.quarantine_seconds
-            state["last_reason"] = reason
+            with self._state_lock:
+                state["quarantined_until"] = now + self.config.quarantine_seconds
+                state["last_reason"] = reason
             log_event(
                 "quarantine_extended",
                 node_id=node_id,
@@ -1262,50 +4024,98 @@ class Guard:
             if rotate_on_failure and self._should_rotate(node_id, reason):
                 self._recover_quarantined(node, time.time(), rotate=True)
             return
-        updated = self.api.set_enabled(node_id, True)
-        if updated != 1:
-            log_event(
-                "restore_not_applied",
-                node_id=node_id,
-                node_name=node.get("name"),
-                updated=updated,
-            )
+        batch: ActuationBatch | None = getattr(self._actuator, "batch", None)
+        if batch is not None:
+            batch.restores.setdefault(node_id, (node, now, connectivity_status))
             return
-        if self._is_mihomo_synced(node):
-            node_name = str(node.get("name") or "")
-            if node_name and not self.api.unban_test_member(node_name):
-                # 解除封禁失败仅记录、不阻断恢复：节点已重新启用，黑名单 TTL
-                # 到期后测试组自然恢复该成员。
-                log_event(
-                    "mihomo_unban_failed",
+        self._apply_restores([(node, now, connectivity_status)])
+
+    def _apply_restores(
+        self, decisions: list[tuple[dict[str, Any], float, str]]
+    ) -> None:
+        # Each node is owned by the recovery that decided it, so only the
+        # settlement below needs the state lock; the requests run without it.
+        if not decisions:
+            return
+        # As with quarantines, synced nodes are restored by unbanning the
+        # test-group member rather than by a PATCH.
+        patched = [
+            str(node["id"])
+            for node, _now, _status in decisions
+            if not self._is_mihomo_synced(node)
+        ]
+        changed: set[str] = set()
+        if patched:
+            try:
+                changed = self._set_enabled_batch(patched, True)
+            except Exception as exc:
+                # Ownership is untouched, so the nodes stay quarantined and
+                # the next recovery probe retries the restore.
+                for node, _now, _status in decisions:
+                    if str(node["id"]) in patched:
+                        log_event(
+                            "restore_failed",
+                            node_id=str(node["id"]),
+                            node_name=node.get("name"),
+                            error_type=type(exc).__name__,
+                        )
+                patched = []
+        restored: list[tuple[dict[str, Any], float, str]] = []
+        for node, now, connectivity_status in decisions:
+            node_id = str(node["id"])
+            if self._is_mihomo_synced(node):
+                node_name = str(node.get("name") or "")
+                if not (node_name and self.api.unban_test_member(node_name)):
+                    # 解除封禁失败则保持隔离，下一次恢复探测重试。
+                    log_event(
+                        "mihomo_unban_failed",
+                        node_id=node_id,
+                        node_name=node.get("name"),
+                    )
+                    continue
+            elif node_id not in changed:
+                if node_id in patched:
+                    log_event(
+                        "restore_not_applied",
+                        node_id=node_id,
+                        node_name=node.get("name"),
+                    )
+                continue
+            restored.append((node, now, connectivity_status))
+        with self._state_lock:
+            for node, now, _status in restored:
+                node_id = str(node["id"])
+                state = self._state_for(node_id)
+                state.update(
+                    {
+                        "active_soft_strikes": 0,
+                        "passive_soft_strikes": 0,
+                        "error_strikes": 0,
+                        "quarantined_until": 0.0,
+                        "disabled_by_guard": False,
+                        "last_reason": "",
+                        "healthy_streak": 0,
+                        "last_restored_at": now,
+                    }
+                )
+                # The recovery probe is fresh evidence; wait a full period (the
+                # short adaptive period while the restore is recent).
+                state["next_probe_at"] = now + self._probe_interval(node_id, now)
+                node["enabled"] = True
+                self._bump_statistic("actions", "restored")
+                self._append_event(
+                    "node_restored",
                     node_id=node_id,
                     node_name=node.get("name"),
+                    reason="quality_probe_healthy",
                 )
-        state.update(
-            {
-                "active_soft_strikes": 0,
-                "passive_soft_strikes": 0,
-                "error_strikes": 0,
-                "quarantined_until": 0.0,
-                "disabled_by_guard": False,
-                "last_reason": "",
-            }
-        )
-        node["enabled"] = True
-        self._bump_statistic("actions", "restored")
-        append_state_event(
-            self.state,
-            "node_restored",
-            node_id=node_id,
-            node_name=node.get("name"),
-            reason="quality_probe_healthy",
-        )
-        log_event(
-            "node_restored",
-            node_id=node_id,
-            node_name=node.get("name"),
-            connectivity_status=connectivity_status,
-        )
+        for node, _now, connectivity_status in restored:
+            log_event(
+                "node_restored",
+                node_id=str(node["id"]),
+                node_name=node.get("name"),
+                connectivity_status=connectivity_status,
+            )
 
     def _probe_quarantined(self, node: dict[str, Any], now: float) -> None:
         node_id = str(node["id"])
@@ -1313,7 +4123,7 @@ class Guard:
         if now < float(state.get("quarantined_until", 0.0)):
             return
         reason = str(state.get("last_reason") or "")
-        self._recover_quarantined(
+        self._start_recovery(
             node,
             now,
             rotate=self._should_rotate(node_id, reason) and reason != "buffered_burst",
@@ -1323,13 +4133,47 @@ class Guard:
     def _prepare_nodes(
         self, now: float
     ) -> tuple[list[dict[str, Any]], list[dict[str, Any]], set[str]]:
-        all_nodes = self.api.list_nodes()
+        snapshot = self.api.guard_snapshot()
+        if snapshot is None:
+            self._snapshot_mihomo = None
+            all_nodes = self.api.list_nodes()
+            protected_node_ids = self.api.fixed_fallback_node_ids()
+        else:
+            self._snapshot_mihomo = (time.monotonic(), snapshot["mihomo"])
+            all_nodes = snapshot["nodes"]
+            protected_node_ids = snapshot["fixed_fallback_ids"]
         self._mihomo_member_by_node = {
             str(node.get("id") or ""): str(node.get("name") or "")
             for node in all_nodes
             if node.get("id") and self._is_mihomo_synced(node)
         }
-        protected_node_ids = self.api.fixed_fallback_node_ids()
+        with self._state_lock:
+            nodes, skip_ids, reenabled, quarantined = self._reconcile_nodes(
+                now, all_nodes, protected_node_ids
+            )
+        # Recoveries run inline without a recovery worker; their restores
+        # go out together once every quarantined node has been probed.
+        with self._actuation():
+            for node in reenabled:
+                self._requarantine_reenabled(node, now)
+            for node in quarantined:
+                self._probe_quarantined(node, now)
+        return all_nodes, nodes, skip_ids
+
+    def _reconcile_nodes(
+        self,
+        now: float,
+        all_nodes: list[dict[str, Any]],
+        protected_node_ids: set[str],
+    ) -> tuple[
+        list[dict[str, Any]], set[str], list[dict[str, Any]], list[dict[str, Any]]
+    ]:
+        """Settle ownership and eligibility against a fresh node listing.
+
+        Returns the managed nodes, the IDs the active cycle skips, and the
+        operator re-enabled and quarantined nodes whose follow-up requests
+        the caller makes after releasing the state lock.
+        """
         previous_protected = set(
             str(value) for value in self.state.get("protected_node_ids", [])
         )
@@ -1374,6 +4218,7 @@ class Guard:
                 and node.get("proxyConfigured")
                 and not self._is_mihomo_type(node)
                 and str(node["id"]) not in protected_node_ids
+                and self.config.owns(str(node["id"]))
             ]
         nodes = self._eligible_nodes(all_nodes, protected_node_ids)
         present_ids = {str(node.get("id")) for node in all_nodes if node.get("id")}
@@ -1385,34 +4230,28 @@ class Guard:
             ):
                 del state_nodes[stale_id]
         skip_ids: set[str] = set()
+        reenabled: list[dict[str, Any]] = []
+        quarantined: list[dict[str, Any]] = []
         if not nodes:
             log_event("no_eligible_nodes")
-            return all_nodes, [], skip_ids
+            return [], skip_ids, reenabled, quarantined
         for node in nodes:
             node_id = str(node["id"])
+            if self._recovering(node_id):
+                # The recovery worker owns this node until its result is applied.
+                skip_ids.add(node_id)
+                continue
             state = self._state_for(node_id)
-            if state.get("disabled_by_guard") and node.get("enabled"):
+            # Synced nodes stay enabled while quarantined (the test-group
+            # ban is the quarantine), so their flag is no operator override.
+            if (
+                state.get("disabled_by_guard")
+                and node.get("enabled")
+                and not self._is_mihomo_synced(node)
+            ):
+                skip_ids.add(node_id)
                 if self.config.fail_closed:
-                    updated = self.api.set_enabled(node_id, False)
-                    if updated == 1:
-                        node["enabled"] = False
-                        state["quarantined_until"] = (
-                            now + self.config.quarantine_seconds
-                        )
-                        log_event(
-                            "operator_reenable_requires_probe",
-                            node_id=node_id,
-                            node_name=node.get("name"),
-                        )
-                        reason = str(state.get("last_reason") or "")
-                        self._recover_quarantined(
-                            node,
-                            now,
-                            rotate=self._should_rotate(node_id, reason)
-                            and reason != "buffered_burst",
-                            rotate_on_failure=reason == "buffered_burst",
-                        )
-                    skip_ids.add(node_id)
+                    reenabled.append(node)
                     continue
                 state.update(
                     {
@@ -1429,28 +4268,274 @@ class Guard:
                     node_id=node_id,
                     node_name=node.get("name"),
                 )
-                skip_ids.add(node_id)
                 continue
             if state.get("disabled_by_guard"):
                 skip_ids.add(node_id)
-                self._probe_quarantined(node, now)
-        return all_nodes, nodes, skip_ids
+                quarantined.append(node)
+        return nodes, skip_ids, reenabled, quarantined
+
+    def _requarantine_reenabled(self, node: dict[str, Any], now: float) -> None:
+        """In strict mode, disable an operator re-enabled node until it recovers."""
+        node_id = str(node["id"])
+        if self.api.set_enabled(node_id, False) != 1:
+            return
+        with self._state_lock:
+            node["enabled"] = False
+            state = self._state_for(node_id)
+            state["quarantined_until"] = now + self.config.quarantine_seconds
+            reason = str(state.get("last_reason") or "")
+        log_event(
+            "operator_reenable_requires_probe",
+            node_id=node_id,
+            node_name=node.get("name"),
+        )
+        self._start_recovery(
+            node,
+            now,
+            rotate=self._should_rotate(node_id, reason) and reason != "buffered_burst",
+            rotate_on_failure=reason == "buffered_burst",
+        )
+
+    def _active_targets(
+        self, nodes: list[dict[str, Any]], skip_ids: set[str]
+    ) -> list[dict[str, Any]]:
+        return [
+            node
+            for node in nodes
+            if str(node["id"]) not in skip_ids
+            and node.get("enabled")
+            and not self._state_for(str(node["id"])).get("disabled_by_guard")
+        ]
+
+    def _probe_targets(
+        self,
+        all_nodes: list[dict[str, Any]],
+        targets: list[dict[str, Any]],
+        now: float,
+        deadline: float = math.inf,
+    ) -> list[str]:
+        """Probe targets until ``deadline``; return the IDs never started."""
+        if self.config.active_concurrency > 1 and len(targets) > 1:
+            carried: list[str] = []
+            begun: set[str] = set()
+            if not self._batch_probes_unsupported:
+                targets, begun, carried = self._probe_batched(
+                    all_nodes, targets, now, deadline
+                )
+            return carried + self._probe_concurrently(
+                all_nodes, targets, now, deadline, begun
+            )
+        for index, node in enumerate(targets):
+            if self.draining or time.time() >= deadline:
+                return [str(value["id"]) for value in targets[index:]]
+            self._probe_active(all_nodes, node, now)
+            self._save()
+        return []
+
+    def _cycle_deadline(self, now: float) -> float:
+        budget = self.config.active_cycle_budget_seconds
+        return now + budget if budget > 0 else math.inf
+
+    def _log_cycle_budget(self, targets: int, carried: list[str]) -> None:
+        if carried and self.draining:
+            log_event(
+                "active_cycle_drained",
+                targets=targets,
+                started=targets - len(carried),
+                carried_over=carried,
+            )
+        elif carried:
+            log_event(
+                "active_cycle_budget_exhausted",
+                budget_seconds=self.config.active_cycle_budget_seconds,
+                targets=targets,
+                started=targets - len(carried),
+                carried_over=carried,
+            )
 
     def run_active_cycle(self) -> None:
         now = time.time()
         all_nodes, nodes, skip_ids = self._prepare_nodes(now)
-        for node in nodes:
+        targets = self._active_targets(nodes, skip_ids)
+        carried = self._probe_targets(
+            all_nodes, targets, now, self._cycle_deadline(now)
+        )
+        self._log_cycle_budget(len(targets), carried)
+        with self._state_lock:
+            self.state["last_active_cycle_at"] = time.time()
+        self._save()
+
+    def _probe_schedule(
+        self, targets: list[dict[str, Any]], now: float
+    ) -> list[tuple[float, str]]:
+        """Build the deadline heap, giving unscheduled nodes evenly spaced slots.
+
+        Deadlines live in each node's ``next_probe_at`` so restarts resume the
+        same phase. A shortened interval pulls distant deadlines back in range.
+        """
+        interval = float(self.config.active_interval_seconds)
+        spacing = interval / max(1, len(targets))
+        heap: list[tuple[float, str]] = []
+        unscheduled: list[tuple[float, str]] = []
+        for node in targets:
             node_id = str(node["id"])
             state = self._state_for(node_id)
-            if (
-                node_id not in skip_ids
-                and node.get("enabled")
-                and not state.get("disabled_by_guard")
-            ):
-                self._probe_active(all_nodes, node, now)
+            due = float(state.get("next_probe_at", 0.0))
+            if due <= 0:
+                unscheduled.append((float(state.get("last_probe_at", 0.0)), node_id))
+                continue
+            due = min(
+                due,
+                now + self._probe_interval(node_id, now) + self.config.jitter_seconds,
+            )
+            state["next_probe_at"] = due
+            heap.append((due, node_id))
+        # Oldest evidence first, then one slot per node across the interval.
+        for index, (_last_probe_at, node_id) in enumerate(sorted(unscheduled)):
+            due = now + index * spacing
+            self._state_for(node_id)["next_probe_at"] = due
+            heap.append((due, node_id))
+        heapq.heapify(heap)
+        return heap
+
+    def next_recovery_at(self, now: float) -> float:
+        """Wall-clock time the earliest future guard quarantine ends, or ``inf``.
+
+        Quarantines that already ended are left to the regular cadence, so a
+        recovery that is deferred without extending its quarantine cannot
+        turn into a busy loop.
+        """
+        with self._state_lock:
+            return min(
+                (
+                    until
+                    for state in self.state.get("nodes", {}).values()
+                    if state.get("disabled_by_guard")
+                    and (until := float(state.get("quarantined_until", 0.0))) > now
+                ),
+                default=math.inf,
+            )
+
+    def _next_probe_deadline(self, node_id: str, due: float, now: float) -> float:
+        jitter = random.uniform(-self.config.jitter_seconds, self.config.jitter_seconds)
+        # Keep the node's phase so slots stay spread; a node that fell behind
+        # restarts its period from now instead of bursting to catch up.
+        return max(due, now) + self._probe_interval(node_id, now) + jitter
+
+    def _probe_interval(self, node_id: str, now: float) -> float:
+        """Scheduled probe period for one node.
+
+        In adaptive mode the base period doubles for every
+        ``ADAPTIVE_HEALTHY_STREAK`` consecutive healthy probes and drops to the
+        configured minimum while the node carries strikes or was suspect or
+        restored within the last base period. Fixed mode always returns the
+        base period.
+        """
+        interval = float(self.config.active_interval_seconds)
+        if not self.config.adaptive_interval:
+            return interval
+        state = self._state_for(node_id)
+        recent = now - interval
+        if (
+            int(state.get("active_soft_strikes", 0))
+            or int(state.get("passive_soft_strikes", 0))
+            or int(state.get("error_strikes", 0))
+            or float(state.get("last_suspect_at", 0.0)) > recent
+            or float(state.get("last_restored_at", 0.0)) > recent
+        ):
+            return float(self.config.active_interval_min_seconds)
+        doublings = min(
+            int(state.get("healthy_streak", 0)) // ADAPTIVE_HEALTHY_STREAK, 16
+        )
+        return float(
+            max(
+                self.config.active_interval_min_seconds,
+                min(self.config.active_interval_max_seconds, interval * 2**doublings),
+            )
+        )
+
+    def run_scheduled_probes(self) -> float:
+        """Probe only nodes whose deadline has passed.
+
+        Returns the wall-clock time of the next deadline so the caller can
+        sleep until then instead of waking for a full-cycle burst.
+        """
+        plan = self._plan_scheduled_probes()
+        if plan.targets:
+            plan.carried = self._probe_targets(
+                plan.all_nodes, plan.targets, plan.now, plan.deadline
+            )
+        return self._finish_scheduled_probes(plan)
+
+    def _plan_scheduled_probes(self) -> ProbePlan:
+        now = time.time()
+        all_nodes, nodes, skip_ids = self._prepare_nodes(now)
+        targets = self._active_targets(nodes, skip_ids)
+        node_by_id = {str(node["id"]): node for node in targets}
+        with self._state_lock:
+            heap = self._probe_schedule(targets, now)
+        due: list[tuple[float, str]] = []
+        while heap and heap[0][0] <= now:
+            due.append(heapq.heappop(heap))
+        covered = [node_id for _, node_id in due if self._passive_covered(node_id, now)]
+        if covered:
+            self._bump_statistic("actions", "passive_covered", len(covered))
+            log_event("scheduled_probes_covered_by_passive", node_ids=covered)
+        return ProbePlan(
+            now=now,
+            all_nodes=all_nodes,
+            targets=[
+                node_by_id[node_id] for _, node_id in due if node_id not in covered
+            ],
+            due=due,
+            heap=heap,
+            deadline=self._cycle_deadline(now),
+        )
+
+    def _passive_covered(self, node_id: str, now: float) -> bool:
+        """True when recent healthy production audits can stand in for a probe.
+
+        Only hybrid mode qualifies, since passive polling must be running, and
+        a node with any open strike is always probed.
+        """
+        needed = self.config.passive_coverage_audits
+        if needed <= 0 or self.config.mode != "hybrid":
+            return False
+        state = self._state_for(node_id)
+        if (
+            int(state.get("active_soft_strikes", 0))
+            or int(state.get("passive_soft_strikes", 0))
+            or int(state.get("error_strikes", 0))
+        ):
+            return False
+        since = now - self.config.passive_coverage_window_seconds
+        recent = [
+            float(value)
+            for value in state.get("passive_healthy_at") or []
+            if float(value) >= since
+        ]
+        return len(recent) >= needed
+
+    def _finish_scheduled_probes(self, plan: ProbePlan) -> float:
+        with self._state_lock:
+            heap = plan.heap
+            self._log_cycle_budget(len(plan.targets), plan.carried)
+            carried = set(plan.carried)
+            if plan.due:
+                for previous, node_id in plan.due:
+                    if node_id in carried:
+                        # Unreached nodes keep their overdue deadline, so they sort
+                        # ahead of everything else in the next slot.
+                        heapq.heappush(heap, (previous, node_id))
+                        continue
+                    deadline = self._next_probe_deadline(node_id, previous, plan.now)
+                    self._state_for(node_id)["next_probe_at"] = deadline
+                    heapq.heappush(heap, (deadline, node_id))
+                self.state["last_active_cycle_at"] = time.time()
             self._save()
-        self.state["last_active_cycle_at"] = time.time()
-        self._save()
+            if not heap:
+                return plan.now + self.config.active_interval_seconds
+            return heap[0][0]
 
     def _fetch_new_audits(self) -> list[dict[str, Any]]:
         known = set(str(value) for value in self.state.get("seen_audit_ids", []))
@@ -1460,19 +4545,24 @@ class Guard:
         reached_known = False
         for _page in range(self.config.passive_max_pages):
             page = self.api.list_audits(cursor)
-            items = list(page.get("items") or [])
-            if not items:
-                break
-            for item in items:
-                audit_id = str(item.get("id") or item.get("requestId") or "")
-                if not audit_id:
-                    continue
-                fetched_ids.append(audit_id)
-                if audit_id in known:
-                    reached_known = True
-                    break
-                collected.append(item)
-            if reached_known or not page.get("hasMore"):
+            items = page.get("items") or []
+            empty = True
+            try:
+                for item in items:
+                    empty = False
+                    audit_id = str(item.get("id") or item.get("requestId") or "")
+                    if not audit_id:
+                        continue
+                    fetched_ids.append(audit_id)
+                    if audit_id in known:
+                        reached_known = True
+                        break
+                    collected.append(item)
+            finally:
+                if hasattr(items, "close"):
+                    # A streamed page stops decoding and drops its connection.
+                    items.close()
+            if empty or reached_known or not page.get("hasMore"):
                 break
             cursor = str(page.get("nextCursor") or "")
             if not cursor:
@@ -1487,9 +4577,11 @@ class Guard:
                 combined.append(audit_id)
             if len(combined) >= 2000:
                 break
-        self.state["seen_audit_ids"] = combined
-        if not self.state.get("passive_initialized"):
+        with self._state_lock:
+            self.state["seen_audit_ids"] = combined
+            initialized = bool(self.state.get("passive_initialized"))
             self.state["passive_initialized"] = True
+        if not initialized:
             log_event("passive_baseline_initialized", audit_count=len(fetched_ids))
             return []
         if collected and not reached_known and known:
@@ -1531,15 +4623,25 @@ class Guard:
         )
         if classification == "healthy":
             state["passive_soft_strikes"] = 0
+            if self.config.passive_coverage_audits > 0:
+                # Coverage dates from the request itself: a backlog read after
+                # downtime must not count as traffic seen at poll time.
+                recent = list(state.get("passive_healthy_at") or [])
+                recent.append(min(now, audit_time(audit_value, now)))
+                state["passive_healthy_at"] = recent[
+                    -self.config.passive_coverage_audits :
+                ]
             return
+        state["passive_healthy_at"] = []
+        state["healthy_streak"] = 0
+        state["last_suspect_at"] = now
         if classification == "soft":
             state["passive_soft_strikes"] = (
                 int(state.get("passive_soft_strikes", 0)) + 1
             )
         else:
             state["passive_soft_strikes"] = self.config.consecutive_soft
-        append_state_event(
-            self.state,
+        self._append_event(
             "passive_audit_anomaly",
             node_id=node_id,
             node_name=node.get("name"),
@@ -1566,28 +4668,961 @@ class Guard:
         if self.config.fail_closed:
             self._quarantine(all_nodes, node, reason, now)
             return
-        self._probe_active(all_nodes, node, now, trigger="passive_confirmation")
+        self._request_confirmation(all_nodes, node)
 
     def run_passive_cycle(self) -> None:
         now = time.time()
-        self.state["last_passive_poll_at"] = now
+        with self._state_lock:
+            self.state["last_passive_poll_at"] = now
         all_nodes, nodes, _skip_ids = self._prepare_nodes(now)
         node_by_id = {str(node["id"]): node for node in nodes}
         audits = self._fetch_new_audits()
-        for value in audits:
-            if bool(value.get("qualityProbe")):
-                continue
-            node = node_by_id.get(str(value.get("egressNodeId") or ""))
-            if node is None or not node.get("enabled"):
-                continue
-            self._record_passive_audit(all_nodes, node, value, now)
+        # An incident trips many nodes in one poll; act on them together once
+        # the state lock is released.
+        with self._actuation(), self._state_lock:
+            for value in audits:
+                if bool(value.get("qualityProbe")):
+                    continue
+                node = node_by_id.get(str(value.get("egressNodeId") or ""))
+                if (
+                    node is None
+                    or not node.get("enabled")
+                    or self._state_for(str(node["id"])).get("disabled_by_guard")
+                    or self._recovering(str(node["id"]))
+                    or self._actuation_pending(str(node["id"]))
+                ):
+                    continue
+                self._record_passive_audit(all_nodes, node, value, now)
         self._save()
+        backlog, self._confirmation_backlog = self._confirmation_backlog, {}
+        for confirmation_nodes, node in backlog.values():
+            self._run_confirmation(node, confirmation_nodes)
 
     # Backward-compatible name for callers that expect one active cycle.
     def run_cycle(self) -> None:
         self.run_active_cycle()
 
 
+class NodeTaskWorker:
+    """Runs per-node guard tasks on a dedicated thread, coalesced by node.
+
+    At most one task per node is queued or in flight; a submission for a node
+    that already has one is dropped. The guard loops consult :meth:`owns` where
+    a node must have a single writer until its task has been applied.
+    """
+
+    def __init__(
+        self, name: str, failure_event: str, handler: Callable[..., None]
+    ) -> None:
+        self.name = name
+        self.failure_event = failure_event
+        self.handler = handler
+        self.jobs: queue.Queue[tuple[dict[str, Any], tuple[Any, ...]] | None] = (
+            queue.Queue()
+        )
+        self.pending: set[str] = set()
+        self._pending_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None, cancel: bool = False) -> None:
+        """Stop the thread, waiting at most ``timeout`` seconds.
+
+        Queued tasks still run first unless ``cancel`` drops them, leaving only
+        the task in flight to finish.
+        """
+        if self._thread is None:
+            return
+        if cancel:
+            with contextlib.suppress(queue.Empty):
+                while True:
+                    job = self.jobs.get_nowait()
+                    if job is not None:
+                        with self._pending_lock:
+                            self.pending.discard(str(job[0]["id"]))
+        self.jobs.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def owns(self, node_id: str) -> bool:
+        with self._pending_lock:
+            return node_id in self.pending
+
+    def submit(self, node: dict[str, Any], *args: Any) -> bool:
+        node_id = str(node["id"])
+        with self._pending_lock:
+            if node_id in self.pending:
+                return False
+            self.pending.add(node_id)
+        self.jobs.put((node, args))
+        return True
+
+    def _run(self) -> None:
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            node, args = job
+            node_id = str(node["id"])
+            try:
+                self.handler(node, *args)
+            except Exception as exc:
+                log_event(
+                    self.failure_event,
+                    node_id=node_id,
+                    node_name=node.get("name"),
+                    error_type=type(exc).__name__,
+                )
+            finally:
+                with self._pending_lock:
+                    self.pending.discard(node_id)
+
+
+class AsyncGuardEngine:
+    """Runs the guard detectors as cooperating tasks on one asyncio loop.
+
+    Passive polling, scheduled probes, and runtime config reloads are separate
+    tasks. All internal API traffic goes through :class:`AsyncApiClient`;
+    regular-node probes are awaited directly, bounded by
+    ``active_concurrency``. Guard decisions still run in the synchronous
+    :class:`Guard` methods, serialized on a single state thread, so both
+    engines share one decision implementation. Mihomo-synced probes hold the
+    shared test-group lock and are handed to a thread.
+    """
+
+    def __init__(
+        self,
+        guard: Guard,
+        api: AsyncApiClient,
+        reloader: RuntimeConfigReloader | None = None,
+    ) -> None:
+        self.guard = guard
+        self.api = api
+        self.reloader = reloader
+        self.lease: LeaderLease | None = None
+        self.state_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="guard-state"
+        )
+        # Mihomo-synced probes block a thread; a private pool lets an expired
+        # drain leave them behind, which the loop's default executor cannot.
+        self.probe_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="quality-probe"
+        )
+        self.stopping = asyncio.Event()
+        self.abandoned = False
+        self._wakeups: list[asyncio.Event] = []
+        self._reload_wakeup: asyncio.Event | None = None
+        self._loops: asyncio.Future | None = None
+
+    def stop(self) -> None:
+        """Begin draining: no new probes, and in-flight ones get the grace."""
+        if not self.stopping.is_set() and self._loops is not None:
+            asyncio.get_running_loop().call_later(
+                self.guard.drain_remaining(), self._abandon
+            )
+        self.guard.drain()
+        self.stopping.set()
+        for wakeup in self._wakeups:
+            wakeup.set()
+
+    def _abandon(self) -> None:
+        if self._loops is not None and not self._loops.done():
+            log_event("drain_grace_expired")
+            self.abandoned = True
+            self._loops.cancel()
+
+    def request_reload(self) -> None:
+        """Check the runtime config now instead of at the next poll."""
+        if self._reload_wakeup is not None:
+            self._reload_wakeup.set()
+
+    async def run(self, once: bool = False) -> None:
+        try:
+            if once:
+                await self._run_once()
+                return
+            self.guard.start_workers()
+            self._loops = asyncio.gather(
+                self._passive_loop(), self._active_loop(), self._reload_loop()
+            )
+            try:
+                await self._loops
+            except asyncio.CancelledError:
+                if not self.abandoned:
+                    raise
+        finally:
+            await asyncio.to_thread(
+                self.guard.stop_workers,
+                timeout=self.guard.drain_remaining(),
+                cancel=True,
+            )
+            self.probe_executor.shutdown(wait=not self.abandoned, cancel_futures=True)
+            self.state_executor.shutdown(wait=not self.abandoned, cancel_futures=True)
+            self.guard.close()
+
+    async def _in_state(self, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.state_executor, functools.partial(fn, *args)
+        )
+
+    def _wakeup(self) -> asyncio.Event:
+        wakeup = asyncio.Event()
+        self._wakeups.append(wakeup)
+        return wakeup
+
+    @staticmethod
+    async def _sleep(wakeup: asyncio.Event, delay: float | None) -> None:
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(wakeup.wait(), delay)
+        wakeup.clear()
+
+    async def _run_once(self) -> None:
+        mode = self.guard.config.mode
+        if mode in {"passive", "hybrid"}:
+            try:
+                await self._in_state(self.guard.run_passive_cycle)
+            except Exception as exc:
+                log_event("passive_cycle_failed", error_type=type(exc).__name__)
+        if mode in {"active", "hybrid"}:
+            try:
+                await self._in_state(self.guard.run_active_cycle)
+            except Exception as exc:
+                log_event("active_cycle_failed", error_type=type(exc).__name__)
+
+    async def _passive_loop(self) -> None:
+        wakeup = self._wakeup()
+        while not self.stopping.is_set():
+            config = self.guard.config
+            delay: float | None = None
+            if config.mode in {"passive", "hybrid"}:
+                try:
+                    await self._in_state(self.guard.run_passive_cycle)
+                except Exception as exc:
+                    log_event("passive_cycle_failed", error_type=type(exc).__name__)
+                delay = config.passive_poll_seconds
+            await self._sleep(wakeup, delay)
+
+    async def _active_loop(self) -> None:
+        wakeup = self._wakeup()
+        while not self.stopping.is_set():
+            delay: float | None = None
+            if self.guard.config.mode in {"active", "hybrid"}:
+                try:
+                    next_deadline = await self.run_scheduled_probes()
+                except Exception as exc:
+                    log_event("active_cycle_failed", error_type=type(exc).__name__)
+                    next_deadline = time.time() + 60.0
+                next_deadline = min(
+                    next_deadline, self.guard.next_recovery_at(time.time())
+                )
+                delay = max(1.0, next_deadline - time.time())
+            await self._sleep(wakeup, delay)
+
+    async def _reload_loop(self) -> None:
+        if self.reloader is None:
+            return
+        wakeup = self._wakeup()
+        self._reload_wakeup = wakeup
+        loop = asyncio.get_running_loop()
+        watcher = ConfigWatcher.open(self.reloader.watched_files())
+
+        def on_config_event() -> None:
+            nonlocal watcher
+            assert watcher is not None
+            if watcher.read_changes():
+                wakeup.set()
+            if watcher.lost:
+                log_event("config_watch_lost")
+                loop.remove_reader(watcher.fileno())
+                watcher.close()
+                watcher = None
+
+        if watcher is not None:
+            loop.add_reader(watcher.fileno(), on_config_event)
+        try:
+            while not self.stopping.is_set():
+                delay = None if watcher is not None else RUNTIME_CONFIG_POLL_SECONDS
+                await self._sleep(wakeup, delay)
+                if self.stopping.is_set():
+                    return
+                await self._check_config(wakeup)
+        finally:
+            if watcher is not None:
+                loop.remove_reader(watcher.fileno())
+                watcher.close()
+
+    async def _check_config(self, wakeup: asyncio.Event) -> None:
+        assert self.reloader is not None
+        config, changed, runtime_error = await self._in_state(self.reloader.reload)
+        if isinstance(runtime_error, GuardDisabled):
+            log_event("guard_disabled")
+            self.stop()
+        elif runtime_error is not None:
+            log_event(
+                "runtime_config_rejected", error_type=type(runtime_error).__name__
+            )
+        elif changed:
+            await self._in_state(self._apply_config, config)
+            for other in self._wakeups:
+                if other is not wakeup:
+                    other.set()
+
+    def _apply_config(self, config: Config) -> None:
+        previous_mode = self.guard.config.mode
+        self.guard.config = config
+        self.guard.api.config = config
+        self.api.config = config
+        if self.lease is not None:
+            self.lease.api.config = config
+        self.guard._save()
+        log_event(
+            "runtime_config_reloaded", previous_mode=previous_mode, mode=config.mode
+        )
+
+    async def run_scheduled_probes(self) -> float:
+        """Async counterpart of :meth:`Guard.run_scheduled_probes`.
+
+        The state thread is released while probes are in flight, so passive
+        polls keep running between probe completions.
+        """
+        guard = self.guard
+        plan = await self._in_state(guard._plan_scheduled_probes)
+        limit = asyncio.Semaphore(guard.config.active_concurrency)
+
+        async def probe(node: dict[str, Any]) -> tuple[dict[str, Any], Any]:
+            async with limit:
+                # Like the thread engine, stop starting probes at the deadline
+                # or once a drain has begun.
+                if guard.draining or time.time() >= plan.deadline:
+                    plan.carried.append(str(node["id"]))
+                    return node, None
+                if not await self._in_state(guard._begin_probe, node, plan.now):
+                    return node, None
+                return node, await self._probe_io(node, "scheduled")
+
+        for completed in asyncio.as_completed([probe(node) for node in plan.targets]):
+            node, outcome = await completed
+            if outcome is not None:
+                await self._in_state(self._apply_probe, plan, node, outcome)
+        return await self._in_state(guard._finish_scheduled_probes, plan)
+
+    def _apply_probe(
+        self, plan: ProbePlan, node: dict[str, Any], outcome: tuple[str, Any]
+    ) -> None:
+        self.guard._apply_probe(plan.all_nodes, node, plan.now, "scheduled", outcome)
+        self.guard._save()
+
+    async def _probe_io(self, node: dict[str, Any], trigger: str) -> tuple[str, Any]:
+        if self.guard._is_mihomo_synced(node):
+            return await asyncio.get_running_loop().run_in_executor(
+                self.probe_executor, self.guard._run_probe, node, trigger
+            )
+        node_id = str(node["id"])
+        loop = asyncio.get_running_loop()
+        with self.guard._epoch_window(node_id) as window:
+            if window is not None:
+                before = window.before
+            else:
+                before = await self.api.get_mihomo_status()
+            probe = asyncio.ensure_future(
+                self.api.quality_test(node_id, self.guard.config.early_exit_probe)
+            )
+            aborts = contextlib.ExitStack()
+            if window is not None:
+                aborts.enter_context(
+                    window.cancellation.attach(
+                        lambda: loop.call_soon_threadsafe(probe.cancel)
+                    )
+                )
+            with aborts:
+                try:
+                    result = await probe
+                except asyncio.CancelledError:
+                    current = asyncio.current_task()
+                    if (
+                        window is None
+                        or not window.cancellation.cancelled
+                        or (current is not None and current.cancelling())
+                    ):
+                        raise
+                    result = None
+                except Exception as exc:
+                    return "error", exc
+            live, after = window.watch.status() if window is not None else (False, None)
+        if before and not live:
+            after = await self.api.get_mihomo_status()
+        if before and self.guard._epoch_moved(
+            before, after, node_id, node.get("name"), trigger=trigger
+        ):
+            return "epoch_changed", None
+        if result is None:
+            return "error", RuntimeError("probe aborted")
+        self.guard._remember_probe_result(node_id, before, result)
+        return "result", result
+
+
+async def run_async_engine(
+    config: Config,
+    reloader: RuntimeConfigReloader,
+    once: bool,
+    lease: LeaderLease | None = None,
+) -> bool:
+    """Run the asyncio engine; True when an expired drain abandoned work."""
+    loop = asyncio.get_running_loop()
+    api = AsyncApiClient(config)
+    guard = Guard(config, LoopApiClient(config, api, loop), lease)
+    engine = AsyncGuardEngine(guard, api, reloader)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, engine.stop)
+    loop.add_signal_handler(signal.SIGHUP, engine.request_reload)
+    if lease is not None:
+        engine.lease = lease
+        lease.fence(api)
+        lease.on_lost = lambda: loop.call_soon_threadsafe(engine.stop)
+        lease.start()
+    await engine.run(once=once)
+    return engine.abandoned
+
+
+class ShardCoordinator:
+    """Supervises sharded guard workers and publishes their merged state.
+
+    Each worker is this script with ``--shard INDEX/COUNT``; it owns the nodes
+    that :func:`shard_of` assigns to it and keeps its own lock and state file.
+    The coordinator holds the main guard lock, seeds missing shard files from
+    the main state so quarantine ownership survives a change of shard count,
+    restarts exited workers, and rewrites the status file every
+    ``SHARD_MERGE_SECONDS``. Workers serialize quarantine decisions on
+    :attr:`Config.floor_lock_file` and recount enabled nodes under it, less
+    the nodes other shards' state files hold in quarantine, which keeps
+    ``min_healthy_nodes`` global.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        reloader: RuntimeConfigReloader,
+        count: int,
+        worker_args: list[str],
+    ):
+        self.config = config
+        self.reloader = reloader
+        self.count = count
+        self.worker_args = worker_args
+        self.workers: dict[int, subprocess.Popen] = {}
+        self.started_at: dict[int, float] = {}
+        self.stopping = False
+
+    def shard_config(self, index: int) -> Config:
+        return self.config.for_shard(index, self.count)
+
+    def worker_command(self, index: int) -> list[str]:
+        return [
+            sys.executable,
+            str(Path(__file__).resolve()),
+            "--shard",
+            f"{index}/{self.count}",
+            *self.worker_args,
+        ]
+
+    def seed(self) -> None:
+        state = load_state(self.config.state_file)
+        for index in range(self.count):
+            shard = self.shard_config(index)
+            if not shard.state_file.exists():
+                save_state(shard.state_file, shard_state_from(state, shard))
+
+    def spawn(self, index: int) -> None:
+        # Workers exit when this pipe closes, so they never outlive the
+        # coordinator and keep their shard locks.
+        worker = subprocess.Popen(self.worker_command(index), stdin=subprocess.PIPE)
+        self.workers[index] = worker
+        self.started_at[index] = time.monotonic()
+        log_event("shard_worker_started", shard=index, pid=worker.pid)
+
+    def supervise(self) -> None:
+        for index in range(self.count):
+            worker = self.workers.get(index)
+            if worker is not None:
+                returncode = worker.poll()
+                if returncode is None:
+                    continue
+                del self.workers[index]
+                log_event("shard_worker_exited", shard=index, returncode=returncode)
+            if time.monotonic() - self.started_at.get(index, -math.inf) >= (
+                SHARD_RESTART_SECONDS
+            ):
+                self.spawn(index)
+
+    def merge(self) -> None:
+        states: dict[int, dict[str, Any]] = {}
+        for index in range(self.count):
+            try:
+                states[index] = load_state(self.shard_config(index).state_file)
+            except RuntimeError as exc:
+                log_event("shard_state_unreadable", shard=index, error=str(exc))
+        save_state(
+            self.config.state_file,
+            merge_shard_states(self.config, states, self.count, time.time()),
+        )
+
+    def stop(self, timeout: float) -> None:
+        for worker in self.workers.values():
+            if worker.stdin is not None:
+                worker.stdin.close()
+            worker.terminate()
+        deadline = time.monotonic() + timeout
+        for worker in self.workers.values():
+            try:
+                worker.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                worker.kill()
+                worker.wait()
+        self.workers.clear()
+
+    def run(self, once: bool) -> None:
+        self.seed()
+        for index in range(self.count):
+            self.spawn(index)
+        if once:
+            for worker in self.workers.values():
+                worker.wait()
+            self.merge()
+            return
+        next_merge = 0.0
+        try:
+            while not self.stopping:
+                config, changed, runtime_error = self.reloader.reload()
+                if isinstance(runtime_error, GuardDisabled):
+                    log_event("guard_disabled")
+                    break
+                if runtime_error is None and changed:
+                    self.config = config
+                self.supervise()
+                if time.monotonic() >= next_merge:
+                    try:
+                        self.merge()
+                    except OSError as exc:
+                        log_event("shard_merge_failed", error_type=type(exc).__name__)
+                    next_merge = time.monotonic() + SHARD_MERGE_SECONDS
+                time.sleep(1.0)
+        finally:
+            # Workers drain on SIGTERM; allow their grace plus time to flush.
+            self.stop(self.config.drain_grace_seconds + DRAIN_FLUSH_SECONDS)
+            self.merge()
+
+
+class TimerLoop:
+    """Deadline heap driven by a selector, for the thread engine's main loop.
+
+    :meth:`wait` blocks until the earliest named timer is due or a registered
+    file becomes readable. Signals and :meth:`wake` write to a self-pipe that
+    the selector watches, so a signal, a lost lease, or a config-change
+    notification interrupts the wait at once instead of on the next poll.
+    """
+
+    WAKE = "wake"
+
+    def __init__(self) -> None:
+        self.selector = selectors.DefaultSelector()
+        self._reader, self._writer = os.pipe()
+        os.set_blocking(self._reader, False)
+        os.set_blocking(self._writer, False)
+        self.selector.register(self._reader, selectors.EVENT_READ, self.WAKE)
+        self._heap: list[tuple[float, str]] = []
+        self._deadlines: dict[str, float] = {}
+        self._previous_wakeup_fd: int | None = None
+
+    def call_at(self, name: str, when: float) -> None:
+        """(Re)schedule timer ``name`` at monotonic time ``when``."""
+        self._deadlines[name] = when
+        heapq.heappush(self._heap, (when, name))
+
+    def cancel(self, name: str) -> None:
+        self._deadlines.pop(name, None)
+
+    def add_reader(self, fileobj: Any, name: str) -> None:
+        self.selector.register(fileobj, selectors.EVENT_READ, name)
+
+    def remove_reader(self, fileobj: Any) -> None:
+        self.selector.unregister(fileobj)
+
+    def wake(self) -> None:
+        """Interrupt :meth:`wait`; safe from any thread."""
+        with contextlib.suppress(BlockingIOError):
+            os.write(self._writer, b"\0")
+
+    def watch_signals(self) -> None:
+        """Let Python signal handlers interrupt :meth:`wait` (main thread only)."""
+        self._previous_wakeup_fd = signal.set_wakeup_fd(
+            self._writer, warn_on_full_buffer=False
+        )
+
+    def next_deadline(self) -> float | None:
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def wait(self) -> set[str]:
+        """Block until something is due; returns due timer and reader names."""
+        deadline = self.next_deadline()
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        ready = {key.data for key, _ in self.selector.select(timeout)}
+        if self.WAKE in ready:
+            with contextlib.suppress(BlockingIOError):
+                while os.read(self._reader, 4096):
+                    pass
+        now = time.monotonic()
+        while (deadline := self.next_deadline()) is not None and deadline <= now:
+            name = heapq.heappop(self._heap)[1]
+            del self._deadlines[name]
+            ready.add(name)
+        return ready
+
+    def close(self) -> None:
+        if self._previous_wakeup_fd is not None:
+            signal.set_wakeup_fd(self._previous_wakeup_fd)
+        self.selector.close()
+        os.close(self._reader)
+        os.close(self._writer)
+
+
+class EpochWatch:
+    """Follows the mihomo epochs over a long poll instead of per-probe reads.
+
+    One thread keeps a request parked on the epochs endpoint, which the
+    backend answers as soon as an epoch moves. Subscribers are called with
+    the previous and the new status on every change, so a probe can be
+    aborted while it is still running. Statuses have the shape of
+    :meth:`ApiClient.get_mihomo_status` (None while mihomo is off). Until the
+    first poll succeeds, and after one fails, the watch is not live and
+    callers read the status endpoint themselves.
+    """
+
+    def __init__(self, api: ApiClient, wait_seconds: int = EPOCH_WATCH_WAIT_SECONDS):
+        self.api = api
+        self.wait_seconds = wait_seconds
+        self._lock = threading.Lock()
+        self._live = False
+        self._status: dict[str, Any] | None = None
+        self._subscribers: list[Callable[[Any, Any], None]] = []
+        self._stop = threading.Event()
+        self._cancellation = ProbeCancellation()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="mihomo-epochs", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._cancellation.cancel()
+
+    def status(self) -> tuple[bool, dict[str, Any] | None]:
+        with self._lock:
+            return self._live, self._status
+
+    @contextlib.contextmanager
+    def subscribe(
+        self, callback: Callable[[Any, Any], None]
+    ) -> Iterator[tuple[bool, dict[str, Any] | None]]:
+        """Call ``callback(previous, current)`` on changes inside the block.
+
+        Yields the status at subscription time; every later change reaches
+        the callback, from the watch thread.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+            current = self._live, self._status
+        try:
+            yield current
+        finally:
+            with self._lock:
+                self._subscribers.remove(callback)
+
+    def _run(self) -> None:
+        known: dict[str, Any] | None = None
+        with probe_cancellation(self._cancellation):
+            while not self._stop.is_set():
+                try:
+                    epochs = self.api.wait_mihomo_epochs(
+                        known, self.wait_seconds if known is not None else 0
+                    )
+                except Exception as exc:
+                    with self._lock:
+                        self._live = False
+                    if self._stop.is_set():
+                        return
+                    if isinstance(exc, ApiError) and exc.status == 404:
+                        log_event("mihomo_epoch_watch_unsupported")
+                        return
+                    log_event(
+                        "mihomo_epoch_watch_failed", error_type=type(exc).__name__
+                    )
+                    known = None
+                    self._stop.wait(EPOCH_WATCH_RETRY_SECONDS)
+                    continue
+                known = epochs
+                self._publish(epochs if epochs.get("enabled") else None)
+
+    def _publish(self, status: dict[str, Any] | None) -> None:
+        with self._lock:
+            previous = self._status
+            self._live = True
+            self._status = status
+            subscribers = list(self._subscribers)
+        if previous == status:
+            return
+        for callback in subscribers:
+            callback(previous, status)
+
+
+class LeaderLease:
+    """Leadership between guards on several replicas, via the lease endpoint.
+
+    Only the holder runs detectors; the others stay standby and retry every
+    third of the TTL, so one takes over within about ``4/3`` of a TTL after
+    the leader stops renewing. The holder renews on the same cadence and
+    treats the lease as lost one renewal interval before it can expire on the
+    backend. Its fencing token is stamped on every client passed to
+    :meth:`fence`, and the backend rejects writes carrying a stale token, so a
+    leader that stalls past its lease cannot quarantine or rotate anything.
+    """
+
+    def __init__(
+        self,
+        api: ApiClient,
+        ttl_seconds: int,
+        holder: str = "",
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.api = api
+        self.ttl_seconds = ttl_seconds
+        self.holder = (
+            holder or f"{socket.gethostname()}-{os.getpid()}-{secrets.token_hex(4)}"
+        )
+        self.clock = clock
+        self.token = ""
+        self.valid_until = 0.0
+        self.lost = threading.Event()
+        self.on_lost: Callable[[], None] | None = None
+        self.clients: list[Any] = [api]
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def renew_seconds(self) -> float:
+        return self.ttl_seconds / 3
+
+    def fence(self, *clients: Any) -> None:
+        self.clients.extend(clients)
+        for client in clients:
+            client.fence_token = self.token
+
+    def held(self) -> bool:
+        return not self.lost.is_set() and self.clock() < self.valid_until
+
+    def try_acquire(self) -> tuple[bool, str]:
+        """Acquire or renew the lease; returns whether it is held and by whom."""
+        started = self.clock()
+        payload = self.api.acquire_lease(self.holder, self.ttl_seconds)
+        holder = str(payload.get("holder") or "")
+        token = str(payload.get("token") or "")
+        if not bool(payload.get("leader")) or holder != self.holder or not token:
+            return False, holder
+        self.valid_until = started + self.ttl_seconds - self.renew_seconds
+        if token != self.token:
+            self.token = token
+            for client in self.clients:
+                client.fence_token = token
+        return True, holder
+
+    def wait(self, stopping: Callable[[], bool]) -> bool:
+        """Stay standby until this guard holds the lease or ``stopping()``."""
+        leader = ""
+        while not stopping():
+            try:
+                held, holder = self.try_acquire()
+            except (ApiError, RuntimeError, ValueError) as exc:
+                held, holder = False, leader
+                log_event("lease_acquire_failed", error_type=type(exc).__name__)
+            if held:
+                log_event("lease_acquired", holder=self.holder, token=self.token)
+                return True
+            if holder != leader:
+                leader = holder
+                log_event("lease_standby", holder=self.holder, leader=leader)
+            deadline = self.clock() + self.renew_seconds
+            while not stopping() and self.clock() < deadline:
+                time.sleep(min(0.5, self.renew_seconds))
+        return False
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._renew, name="quality-lease", daemon=True
+        )
+        self._thread.start()
+
+    def _renew(self) -> None:
+        while not self._stop.wait(self.renew_seconds):
+            try:
+                held, holder = self.try_acquire()
+            except (ApiError, RuntimeError, ValueError) as exc:
+                log_event("lease_renew_failed", error_type=type(exc).__name__)
+                held, holder = self.clock() < self.valid_until, self.holder
+            if held:
+                continue
+            self.lost.set()
+            log_event("lease_lost", holder=self.holder, token=self.token, leader=holder)
+            if self.on_lost is not None:
+                self.on_lost()
+            return
+
+    def release(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.api.config.request_timeout_seconds)
+        if not self.token or self.lost.is_set():
+            return
+        try:
+            self.api.release_lease(self.holder, self.token)
+        except (ApiError, RuntimeError, ValueError) as exc:
+            log_event("lease_release_failed", error_type=type(exc).__name__)
+            return
+        log_event("lease_released", holder=self.holder, token=self.token)
+
+
+class LeaseStandIn:
+    """In-memory copy of the backend's lease and fencing rules.
+
+    Served by :func:`lease_stand_in_server` so leader election can be
+    exercised locally without grok2api or Redis. Besides the lease endpoint
+    it answers the fenced node batch update, rejecting stale tokens with the
+    same ``409 qualityGuardFenced`` as the backend.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.holder = ""
+        self.token = 0
+        self.expires_at = 0.0
+        self.updates: list[dict[str, Any]] = []
+
+    def acquire(self, holder: str, ttl_seconds: int) -> dict[str, Any]:
+        with self.lock:
+            now = self.clock()
+            if self.holder and self.holder != holder and now < self.expires_at:
+                return {
+                    "leader": False,
+                    "holder": self.holder,
+                    "token": str(self.token),
+                }
+            if self.holder != holder or now >= self.expires_at:
+                self.holder = holder
+                self.token += 1
+            self.expires_at = now + ttl_seconds
+            return {"leader": True, "holder": holder, "token": str(self.token)}
+
+    def release(self, holder: str, token: str) -> None:
+        with self.lock:
+            if self.holder == holder and str(self.token) == token:
+                self.holder = ""
+                self.expires_at = 0.0
+
+    def fenced(self, token: str) -> bool:
+        """Whether a write carrying ``token`` must be rejected."""
+        if not token:
+            return False
+        with self.lock:
+            return (
+                not self.holder
+                or self.clock() >= self.expires_at
+                or str(self.token) != token
+            )
+
+
+class LeaseStandInHandler(BaseHTTPRequestHandler):
+    server_version = "grok2api-lease-stand-in/1"
+
+    def _json(self, status: int, value: dict[str, Any]) -> None:
+        payload = json.dumps(value, ensure_ascii=True, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error(self, status: int, code: str) -> None:
+        self._json(status, {"error": {"code": code, "message": code}})
+
+    def _body(self) -> dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > 4096:
+            raise ValueError("request body is too large")
+        value = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(value, dict):
+            raise ValueError("request body must be an object")
+        return value
+
+    def _handle(self) -> None:
+        stand_in: LeaseStandIn = self.server.stand_in  # type: ignore[attr-defined]
+        route = (self.command, self.path)
+        try:
+            body = self._body()
+        except ValueError:
+            self._error(400, "invalidRequest")
+            return
+        if route == ("POST", f"{INTERNAL_API_PREFIX}/egress-quality-guard/lease"):
+            ttl = int(body.get("ttlSeconds") or 0)
+            holder = str(body.get("holder") or "")
+            if not holder or not 5 <= ttl <= 300:
+                self._error(400, "invalidRequest")
+                return
+            self._json(200, {"data": stand_in.acquire(holder, ttl)})
+        elif route == ("DELETE", f"{INTERNAL_API_PREFIX}/egress-quality-guard/lease"):
+            stand_in.release(
+                str(body.get("holder") or ""), str(body.get("token") or "")
+            )
+            self._json(200, {"data": {"released": True}})
+        elif route == ("PATCH", f"{INTERNAL_API_PREFIX}/egress-nodes/batch"):
+            if stand_in.fenced(self.headers.get(FENCE_HEADER, "").strip()):
+                self._error(409, "qualityGuardFenced")
+                return
+            stand_in.updates.append(body)
+            ids = [str(value) for value in body.get("ids") or []]
+            self._json(200, {"data": {"updated": len(ids), "updatedIds": ids}})
+        else:
+            self._error(404, "notFound")
+
+    do_POST = do_DELETE = do_PATCH = _handle
+
+    def log_message(self, _format: str, *_args: Any) -> None:
+        return
+
+
+def lease_stand_in_server(host: str, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), LeaseStandInHandler)
+    server.stand_in = LeaseStandIn()  # type: ignore[attr-defined]
+    return server
+
+
+def watch_parent() -> None:
+    """Stop a shard worker once its coordinator's stdin pipe closes."""
+
+    def wait() -> None:
+        sys.stdin.buffer.read()
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    threading.Thread(target=wait, name="quality-shard-parent", daemon=True).start()
+
+
 def acquire_lock(path: Path):
     path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
     handle = path.open("a+", encoding="utf-8")
@@ -1600,6 +5635,11 @@ def acquire_lock(path: Path):
     return handle
 
 
+def release_lock(handle) -> None:
+    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    handle.close()
+
+
 def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(
         description="Active and passive quality guard for grok2api egress nodes"
@@ -1614,13 +5654,55 @@ def main(argv: list[str] | None = None) -> int:
         action="store_true",
         help="validate config.yaml bootstrap and exit",
     )
+    parser.add_argument(
+        "--engine",
+        choices=("threads", "asyncio"),
+        default=os.environ.get("QUALITY_GUARD_ENGINE", "threads"),
+        help="run loop implementation (default: threads)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=int(os.environ.get("QUALITY_GUARD_SHARDS") or 1),
+        help="split managed nodes across this many worker processes (default: 1)",
+    )
+    parser.add_argument("--shard", default="", help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--lease-stand-in",
+        metavar="HOST:PORT",
+        default="",
+        help="serve an in-memory leader lease endpoint for local testing and exit",
+    )
     args = parser.parse_args(argv)
+    if args.lease_stand_in:
+        host, _, port = args.lease_stand_in.rpartition(":")
+        server = lease_stand_in_server(host or "127.0.0.1", int(port))
+        log_event("lease_stand_in_started", address=args.lease_stand_in)
+        try:
+            server.serve_forever(poll_interval=0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
+
+    def load_base_config() -> Config:
+        base = Config.from_bootstrap()
+        if args.shard:
+            base = base.for_shard(*parse_shard_spec(args.shard))
+        return base
+
     try:
-        base_config = Config.from_bootstrap()
-        reloader = RuntimeConfigReloader(base_config)
+        base_config = load_base_config()
+        if args.shards > 1 and not args.shard:
+            # Validate the worker configuration before spawning anything.
+            base_config.for_shard(0, args.shards)
+        reloader = RuntimeConfigReloader(base_config, load_base_config)
         config, _, runtime_error = reloader.reload(force=True)
         if runtime_error is not None:
             raise ValueError(str(runtime_error))
+        if config.lease_ttl_seconds and args.shards > 1:
+            raise ValueError("qualityGuard.leaseTTL cannot be combined with --shards")
     except GuardDisabled as exc:
         print(str(exc))
         return 0
@@ -1630,28 +5712,93 @@ def main(argv: list[str] | None = None) -> int:
     if args.check_config:
         print("configuration is valid")
         return 0
+    lock_file = config.lock_file
+    if config.lease_ttl_seconds:
+        # Replicas may share the state directory; the lease, not this file,
+        # arbitrates between hosts.
+        lock_file = shard_path(lock_file, socket.gethostname())
     try:
-        lock = acquire_lock(config.lock_file)
+        lock = acquire_lock(lock_file)
     except RuntimeError as exc:
         print(str(exc), file=sys.stderr)
         return 1
-    _ = lock
+    if args.shard:
+        watch_parent()
+    elif args.shards > 1:
+        coordinator = ShardCoordinator(
+            config,
+            reloader,
+            args.shards,
+            ["--engine", args.engine, *(["--once"] if args.once else [])],
+        )
+
+        def stop_coordinator(_signum, _frame):
+            coordinator.stopping = True
+
+        signal.signal(signal.SIGTERM, stop_coordinator)
+        signal.signal(signal.SIGINT, stop_coordinator)
+        log_event("guard_started", mode=config.mode, shards=args.shards)
+        coordinator.run(args.once)
+        log_event("guard_stopped")
+        return 0
     stopping = False
+    reload_requested = False
+    guard: Guard | None = None
 
     def stop(_signum, _frame):
         nonlocal stopping
         stopping = True
+        if guard is not None and not guard.draining:
+            # Loops check the drain deadline at their boundaries and give up
+            # on in-flight probes once the grace period is over.
+            guard.drain()
+
+    def request_reload(_signum, _frame):
+        nonlocal reload_requested
+        reload_requested = True
 
     signal.signal(signal.SIGTERM, stop)
     signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, request_reload)
+    lease = None
+    if config.lease_ttl_seconds:
+        # The guard state is loaded only after the lease is won, so a standby
+        # resumes from whatever the previous leader last persisted.
+        lease = LeaderLease(ApiClient(config), config.lease_ttl_seconds)
+        if not lease.wait(lambda: stopping):
+            return 0
+    if args.engine == "asyncio":
+        log_event(
+            "guard_started",
+            mode=config.mode,
+            active_interval_seconds=config.active_interval_seconds,
+            passive_poll_seconds=config.passive_poll_seconds,
+            node_count=len(config.node_ids),
+            model=config.model,
+            engine=args.engine,
+        )
+        abandoned = asyncio.run(run_async_engine(config, reloader, args.once, lease))
+        release_lock(lock)
+        return exit_after_drain(finish_leadership(lease), abandoned)
     api = ApiClient(config)
-    guard = Guard(config, api)
-    last_active_at = float(guard.state.get("last_active_cycle_at", 0.0))
-    active_delay = max(
-        0.0, last_active_at + config.active_interval_seconds - time.time()
-    )
-    next_active = 0.0 if args.once else time.monotonic() + active_delay
-    next_passive = 0.0
+    if lease is not None:
+        lease.fence(api)
+        lease.start()
+    guard = Guard(config, api, lease)
+    if not args.once:
+        guard.start_workers()
+    # Per-node deadlines are persisted in state, so the scheduler resumes the
+    # same phase after a restart and only overdue nodes are probed at once.
+    timers = TimerLoop()
+    timers.watch_signals()
+    watcher = None if args.once else ConfigWatcher.open(reloader.watched_files())
+    if watcher is not None:
+        timers.add_reader(watcher, "config")
+    else:
+        timers.call_at("reload", time.monotonic() + RUNTIME_CONFIG_POLL_SECONDS)
+    if lease is not None:
+        lease.on_lost = timers.wake
+    due = {"passive", "active"}
     log_event(
         "guard_started",
         mode=config.mode,
@@ -1660,53 +5807,105 @@ def main(argv: list[str] | None = None) -> int:
         node_count=len(config.node_ids),
         model=config.model,
     )
-    while not stopping:
-        now = time.monotonic()
-        next_config, changed, runtime_error = reloader.reload()
-        if runtime_error is not None:
-            log_event(
-                "runtime_config_rejected", error_type=type(runtime_error).__name__
-            )
-        elif changed:
-            previous_mode = config.mode
-            config = next_config
-            guard.config = config
-            api.config = config
-            guard._save()
-            last_active_at = float(guard.state.get("last_active_cycle_at", 0.0))
-            next_active = now + max(
-                0.0, last_active_at + config.active_interval_seconds - time.time()
-            )
-            next_passive = now
-            log_event(
-                "runtime_config_reloaded", previous_mode=previous_mode, mode=config.mode
-            )
+    while not stopping and (lease is None or lease.held()):
+        config_event = False
+        if watcher is not None and "config" in due:
+            config_event = watcher.read_changes()
+            if watcher.lost:
+                log_event("config_watch_lost")
+                timers.remove_reader(watcher)
+                watcher.close()
+                watcher = None
+        if reload_requested or config_event or "reload" in due:
+            reload_requested = False
+            if watcher is None:
+                timers.call_at("reload", time.monotonic() + RUNTIME_CONFIG_POLL_SECONDS)
+            next_config, changed, runtime_error = reloader.reload()
+            if isinstance(runtime_error, GuardDisabled):
+                log_event("guard_disabled")
+                break
+            if runtime_error is not None:
+                log_event(
+                    "runtime_config_rejected",
+                    error_type=type(runtime_error).__name__,
+                )
+            elif changed:
+                previous_mode = config.mode
+                config = next_config
+                guard.config = config
+                api.config = config
+                if lease is not None:
+                    lease.api.config = config
+                guard._save()
+                due |= {"passive", "active"}
+                log_event(
+                    "runtime_config_reloaded",
+                    previous_mode=previous_mode,
+                    mode=config.mode,
+                )
         active_enabled = config.mode in {"active", "hybrid"}
         passive_enabled = config.mode in {"passive", "hybrid"}
-        if passive_enabled and now >= next_passive:
+        if not passive_enabled:
+            timers.cancel("passive")
+        elif "passive" in due:
             try:
                 guard.run_passive_cycle()
             except Exception as exc:
                 log_event("passive_cycle_failed", error_type=type(exc).__name__)
-            next_passive = time.monotonic() + config.passive_poll_seconds
-        if active_enabled and now >= next_active:
+            timers.call_at("passive", time.monotonic() + config.passive_poll_seconds)
+        if not active_enabled:
+            timers.cancel("active")
+        elif "active" in due:
             try:
-                guard.run_active_cycle()
+                if args.once:
+                    guard.run_active_cycle()
+                    next_deadline = time.time()
+                else:
+                    next_deadline = guard.run_scheduled_probes()
             except Exception as exc:
                 log_event("active_cycle_failed", error_type=type(exc).__name__)
-            jitter = random.uniform(-config.jitter_seconds, config.jitter_seconds)
-            next_active = time.monotonic() + max(
-                60.0, config.active_interval_seconds + jitter
+                next_deadline = time.time() + 60.0
+            # Wake for whichever comes first: the next probe slot or the end
+            # of a guard quarantine, whose recovery the cycle also starts.
+            next_deadline = min(next_deadline, guard.next_recovery_at(time.time()))
+            timers.call_at(
+                "active", time.monotonic() + max(1.0, next_deadline - time.time())
             )
         if args.once:
             break
-        deadlines = []
-        if passive_enabled:
-            deadlines.append(next_passive)
-        if active_enabled:
-            deadlines.append(next_active)
-        delay = max(0.1, min(deadlines) - time.monotonic()) if deadlines else 1.0
-        time.sleep(min(1.0, delay))
+        if lease is not None:
+            timers.call_at("lease", lease.valid_until)
+        due = timers.wait()
+    timers.close()
+    if watcher is not None:
+        watcher.close()
+    guard.stop_workers(timeout=guard.drain_remaining(), cancel=True)
+    guard.close()
+    release_lock(lock)
+    return exit_after_drain(finish_leadership(lease), guard.abandoned)
+
+
+def exit_after_drain(code: int, abandoned: bool) -> int:
+    """Return ``code``, or exit at once if an expired drain left threads behind.
+
+    Interpreter shutdown would otherwise join the abandoned probe threads and
+    wait out their request timeouts.
+    """
+    if abandoned:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+    return code
+
+
+def finish_leadership(lease: LeaderLease | None) -> int:
+    """Release the lease after a clean stop; exit non-zero if it was lost."""
+    if lease is not None and not lease.held():
+        lease.release()
+        log_event("guard_stopped", reason="lease_lost")
+        return 1
+    if lease is not None:
+        lease.release()
     log_event("guard_stopped")
     return 0
 
@@ -1,8 +1,11 @@
 import importlib.util
+import io
 import json
+import socketserver
 import stat
 import sys
 import tempfile
+import threading
 import unittest
 from pathlib import Path
 
@@ -23,7 +26,12 @@ def config(**overrides):
         node_ids=(),
         mode="hybrid",
         active_interval_seconds=1800,
+        adaptive_interval=False,
+        active_interval_min_seconds=600,
+        active_interval_max_seconds=14400,
         passive_poll_seconds=5,
+        passive_coverage_audits=0,
+        passive_coverage_window_seconds=1800,
         passive_page_size=200,
         passive_max_pages=10,
         jitter_seconds=0,
@@ -35,9 +43,18 @@ def config(**overrides):
         quarantine_seconds=300,
         no_account_backoff_seconds=300,
         min_healthy_nodes=3,
+        active_concurrency=1,
+        active_cycle_budget_seconds=0,
+        lease_ttl_seconds=0,
+        drain_grace_seconds=0,
+        daily_probe_requests=0,
+        daily_probe_output_tokens=0,
+        probe_reuse_seconds=0,
         max_output_tokens=384,
+        early_exit_probe=False,
         prompt="probe",
         expected="QUALITY_OK",
+        api_socket="",
         fail_closed=False,
         min_generation_ms=1000,
         rotation_url="",
@@ -249,40 +266,138 @@ class ConfigTests(unittest.TestCase):
             self.assertIsNotNone(error)
             self.assertEqual(loaded, base)
 
+    def test_runtime_config_reloader_applies_bootstrap_changes_in_place(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "runtime-config.json"
+            bootstrap = Path(directory) / "bootstrap.json"
+            bootstrap.write_text("{}", encoding="utf-8")
+            path.write_text(
+                '{"version":1,"settings":{"mode":"passive","active_interval_seconds":3600,"passive_poll_seconds":10,"soft_tps":400,"hard_tps":900,"consecutive_soft":3,"consecutive_errors":4,"quarantine_seconds":600,"min_healthy_nodes":2}}',
+                encoding="utf-8",
+            )
+            base = config(runtime_config_file=path, node_ids=("1", "2"))
+            pending = [base]
+            reloader = quality_guard.RuntimeConfigReloader(
+                base, lambda: pending[-1], bootstrap
+            )
+            reloader.reload(force=True)
+            pending.append(config(runtime_config_file=path, node_ids=("1", "2", "3")))
+            bootstrap.write_text('{"changed":true}', encoding="utf-8")
+            loaded, changed, error = reloader.reload()
+            self.assertIsNone(error)
+            self.assertTrue(changed)
+            self.assertEqual(
+                (loaded.node_ids, loaded.mode), (("1", "2", "3"), "passive")
+            )
+
+            pending.append(
+                config(
+                    runtime_config_file=path,
+                    node_ids=("1", "2", "3"),
+                    state_file=Path(directory) / "elsewhere.json",
+                )
+            )
+            bootstrap.write_text('{"changed":"again"}', encoding="utf-8")
+            loaded, _, error = reloader.reload()
+            self.assertIsInstance(error, ValueError)
+            self.assertEqual(loaded.node_ids, ("1", "2", "3"))
+
+    def test_config_watcher_reports_renamed_config_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "runtime-config.json"
+            watcher = quality_guard.ConfigWatcher.open([path])
+            if watcher is None:
+                self.skipTest("inotify is unavailable")
+            try:
+                (Path(directory) / "state.json").write_text("{}", encoding="utf-8")
+                self.assertFalse(watcher.read_changes())
+                temporary = Path(directory) / "runtime-config.json.tmp"
+                temporary.write_text("{}", encoding="utf-8")
+                temporary.replace(path)
+                self.assertTrue(watcher.read_changes())
+                self.assertFalse(watcher.read_changes())
+            finally:
+                watcher.close()
+
 
 class ApiClientTests(unittest.TestCase):
     def test_list_nodes_reads_every_page(self):
         client = quality_guard.ApiClient(config())
         requested_pages = []
 
-        def request(_method, path, _body=None):
-            page = int(
-                quality_guard.urllib.parse.parse_qs(
-                    quality_guard.urllib.parse.urlparse(path).query
-                )["page"][0]
-            )
-            requested_pages.append(page)
-            if page == 1:
-                return {
-                    "items": [{"id": str(index)} for index in range(1, 2001)],
-                    "total": 2001,
-                }
-            return {"items": [{"id": "2001"}], "total": 2001}
-
-        client._request = request
+        def request_items(path, page, conditional=False):
+            self.assertTrue(conditional)
+            query = quality_guard.urllib.parse.parse_qs(
+                quality_guard.urllib.parse.urlparse(path).query
+            )
+            self.assertEqual(query["format"], ["rows"])
+            self.assertEqual(query["fields"], [",".join(quality_guard.NODE_FIELDS)])
+            number = int(query["page"][0])
+            requested_pages.append(number)
+            if number == 1:
+                yield from ({"id": str(index)} for index in range(1, 2001))
+            else:
+                yield {"id": "2001", "enabled": True}
+            # Like a streamed page, the total follows the items.
+            page["total"] = 2001
+
+        client._request_items = request_items
         nodes = client.list_nodes()
         self.assertEqual(len(nodes), 2001)
+        self.assertEqual(nodes[-1], {"id": "2001", "enabled": True})
         self.assertEqual(requested_pages, [1, 2])
 
     def test_list_nodes_rejects_incomplete_pagination(self):
         client = quality_guard.ApiClient(config())
-        client._request = lambda *_args, **_kwargs: {"items": [], "total": 1}
+
+        def request_items(_path, page, conditional=False):
+            page["total"] = 1
+            yield from ()
+
+        client._request_items = request_items
         with self.assertRaises(RuntimeError):
             client.list_nodes()
 
+    def test_page_items_decode_incrementally_and_stop_early(self):
+        items = [
+            {"id": str(index), "durationMs": 12345, "egressNodeName": "节点"}
+            for index in range(500)
+        ]
+        body = json.dumps(
+            {"data": {"hasMore": True, "items": items, "nextCursor": "c"}},
+            ensure_ascii=False,
+        ).encode()
+
+        def reader():
+            stream = io.BytesIO(body)
+            # Seven-byte reads split numbers and multi-byte characters.
+            return stream, lambda _size: stream.read(7)
+
+        stream, read = reader()
+        page = {}
+        decoded = quality_guard.iter_page_items(read, page)
+        self.assertEqual([next(decoded) for _ in range(3)], items[:3])
+        self.assertTrue(page["hasMore"])
+        decoded.close()
+        self.assertLess(stream.tell(), len(body) // 10)
+
+        stream, read = reader()
+        page = {}
+        self.assertEqual(list(quality_guard.iter_page_items(read, page)), items)
+        self.assertEqual(page, {"hasMore": True, "nextCursor": "c"})
+        self.assertEqual(stream.tell(), len(body))
+
+        table = b'{"data":{"columns":["id","ok"],"hasMore":false,"rows":[["1",true],["2",false]]}}'
+        page = {}
+        self.assertEqual(
+            list(quality_guard.iter_page_items(io.BytesIO(table).read, page)),
+            [{"id": "1", "ok": True}, {"id": "2", "ok": False}],
+        )
+        self.assertFalse(page["hasMore"])
+
     def test_fixed_fallback_nodes_are_discovered_from_operations_policy(self):
         client = quality_guard.ApiClient(config())
-        client._request = lambda *_args, **_kwargs: {
+        client._request_conditional = lambda *_args, **_kwargs: {
             "fallbacks": {
                 "grok_build": {"mode": "fixed", "nodeId": "9"},
                 "grok_web": {"mode": "direct"},
@@ -291,6 +406,548 @@ class ApiClientTests(unittest.TestCase):
         }
         self.assertEqual(client.fixed_fallback_node_ids(), {"9", "11"})
 
+    def test_async_client_speaks_http_over_asyncio_streams(self):
+        requests = []
+
+        async def handle(reader, writer):
+            head = await reader.readuntil(b"\r\n\r\n")
+            requests.append(head.decode("latin-1"))
+            if b"/quality-test" in head:
+                body = b'{"error":{"code":"no_account","message":"busy"}}'
+                writer.write(
+                    b"HTTP/1.1 409 Conflict\r\nContent-Length: "
+                    + str(len(body)).encode()
+                    + b"\r\n\r\n"
+                    + body
+                )
+            else:
+                body = b'{"data":{"enabled":true,"epoch":7}}'
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                    + b"%x\r\n" % 10
+                    + body[:10]
+                    + b"\r\n%x\r\n" % (len(body) - 10)
+                    + body[10:]
+                    + b"\r\n0\r\n\r\n"
+                )
+            await writer.drain()
+            writer.close()
+
+        async def scenario():
+            server = await quality_guard.asyncio.start_server(handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            client = quality_guard.AsyncApiClient(
+                config(base_url=f"http://127.0.0.1:{port}")
+            )
+            async with server:
+                status = await client.get_mihomo_status()
+                with self.assertRaises(quality_guard.ApiError) as raised:
+                    await client.quality_test("3")
+            return status, raised.exception
+
+        status, error = quality_guard.asyncio.run(scenario())
+        self.assertEqual(status, {"enabled": True, "epoch": 7})
+        self.assertEqual((error.status, error.code), (409, "no_account"))
+        self.assertIn("Authorization: Bearer scoped-secret\r\n", requests[0])
+        self.assertTrue(
+            requests[1].startswith(
+                "POST /api/internal/v1/quality-guard/egress-nodes/3/quality-test "
+            )
+        )
+        self.assertIn("Content-Length: 0\r\n", requests[1])
+
+    def running_loop(self):
+        """An event loop running on its own thread until the test ends."""
+        loop = quality_guard.asyncio.new_event_loop()
+        runner = threading.Thread(target=loop.run_forever, daemon=True)
+        runner.start()
+
+        def stop_loop():
+            loop.call_soon_threadsafe(loop.stop)
+            runner.join(5)
+            loop.close()
+
+        self.addCleanup(stop_loop)
+        return loop
+
+    def test_loop_client_streams_batches_and_rotates_on_the_loop(self):
+        loop = self.running_loop()
+        requests = []
+        closed = threading.Event()
+
+        async def handle(reader, writer):
+            head = await reader.readuntil(b"\r\n\r\n")
+            requests.append(head.decode("latin-1"))
+            if b"/rotate" in head:
+                body = b'{"changed":true,"newExitIp":"203.0.113.9"}'
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(body) + body
+                )
+                await writer.drain()
+                writer.close()
+                return
+            line = b'{"nodeId":"1","data":{"expectedMatched":true}}\n'
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                + b"%x\r\n" % len(line)
+                + line
+                + b"\r\n"
+            )
+            await writer.drain()
+            # The second probe hangs until the guard closes the stream.
+            while await reader.read(1024):
+                pass
+            closed.set()
+
+        server = quality_guard.asyncio.run_coroutine_threadsafe(
+            quality_guard.asyncio.start_server(handle, "127.0.0.1", 0), loop
+        ).result()
+        self.addCleanup(loop.call_soon_threadsafe, server.close)
+        port = server.sockets[0].getsockname()[1]
+        cfg = config(
+            base_url=f"http://127.0.0.1:{port}",
+            rotation_url=f"http://127.0.0.1:{port}/rotate",
+            rotation_token="rotation-secret",
+        )
+        client = quality_guard.LoopApiClient(
+            cfg, quality_guard.AsyncApiClient(cfg), loop
+        )
+        # Nothing may fall back to the blocking connection pool.
+        client.pool = None
+
+        cancellation = quality_guard.ProbeCancellation()
+        with quality_guard.probe_cancellation(cancellation):
+            results = client.quality_test_many(["1", "2"], 2)
+            self.assertEqual(next(results), ("1", {"expectedMatched": True}))
+            threading.Timer(0.1, cancellation.cancel).start()
+            with self.assertRaises(quality_guard.concurrent.futures.CancelledError):
+                next(results)
+        self.assertTrue(closed.wait(5))
+        self.assertEqual(
+            client.rotate_node("4", "198.51.100.1")["newExitIp"], "203.0.113.9"
+        )
+        self.assertTrue(
+            requests[0].startswith(
+                "POST /api/internal/v1/quality-guard/egress-nodes/batch/quality-test "
+            )
+        )
+        self.assertTrue(requests[1].startswith("POST /rotate "))
+        self.assertIn("Authorization: Bearer rotation-secret\r\n", requests[1])
+
+    def test_leader_lease_fails_over_and_fences_the_stale_leader(self):
+        now = [1000.0]
+        server = quality_guard.lease_stand_in_server("127.0.0.1", 0)
+        server.stand_in.clock = lambda: now[0]
+        threading.Thread(
+            target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        ).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        cfg = config(base_url=f"http://127.0.0.1:{server.server_address[1]}")
+        leader = quality_guard.LeaderLease(
+            quality_guard.ApiClient(cfg), 15, "host-a", clock=lambda: now[0]
+        )
+        standby = quality_guard.LeaderLease(
+            quality_guard.ApiClient(cfg), 15, "host-b", clock=lambda: now[0]
+        )
+
+        self.assertEqual(leader.try_acquire(), (True, "host-a"))
+        self.assertEqual(standby.try_acquire(), (False, "host-a"))
+        self.assertEqual(leader.api.set_enabled("8", False), 1)
+
+        # The leader stalls past its lease; the standby takes over.
+        now[0] += 16
+        self.assertFalse(leader.held())
+        self.assertTrue(standby.wait(lambda: False))
+        self.assertEqual((leader.token, standby.token), ("1", "2"))
+        with self.assertRaises(quality_guard.ApiError) as stale:
+            leader.api.set_enabled("8", True)
+        self.assertEqual(
+            (stale.exception.status, stale.exception.code), (409, "qualityGuardFenced")
+        )
+        self.assertEqual(standby.api.set_enabled("8", True), 1)
+        self.assertEqual(len(server.stand_in.updates), 2)
+
+        standby.release()
+        self.assertEqual(server.stand_in.holder, "")
+
+    def test_connection_pool_reuses_keep_alive_connections_until_idle(self):
+        peers = []
+
+        class KeepAliveHandler(quality_guard.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                peers.append(self.client_address)
+                body = b'{"data":{"enabled":false}}'
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, _format, *_args):
+                pass
+
+        server = quality_guard.ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        ).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        client = quality_guard.ApiClient(
+            config(base_url=f"http://127.0.0.1:{server.server_address[1]}")
+        )
+        now = [0.0]
+        client.pool.clock = lambda: now[0]
+        self.addCleanup(client.pool.close)
+
+        for _ in range(3):
+            self.assertEqual(client._request("GET", "/status"), {"enabled": False})
+        self.assertEqual(len(set(peers)), 1)
+        self.assertEqual(client.pool.idle_count(), 1)
+
+        now[0] += quality_guard.POOL_IDLE_SECONDS + 1
+        client._request("GET", "/status")
+        self.assertEqual(len(set(peers)), 2)
+        self.assertEqual(client.pool.idle_count(), 1)
+
+    def test_runtime_reload_resizes_the_connection_pool(self):
+        client = quality_guard.ApiClient(config(active_concurrency=1))
+        self.addCleanup(client.pool.close)
+        spare = quality_guard.POOL_SPARE_CONNECTIONS
+        key = ("http", "grok2api", 8000)
+        for _ in range(1 + spare):
+            client.pool._acquire(key, quality_guard.time.monotonic() + 1)
+        acquired = threading.Event()
+
+        def acquire():
+            client.pool._acquire(key, quality_guard.time.monotonic() + 5)
+            acquired.set()
+
+        waiter = threading.Thread(target=acquire)
+        waiter.start()
+        self.assertFalse(acquired.wait(0.1))
+        client.config = config(active_concurrency=4)
+        waiter.join(5)
+        self.assertTrue(acquired.is_set())
+        self.assertEqual(client.pool.max_per_host, 4 + spare)
+
+    def test_api_client_sends_requests_over_the_unix_socket(self):
+        requests = []
+
+        class SocketHandler(quality_guard.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                requests.append((self.path, self.headers["Host"]))
+                body = b'{"data":{"enabled":false}}'
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def address_string(self):
+                return "unix"
+
+            def log_message(self, _format, *_args):
+                pass
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory) / "api.sock")
+            server = socketserver.ThreadingUnixStreamServer(path, SocketHandler)
+            server.daemon_threads = True
+            threading.Thread(
+                target=server.serve_forever,
+                kwargs={"poll_interval": 0.05},
+                daemon=True,
+            ).start()
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+            # The TCP base URL points nowhere; only the socket can answer.
+            client = quality_guard.ApiClient(
+                config(base_url="http://127.0.0.1:9", api_socket=path)
+            )
+            self.addCleanup(client.pool.close)
+
+            for _ in range(2):
+                self.assertEqual(client._request("GET", "/status"), {"enabled": False})
+            self.assertEqual(requests, [("/status", "127.0.0.1:9")] * 2)
+            self.assertEqual(client.pool.idle_count(), 1)
+
+    def test_audit_feed_is_decompressed_and_expanded_from_rows(self):
+        queries = []
+
+        class FeedHandler(quality_guard.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                queries.append(
+                    quality_guard.urllib.parse.parse_qs(
+                        quality_guard.urllib.parse.urlsplit(self.path).query
+                    )
+                )
+                payload = {
+                    "data": {
+                        "columns": ["id", "statusCode"],
+                        "rows": [["9", 200], ["8", 502]],
+                        "hasMore": False,
+                    }
+                }
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                if "gzip" in (self.headers["Accept-Encoding"] or ""):
+                    body = quality_guard.gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, _format, *_args):
+                pass
+
+        server = quality_guard.ThreadingHTTPServer(("127.0.0.1", 0), FeedHandler)
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        ).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        cfg = config(base_url=f"http://127.0.0.1:{server.server_address[1]}")
+        client = quality_guard.ApiClient(cfg)
+        self.addCleanup(client.pool.close)
+
+        expected = [{"id": "9", "statusCode": 200}, {"id": "8", "statusCode": 502}]
+        self.assertEqual(list(client.list_audits()["items"]), expected)
+        self.assertEqual(queries[0]["format"], ["rows"])
+        self.assertEqual(queries[0]["fields"], [",".join(quality_guard.AUDIT_FIELDS)])
+
+        page = quality_guard.asyncio.run(
+            quality_guard.AsyncApiClient(cfg).request(
+                "GET", "/request-audits", compressed=True
+            )
+        )
+        self.assertEqual(quality_guard.table_items(page), expected)
+
+    def test_inventory_is_revalidated_with_etags(self):
+        inventory = {"version": 1}
+        seen = []
+
+        class InventoryHandler(quality_guard.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                route = quality_guard.urllib.parse.urlsplit(self.path).path
+                if route.endswith("/egress-operations"):
+                    payload = {
+                        "fallbacks": {"grok_build": {"mode": "fixed", "nodeId": "2"}}
+                    }
+                else:
+                    payload = {
+                        "columns": ["id", "enabled"],
+                        "rows": [["1", True], ["2", inventory["version"] == 1]],
+                        "total": 2,
+                    }
+                etag = f'W/"{route}-{inventory["version"]}"'
+                status = 304 if self.headers["If-None-Match"] == etag else 200
+                seen.append((route.rsplit("/", 1)[-1], status))
+                body = b"" if status == 304 else json.dumps({"data": payload}).encode()
+                self.send_response(status)
+                self.send_header("ETag", etag)
+                if status == 200:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, _format, *_args):
+                pass
+
+        server = quality_guard.ThreadingHTTPServer(("127.0.0.1", 0), InventoryHandler)
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        ).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        cfg = config(base_url=f"http://127.0.0.1:{server.server_address[1]}")
+
+        def revalidate(client):
+            seen.clear()
+            first = client.list_nodes()
+            # The guard edits node dicts in place; the cache must not see it.
+            first[0]["enabled"] = False
+            self.assertEqual(client.fixed_fallback_node_ids(), {"2"})
+            self.assertEqual(
+                client.list_nodes(),
+                [{"id": "1", "enabled": True}, {"id": "2", "enabled": True}],
+            )
+            self.assertEqual(client.fixed_fallback_node_ids(), {"2"})
+            self.assertEqual(
+                seen,
+                [
+                    ("egress-nodes", 200),
+                    ("egress-operations", 200),
+                    ("egress-nodes", 304),
+                    ("egress-operations", 304),
+                ],
+            )
+
+        client = quality_guard.ApiClient(cfg)
+        self.addCleanup(client.pool.close)
+        revalidate(client)
+        self.assertEqual(client.pool.idle_count(), 1)
+
+        # The asyncio engine revalidates over its own transport.
+        loop_client = quality_guard.LoopApiClient(
+            cfg, quality_guard.AsyncApiClient(cfg), self.running_loop()
+        )
+        loop_client.pool = None
+        revalidate(loop_client)
+
+        inventory["version"] = 2
+        self.assertEqual(client.list_nodes()[1], {"id": "2", "enabled": False})
+        self.assertEqual(seen[-1], ("egress-nodes", 200))
+
+        # Pages above the cache bound are streamed again instead of kept.
+        self.addCleanup(
+            setattr,
+            quality_guard,
+            "CONDITIONAL_CACHE_ITEMS",
+            quality_guard.CONDITIONAL_CACHE_ITEMS,
+        )
+        quality_guard.CONDITIONAL_CACHE_ITEMS = 1
+        inventory["version"] = 3
+        client.list_nodes()
+        client.list_nodes()
+        self.assertEqual(seen[-2:], [("egress-nodes", 200), ("egress-nodes", 200)])
+
+    def test_probe_cancellation_aborts_a_pending_request(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        class SlowHandler(quality_guard.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                release.wait(10)
+
+            def log_message(self, _format, *_args):
+                pass
+
+        server = quality_guard.ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        ).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        client = quality_guard.ApiClient(
+            config(base_url=f"http://127.0.0.1:{server.server_address[1]}")
+        )
+        self.addCleanup(client.pool.close)
+
+        cancellation = quality_guard.ProbeCancellation()
+        threading.Timer(0.1, cancellation.cancel).start()
+        started = quality_guard.time.monotonic()
+        with quality_guard.probe_cancellation(cancellation):
+            with self.assertRaises(RuntimeError):
+                client.quality_test("1")
+        self.assertLess(quality_guard.time.monotonic() - started, 5)
+        self.assertEqual(client.pool.idle_count(), 0)
+
+    def test_guard_snapshot_reads_cycle_inputs_and_detects_old_backends(self):
+        supported = {"value": True}
+        seen = []
+
+        class SnapshotHandler(quality_guard.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                seen.append(self.path)
+                if supported["value"]:
+                    status, payload = 200, {
+                        "columns": ["id", "enabled"],
+                        "fixedFallbackNodeIds": ["2"],
+                        "mihomo": {"enabled": True, "epoch": 4, "testEpoch": 9},
+                        "rows": [["1", True], ["2", False]],
+                        "total": 2,
+                    }
+                else:
+                    status, payload = 404, {"code": "notFound"}
+                body = json.dumps({"data": payload}).encode()
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, _format, *_args):
+                pass
+
+        server = quality_guard.ThreadingHTTPServer(("127.0.0.1", 0), SnapshotHandler)
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        ).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        client = quality_guard.ApiClient(
+            config(base_url=f"http://127.0.0.1:{server.server_address[1]}")
+        )
+        self.addCleanup(client.pool.close)
+
+        self.assertEqual(
+            client.guard_snapshot(),
+            {
+                "nodes": [{"id": "1", "enabled": True}, {"id": "2", "enabled": False}],
+                "fixed_fallback_ids": {"2"},
+                "mihomo": {"enabled": True, "epoch": 4, "testEpoch": 9},
+            },
+        )
+        path = quality_guard.urllib.parse.urlsplit(seen[0])
+        self.assertTrue(path.path.endswith("/egress-quality-guard/snapshot"))
+        self.assertEqual(
+            quality_guard.urllib.parse.parse_qs(path.query)["format"], ["rows"]
+        )
+
+        supported["value"] = False
+        self.assertIsNone(client.guard_snapshot())
+        # A backend without the route is not asked again.
+        self.assertIsNone(client.guard_snapshot())
+        self.assertEqual(len(seen), 2)
+
+
+class TimerLoopTests(unittest.TestCase):
+    def test_wait_returns_due_timers_and_wakes_early_on_notification(self):
+        timers = quality_guard.TimerLoop()
+        self.addCleanup(timers.close)
+        now = quality_guard.time.monotonic()
+        timers.call_at("active", now + 3600)
+        timers.call_at("passive", now + 3600)
+        # Rescheduling replaces the earlier deadline; cancelling drops it.
+        timers.call_at("active", now - 1)
+        timers.cancel("passive")
+        self.assertEqual(timers.wait(), {"active"})
+
+        timers.call_at("passive", now + 3600)
+        threading.Timer(0.05, timers.wake).start()
+        started = quality_guard.time.monotonic()
+        self.assertEqual(timers.wait(), {"wake"})
+        self.assertLess(quality_guard.time.monotonic() - started, 5)
+        self.assertEqual(timers.next_deadline(), now + 3600)
+
+    def test_recovery_deadline_ignores_ended_and_foreign_quarantines(self):
+        guard = quality_guard.Guard(config(), FakeApi([], []))
+        guard.state["nodes"] = {
+            "1": {"disabled_by_guard": True, "quarantined_until": 500.0},
+            "2": {"disabled_by_guard": True, "quarantined_until": 90.0},
+            "3": {"disabled_by_guard": False, "quarantined_until": 200.0},
+        }
+        self.assertEqual(guard.next_recovery_at(100.0), 500.0)
+        self.assertEqual(guard.next_recovery_at(600.0), quality_guard.math.inf)
+
 
 class FakeApi:
     def __init__(self, nodes, results, audit_pages=None, fixed_fallback_ids=None):
@@ -299,7 +956,11 @@ class FakeApi:
         self.audit_pages = list(audit_pages or [])
         self.fixed_fallback_ids = set(fixed_fallback_ids or [])
         self.enabled_calls = []
+        self.batch_calls = []
+        self.batch_probes = False
+        self.batch_probe_calls = []
         self.quality_calls = []
+        self.early_exit_calls = []
         self.rotation_calls = []
         self.select_calls = []
         self.ban_calls = []
@@ -311,16 +972,42 @@ class FakeApi:
     def fixed_fallback_node_ids(self):
         return set(self.fixed_fallback_ids)
 
+    def guard_snapshot(self):
+        return {
+            "nodes": self.list_nodes(),
+            "fixed_fallback_ids": self.fixed_fallback_node_ids(),
+            "mihomo": self.get_mihomo_status(),
+        }
+
     def get_mihomo_status(self):
         return None
 
-    def quality_test(self, node_id):
+    def wait_mihomo_epochs(self, _known, _wait_seconds):
+        # Without the long-poll route the guard reads the status per probe.
+        raise quality_guard.ApiError(404, "notFound", "")
+
+    def quality_test(self, node_id, early_exit=False):
         self.quality_calls.append(node_id)
+        self.early_exit_calls.append(early_exit)
         value = self.results.pop(0)
         if isinstance(value, Exception):
             raise value
         return value
 
+    def quality_test_many(self, node_ids, concurrency, early_exit=False):
+        self.batch_probe_calls.append((list(node_ids), concurrency))
+        if not self.batch_probes:
+            # Without the batch route the guard probes node by node.
+            raise quality_guard.ApiError(404, "notFound", "")
+        for node_id in node_ids:
+            self.quality_calls.append(node_id)
+            self.early_exit_calls.append(early_exit)
+            value = self.results.pop(0)
+            if isinstance(value, Exception):
+                yield node_id, value
+            else:
+                yield node_id, dict(value, nodeId=node_id)
+
     def connectivity_test(self, _node_id):
         return {"status": "healthy"}
 
@@ -332,13 +1019,25 @@ class FakeApi:
                 return 1
         return 0
 
+    def set_enabled_many(self, node_ids, enabled):
+        self.batch_calls.append((list(node_ids), enabled))
+        return {
+            node_id
+            for node_id in node_ids
+            if any(
+                str(node["id"]) == node_id and node["enabled"] != enabled
+                for node in self.nodes
+            )
+            and self.set_enabled(node_id, enabled) == 1
+        }
+
     def rotate_node(self, node_id, old_exit_ip=""):
         self.rotation_calls.append((node_id, old_exit_ip))
         return {"changed": True, "oldExitIp": old_exit_ip, "newExitIp": "203.0.113.10"}
 
     def select_test_member(self, node_name):
         self.select_calls.append(node_name)
-        return True
+        return {"changed": True, "currentNode": node_name}
 
     def ban_test_member(self, node_name):
         self.ban_calls.append(node_name)
@@ -354,6 +1053,34 @@ class FakeApi:
         return {"items": [], "hasMore": False, "nextCursor": ""}
 
 
+class FakeAsyncApi:
+    def __init__(self, results, in_flight_target=1):
+        self.results = list(results)
+        self.quality_calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.in_flight_target = in_flight_target
+        self.all_in_flight = None
+
+    async def get_mihomo_status(self):
+        return None
+
+    async def quality_test(self, node_id, early_exit=False):
+        if self.all_in_flight is None:
+            self.all_in_flight = quality_guard.asyncio.Event()
+        self.quality_calls.append(node_id)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        if self.in_flight >= self.in_flight_target:
+            self.all_in_flight.set()
+        await quality_guard.asyncio.wait_for(self.all_in_flight.wait(), 5)
+        self.in_flight -= 1
+        value = self.results.pop(0)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
 class GuardTests(unittest.TestCase):
     @staticmethod
     def nodes(count=5):
@@ -405,8 +1132,973 @@ class GuardTests(unittest.TestCase):
                     "output_tokens": 200,
                 },
             )
-            self.assertEqual(guard.state["statistics"]["actions"]["quarantined"], 1)
-            self.assertEqual(guard.state["statistics"]["actions"]["restored"], 1)
+            self.assertEqual(guard.state["statistics"]["actions"]["quarantined"], 1)
+            self.assertEqual(guard.state["statistics"]["actions"]["restored"], 1)
+
+    def test_concurrent_active_cycle_overlaps_probes_and_keeps_healthy_floor(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                active_concurrency=5,
+            )
+            bad = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 1200,
+            }
+            api = FakeApi(self.nodes(), [bad] * 5)
+            barrier = threading.Barrier(5, timeout=5)
+            quality_test = api.quality_test
+
+            def overlapping_quality_test(node_id, early_exit=False):
+                # Every worker must be in flight at once for the barrier to open.
+                barrier.wait()
+                return quality_test(node_id)
+
+            api.quality_test = overlapping_quality_test
+            guard = quality_guard.Guard(cfg, api)
+            guard.run_active_cycle()
+            self.assertEqual(sorted(api.quality_calls), ["1", "2", "3", "4", "5"])
+            self.assertEqual(len(api.enabled_calls), 2)
+            self.assertEqual(sum(1 for node in api.nodes if node["enabled"]), 3)
+            self.assertEqual(guard.state["statistics"]["actions"]["suppressed"], 3)
+            self.assertEqual(guard.state["statistics"]["active"]["hard"], 5)
+
+    def test_batch_probe_route_streams_results_into_incremental_verdicts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                active_concurrency=5,
+            )
+            bad = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 1200,
+            }
+            good = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            no_account = quality_guard.ApiError(
+                503, "egressQualityProbeNoAccount", "no account"
+            )
+            synced = {
+                "id": "5",
+                "name": "mihomo-hk",
+                "enabled": True,
+                "proxyConfigured": True,
+            }
+            api = FakeApi(self.nodes(4) + [synced], [bad, good, no_account, good, good])
+            api.batch_probes = True
+            stream = api.quality_test_many
+            seen = []
+
+            def observed(node_ids, concurrency, early_exit=False):
+                for node_id, value in stream(node_ids, concurrency, early_exit):
+                    seen.append((node_id, api.nodes[0]["enabled"]))
+                    yield node_id, value
+
+            api.quality_test_many = observed
+            guard = quality_guard.Guard(cfg, api)
+            guard.run_active_cycle()
+            # The synced node needs its test-group select, so it is probed
+            # alone; node 1 is quarantined before node 2's line is read.
+            self.assertEqual(api.batch_probe_calls, [(["1", "2", "3", "4"], 5)])
+            self.assertEqual(api.select_calls, ["mihomo-hk"])
+            self.assertEqual(api.quality_calls, ["1", "2", "3", "4", "5"])
+            self.assertEqual(seen[:2], [("1", True), ("2", False)])
+            self.assertEqual(api.enabled_calls, [("1", False)])
+            self.assertEqual(
+                guard.state["nodes"]["3"]["last_reason"], "probe_no_account"
+            )
+            self.assertEqual(guard.state["statistics"]["active"]["total"], 5)
+
+    def test_refused_batch_falls_back_to_per_node_probes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                active_concurrency=32,
+            )
+            good = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            api = FakeApi(self.nodes(3), [good] * 6)
+            api.batch_probes = True
+            stream = api.quality_test_many
+
+            def refusing(node_ids, concurrency, early_exit=False):
+                if len(api.batch_probe_calls) == 1:
+                    api.batch_probe_calls.append((list(node_ids), concurrency))
+                    raise quality_guard.ApiError(500, "internal", "busy")
+                yield from stream(node_ids, concurrency, early_exit)
+
+            api.quality_test_many = refusing
+            guard = quality_guard.Guard(cfg, api)
+            guard.run_active_cycle()
+            # The backend caps a batch's concurrency; the guard asks for no more.
+            self.assertEqual(api.batch_probe_calls, [(["1", "2", "3"], 16)])
+            guard.run_active_cycle()
+            self.assertEqual(len(api.batch_probe_calls), 2)
+            self.assertEqual(sorted(api.quality_calls), ["1", "1", "2", "2", "3", "3"])
+            for node_id in "123":
+                self.assertEqual(guard.state["nodes"][node_id]["error_strikes"], 0)
+            self.assertEqual(guard.state["statistics"]["active"]["total"], 6)
+            self.assertFalse(guard._batch_probes_unsupported)
+
+    def test_broken_batch_stream_fails_only_unreported_probes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                active_concurrency=4,
+            )
+            good = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            api = FakeApi(self.nodes(4), [good, good])
+            api.batch_probes = True
+            stream = api.quality_test_many
+
+            def breaking(node_ids, concurrency, early_exit=False):
+                results = stream(node_ids, concurrency, early_exit)
+                yield next(results)
+                yield next(results)
+                raise RuntimeError("request failed: IncompleteRead")
+
+            api.quality_test_many = breaking
+            guard = quality_guard.Guard(cfg, api)
+            guard.run_active_cycle()
+            strikes = {
+                node_id: guard.state["nodes"][node_id]["error_strikes"]
+                for node_id in "1234"
+            }
+            self.assertEqual(strikes, {"1": 0, "2": 0, "3": 1, "4": 1})
+            self.assertEqual(api.quality_calls, ["1", "2"])
+            self.assertEqual(guard.state["statistics"]["active"]["total"], 4)
+
+    def test_batch_stream_stops_reading_at_the_cycle_deadline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                active_concurrency=4,
+            )
+            good = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            api = FakeApi(self.nodes(4), [good] * 4)
+            api.batch_probes = True
+            stream = api.quality_test_many
+            closed = []
+
+            def slow(node_ids, concurrency, early_exit=False):
+                try:
+                    for index, item in enumerate(
+                        stream(node_ids, concurrency, early_exit)
+                    ):
+                        if index:
+                            quality_guard.time.sleep(0.3)
+                        yield item
+                finally:
+                    closed.append(True)
+
+            api.quality_test_many = slow
+            guard = quality_guard.Guard(cfg, api)
+            for index, node_id in enumerate("1234"):
+                guard._state_for(node_id)["next_probe_at"] = 1.0 + index
+            guard._cycle_deadline = lambda now: quality_guard.time.time() + 0.15
+            guard.run_scheduled_probes()
+            # The line already read is applied; closing the stream aborts the
+            # probes still running and their nodes keep their deadlines.
+            self.assertEqual(api.quality_calls, ["1", "2"])
+            self.assertEqual(closed, [True])
+            self.assertGreater(guard.state["nodes"]["2"]["next_probe_at"], 1000)
+            self.assertEqual(guard.state["nodes"]["3"]["next_probe_at"], 3.0)
+            self.assertEqual(guard.state["nodes"]["4"]["next_probe_at"], 4.0)
+
+    def test_state_changes_from_every_thread_hold_the_state_lock(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                active_concurrency=3,
+                min_healthy_nodes=1,
+            )
+            bad = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 1200,
+            }
+            good = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            api = FakeApi(self.nodes(3), [bad, bad, bad, good, good])
+            guard = quality_guard.Guard(cfg, api)
+            unlocked = []
+
+            class LockedState(dict):
+                def _changed(self):
+                    if not guard._state_lock._is_owned():
+                        unlocked.append(threading.current_thread().name)
+
+                def __setitem__(self, key, value):
+                    self._changed()
+                    super().__setitem__(key, value)
+
+                def update(self, *args, **kwargs):
+                    self._changed()
+                    super().update(*args, **kwargs)
+
+                def clear(self):
+                    self._changed()
+                    super().clear()
+
+            for node in api.nodes:
+                guard.state["nodes"][node["id"]] = LockedState(
+                    quality_guard.default_node_state()
+                )
+            guard.run_active_cycle()
+            quarantined = [node for node in api.nodes if not node["enabled"]]
+            healthy = [node for node in api.nodes if node["enabled"]]
+            self.assertEqual(len(quarantined), 2)
+            with guard._state_lock:
+                guard.state["nodes"][quarantined[0]["id"]]["quarantined_until"] = 0
+            workers = [
+                threading.Thread(
+                    target=guard._run_recovery, args=(quarantined[0], False, False)
+                ),
+                threading.Thread(
+                    target=guard._run_confirmation, args=(healthy[0], api.nodes)
+                ),
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join(5)
+            self.assertTrue(quarantined[0]["enabled"])
+            self.assertEqual(unlocked, [])
+
+    def test_scheduler_spreads_probes_and_persists_per_node_deadlines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+            )
+            good = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            api = FakeApi(self.nodes(4), [good] * 4)
+            guard = quality_guard.Guard(cfg, api)
+            started = quality_guard.time.time()
+            deadline = guard.run_scheduled_probes()
+            self.assertEqual(api.quality_calls, ["1"])
+            self.assertAlmostEqual(deadline, started + 450, delta=5)
+            persisted = quality_guard.load_state(cfg.state_file)["nodes"]
+            self.assertAlmostEqual(
+                persisted["3"]["next_probe_at"], started + 900, delta=5
+            )
+            self.assertAlmostEqual(
+                persisted["1"]["next_probe_at"], started + 1800, delta=5
+            )
+            guard.state["nodes"]["2"]["next_probe_at"] = 1.0
+            guard.run_scheduled_probes()
+            self.assertEqual(api.quality_calls, ["1", "2"])
+
+    def test_cycle_budget_carries_unreached_nodes_into_next_slot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+                active_cycle_budget_seconds=60,
+            )
+            good = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            api = FakeApi(self.nodes(3), [good] * 3)
+            quality_test = api.quality_test
+
+            def slow_quality_test(node_id, early_exit=False):
+                quality_guard.time.sleep(0.1)
+                return quality_test(node_id, early_exit)
+
+            api.quality_test = slow_quality_test
+            guard = quality_guard.Guard(cfg, api)
+            # A backend latency spike: the first probe outlasts the budget.
+            guard._cycle_deadline = lambda now: quality_guard.time.time() + 0.05
+            for index, node_id in enumerate(["3", "1", "2"]):
+                guard._state_for(node_id)["next_probe_at"] = 1.0 + index
+            deadline = guard.run_scheduled_probes()
+            self.assertEqual(api.quality_calls, ["3"])
+            self.assertEqual(deadline, 2.0)
+            self.assertEqual(guard.state["nodes"]["2"]["next_probe_at"], 3.0)
+            self.assertGreater(guard.state["nodes"]["3"]["next_probe_at"], 1000)
+            guard._cycle_deadline = lambda now: quality_guard.math.inf
+            guard.run_scheduled_probes()
+            self.assertEqual(api.quality_calls, ["3", "1", "2"])
+
+    def test_drain_lets_in_flight_probes_finish_and_flushes_state_once(self):
+        with tempfile.TemporaryDirectory() as directory:
+            state_file = Path(directory) / "state.json"
+            cfg = config(
+                state_file=state_file,
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+                active_concurrency=2,
+                drain_grace_seconds=20,
+            )
+            good = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            api = FakeApi(self.nodes(4), [good] * 4)
+            quality_test = api.quality_test
+            started = threading.Barrier(2)
+
+            def draining_quality_test(node_id, early_exit=False):
+                # SIGTERM arrives while both workers are mid-probe.
+                if started.wait() == 0:
+                    guard.drain()
+                quality_guard.time.sleep(0.05)
+                return quality_test(node_id, early_exit)
+
+            api.quality_test = draining_quality_test
+            guard = quality_guard.Guard(cfg, api)
+            for index, node_id in enumerate(["1", "2", "3", "4"]):
+                guard._state_for(node_id)["next_probe_at"] = 1.0 + index
+            guard.run_scheduled_probes()
+            self.assertEqual(sorted(api.quality_calls), ["1", "2"])
+            self.assertEqual(guard.state["nodes"]["3"]["next_probe_at"], 3.0)
+            on_disk = json.loads(state_file.read_text(encoding="utf-8"))
+            self.assertNotIn("1", on_disk.get("nodes", {}))
+
+            guard.close()
+            on_disk = json.loads(state_file.read_text(encoding="utf-8"))
+            self.assertGreater(on_disk["nodes"]["1"]["next_probe_at"], 1000)
+            guard._state_for("1")["next_probe_at"] = 5.0
+            guard._save()
+            guard.close()
+            on_disk = json.loads(state_file.read_text(encoding="utf-8"))
+            self.assertGreater(on_disk["nodes"]["1"]["next_probe_at"], 1000)
+
+    def test_expired_drain_abandons_in_flight_probes_at_the_next_check(self):
+        with tempfile.TemporaryDirectory() as directory:
+            state_file = Path(directory) / "state.json"
+            cfg = config(
+                state_file=state_file,
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+                active_concurrency=2,
+            )
+            api = FakeApi(self.nodes(3), [])
+            release = threading.Event()
+            started = threading.Barrier(3)
+
+            def stuck_quality_test(node_id, early_exit=False):
+                api.quality_calls.append(node_id)
+                started.wait()
+                release.wait(5)
+                return {"expectedMatched": True, "outputTokensPerSecond": 100}
+
+            api.quality_test = stuck_quality_test
+            guard = quality_guard.Guard(cfg, api)
+            for index, node_id in enumerate(["1", "2", "3"]):
+                guard._state_for(node_id)["next_probe_at"] = 1.0 + index
+
+            def terminate():
+                # SIGTERM with no grace left, while both probes hang.
+                started.wait()
+                guard.drain()
+
+            signal = threading.Thread(target=terminate)
+            signal.start()
+            try:
+                carried = guard._probe_concurrently(
+                    api.nodes, api.nodes, 0.0, quality_guard.math.inf
+                )
+            finally:
+                release.set()
+                signal.join()
+            self.assertTrue(guard.abandoned)
+            self.assertEqual(carried, ["3"])
+            self.assertEqual(sorted(api.quality_calls), ["1", "2"])
+            self.assertEqual(guard.state["nodes"]["1"]["last_probe_at"], 0)
+            self.assertEqual(guard.state["nodes"]["3"]["next_probe_at"], 3.0)
+
+    def blocked_until_cancelled(self):
+        """Block like a hung request until the thread's cancellation fires."""
+        aborted = threading.Event()
+        cancellation = quality_guard.current_probe_cancellation()
+        self.assertIsNotNone(cancellation)
+        with cancellation.attach(aborted.set):
+            aborted.wait(5)
+        raise quality_guard.ApiError(0, "requestFailed", "connection aborted")
+
+    def test_expired_drain_aborts_a_sequential_probe(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+            )
+            api = FakeApi(self.nodes(2), [])
+
+            def hung_quality_test(node_id, early_exit=False):
+                api.quality_calls.append(node_id)
+                # SIGTERM with no grace left, while the probe hangs.
+                guard.drain()
+                self.blocked_until_cancelled()
+
+            api.quality_test = hung_quality_test
+            guard = quality_guard.Guard(cfg, api)
+            for index, node_id in enumerate(["1", "2"]):
+                guard._state_for(node_id)["next_probe_at"] = 1.0 + index
+            started = quality_guard.time.monotonic()
+            guard.run_scheduled_probes()
+            self.assertLess(quality_guard.time.monotonic() - started, 3)
+            self.assertTrue(guard.abandoned)
+            self.assertEqual(api.quality_calls, ["1"])
+            self.assertEqual(guard.state["nodes"]["1"].get("error_strikes", 0), 0)
+            self.assertEqual(guard.state["nodes"]["2"]["next_probe_at"], 2.0)
+            self.assertEqual(guard._budget_reservations, {})
+
+    def test_expired_drain_aborts_a_batch_stream(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+                active_concurrency=2,
+            )
+            api = FakeApi(self.nodes(3), [])
+            api.batch_probes = True
+
+            def hung_quality_test_many(node_ids, concurrency, early_exit=False):
+                api.batch_probe_calls.append((list(node_ids), concurrency))
+                yield node_ids[0], {
+                    "expectedMatched": True,
+                    "outputTokens": 100,
+                    "outputTokensPerSecond": 100,
+                }
+                guard.drain()
+                self.blocked_until_cancelled()
+
+            api.quality_test_many = hung_quality_test_many
+            guard = quality_guard.Guard(cfg, api)
+            for index, node_id in enumerate(["1", "2", "3"]):
+                guard._state_for(node_id)["next_probe_at"] = 1.0 + index
+            started = quality_guard.time.monotonic()
+            guard.run_scheduled_probes()
+            self.assertLess(quality_guard.time.monotonic() - started, 3)
+            self.assertTrue(guard.abandoned)
+            self.assertEqual(api.quality_calls, [])
+            self.assertGreater(guard.state["nodes"]["1"]["last_probe_at"], 0)
+            for node_id in ["2", "3"]:
+                state = guard.state["nodes"][node_id]
+                self.assertEqual(state.get("error_strikes", 0), 0)
+                self.assertEqual(state.get("last_probe_at", 0), 0)
+            self.assertEqual(guard._budget_reservations, {})
+
+    def test_guard_stops_writing_state_once_the_lease_lapses(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+            )
+            bad = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 1200,
+            }
+            api = FakeApi(self.nodes(3), [bad])
+            now = [1000.0]
+            lease = quality_guard.LeaderLease(api, 15, "host-a", clock=lambda: now[0])
+            lease.valid_until = now[0] + 10
+            guard = quality_guard.Guard(cfg, api, lease)
+            quality_test = api.quality_test
+
+            def stalled_quality_test(node_id, early_exit=False):
+                # The probe outlives the lease; a new leader takes over.
+                now[0] += 20
+                return quality_test(node_id, early_exit)
+
+            api.quality_test = stalled_quality_test
+            persisted = cfg.state_file.read_bytes()
+            guard.run_active_cycle()
+            self.assertFalse(api.nodes[0]["enabled"])
+            self.assertTrue(guard.state["nodes"]["1"]["disabled_by_guard"])
+            guard.close()
+            self.assertEqual(cfg.state_file.read_bytes(), persisted)
+
+    def test_adaptive_interval_follows_health_history_within_bounds(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+                adaptive_interval=True,
+                active_interval_max_seconds=7200,
+            )
+            good = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            soft = dict(good, outputTokensPerSecond=600)
+            api = FakeApi(self.nodes(3), [good] * 9 + [soft])
+            guard = quality_guard.Guard(cfg, api)
+            now = quality_guard.time.time()
+            self.assertEqual(guard._probe_interval("1", now), 1800)
+            for _ in range(9):
+                guard._probe_active(api.nodes, api.nodes[0], now)
+            self.assertEqual(guard.state["nodes"]["1"]["healthy_streak"], 9)
+            # Three doublings would be 14,400 s; the configured maximum caps it.
+            self.assertEqual(guard._probe_interval("1", now), 7200)
+            guard._probe_active(api.nodes, api.nodes[0], now)
+            self.assertEqual(guard._probe_interval("1", now), 600)
+            self.assertEqual(guard._probe_interval("1", now + 3600), 600)
+            guard.state["nodes"]["1"]["active_soft_strikes"] = 0
+            self.assertEqual(guard._probe_interval("1", now + 3600), 1800)
+            guard._state_for("2")["last_restored_at"] = now
+            self.assertEqual(guard._probe_interval("2", now + 60), 600)
+            heap = guard._probe_schedule(api.nodes[:2], now)
+            self.assertLessEqual(
+                guard.state["nodes"]["1"]["next_probe_at"], now + 1800 + 30
+            )
+            self.assertEqual(len(heap), 2)
+            guard = quality_guard.Guard(
+                quality_guard.dataclasses.replace(cfg, adaptive_interval=False), api
+            )
+            self.assertEqual(guard._probe_interval("1", now), 1800)
+
+    def test_probe_budget_shares_daily_limit_and_reserves_recovery(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+                daily_probe_requests=10,
+            )
+            good = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            api = FakeApi(self.nodes(3), [good] * 10)
+            guard = quality_guard.Guard(cfg, api)
+            for _ in range(4):
+                guard.run_active_cycle()
+            # 90% of the requests are shared evenly: three probes per node.
+            budget = guard.state["budget"]
+            self.assertEqual(len(api.quality_calls), 9)
+            self.assertEqual(
+                [budget["nodes"][node_id]["requests"] for node_id in "123"],
+                [3, 3, 3],
+            )
+            self.assertEqual(budget["output_tokens"], 900)
+            self.assertEqual(budget["denied"], 3)
+            # The reserved 10% still admits a recovery probe.
+            now = quality_guard.time.time()
+            api.nodes[0]["enabled"] = False
+            guard._state_for("1")["disabled_by_guard"] = True
+            guard._recover_quarantined(api.nodes[0], now, rotate=False)
+            self.assertTrue(api.nodes[0]["enabled"])
+            self.assertEqual(budget["requests"], 10)
+            self.assertFalse(guard._budget_allows("2", "recovery", now))
+            guard._save()
+            persisted = quality_guard.load_state(cfg.state_file)["budget"]
+            self.assertEqual(persisted["request_limit"], 10)
+            self.assertEqual(persisted["requests"], 10)
+            guard.state["budget"]["day"] = "2000-01-01"
+            self.assertTrue(guard._budget_allows("2", "scheduled", now))
+
+    def test_probe_crossing_midnight_charges_the_new_day(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+            )
+            api = FakeApi(self.nodes(3), [])
+            guard = quality_guard.Guard(cfg, api)
+            now = quality_guard.time.time()
+            guard._spend_budget("1", now, requests=1)
+            budget = guard.state["budget"]
+            result = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            # The probe started yesterday; its tokens land on today's books.
+            guard._record_probe(api.nodes[0], result, "healthy", "ok", now - 86400)
+            self.assertIs(guard.state["budget"], budget)
+            self.assertEqual(budget["day"], quality_guard.budget_day(now))
+            self.assertEqual(budget["requests"], 1)
+            self.assertEqual(budget["output_tokens"], 100)
+            self.assertEqual(budget["nodes"]["1"]["output_tokens"], 100)
+
+    def test_probes_in_flight_reserve_their_worst_case_budget(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+                daily_probe_output_tokens=1000,
+            )
+            api = FakeApi(self.nodes(3), [])
+            guard = quality_guard.Guard(cfg, api)
+            now = quality_guard.time.time()
+            budget = guard.state["budget"]
+            # Two admitted probes hold 2 x 384 of the 900-token pool, so a
+            # third started alongside them would overshoot it.
+            self.assertTrue(guard._begin_probe(api.nodes[0], now))
+            self.assertTrue(guard._begin_probe(api.nodes[1], now))
+            self.assertFalse(guard._begin_probe(api.nodes[2], now))
+            self.assertEqual((budget["requests"], budget["output_tokens"]), (2, 768))
+            result = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            guard._apply_probe(
+                api.nodes, api.nodes[0], now, "scheduled", ("result", result)
+            )
+            self.assertEqual(budget["output_tokens"], 484)
+            guard._apply_probe(
+                api.nodes, api.nodes[1], now, "scheduled", ("error", RuntimeError())
+            )
+            self.assertEqual(budget["output_tokens"], 100)
+            self.assertTrue(guard._begin_probe(api.nodes[2], now))
+            # A recovery whose rotation fails never sends its probe.
+            guard.config = quality_guard.dataclasses.replace(
+                cfg, rotation_url="http://rotate", rotatable_node_ids=("1",)
+            )
+
+            def failed_rotation(_node_id, _old_exit_ip=""):
+                raise RuntimeError("rotation unavailable")
+
+            api.rotate_node = failed_rotation
+            self.assertIsNone(guard._run_recovery_probe(api.nodes[0], now, rotate=True))
+            self.assertEqual((budget["requests"], budget["output_tokens"]), (3, 484))
+            self.assertEqual(budget["nodes"]["1"]["output_tokens"], 100)
+
+    def test_fresh_probe_result_is_reused_within_window_and_epoch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+                probe_reuse_seconds=60,
+            )
+            soft = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 600,
+            }
+            api = FakeApi(self.nodes(3), [soft, soft, soft])
+            guard = quality_guard.Guard(cfg, api)
+            now = quality_guard.time.time()
+            node = api.nodes[0]
+            guard._probe_active(api.nodes, node, now)
+            guard._probe_active(api.nodes, node, now, trigger="passive_confirmation")
+            self.assertEqual(api.quality_calls, ["1"])
+            self.assertEqual(guard.state["nodes"]["1"]["active_soft_strikes"], 1)
+            self.assertEqual(guard.state["statistics"]["active"]["total"], 1)
+            # A moved mihomo epoch invalidates the cached result.
+            api.get_mihomo_status = lambda: {"enabled": True, "epoch": 2}
+            guard._probe_active(api.nodes, node, now)
+            self.assertEqual(api.quality_calls, ["1", "1"])
+            self.assertFalse(node["enabled"])
+            # Quarantine drops the entry, so recovery probes the node afresh.
+            guard._recover_quarantined(node, now, rotate=False)
+            self.assertEqual(api.quality_calls, ["1", "1", "1"])
+            guard._recover_quarantined(node, now, rotate=False)
+            self.assertEqual(len(api.quality_calls), 3)
+            self.assertFalse(node["enabled"])
+
+    def test_epoch_watch_aborts_in_flight_probe_without_status_reads(self):
+        epochs = quality_guard.queue.Queue()
+        first = {"enabled": True, "epoch": 1, "testEnabled": False, "testEpoch": 0}
+
+        class WatchedApi(FakeApi):
+            def wait_mihomo_epochs(self, known, _wait_seconds):
+                return first if known is None else epochs.get(timeout=5)
+
+            def get_mihomo_status(self):
+                raise AssertionError("a live watch replaces status reads")
+
+            def quality_test(self, node_id, early_exit=False):
+                self.quality_calls.append(node_id)
+                if not self.results:
+                    aborted = threading.Event()
+                    cancellation = quality_guard.current_probe_cancellation()
+                    with cancellation.attach(aborted.set):
+                        epochs.put({**first, "epoch": 2})
+                        self.aborted = aborted.wait(5)
+                    raise RuntimeError("connection shut down")
+                return self.results.pop(0)
+
+        healthy = {
+            "expectedMatched": True,
+            "outputTokens": 500,
+            "generationMs": 1000,
+            "outputTokensPerSecond": 500,
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+            )
+            api = WatchedApi(self.nodes(3), [healthy])
+            guard = quality_guard.Guard(cfg, api)
+            guard.start_workers()
+            self.addCleanup(guard.stop_workers)
+            deadline = quality_guard.time.monotonic() + 5
+            while not guard.epoch_watch.status()[0]:
+                self.assertLess(quality_guard.time.monotonic(), deadline)
+                quality_guard.time.sleep(0.01)
+            node = api.nodes[0]
+            self.assertEqual(guard._run_probe(node, "scheduled"), ("result", healthy))
+            self.assertEqual(
+                guard._run_probe(node, "scheduled"), ("epoch_changed", None)
+            )
+            self.assertTrue(api.aborted)
+            self.assertEqual(guard.epoch_watch.status(), (True, {**first, "epoch": 2}))
+
+    def test_synced_probe_takes_its_baseline_from_the_select(self):
+        epochs = quality_guard.queue.Queue()
+        first = {"enabled": True, "epoch": 1, "testEnabled": True, "testEpoch": 1}
+
+        class WatchedApi(FakeApi):
+            test_epoch = 1
+
+            def wait_mihomo_epochs(self, known, _wait_seconds):
+                return first if known is None else epochs.get(timeout=5)
+
+            def get_mihomo_status(self):
+                raise AssertionError("the select reports the baseline")
+
+            def select_test_member(self, node_name):
+                # Switching the test group bumps its epoch; the watch has not
+                # seen that yet when the probe starts.
+                super().select_test_member(node_name)
+                self.test_epoch += 1
+                return {
+                    "changed": True,
+                    "currentNode": node_name,
+                    "epochs": {**first, "testEpoch": self.test_epoch},
+                }
+
+            def quality_test(self, node_id, early_exit=False):
+                self.quality_calls.append(node_id)
+                cancellation = quality_guard.current_probe_cancellation()
+                aborted = threading.Event()
+                with cancellation.attach(aborted.set):
+                    # The watch catches up with the select mid-probe.
+                    epochs.put({**first, "testEpoch": self.test_epoch})
+                    if len(self.quality_calls) == 2:
+                        # A real move after the select aborts the probe.
+                        epochs.put({**first, "testEpoch": self.test_epoch + 1})
+                        self.aborted = aborted.wait(5)
+                        raise RuntimeError("connection shut down")
+                    self.aborted = aborted.wait(0.2)
+                return self.results.pop(0)
+
+        healthy = {
+            "expectedMatched": True,
+            "outputTokens": 500,
+            "generationMs": 1000,
+            "outputTokensPerSecond": 500,
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+            )
+            nodes = self.nodes(3)
+            nodes[0]["name"] = "mihomo-sg-1"
+            api = WatchedApi(nodes, [healthy])
+            guard = quality_guard.Guard(cfg, api)
+            guard._mihomo_member_by_node = {"1": "mihomo-sg-1"}
+            guard.start_workers()
+            self.addCleanup(guard.stop_workers)
+            deadline = quality_guard.time.monotonic() + 5
+            while not guard.epoch_watch.status()[0]:
+                self.assertLess(quality_guard.time.monotonic(), deadline)
+                quality_guard.time.sleep(0.01)
+            node = api.nodes[0]
+            self.assertEqual(guard._run_probe(node, "scheduled"), ("result", healthy))
+            self.assertFalse(api.aborted)
+            self.assertEqual(api.select_calls, ["mihomo-sg-1"])
+            self.assertEqual(
+                guard._run_probe(node, "scheduled"), ("epoch_changed", None)
+            )
+            self.assertTrue(api.aborted)
+
+    def test_early_exit_probe_covers_detection_but_not_recovery(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+                early_exit_probe=True,
+            )
+            truncated = {
+                "expectedMatched": True,
+                "earlyExit": True,
+                "outputTokens": quality_guard.MIN_SPEED_OUTPUT_TOKENS,
+                "generationMs": 1000,
+                "outputTokensPerSecond": 1200,
+            }
+            full = {
+                "expectedMatched": True,
+                "outputTokens": 300,
+                "outputTokensPerSecond": 80,
+            }
+            self.assertEqual(
+                quality_guard.classify_result(truncated, cfg), ("hard", "hard_tps")
+            )
+            api = FakeApi(self.nodes(3), [truncated, full])
+            guard = quality_guard.Guard(cfg, api)
+            now = quality_guard.time.time()
+            node = api.nodes[0]
+            guard._probe_active(api.nodes, node, now)
+            self.assertFalse(node["enabled"])
+            # Recovery re-enables a node, so it still waits for a full generation.
+            guard._recover_quarantined(node, now, rotate=False)
+            self.assertTrue(node["enabled"])
+            self.assertEqual(api.early_exit_calls, [True, False])
+
+    def test_async_engine_overlaps_probes_and_applies_outcomes_serially(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                active_concurrency=5,
+            )
+            bad = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 1200,
+            }
+            api = FakeApi(self.nodes(), [])
+            async_api = FakeAsyncApi([bad] * 5, in_flight_target=5)
+            guard = quality_guard.Guard(cfg, api)
+            for node in api.nodes:
+                guard._state_for(node["id"])["next_probe_at"] = 1.0
+            engine = quality_guard.AsyncGuardEngine(guard, async_api)
+            try:
+                deadline = quality_guard.asyncio.run(engine.run_scheduled_probes())
+            finally:
+                engine.state_executor.shutdown()
+            self.assertEqual(async_api.max_in_flight, 5)
+            self.assertEqual(api.quality_calls, [])
+            self.assertEqual(len(api.enabled_calls), 2)
+            self.assertEqual(sum(1 for node in api.nodes if node["enabled"]), 3)
+            self.assertEqual(guard.state["statistics"]["active"]["hard"], 5)
+            self.assertGreater(deadline, quality_guard.time.time() + 1000)
+            persisted = quality_guard.load_state(cfg.state_file)
+            self.assertGreater(persisted["last_active_cycle_at"], 0)
+
+    def test_recovery_worker_keeps_passive_poll_off_the_recovery_path(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+            )
+            good = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            api = FakeApi(self.nodes(3), [good])
+            api.nodes[0]["enabled"] = False
+            release = threading.Event()
+            quality_test = api.quality_test
+
+            def slow_quality_test(node_id, early_exit=False):
+                release.wait(5)
+                return quality_test(node_id)
+
+            api.quality_test = slow_quality_test
+            guard = quality_guard.Guard(cfg, api)
+            guard._state_for("1")["disabled_by_guard"] = True
+            guard.start_workers()
+            try:
+                guard.run_passive_cycle()
+                guard.run_passive_cycle()
+                self.assertTrue(guard._recovering("1"))
+                self.assertEqual(api.enabled_calls, [])
+            finally:
+                release.set()
+                guard.stop_workers(timeout=5)
+            self.assertEqual(api.quality_calls, ["1"])
+            self.assertEqual(api.enabled_calls, [("1", True)])
+            self.assertFalse(guard.state["nodes"]["1"]["disabled_by_guard"])
+
+    def test_slow_restore_request_does_not_hold_the_state_lock(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+            )
+            good = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            api = FakeApi(self.nodes(3), [good])
+            api.nodes[0]["enabled"] = False
+            patching = threading.Event()
+            release = threading.Event()
+            set_enabled = api.set_enabled
+
+            def slow_set_enabled(node_id, enabled):
+                if enabled:
+                    patching.set()
+                    release.wait(5)
+                return set_enabled(node_id, enabled)
+
+            api.set_enabled = slow_set_enabled
+            guard = quality_guard.Guard(cfg, api)
+            guard._state_for("1")["disabled_by_guard"] = True
+            guard.start_workers()
+            try:
+                guard.run_passive_cycle()
+                self.assertTrue(patching.wait(5))
+                # The restore PATCH is in flight; the passive poll and state
+                # saves go on without waiting for it.
+                poll = threading.Thread(target=guard.run_passive_cycle)
+                poll.start()
+                poll.join(2)
+                self.assertFalse(poll.is_alive())
+                self.assertTrue(guard.state["nodes"]["1"]["disabled_by_guard"])
+            finally:
+                release.set()
+                guard.stop_workers(timeout=5)
+            self.assertTrue(api.nodes[0]["enabled"])
+            self.assertFalse(guard.state["nodes"]["1"]["disabled_by_guard"])
 
     def test_auto_discovery_publishes_resolved_node_ids_for_status_consumers(self):
         with tempfile.TemporaryDirectory() as directory:
@@ -590,6 +2282,125 @@ class GuardTests(unittest.TestCase):
             self.assertEqual(api.enabled_calls, [])
             self.assertFalse(guard.state["nodes"]["1"]["disabled_by_guard"])
 
+    def test_shards_partition_nodes_and_share_the_healthy_floor(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=3,
+            )
+            api = FakeApi(self.nodes(6), [])
+            shards = [quality_guard.Guard(cfg.for_shard(i, 2), api) for i in (0, 1)]
+            owned = []
+            for guard in shards:
+                _all_nodes, nodes, _skip = guard._prepare_nodes(0.0)
+                owned.append({node["id"] for node in nodes})
+                self.assertTrue(guard.config.state_file.name.startswith("state.shard-"))
+            self.assertFalse(owned[0] & owned[1])
+            self.assertEqual(owned[0] | owned[1], {"1", "2", "3", "4", "5", "6"})
+            # Each shard decides on a stale listing; the floor still holds
+            # because quarantine recounts enabled nodes under the shared lock.
+            stale = [dict(node) for node in api.nodes]
+            for guard, ids in zip(shards, owned):
+                for node in api.nodes:
+                    if node["id"] in ids:
+                        guard._quarantine(stale, node, "hard_tps", 0.0)
+            self.assertEqual(len(api.enabled_calls), 3)
+            self.assertEqual(sum(1 for node in api.nodes if node["enabled"]), 3)
+
+    def test_shards_count_synced_nodes_quarantined_by_another_shard(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=3,
+            )
+            api = FakeApi(self.nodes(4), [])
+            synced = api.nodes[0]
+            synced["name"] = "mihomo-a"
+            owner = quality_guard.shard_of(synced["id"], 2)
+            shards = [quality_guard.Guard(cfg.for_shard(i, 2), api) for i in (0, 1)]
+            target = next(
+                node
+                for node in api.nodes[1:]
+                if quality_guard.shard_of(node["id"], 2) != owner
+            )
+            # The ban is the synced node's quarantine; it stays enabled.
+            shards[owner]._quarantine(api.nodes, synced, "hard_tps", 0.0)
+            self.assertEqual(api.ban_calls, ["mihomo-a"])
+            self.assertTrue(synced["enabled"])
+            # Three nodes still serve traffic, so the other shard must not
+            # take a fourth one below the floor.
+            shards[1 - owner]._quarantine(api.nodes, target, "hard_tps", 0.0)
+            self.assertEqual(api.enabled_calls, [])
+            self.assertTrue(target["enabled"])
+            self.assertFalse(
+                shards[1 - owner].state["nodes"][target["id"]]["disabled_by_guard"]
+            )
+
+    def test_shards_serialize_synced_probes_on_a_shared_lock(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+            ).for_shard(0, 2)
+            api = FakeApi(self.nodes(2), [])
+            api.nodes[0]["name"] = "mihomo-a"
+            guard = quality_guard.Guard(cfg, api)
+            entered = threading.Event()
+
+            def probe():
+                with guard._test_group_guard(api.nodes[0]):
+                    entered.set()
+
+            # Another shard is mid-probe on the shared test group.
+            with quality_guard.process_lock(cfg.test_group_lock_file):
+                worker = threading.Thread(target=probe)
+                worker.start()
+                self.assertFalse(entered.wait(0.2))
+            worker.join(5)
+            self.assertTrue(entered.is_set())
+            # Unsynced nodes never wait on the test group.
+            with quality_guard.process_lock(cfg.test_group_lock_file):
+                with guard._test_group_guard(api.nodes[1]):
+                    pass
+
+    def test_shard_states_seed_from_and_merge_back_into_status_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                daily_probe_requests=100,
+            )
+            state = quality_guard.load_state(cfg.state_file)
+            for node_id in ("1", "2", "3", "4"):
+                state["nodes"][node_id] = quality_guard.default_node_state()
+            state["nodes"]["3"]["disabled_by_guard"] = True
+            quality_guard.ensure_statistics(state)["actions"]["quarantined"] = 7
+            seeded = {
+                index: quality_guard.shard_state_from(state, cfg.for_shard(index, 3))
+                for index in range(3)
+            }
+            self.assertEqual(
+                sorted(node for value in seeded.values() for node in value["nodes"]),
+                ["1", "2", "3", "4"],
+            )
+            for value in seeded.values():
+                quality_guard.ensure_statistics(value)
+                value["updated_at"] = 50.0
+            seeded[2]["updated_at"] = 10.0
+            seeded[1]["statistics"]["active"]["total"] = 2
+            merged = quality_guard.merge_shard_states(
+                cfg, seeded, 3, quality_guard.time.time()
+            )
+            self.assertTrue(merged["nodes"]["3"]["disabled_by_guard"])
+            self.assertEqual(merged["statistics"]["actions"]["quarantined"], 7)
+            self.assertEqual(merged["statistics"]["active"]["total"], 2)
+            self.assertEqual(merged["updated_at"], 10.0)
+            self.assertEqual(merged["budget"]["request_limit"], 100)
+            self.assertEqual(cfg.for_shard(1, 3).daily_probe_requests, 34)
+            self.assertEqual(len(merged["shards"]), 3)
+
     def test_fail_closed_rotates_soft_signal_and_restores_after_one_good_probe(self):
         with tempfile.TemporaryDirectory() as directory:
             cfg = config(
@@ -923,6 +2734,88 @@ class GuardTests(unittest.TestCase):
             self.assertEqual(api.enabled_calls, [("2", False)])
             self.assertTrue(guard.state["nodes"]["2"]["disabled_by_guard"])
 
+    def test_healthy_passive_coverage_replaces_scheduled_probe(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+                passive_coverage_audits=2,
+            )
+            good = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            api = FakeApi(
+                self.nodes(3),
+                [good, good],
+                [
+                    {"items": [], "hasMore": False, "nextCursor": ""},
+                    {
+                        "items": [
+                            self.audit("a", "1", 400),
+                            self.audit("b", "1", 400),
+                            self.audit("c", "2", 400),
+                        ],
+                        "hasMore": False,
+                        "nextCursor": "",
+                    },
+                ],
+            )
+            guard = quality_guard.Guard(cfg, api)
+            guard.run_passive_cycle()
+            guard.run_passive_cycle()
+            for node in api.nodes:
+                guard._state_for(node["id"])["next_probe_at"] = 1.0
+            started = quality_guard.time.time()
+            guard.run_scheduled_probes()
+            self.assertEqual(sorted(api.quality_calls), ["2", "3"])
+            self.assertGreater(
+                guard.state["nodes"]["1"]["next_probe_at"], started + 1000
+            )
+            statistics = guard.state["statistics"]
+            self.assertEqual(statistics["actions"]["passive_covered"], 1)
+            self.assertEqual(statistics["active"]["total"], 2)
+            guard.config = quality_guard.dataclasses.replace(cfg, mode="active")
+            guard.state["nodes"]["1"]["next_probe_at"] = 1.0
+            api.results.append(good)
+            guard.run_scheduled_probes()
+            self.assertEqual(api.quality_calls[-1], "1")
+
+    def test_passive_coverage_dates_from_the_audited_request(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+                passive_coverage_audits=2,
+            )
+            old = "2000-01-01T00:00:00.123456789Z"
+            api = FakeApi(
+                self.nodes(3),
+                [],
+                [
+                    {"items": [], "hasMore": False, "nextCursor": ""},
+                    {
+                        "items": [
+                            dict(self.audit("a", "1", 400), createdAt=old),
+                            dict(self.audit("b", "1", 400), createdAt=old),
+                        ],
+                        "hasMore": False,
+                        "nextCursor": "",
+                    },
+                ],
+            )
+            guard = quality_guard.Guard(cfg, api)
+            guard.run_passive_cycle()
+            # A backlog read after downtime is stamped with its own time.
+            guard.run_passive_cycle()
+            self.assertEqual(
+                guard.state["nodes"]["1"]["passive_healthy_at"], [946684800.123456] * 2
+            )
+            self.assertFalse(guard._passive_covered("1", quality_guard.time.time()))
+
     def test_passive_signals_quarantine_only_after_consecutive_active_soft_confirmations(
         self,
     ):
@@ -964,6 +2857,92 @@ class GuardTests(unittest.TestCase):
             self.assertEqual(api.enabled_calls, [("2", False)])
             self.assertTrue(guard.state["nodes"]["2"]["disabled_by_guard"])
 
+    def test_passive_soft_burst_coalesces_into_one_confirmation_per_node(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                mode="passive",
+            )
+            soft = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 600,
+            }
+            api = FakeApi(
+                self.nodes(),
+                [soft],
+                [
+                    {"items": [], "hasMore": False, "nextCursor": ""},
+                    {
+                        "items": [
+                            self.audit("user-1", "2", 600),
+                            self.audit("user-2", "2", 700),
+                            self.audit("user-3", "2", 800),
+                        ],
+                        "hasMore": False,
+                        "nextCursor": "",
+                    },
+                ],
+            )
+            guard = quality_guard.Guard(cfg, api)
+            guard.run_passive_cycle()
+            guard.run_passive_cycle()
+            self.assertEqual(api.quality_calls, ["2"])
+            self.assertEqual(api.enabled_calls, [])
+            self.assertEqual(guard.state["nodes"]["2"]["passive_soft_strikes"], 3)
+            self.assertEqual(guard.state["nodes"]["2"]["active_soft_strikes"], 1)
+
+    def test_confirmation_worker_keeps_one_probe_in_flight_per_node(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                mode="passive",
+            )
+            healthy = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            api = FakeApi(
+                self.nodes(),
+                [healthy],
+                [
+                    {"items": [], "hasMore": False, "nextCursor": ""},
+                    {
+                        "items": [self.audit("user-1", "2", 600)],
+                        "hasMore": False,
+                        "nextCursor": "",
+                    },
+                    {
+                        "items": [self.audit("user-2", "2", 600)],
+                        "hasMore": False,
+                        "nextCursor": "",
+                    },
+                ],
+            )
+            release = threading.Event()
+            quality_test = api.quality_test
+
+            def slow_quality_test(node_id, early_exit=False):
+                release.wait(5)
+                return quality_test(node_id)
+
+            api.quality_test = slow_quality_test
+            guard = quality_guard.Guard(cfg, api)
+            guard.start_workers()
+            try:
+                guard.run_passive_cycle()
+                guard.run_passive_cycle()
+                guard.run_passive_cycle()
+                self.assertTrue(guard.confirmations.owns("2"))
+            finally:
+                release.set()
+                guard.stop_workers(timeout=5)
+            self.assertEqual(api.quality_calls, ["2"])
+            self.assertEqual(guard.state["nodes"]["2"]["passive_soft_strikes"], 0)
+
     def test_multiple_passive_hard_signals_only_quarantine_once(self):
         with tempfile.TemporaryDirectory() as directory:
             cfg = config(
@@ -993,6 +2972,174 @@ class GuardTests(unittest.TestCase):
             self.assertEqual(api.enabled_calls, [("2", False)])
             self.assertEqual(guard.state["nodes"]["2"]["passive_soft_strikes"], 0)
 
+    def test_incident_poll_quarantines_and_restores_in_one_batch_each(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                mode="passive",
+                node_ids=("1", "2", "3", "4"),
+            )
+
+            class RacingApi(FakeApi):
+                def set_enabled_many(self, node_ids, enabled):
+                    # An operator disabled node 2 after the poll's listing.
+                    self.nodes[1]["enabled"] = False
+                    return super().set_enabled_many(node_ids, enabled)
+
+            healthy = {
+                "expectedMatched": True,
+                "outputTokens": 100,
+                "outputTokensPerSecond": 100,
+            }
+            api = RacingApi(
+                self.nodes(6),
+                [healthy] * 4,
+                [
+                    {"items": [], "hasMore": False, "nextCursor": ""},
+                    {
+                        "items": [
+                            self.audit(f"user-{node_id}", node_id, 1200)
+                            for node_id in ("1", "2", "3", "4")
+                        ],
+                        "hasMore": False,
+                        "nextCursor": "",
+                    },
+                ],
+            )
+            guard = quality_guard.Guard(cfg, api)
+            guard.run_passive_cycle()
+            guard.run_passive_cycle()
+            # Audits apply newest first. One floor count admits three of the
+            # four, one PATCH carries them, and only the IDs the backend
+            # changed stay guard-owned.
+            self.assertEqual(api.batch_calls, [(["4", "3", "2"], False)])
+            owned = {
+                node_id
+                for node_id, state in guard.state["nodes"].items()
+                if state.get("disabled_by_guard")
+            }
+            self.assertEqual(owned, {"3", "4"})
+            self.assertEqual(guard.state["statistics"]["actions"]["quarantined"], 2)
+            self.assertEqual(guard.state["statistics"]["actions"]["suppressed"], 1)
+
+            for node_id in owned:
+                guard.state["nodes"][node_id]["quarantined_until"] = 0
+            guard.run_active_cycle()
+            self.assertEqual(api.batch_calls[1:], [(["3", "4"], True)])
+            self.assertFalse(
+                any(
+                    state.get("disabled_by_guard")
+                    for state in guard.state["nodes"].values()
+                )
+            )
+            self.assertEqual(guard.state["statistics"]["actions"]["restored"], 2)
+
+    def test_synced_nodes_stay_out_of_batches_and_refused_batches_go_per_id(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+            )
+
+            class ManagedApi(FakeApi):
+                # Node 3 became Mihomo-synced after the guard's listing.
+                managed = {"3", "10"}
+
+                def _refuse(self, node_ids):
+                    if self.managed & set(node_ids):
+                        raise quality_guard.ApiError(
+                            403,
+                            "mihomoNodeProtected",
+                            "Mihomo 同步节点由系统自动管理，禁止修改或删除",
+                        )
+
+                def set_enabled(self, node_id, enabled):
+                    self._refuse([node_id])
+                    return super().set_enabled(node_id, enabled)
+
+                def set_enabled_many(self, node_ids, enabled):
+                    self.batch_calls.append((list(node_ids), enabled))
+                    self._refuse(node_ids)
+                    return super().set_enabled_many(node_ids, enabled)
+
+            nodes = self.nodes(5)
+            nodes.append(
+                {
+                    "id": "10",
+                    "name": "mihomo-sg-1",
+                    "sourceKey": "mihomo:test-group:mihomo-sg-1",
+                    "enabled": True,
+                    "proxyConfigured": True,
+                }
+            )
+            api = ManagedApi(nodes, [])
+            guard = quality_guard.Guard(cfg, api)
+            by_id = {node["id"]: node for node in nodes}
+            guard._apply_quarantines(
+                nodes,
+                [(by_id[node_id], "hard_tps", 0.0) for node_id in ("10", "2", "3")],
+            )
+            # The synced node is banned, never PATCHed; the refused batch is
+            # retried per ID and only node 3 stays out of guard ownership.
+            self.assertEqual(api.batch_calls[0], (["2", "3"], False))
+            self.assertEqual(api.enabled_calls, [("2", False)])
+            self.assertEqual(api.ban_calls, ["mihomo-sg-1"])
+            owned = {
+                node_id
+                for node_id, state in guard.state["nodes"].items()
+                if state.get("disabled_by_guard")
+            }
+            self.assertEqual(owned, {"2", "10"})
+            self.assertTrue(by_id["10"]["enabled"])
+
+            guard._apply_restores(
+                [(by_id[node_id], 1.0, "ok") for node_id in ("10", "2")]
+            )
+            self.assertEqual(api.enabled_calls[1:], [("2", True)])
+            self.assertEqual(api.unban_calls, ["mihomo-sg-1"])
+            self.assertFalse(guard.state["nodes"]["10"]["disabled_by_guard"])
+            self.assertFalse(guard.state["nodes"]["2"]["disabled_by_guard"])
+
+    def test_fenced_or_unauthorized_batch_is_not_retried_per_id(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cfg = config(
+                state_file=Path(directory) / "state.json",
+                lock_file=Path(directory) / "lock",
+                min_healthy_nodes=1,
+            )
+
+            class RefusingApi(FakeApi):
+                error = quality_guard.ApiError(409, "qualityGuardFenced", "")
+
+                def set_enabled(self, node_id, enabled):
+                    self.enabled_calls.append((node_id, enabled))
+                    raise self.error
+
+                def set_enabled_many(self, node_ids, enabled):
+                    self.batch_calls.append((list(node_ids), enabled))
+                    raise self.error
+
+            api = RefusingApi(self.nodes(5), [])
+            guard = quality_guard.Guard(cfg, api)
+            guard._apply_quarantines(
+                api.nodes, [(node, "hard_tps", 0.0) for node in api.nodes[:3]]
+            )
+            self.assertEqual(api.batch_calls, [(["1", "2", "3"], False)])
+            self.assertEqual(api.enabled_calls, [])
+            self.assertFalse(
+                any(
+                    state.get("disabled_by_guard")
+                    for state in guard.state["nodes"].values()
+                )
+            )
+            api.error = quality_guard.ApiError(401, "unauthorized", "")
+            with self.assertRaises(quality_guard.ApiError):
+                guard._set_enabled_batch(["1", "2"], False)
+            self.assertEqual(len(api.batch_calls), 2)
+            self.assertEqual(api.enabled_calls, [])
+
     def test_passive_confirmation_errors_do_not_quarantine(self):
         with tempfile.TemporaryDirectory() as directory:
             cfg = config(
@@ -1096,7 +3243,7 @@ class GuardTests(unittest.TestCase):
             guard = quality_guard.Guard(cfg, api)
             guard.run_cycle()
             self.assertEqual(api.select_calls, ["mihomo-sg-1"])
-            self.assertEqual(api.enabled_calls, [("10", False)])
+            self.assertEqual(api.enabled_calls, [])
             self.assertEqual(api.ban_calls, ["mihomo-sg-1"])
             self.assertEqual(api.quality_calls, ["10"])
 
@@ -1127,7 +3274,7 @@ class GuardTests(unittest.TestCase):
             guard = quality_guard.Guard(cfg, api)
             guard.run_cycle()
             guard.run_cycle()
-            self.assertEqual(api.enabled_calls, [("10", False)])
+            self.assertEqual(api.enabled_calls, [])
             self.assertEqual(api.rotation_calls, [])
             self.assertEqual(api.ban_calls, ["mihomo-sg-1"])
 
@@ -1158,7 +3305,7 @@ class GuardTests(unittest.TestCase):
             state = guard._state_for("10")
             state.update({"disabled_by_guard": True, "quarantined_until": 0})
             guard.run_cycle()
-            self.assertEqual(api.enabled_calls, [("10", True)])
+            self.assertEqual(api.enabled_calls, [])
             self.assertEqual(api.unban_calls, ["mihomo-sg-1"])
             self.assertFalse(state["disabled_by_guard"])
 
@@ -1180,7 +3327,7 @@ class GuardTests(unittest.TestCase):
                 }
             )
             api = FakeApi(nodes, [])
-            api.select_test_member = lambda _node_name: False
+            api.select_test_member = lambda _node_name: None
             guard = quality_guard.Guard(cfg, api)
             guard.run_cycle()
             state = guard.state["nodes"]["10"]
@@ -1273,7 +3420,9 @@ class GuardTests(unittest.TestCase):
             api = StableApi(nodes, [hard])
             guard = quality_guard.Guard(cfg, api)
             guard.run_cycle()
-            self.assertEqual(api.enabled_calls, [("10", False)])
+            # Synced nodes are quarantined by banning the test-group member.
+            self.assertEqual(api.enabled_calls, [])
+            self.assertEqual(api.ban_calls, ["mihomo-sg-1"])
             self.assertTrue(guard.state["nodes"]["10"]["disabled_by_guard"])
 
     def test_mihomo_epoch_change_detected_via_production_epoch(self):